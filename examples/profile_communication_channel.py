@@ -54,8 +54,20 @@ with open("profile_communication_channel.csv", "wb") as csv_file:
         # columns for number of neurons and dimensions
         if i == 0:
             profiling.write_csv_header(core_data, csv_writer,
-                                       ["Num neurons", "Dimensions"])
+                                       ["Num neurons", "Dimensions",
+                                        "n_neurons_in_cluster", "size_out"])
 
         # Write a row from the profiler data
         profiling.write_csv_row(core_data, 10.0, 0.001, csv_writer,
-                                [neuron_slice[1] - neuron_slice[0], dimensions])
\ No newline at end of file
+                                [neuron_slice[1] - neuron_slice[0], dimensions,
+                                 ensemble_size, dimensions])
+
+# The cost model used to partition ensembles may be fitted to the CSV files
+# produced by running this script with different parameters, e.g.:
+#
+#   from nengo_spinnaker.operators.lif import fit_ensemble_cost_model
+#   fit_ensemble_cost_model(["profile_communication_channel.csv"],
+#                           "ensemble_cost_model.json")
+#
+# and then used by naming the saved file in the [cost_model] section of
+# nengo_spinnaker.conf.
\ No newline at end of file
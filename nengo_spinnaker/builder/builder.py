@@ -6,10 +6,12 @@ from nengo.cache import NoDecoderCache
 from nengo.utils import numpy as npext
 import numpy as np
 from six import iteritems, itervalues
+from six.moves import zip
 
-from . import model
+from . import model, parallel
 from nengo_spinnaker.netlist import NMNet, Netlist
 from nengo_spinnaker.utils import collections as collections_ext
+from nengo_spinnaker.utils.build_cache import NoBuildCache
 from nengo_spinnaker.utils.keyspaces import KeyspaceContainer
 
 BuiltConnection = collections.namedtuple(
@@ -34,6 +36,9 @@ class Model(object):
         Real-time duration of a simulation timestep in microseconds.
     decoder_cache :
         Cache used to reduce the time spent solving for decoders.
+    build_cache :
+        Cache used to reduce the time spent placing and routing the netlist
+        and minimising its routing tables.
     params : {object: build details, ...}
         Map of Nengo objects (Ensembles, Connections, etc.) to their built
         equivalents.
@@ -119,6 +124,24 @@ class Model(object):
     terminating end of a signal.
     """
 
+    connection_solvers = collections_ext.registerabledict()
+    """Functions which solve for the parameters of many connections at once.
+
+    When connections are made concurrently (see :py:meth:`~.Model.build`) the
+    connections are made once the rest of the network has been built.  First
+    a solver registered against the type of the originating object of the
+    connections is called with all of the connections from objects of that
+    type, it must be of the form:
+
+        .. py:function:: solver(model, connections, n_threads)
+
+    And should store an instance of :py:class:`~.BuiltConnection` in
+    `model.params[connection]` for each connection, which the transmission
+    parameter builder may then use rather than solving for the connection
+    itself.  Solvers must be deterministic with respect to the seed of each
+    connection, `model.seeds[connection]`.
+    """
+
     probe_builders = collections_ext.registerabledict()
     """Builder functions for probes.
 
@@ -132,10 +155,12 @@ class Model(object):
     """
 
     def __init__(self, dt=0.001, machine_timestep=1000,
-                 decoder_cache=NoDecoderCache(), keyspaces=None):
+                 decoder_cache=NoDecoderCache(), keyspaces=None,
+                 build_cache=NoBuildCache()):
         self.dt = dt
         self.machine_timestep = machine_timestep
         self.decoder_cache = decoder_cache
+        self.build_cache = build_cache
 
         self.params = dict()
         self.seeds = dict()
@@ -159,8 +184,12 @@ class Model(object):
         self._source_getters = dict()
         self._reception_parameter_builders = dict()
         self._sink_getters = dict()
+        self._connection_solvers = dict()
         self._probe_builders = dict()
 
+        # Connections which are to be made once the network has been built
+        self._deferred_connections = None
+
     def build(self, network, **kwargs):
         """Build a Network into this model.
 
@@ -168,6 +197,12 @@ class Model(object):
         ----------
         network : :py:class:`~nengo.Network`
             Nengo network to build.  Passthrough Nodes will be removed.
+        decoder_n_threads : int or None
+            Number of threads in which to solve for the parameters of
+            connections (e.g., decoders), if None then one thread per CPU is
+            used.  If not 1 then the connections are made once all the other
+            objects have been built, using the functions in
+            :py:attr:`~.Model.connection_solvers`.
         """
         # Store the network config
         self.config = network.config
@@ -198,14 +233,27 @@ class Model(object):
         self._sink_getters.update(self.sink_getters)
         self._sink_getters.update(kwargs.get("extra_sink_getters", {}))
 
+        self._connection_solvers = collections_ext.mrolookupdict()
+        self._connection_solvers.update(self.connection_solvers)
+        self._connection_solvers.update(
+            kwargs.get("extra_connection_solvers", {}))
+
         self._probe_builders = dict()
         self._probe_builders.update(self.probe_builders)
         self._probe_builders.update(kwargs.get("extra_probe_builders", {}))
 
-        # Build
+        # Build, if connections are to be made concurrently then this is done
+        # after everything else has been built.
+        n_threads = kwargs.get("decoder_n_threads", 1)
+        if n_threads != 1:
+            self._deferred_connections = list()
+
         with self.decoder_cache:
             self._build_network(network)
 
+            if self._deferred_connections is not None:
+                self._make_deferred_connections(n_threads)
+
     def add_interposers(self):
         # Insert interposers
         interposers, connection_map = \
@@ -254,6 +302,40 @@ class Model(object):
         # Set the seed for the connection
         self.seeds[conn] = get_seed(conn, self.rng)
 
+        if self._deferred_connections is not None:
+            # Make the connection once the network has been built
+            self._deferred_connections.append(conn)
+        else:
+            self._make_connection(conn)
+
+    def _make_deferred_connections(self, n_threads):
+        """Make the connections whose construction was deferred, solving for
+        the parameters of many connections at once.
+        """
+        connections = self._deferred_connections
+        self._deferred_connections = None
+
+        # Group the connections by the type of their originating objects and
+        # solve for their parameters.
+        groups = collections.OrderedDict()
+        for conn in connections:
+            pre_type = type(conn.pre_obj)
+            try:
+                solver = self._connection_solvers[pre_type]
+            except KeyError:
+                continue  # No solver, parameters are built individually
+
+            groups.setdefault(solver, list()).append(conn)
+
+        for solver, conns in iteritems(groups):
+            solver(self, conns, n_threads)
+
+        # Make each connection, in the order they were added to the network
+        for conn in connections:
+            self._make_connection(conn)
+
+    def _make_connection(self, conn):
+        """Make a Connection which has already been seeded."""
         # Get the transmission parameters and reception parameters for the
         # connection.
         pre_type = type(conn.pre_obj)
@@ -331,12 +413,25 @@ class Model(object):
     def make_netlist(self, *args, **kwargs):
         """Convert the model into a netlist for simulating on SpiNNaker.
 
+        Other than `n_processes` all arguments are passed to the
+        `make_vertices` method of each operator.
+
+        Parameters
+        ----------
+        n_processes : int or None
+            Number of processes in which to make the vertices of the
+            operators, if None then one process per CPU is used.  By default
+            the vertices are made in this process (see
+            :py:func:`~nengo_spinnaker.builder.parallel.make_vertices`).
+
         Returns
         -------
         :py:class:`~nengo_spinnaker.netlist.Netlist`
             A netlist which can be placed and routed to simulate this model on
             a SpiNNaker machine.
         """
+        n_processes = kwargs.pop("n_processes", 1)
+
         # Call each operator to make vertices
         operator_vertices = dict()
         load_functions = collections_ext.noneignoringlist()
@@ -347,18 +442,26 @@ class Model(object):
         # Prepare to build a list of signal constraints
         id_constraints = collections.defaultdict(set)
 
-        for op in itertools.chain(itervalues(self.object_operators),
-                                  self.extra_operators):
+        # Passthrough Nodes are skipped, all other operators are called upon
+        # to build vertices for the netlist.
+        operators = [op for op in
+                     itertools.chain(itervalues(self.object_operators),
+                                     self.extra_operators) if
+                     not isinstance(op, model.PassthroughNode)]
 
-            # If the operator is a passthrough Node then skip it
-            if isinstance(op, model.PassthroughNode):
-                continue
+        # Find the signals received by every operator before the operators
+        # are called, otherwise they would be found again by every worker
+        # process.
+        if self._incoming_signals is None:
+            self._incoming_signals = \
+                self.connection_map.get_signals_to_all_objects()
 
-            # Otherwise call upon the operator to build vertices for the
-            # netlist. The vertices should always be returned as an iterable.
-            vxs, load_fn, pre_fn, post_fn, constraint = op.make_vertices(
-                self, *args, **kwargs
-            )
+        specs = parallel.make_vertices(self, operators, n_processes,
+                                       *args, **kwargs)
+
+        for op, spec in zip(operators, specs):
+            # The vertices should always be returned as an iterable.
+            vxs, load_fn, pre_fn, post_fn, constraint = spec
             operator_vertices[op] = tuple(vxs)
 
             load_functions.append(load_fn)
@@ -445,7 +548,8 @@ class Model(object):
             load_functions=load_functions,
             before_simulation_functions=before_simulation_functions,
             after_simulation_functions=after_simulation_functions,
-            signal_id_constraints=signal_id_constraints
+            signal_id_constraints=signal_id_constraints,
+            build_cache=self.build_cache
         )
 
 
@@ -1,4 +1,6 @@
 import collections
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 import nengo
 from nengo.builder import connection as connection_b
 from nengo.builder import ensemble
@@ -8,6 +10,8 @@ from nengo.processes import Process
 from nengo.utils.builder import full_transform
 from nengo.utils import numpy as npext
 import numpy as np
+from six.moves import zip
+import threading
 
 from .builder import BuiltConnection, Model, ObjectPort, spec
 from .transmission_parameters import Transform, EnsembleTransmissionParameters
@@ -191,7 +195,24 @@ def build_lif(model, ens):
     model.object_operators[ens] = operators.EnsembleLIF(ens, ens.label)
 
 
+DecoderProblem = collections.namedtuple(
+    "DecoderProblem", "conn, eval_points, gain, bias, x, targets, rng, E"
+)
+"""Everything required to solve for the decoders of a connection."""
+
+
 def build_decoders(model, conn, rng):
+    problem = get_decoder_problem(model, conn, rng)
+    return solve_decoders(
+        model.decoder_cache.wrap_solver(connection_b.solve_for_decoders),
+        problem
+    )
+
+
+def get_decoder_problem(model, conn, rng):
+    """Get the evaluation points, targets and activities from which the
+    decoders of a connection are solved for.
+    """
     # Copied from older version of Nengo
     encoders = model.params[conn.pre_obj].encoders
     gain = model.params[conn.pre_obj].gain
@@ -212,10 +233,20 @@ def build_decoders(model, conn, rng):
         # include transform in solved weights
         targets = connection_b.multiply(targets, conn.transform.T)
 
+    return DecoderProblem(conn, eval_points, gain, bias, x, targets, rng, E)
+
+
+def solve_decoders(wrapped_solver, problem):
+    """Solve for the decoders of a connection using a (cache wrapped)
+    decoder solver.
+
+    Returns
+    -------
+    eval_points, decoders, solver_info
+    """
+    conn, eval_points, gain, bias, x, targets, rng, E = problem
+
     try:
-        wrapped_solver = model.decoder_cache.wrap_solver(
-            connection_b.solve_for_decoders
-        )
         try:
             decoders, solver_info = wrapped_solver(
                 conn, gain, bias, x, targets,
@@ -234,6 +265,69 @@ def build_decoders(model, conn, rng):
     return eval_points, decoders, solver_info
 
 
+@Model.connection_solvers.register(nengo.Ensemble)
+def solve_ensemble_connections(model, conns, n_threads):
+    """Solve for the decoders of many connections from Ensembles at once.
+
+    The evaluation points and targets of each connection are computed in
+    turn (so that connection functions are never called concurrently) and
+    then the decoders are solved for in a pool of threads.  The decoder cache
+    is used by one thread at a time but the solvers, which spend most of
+    their time in NumPy/BLAS, run concurrently.  Each connection is solved
+    using a random number generator seeded from `model.seeds` so the
+    decoders are the same as if they had been solved for in turn.
+    """
+    # Connections which solve for weights are rejected when they are built
+    conns = [c for c in conns if not c.solver.weights]
+    problems = [
+        get_decoder_problem(model, c, np.random.RandomState(model.seeds[c]))
+        for c in conns
+    ]
+
+    if n_threads is None:
+        n_threads = multiprocessing.cpu_count()
+    n_threads = max(1, min(n_threads, len(problems)))
+
+    solve = _make_concurrent_solver(model.decoder_cache)
+    pool = ThreadPool(n_threads)
+    try:
+        solutions = pool.map(solve, problems)
+    finally:
+        pool.close()
+        pool.join()
+
+    for conn, (eval_points, decoders, solver_info) in zip(conns, solutions):
+        model.params[conn] = BuiltConnection(decoders=decoders,
+                                             eval_points=eval_points,
+                                             transform=conn.transform,
+                                             solver_info=solver_info)
+
+
+def _make_concurrent_solver(decoder_cache):
+    """Get a function which solves a :py:class:`~.DecoderProblem` and which
+    may be called from many threads at once.
+
+    The decoder cache is only used while a lock is held, the lock is released
+    while the decoders are actually being solved for (i.e., on a cache miss).
+    """
+    lock = threading.Lock()
+
+    def solve_for_decoders(*args, **kwargs):
+        lock.release()
+        try:
+            return connection_b.solve_for_decoders(*args, **kwargs)
+        finally:
+            lock.acquire()
+
+    wrapped_solver = decoder_cache.wrap_solver(solve_for_decoders)
+
+    def solve(problem):
+        with lock:
+            return solve_decoders(wrapped_solver, problem)
+
+    return solve
+
+
 @Model.transmission_parameter_builders.register(nengo.Ensemble)
 def build_from_ensemble_connection(model, conn):
     """Build the parameters object for a connection from an Ensemble."""
@@ -242,20 +336,22 @@ def build_from_ensemble_connection(model, conn):
             "SpiNNaker does not currently support neuron to neuron connections"
         )
 
-    # Create a random number generator
-    rng = np.random.RandomState(model.seeds[conn])
-
     # Get the transform
     transform = conn.transform
 
-    # Solve for the decoders
-    eval_points, decoders, solver_info = build_decoders(model, conn, rng)
-
-    # Store the parameters in the model
-    model.params[conn] = BuiltConnection(decoders=decoders,
-                                         eval_points=eval_points,
-                                         transform=transform,
-                                         solver_info=solver_info)
+    # Solve for the decoders, unless they have already been solved for along
+    # with those of other connections.
+    if conn not in model.params:
+        # Create a random number generator
+        rng = np.random.RandomState(model.seeds[conn])
+        eval_points, decoders, solver_info = build_decoders(model, conn, rng)
+
+        # Store the parameters in the model
+        model.params[conn] = BuiltConnection(decoders=decoders,
+                                             eval_points=eval_points,
+                                             transform=transform,
+                                             solver_info=solver_info)
+    decoders = model.params[conn].decoders
 
     t = Transform(size_in=decoders.shape[1],
                   size_out=conn.post_obj.size_in,
@@ -67,6 +67,11 @@ class NodeIOController(object):
         Map of passthrough Nodes to the operators which simulate them on
         SpiNNaker, this is exposed so that some passthrough Nodes may be
         optimised out.
+    precompute_aperiodic : bool
+        Whether the output of function of time Nodes without a period may be
+        computed before the simulation and stored on SpiNNaker.  Simulators
+        which run indefinitely set this to False, in which case such Nodes are
+        simulated on the host.
     """
 
     def __init__(self):
@@ -81,6 +86,7 @@ class NodeIOController(object):
         self._added_conns = set()
         self._input_nodes = dict()
         self._output_nodes = dict()
+        self.precompute_aperiodic = True
 
         # Cached node inputs
         self.node_input_lock = threading.Lock()
@@ -118,6 +124,14 @@ class NodeIOController(object):
 
         x = getconfig(model.config, node, "function_of_time", False)
 
+        # Function of time Nodes without a period may only be computed in
+        # advance if the duration of the simulation is known.
+        if (f_of_t and not self.precompute_aperiodic and
+                (callable(node.output) or isinstance(node.output, Process)) and
+                getconfig(model.config, node,
+                          "function_of_time_period") is None):
+            f_of_t = False
+
         if node.output is None:
             # If the Node is a passthrough Node then create a new placeholder
             # for the passthrough node.
@@ -135,7 +149,13 @@ class NodeIOController(object):
             else:
                 period = model.dt
 
-            vs = ValueSource(node.output, node.size_out, period, node.label)
+            vs = ValueSource(
+                node.output, node.size_out, period, node.label,
+                vectorized=getconfig(model.config, node,
+                                     "function_of_time_vectorized"),
+                n_processes=getconfig(model.config, node,
+                                      "function_of_time_n_processes")
+            )
             self._f_of_t_nodes[node] = vs
             model.object_operators[node] = vs
         else:
@@ -0,0 +1,243 @@
+"""Making the vertices of operators in a pool of processes.
+
+Operators make their vertices independently of each other, so for large
+models the vertices may be made in parallel.  Each worker process is forked
+from this process, and so inherits the model, calls upon an operator to make
+its vertices and returns the netlist specification along with the new state
+of the operator.  Objects which are shared with the model (signals, Nengo
+objects, other operators, functions, etc.) are returned by reference rather
+than as copies and callbacks which are methods of these objects (e.g., the
+load function of the operator) are rebound to the objects in this process.
+
+Operators whose vertices are made in parallel must only modify their own
+state (the attributes of the operator, whether stored in its `__dict__` or in
+its `__slots__`, and the objects which only the operator refers to) when
+making their vertices.  Changes which a worker makes to objects shared with
+the model, including other operators, are made to its own copies of them and
+are lost when the worker exits.
+"""
+import gc
+import io
+import multiprocessing
+import os
+import types
+
+import six
+from six.moves import cPickle as pickle
+from six.moves import zip
+
+_ATOMIC_TYPES = (type(None), bool, float, complex, bytes,
+                 six.text_type) + six.integer_types
+"""Types of object which are never shared by reference."""
+
+_OPAQUE_TYPES = (types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType, types.ModuleType) + six.class_types
+"""Types of object whose referents are not shared (unless reachable by some
+other path).
+"""
+
+_state = None
+"""Model, operators, shared objects and arguments inherited by workers."""
+
+
+def make_vertices(model, operators, n_processes, *args, **kwargs):
+    """Call upon operators to make their vertices, in a pool of processes if
+    possible.
+
+    Parameters
+    ----------
+    model : :py:class:`~nengo_spinnaker.builder.Model`
+        Model passed to the `make_vertices` method of each operator.
+    operators : [operator, ...]
+        Operators whose `make_vertices` methods should be called.
+    n_processes : int or None
+        Number of processes to use, if None then one process per CPU is used.
+        If 1, or if processes can not be forked, then the vertices are made
+        in this process.
+
+    Other positional and keyword arguments are passed to `make_vertices`.
+
+    Yields
+    ------
+    :py:class:`~nengo_spinnaker.builder.netlist.netlistspec`
+        The specification returned by each operator, in the order of the
+        operators.  The state of each operator is updated before its
+        specification is generated.
+
+    Notes
+    -----
+    When the vertices are made in a pool of processes the `make_vertices`
+    method of each operator may only modify the operator itself, any changes
+    made to the model or to other operators are lost.
+    """
+    global _state
+
+    operators = list(operators)
+    if n_processes is None:
+        n_processes = multiprocessing.cpu_count()
+    n_processes = min(n_processes, len(operators))
+
+    if n_processes <= 1 or not hasattr(os, "fork"):
+        # Make the vertices in this process
+        for op in operators:
+            yield op.make_vertices(model, *args, **kwargs)
+        return
+
+    # The workers must be forked so that they inherit the model
+    if hasattr(multiprocessing, "get_context"):
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing  # Python 2 always forks
+
+    # Find the objects shared with the model before the workers are created
+    barriers = list(operators)
+    barriers.extend(six.itervalues(model.object_operators))
+    barriers.extend(model.extra_operators)
+    shared = _get_shared_objects(model, barriers)
+    _state = (model, operators, shared, args, kwargs)
+
+    pool = context.Pool(n_processes)
+    try:
+        results = pool.imap(_make_vertices, range(len(operators)))
+        for op, data in zip(operators, results):
+            state, spec = _loads(data, shared)
+
+            # Update the operator with its state from the worker
+            _set_state(op, state)
+
+            yield spec
+    finally:
+        pool.terminate()
+        pool.join()
+        _state = None
+
+
+def _make_vertices(index):
+    """Make the vertices of an operator in a worker process, returning the
+    pickled state of the operator and its netlist specification.
+    """
+    model, operators, shared, args, kwargs = _state
+    op = operators[index]
+    spec = op.make_vertices(model, *args, **kwargs)
+    return _dumps((_get_state(op), spec), shared)
+
+
+def _get_slots(obj):
+    """Get the names of the slots of an object, as stored by Python."""
+    slots = list()
+    for cls in type(obj).__mro__:
+        names = cls.__dict__.get("__slots__", ())
+        if isinstance(names, six.string_types):
+            names = (names, )
+
+        for name in names:
+            if name in ("__dict__", "__weakref__"):
+                continue
+            elif name.startswith("__") and not name.endswith("__"):
+                name = "_{}{}".format(cls.__name__.lstrip("_"), name)
+            slots.append(name)
+
+    return slots
+
+
+def _get_state(obj):
+    """Get the attributes of an object, from both its `__dict__` and its
+    `__slots__`.
+    """
+    state = dict(getattr(obj, "__dict__", {}))
+    for name in _get_slots(obj):
+        if hasattr(obj, name):
+            state[name] = getattr(obj, name)
+    return state
+
+
+def _set_state(obj, state):
+    """Replace the attributes of an object with those given by
+    :py:func:`~._get_state`.
+    """
+    state = dict(state)
+    for name in _get_slots(obj):
+        if name in state:
+            setattr(obj, name, state.pop(name))
+        elif hasattr(obj, name):
+            delattr(obj, name)
+
+    if hasattr(obj, "__dict__"):
+        obj_dict = vars(obj)
+        obj_dict.clear()
+        obj_dict.update(state)
+
+
+def _get_shared_objects(model, barriers):
+    """Get the objects reachable from the model, without passing through any
+    of the barriers, by their IDs.
+
+    The barriers (operators) are themselves shared, as are the functions,
+    classes and modules reachable from them, but the other objects which are
+    only reachable through them belong to them and are copied.
+    """
+    shared = {id(obj): obj for obj in barriers}
+
+    to_visit = [model]
+    while to_visit:
+        obj = to_visit.pop()
+        if id(obj) in shared or isinstance(obj, _ATOMIC_TYPES):
+            continue
+
+        shared[id(obj)] = obj
+        if not isinstance(obj, _OPAQUE_TYPES):
+            to_visit.extend(gc.get_referents(obj))
+
+    owned = set()
+    to_visit = [x for obj in barriers for x in gc.get_referents(obj)]
+    while to_visit:
+        obj = to_visit.pop()
+        if (id(obj) in shared or id(obj) in owned or
+                isinstance(obj, _ATOMIC_TYPES)):
+            continue
+
+        if isinstance(obj, _OPAQUE_TYPES):
+            shared[id(obj)] = obj
+        else:
+            owned.add(id(obj))
+            to_visit.extend(gc.get_referents(obj))
+
+    return shared
+
+
+def _dumps(obj, shared):
+    """Pickle an object, storing references to shared objects and to methods
+    of shared objects rather than copies of them.
+    """
+    def is_shared(x):
+        return id(x) in shared and shared[id(x)] is x
+
+    def persistent_id(x):
+        if is_shared(x):
+            return id(x)
+        elif isinstance(x, types.MethodType):
+            owner = six.get_method_self(x)
+            if is_shared(owner):
+                return (id(owner), six.get_method_function(x).__name__)
+        return None
+
+    fp = io.BytesIO()
+    pickler = pickle.Pickler(fp, pickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = persistent_id
+    pickler.dump(obj)
+    return fp.getvalue()
+
+
+def _loads(data, shared):
+    """Unpickle an object pickled by :py:func:`~._dumps`, resolving the
+    references to shared objects and rebinding methods.
+    """
+    def persistent_load(pid):
+        if isinstance(pid, tuple):
+            owner, name = pid
+            return getattr(shared[owner], name)
+        return shared[pid]
+
+    unpickler = pickle.Unpickler(io.BytesIO(data))
+    unpickler.persistent_load = persistent_load
+    return unpickler.load()
@@ -1,10 +1,12 @@
 """Nengo/SpiNNaker specific configuration."""
 import nengo
-from nengo.params import BoolParam, DictParam, NumberParam, Parameter
+from nengo.params import (BoolParam, DictParam, EnumParam, NumberParam,
+                          Parameter)
 from rig import place_and_route as par
 
 from nengo_spinnaker.node_io import Ethernet
 from nengo_spinnaker.simulator import Simulator
+from nengo_spinnaker.utils.probe_store import ProbeStore
 
 
 def _set_param(obj, name, ParamType, *args, **kwargs):
@@ -40,12 +42,62 @@ def add_spinnaker_params(config):
     _set_param(config[Simulator], "node_io", Parameter, default=Ethernet)
     _set_param(config[Simulator], "node_io_kwargs", DictParam, default={})
 
+    _set_param(config[Simulator], "probe_store", Parameter,
+               default=ProbeStore)
+    _set_param(config[Simulator], "probe_store_kwargs", DictParam,
+               default={})
+
+    # Prepare the data for the next period of a multi-period simulation while
+    # the current period is running.
+    _set_param(config[Simulator], "pipeline_periods", BoolParam,
+               default=False)
+
+    # Duration of the data held in the circular recording buffers of
+    # simulators which run indefinitely (i.e., with `period=None`).
+    _set_param(config[Simulator], "recording_buffer_period", NumberParam,
+               default=1.0, low=0.0, low_open=True)
+
+    # How the host simulation catches up when it falls behind real time and
+    # how long before each step it stops sleeping and starts spinning.
+    _set_param(config[Simulator], "host_catch_up", EnumParam,
+               default="burst", values=("burst", "skip"))
+    _set_param(config[Simulator], "host_spin_time", NumberParam,
+               default=0.002, low=0.0)
+
+    # Number of threads in which to solve for the decoders of connections
+    # (None means one per CPU).
+    _set_param(config[Simulator], "decoder_n_threads", NumberParam,
+               default=1, optional=True, low=1)
+
+    # Number of processes in which to make the vertices of the operators when
+    # building the netlist (None means one per CPU).
+    _set_param(config[Simulator], "netlist_n_processes", NumberParam,
+               default=1, optional=True, low=1)
+
+    # Number of processes used to minimise routing tables (None means one
+    # per CPU) and the time which may be spent minimising each table which
+    # doesn't fit as far as possible before it is minimised only until it
+    # fits (0 means that tables are only minimised until they fit, None that
+    # the time is unlimited).
+    _set_param(config[Simulator], "routing_n_processes", NumberParam,
+               default=None, optional=True, low=1)
+    _set_param(config[Simulator], "routing_time_budget", NumberParam,
+               default=0.0, optional=True, low=0.0)
+
     # Add function_of_time parameters to Nodes
     _set_param(config[nengo.Node], "function_of_time", BoolParam,
                default=False)
     _set_param(config[nengo.Node], "function_of_time_period",
                NumberParam, default=None, optional=True)
 
+    # Function of time Nodes may be evaluated for many times at once (i.e.,
+    # called with an array of times) if they are marked as vectorized.  If
+    # they are not then they may be evaluated in a pool of processes.
+    _set_param(config[nengo.Node], "function_of_time_vectorized", BoolParam,
+               default=False)
+    _set_param(config[nengo.Node], "function_of_time_n_processes",
+               NumberParam, default=None, optional=True)
+
     # Add optimisation control parameters to (passthrough) Nodes. None means
     # that a heuristic will be used to determine if the passthrough Node should
     # be removed.
@@ -57,6 +109,11 @@ def add_spinnaker_params(config):
     _set_param(config[nengo.Ensemble], "profile_num_samples",
                NumberParam, default=None, optional=True)
 
+    # Add the model of the cost of simulating Ensembles, None means that the
+    # default model is used.
+    _set_param(config[nengo.Ensemble], "cost_model", Parameter,
+               default=None, optional=True)
+
 
 class CallableParameter(Parameter):
     """Parameter which only accepts callables."""
@@ -1,5 +1,6 @@
 import logging
 from collections import defaultdict, deque
+import numpy as np
 from rig.place_and_route.routing_tree import RoutingTree
 from six import iteritems, iterkeys, itervalues
 
@@ -39,6 +40,24 @@ def allocate_signal_keyspaces(signal_routes, signal_id_constraints, keyspaces):
             signal_routes, signal_id_constraints)
 
     # Assign keyspaces to the signals
+    apply_signal_keyspaces(signal_ids, keyspaces)
+
+    if (signal_ids):
+        logger.info("%u signals assigned %u IDs", len(signal_ids),
+                    max(itervalues(signal_ids)) + 1)
+
+    return signal_ids
+
+
+def apply_signal_keyspaces(signal_ids, keyspaces):
+    """Assign keyspaces to signals using previously allocated identifiers.
+
+    Parameters
+    ----------
+    signal_ids : {signal: int, ...}
+        Identifiers of the signals, as returned by
+        :py:func:`~.allocate_signal_keyspaces`.
+    """
     for signal, i in iteritems(signal_ids):
         assert signal.keyspace is None
         signal.keyspace = keyspaces["nengo"](connection_id=i)
@@ -46,9 +65,157 @@ def allocate_signal_keyspaces(signal_routes, signal_id_constraints, keyspaces):
         # Expand the keyspace to fit the required indices
         signal.keyspace(index=signal.width - 1)
 
-    if (signal_ids):
-        logger.info("%u signals assigned %u IDs", len(signal_ids),
-                    max(itervalues(signal_ids)) + 1)
+
+def reallocate_signal_keyspaces(signal_routes, signal_id_constraints,
+                                keyspaces, previous_ids):
+    """Assign keyspaces to signals, reusing the identifiers assigned to
+    signals with identical routes in a previous build.
+
+    Identifiers are only allocated afresh for signals whose routes have
+    changed (or which conflict with a new prior constraint), so the keys of
+    the rest of the network remain the same.
+
+    Parameters
+    ----------
+    previous_ids : {route signature: [id, ...], ...}
+        Identifiers assigned to signals in a previous build, as returned by
+        :py:func:`~.get_signal_id_record`.
+
+    Returns
+    -------
+    {signal: int, ...}
+        Identifiers of the signals which were assigned keyspaces.
+    """
+    # Filter signals and routes to be only those without a keyspace
+    signal_routes = {signal: routes for signal, routes in
+                     iteritems(signal_routes) if
+                     signal.keyspace is None}
+
+    # Reuse identifiers for signals whose routes are unchanged; this
+    # colouring remains valid as conflicts between nets depend only upon
+    # their routes.
+    available = {sig: list(ids) for sig, ids in iteritems(previous_ids)}
+    signal_ids = dict()
+    for signal, routes in iteritems(signal_routes):
+        ids = available.get(get_route_signature(routes))
+        if ids and ids[0] is not None:
+            signal_ids[signal] = ids.pop(0)
+
+    # Prior constraints may have changed, recolour any signals which violate
+    # them.
+    for u, vs in iteritems(signal_id_constraints):
+        for v in vs:
+            if (u != v and u in signal_ids and v in signal_ids and
+                    signal_ids[u] == signal_ids[v]):
+                del signal_ids[v]
+
+    # Colour the remaining signals, given the colours of the others
+    changed = [s for s in signal_routes if s not in signal_ids]
+    if changed:
+        nets, indptr, indices = build_mn_net_csr_graph(
+            signal_routes, signal_id_constraints, rows=changed)
+        colours = np.array([signal_ids.get(net, -1) for net in nets],
+                           dtype=np.int64)
+        _first_fit_colour(indptr, indices, colours,
+                          [i for i, net in enumerate(nets) if
+                           net not in signal_ids])
+        signal_ids = {net: int(c) for net, c in zip(nets, colours)}
+
+    # Assign keyspaces to the signals
+    apply_signal_keyspaces(signal_ids, keyspaces)
+
+    logger.info("%u of %u signals assigned new IDs", len(changed),
+                len(signal_ids))
+
+    return signal_ids
+
+
+def get_route_signature(routes):
+    """Get a summary of the routes taken by a signal which determines which
+    other signals it may share an identifier with.
+
+    Parameters
+    ----------
+    routes : [RoutingTree, ...]
+
+    Returns
+    -------
+    frozenset([((x, y), route), ...])
+        The route taken, as a bit field of links and cores, at every chip
+        visited by the signal.
+    """
+    signature = set()
+    for tree in routes:
+        for _, chip, rs in tree.traverse():
+            route = 0x0
+            for r in rs:
+                route |= (1 << r)
+            signature.add((chip, route))
+
+    return frozenset(signature)
+
+
+def get_signal_id_record(signal_routes, signal_ids):
+    """Get a record of the identifiers assigned to signals which can be used
+    with :py:func:`~.reallocate_signal_keyspaces` in a later build.
+
+    Parameters
+    ----------
+    signal_routes : {signal: [RoutingTree, ...], ...}
+    signal_ids : {signal: int, ...}
+        Identifiers assigned to signals; signals which were not assigned
+        identifiers are recorded with an identifier of None.
+
+    Returns
+    -------
+    {route signature: [id, ...], ...}
+    """
+    record = defaultdict(list)
+    for signal, routes in iteritems(signal_routes):
+        record[get_route_signature(routes)].append(signal_ids.get(signal))
+
+    # Sort the identifiers so that they are reused in a consistent order
+    return {sig: sorted(ids, key=lambda i: (i is None, i or 0)) for
+            sig, ids in iteritems(record)}
+
+
+def get_signal_key_record(signal_routes, signal_keys):
+    """Get a record of the keys and masks used by signals which can be used
+    with :py:func:`~.get_changed_signals` in a later build.
+
+    Parameters
+    ----------
+    signal_routes : {signal: [RoutingTree, ...], ...}
+    signal_keys : {signal: frozenset([(key, mask), ...]), ...}
+        Keys and masks of the nets which implement each signal.
+
+    Returns
+    -------
+    {route signature: [frozenset([(key, mask), ...]), ...], ...}
+    """
+    record = defaultdict(list)
+    for signal, routes in iteritems(signal_routes):
+        record[get_route_signature(routes)].append(signal_keys[signal])
+
+    return dict(record)
+
+
+def get_changed_signals(signal_routes, signal_values, previous_values):
+    """Get the signals whose routes, identifiers or keys differ from those in
+    a previous build.
+
+    Parameters
+    ----------
+    signal_values : {signal: value, ...}
+        Identifiers or keys of the signals.
+    previous_values : {route signature: [value, ...], ...}
+        Record of a previous build, as returned by
+        :py:func:`~.get_signal_id_record` or
+        :py:func:`~.get_signal_key_record`.
+    """
+    return {signal for signal, routes in iteritems(signal_routes) if
+            signal_values.get(signal) not in
+            previous_values.get(get_route_signature(routes), ())}
 
 
 # TODO: Migrate to Rig
@@ -76,9 +243,10 @@ def assign_mn_net_ids(nets_routes, prior_constraints=None):
     {net: int}
         Mapping from each multiple source net to a valid identifier.
     """
-    return colour_graph(
-        build_mn_net_graph(nets_routes, prior_constraints)
-    )
+    nets, indptr, indices = build_mn_net_csr_graph(nets_routes,
+                                                   prior_constraints)
+    colours = colour_csr_graph(indptr, indices)
+    return {net: int(c) for net, c in zip(nets, colours)}
 
 
 def build_mn_net_graph(nets_routes, prior_constraints=None):
@@ -100,49 +268,134 @@ def build_mn_net_graph(nets_routes, prior_constraints=None):
         An adjacency list representation of a graph where the presence of an
         edge indicates that two multicast nets may not share a routing key.
     """
-    # The different sets of routes from a chip indicate nets which cannot share
-    # a routing key, this is indicated by creating an edge between those `nets'
-    # in the net graph.
-    net_graph = {net: set() for net in iterkeys(nets_routes)}
-
-    # Construct a map from chips to unique sets of routes from that chip to
-    # nets which take that route whilst simultaneously using this data
-    # structure to fill in the above graph of which nets may not share a
-    # routing key.
-    chip_route_nets = defaultdict(lambda: defaultdict(deque))
+    nets, indptr, indices = build_mn_net_csr_graph(nets_routes,
+                                                   prior_constraints)
+    return {net: {nets[j] for j in indices[indptr[i]:indptr[i + 1]]}
+            for i, net in enumerate(nets)}
+
+
+def build_mn_net_csr_graph(nets_routes, prior_constraints=None, rows=None):
+    """Build the graph described in :py:func:`~.build_mn_net_graph` in
+    compressed sparse row form.
+
+    Rather than comparing every net against the nets taking every other route
+    as each net is added, the (chip, route, net) triples of all the routing
+    trees are gathered, sorted and deduplicated and then the edges for each
+    chip are generated at once.
+
+    Parameters
+    ----------
+    nets_routes : {net: [RoutingTree, ...], ...}
+        Dictionary mapping multi-source nets to the routing trees which
+        describe them.
+    prior_constraints : {net: {net, ...}, ...}
+        Existing constraints to include within the net graph presented as an
+        adjacency list.  Constraints which refer to nets not present in
+        `nets_routes` are ignored.
+    rows : [net, ...] or None
+        If provided then only the neighbours of these nets are determined,
+        the rows of the graph for all other nets are left empty.
+
+    Returns
+    -------
+    [net, ...]
+        The nets in the order of the nodes of the graph.
+    indptr : :py:class:`numpy.ndarray`
+    indices : :py:class:`numpy.ndarray`
+        The neighbours of node `i` are `indices[indptr[i]:indptr[i + 1]]`,
+        the graph is undirected and contains no self-loops.
+    """
+    nets = list(iterkeys(nets_routes))
+    net_ids = {net: i for i, net in enumerate(nets)}
+    n_nets = len(nets)
+
+    # Gather the route taken by every net at every chip it visits
+    chip_ids = dict()
+    chips, routes, members = list(), list(), list()
     for net, trees in iteritems(nets_routes):
+        i = net_ids[net]
         for tree in trees:
-            for _, chip, routes in tree.traverse():
-                # Add this net to the set of nets who take this route at this
-                # point.
+            for _, chip, rs in tree.traverse():
                 route = 0x0
-                for r in routes:
+                for r in rs:
                     route |= (1 << r)
 
-                chip_route_nets[chip][route].append(net)
-
-                # Add constraints to the net graph dependent on which nets take
-                # different routes at this point.
-                routes_from_chip = chip_route_nets[chip]
-                for other_route, nets in iteritems(routes_from_chip):
-                    if other_route != route:
-                        for other_net in nets:
-                            # This net cannot share an identifier with any of
-                            # the nets who take a different route at this
-                            # point.
-                            if net != other_net:
-                                net_graph[net].add(other_net)
-                                net_graph[other_net].add(net)
-
-    # Add any prior constraints into the net graph (doing so in such a way that
-    # ensures that the prior constraints are undirected).
+                chips.append(chip_ids.setdefault(chip, len(chip_ids)))
+                routes.append(route)
+                members.append(i)
+
+    # Sort and deduplicate the triples, then split them by chip
+    chips = np.array(chips, dtype=np.int64)
+    routes = np.array(routes, dtype=np.int64)
+    members = np.array(members, dtype=np.int64)
+    order = np.lexsort((members, routes, chips))
+    chips, routes, members = chips[order], routes[order], members[order]
+
+    if chips.size:
+        unique = np.ones(chips.size, dtype=np.bool)
+        unique[1:] = ((chips[1:] != chips[:-1]) |
+                      (routes[1:] != routes[:-1]) |
+                      (members[1:] != members[:-1]))
+        chips, routes, members = chips[unique], routes[unique], members[unique]
+
+    splits = np.flatnonzero(chips[1:] != chips[:-1]) + 1
+
+    # Determine which rows of the graph are required
+    is_row = np.ones(n_nets, dtype=np.bool)
+    if rows is not None:
+        is_row[:] = False
+        is_row[[net_ids[net] for net in rows]] = True
+
+    # At every chip each net may not share an identifier with any other net
+    # which takes a different route.  Nets taking the same route never
+    # conflict, so the edges are generated for each group of nets which take
+    # the same route (groups are contiguous as the routes are sorted) to the
+    # nets outside of the group.
+    us, vs = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for chip_routes, chip_members in zip(np.split(routes, splits),
+                                         np.split(members, splits)):
+        if chip_routes.size == 0 or chip_routes[0] == chip_routes[-1]:
+            continue  # Every net takes the same route (routes are sorted)
+
+        bounds = np.hstack((0, np.flatnonzero(chip_routes[1:] !=
+                                              chip_routes[:-1]) + 1,
+                            chip_routes.size))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            group = chip_members[start:end]
+            group = group[is_row[group]]
+            if group.size == 0:
+                continue
+
+            others = np.hstack((chip_members[:start], chip_members[end:]))
+            u = np.repeat(group, others.size)
+            v = np.tile(others, group.size)
+            distinct = u != v  # A net may take several routes at a chip
+            us.append(u[distinct])
+            vs.append(v[distinct])
+
+    # Add any prior constraints, ensuring that they are undirected
     if prior_constraints is not None:
-        for u, vs in iteritems(prior_constraints):
-            for v in vs:
-                net_graph[u].add(v)
-                net_graph[v].add(u)
-
-    return net_graph
+        pairs = [(net_ids[u], net_ids[v]) for u, others in
+                 iteritems(prior_constraints) if u in net_ids
+                 for v in others if v in net_ids and v != u]
+        if pairs:
+            pairs = np.array(pairs, dtype=np.int64)
+            pairs = np.vstack((pairs, pairs[:, ::-1]))
+            pairs = pairs[is_row[pairs[:, 0]]]
+            us.append(pairs[:, 0])
+            vs.append(pairs[:, 1])
+
+    return (nets, ) + _edges_to_csr(n_nets, np.hstack(us), np.hstack(vs))
+
+
+def _edges_to_csr(n_nodes, us, vs):
+    """Convert a list of directed edges into a deduplicated compressed sparse
+    row representation.
+    """
+    edges = np.unique(us * n_nodes + vs)
+    us, vs = edges // n_nodes, edges % n_nodes
+    indptr = np.searchsorted(us, np.arange(n_nodes + 1))
+    return indptr, vs
 
 
 def assign_cluster_ids(operator_vertices, signal_routes, placements):
@@ -282,70 +535,186 @@ def colour_graph(graph):  # TODO: Migrate to Rig
     {node: int}
         Mapping from each node to an identifier (colour).
     """
-    # This follows a heuristic of first assigning a colour to the node with the
-    # highest degree and then progressing through other nodes in a
-    # breadth-first search.
-    colours = deque()  # List of sets which contain vertices
-    unvisited = set(iterkeys(graph))  # Nodes which haven't been visited
-
-    # While there are still unvisited nodes -- note that this may be true more
-    # than once if there are disconnected cliques in the graph, e.g.:
-    #
-    #           (c)  (d)
-    #            |   /
-    #            |  /            (f) --- (g)
-    #            | /               \     /
-    #   (a) --- (b)                 \   /
-    #             \                  (h)
-    #              \
-    #               \          (i)
-    #               (e)
-    #
-    # Where a valid colouring would be:
-    #   0: (b), (f), (i)
-    #   1: (a), (c), (d), (e), (g)
-    #   2: (h)
-    #
-    # Nodes might be visited in the order [(b) is always first]:
-    #   (b), (a), (c), (d), (e) - new clique - (f), (g), (h) - again - (i)
-    while unvisited:
-        queue = deque()  # Queue of nodes to visit
-
-        # Add the node with the greatest degree to the queue
-        queue.append(max(unvisited, key=lambda vx: len(graph[vx])))
-
-        # Perform a breadth-first search of the tree and colour nodes as we
-        # touch them.
+    nodes = list(iterkeys(graph))
+    node_ids = {node: i for i, node in enumerate(nodes)}
+
+    # Convert the graph into compressed sparse row form, ensuring that it is
+    # undirected.
+    edges = np.array([(node_ids[u], node_ids[v]) for u, vs in
+                      iteritems(graph) for v in vs if v != u],
+                     dtype=np.int64).reshape(-1, 2)
+    indptr, indices = _edges_to_csr(
+        len(nodes), np.hstack((edges[:, 0], edges[:, 1])),
+        np.hstack((edges[:, 1], edges[:, 0]))
+    )
+
+    colours = colour_csr_graph(indptr, indices)
+    return {node: int(c) for node, c in zip(nodes, colours)}
+
+
+def colour_csr_graph(indptr, indices):
+    """Assign colours to each node in a graph, in compressed sparse row form,
+    such that connected nodes do not share a colour.
+
+    Two greedy colourings are computed and the one using fewer colours is
+    returned.  The first colours the nodes in the order of breadth-first
+    searches starting at the node with the greatest degree (the heuristic
+    previously used by :py:func:`~.colour_graph`).  The second colours them in
+    DSatur order, always colouring the node whose neighbours already use the
+    greatest number of distinct colours.
+
+    Parameters
+    ----------
+    indptr : :py:class:`numpy.ndarray`
+    indices : :py:class:`numpy.ndarray`
+        The neighbours of node `i` are `indices[indptr[i]:indptr[i + 1]]`,
+        the graph must be undirected.
+
+    Returns
+    -------
+    :py:class:`numpy.ndarray`
+        Colour assigned to each node.
+    """
+    degrees = np.diff(indptr)
+    if degrees.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    colourings = [
+        _greedy_colour(indptr, indices, _breadth_first_order(indptr, indices,
+                                                             degrees)),
+        _greedy_colour(indptr, indices),
+    ]
+    return min(colourings, key=lambda colours: colours.max())
+
+
+def _breadth_first_order(indptr, indices, degrees):
+    """Get an ordering of the nodes of a graph from breadth-first searches
+    starting at the unvisited node with the greatest degree.
+    """
+    visited = np.zeros(degrees.size, dtype=np.bool)
+    order = list()
+
+    for start in np.argsort(-degrees, kind="mergesort"):
+        if visited[start]:
+            continue
+
+        visited[start] = True
+        queue = deque([start])
         while queue:
-            node = queue.popleft()  # Get the next node to process
-
-            if node in unvisited:
-                # If the node is unvisited then mark it as visited
-                unvisited.remove(node)
-
-                # Colour the node, using the first legal colour or by creating
-                # a new colour for the node.
-                for group in colours:
-                    if graph[node].isdisjoint(group):
-                        group.add(node)
-                        break
-                else:
-                    # Cannot colour this node with any of the existing colours,
-                    # so create a new colour.
-                    colours.append({node})
-
-                # Add unvisited connected nodes to the queue
-                for vx in graph[node]:
-                    queue.append(vx)
-
-    # Reverse the data format to result in {node: colour, ...}, for each group
-    # of equivalently coloured nodes mark the colour on the node.
-    colouring = dict()
-    for i, group in enumerate(colours):
-        for vx in group:
-            colouring[vx] = i
-
-    return colouring
+            node = queue.popleft()
+            order.append(node)
+
+            neighbours = indices[indptr[node]:indptr[node + 1]]
+            neighbours = neighbours[~visited[neighbours]]
+            visited[neighbours] = True
+            queue.extend(neighbours)
+
+    return order
+
+
+def _first_fit_colour(indptr, indices, colours, nodes):
+    """Colour the given nodes, in order of decreasing degree, with the lowest
+    colour not used by any of their neighbours.
+
+    Parameters
+    ----------
+    colours : :py:class:`numpy.ndarray`
+        Existing colours of the nodes (-1 for uncoloured nodes), modified in
+        place.
+    nodes : [int, ...]
+        Nodes to colour, the rows of the graph must be complete for these
+        nodes.
+    """
+    degrees = np.diff(indptr)
+    for node in sorted(nodes, key=lambda n: (-degrees[n], n)):
+        neighbour_colours = colours[indices[indptr[node]:indptr[node + 1]]]
+        neighbour_colours = neighbour_colours[
+            (neighbour_colours >= 0) &
+            (neighbour_colours <= neighbour_colours.size)
+        ]
+
+        used = np.zeros(neighbour_colours.size + 1, dtype=np.bool)
+        used[neighbour_colours] = True
+        colours[node] = np.argmin(used)
+
+
+def _greedy_colour(indptr, indices, order=None):
+    """Colour each node of a graph with the lowest colour not used by any of
+    its neighbours.
+
+    Parameters
+    ----------
+    order : [int, ...] or None
+        Order in which to colour the nodes.  If None the nodes are coloured in
+        DSatur order: the node with the greatest number of distinctly coloured
+        neighbours is coloured next, with ties broken by degree.
+    """
+    n_nodes = indptr.size - 1
+    degrees = np.diff(indptr)
+    colours = np.full(n_nodes, -1, dtype=np.int64)
+
+    # The colours used by the neighbours of each node are stored as a bitset
+    # spread across 64-bit words.
+    used = np.zeros((n_nodes, 1), dtype=np.uint64)
+
+    if order is None:
+        # Nodes are prioritised by saturation and then degree.  To find the
+        # node with the greatest priority quickly the maximum priority within
+        # each block of nodes is also maintained; as the priority of
+        # uncoloured nodes only increases this is cheap to update.
+        scale = int(degrees.max()) + 1
+        block = max(int(np.sqrt(n_nodes)), 1)
+        n_blocks = -(-n_nodes // block)
+        priority = np.full(n_blocks * block, -1, dtype=np.int64)
+        priority[:n_nodes] = degrees
+        block_priority = priority.reshape(n_blocks, block).max(axis=1)
+
+        def get_nodes():
+            for _ in range(n_nodes):
+                b = int(np.argmax(block_priority))
+                start = b * block
+                node = start + int(np.argmax(priority[start:start + block]))
+
+                priority[node] = -1
+                block_priority[b] = priority[start:start + block].max()
+                yield node
+    else:
+        priority = None
+
+        def get_nodes():
+            return order
+
+    for node in get_nodes():
+        # Find the lowest colour not used by any neighbour
+        for word, bits in enumerate(used[node]):
+            bits = int(bits)
+            if bits != 0xffffffffffffffff:
+                break
+        else:
+            word, bits = used.shape[1], 0
+        free = ~bits & (bits + 1)
+        colour = 64 * word + free.bit_length() - 1
+        colours[node] = colour
+
+        # Add more words to the bitsets if required
+        if word >= used.shape[1]:
+            used = np.hstack((used, np.zeros_like(used)))
+
+        # Mark the colour as used by the uncoloured neighbours of the node
+        neighbours = indices[indptr[node]:indptr[node + 1]]
+        neighbours = neighbours[colours[neighbours] < 0]
+        bit = np.uint64(1 << (colour % 64))
+        new = (used[neighbours, word] & bit) == 0
+        neighbours = neighbours[new]
+        used[neighbours, word] |= bit
+
+        if priority is not None:
+            # Increase the saturation of the neighbours
+            priority[neighbours] += scale
+            np.maximum.at(block_priority, neighbours // block,
+                          priority[neighbours])
+
+    return colours
 
 
 # TODO: Migrate to Rig
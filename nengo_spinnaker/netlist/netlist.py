@@ -7,16 +7,23 @@ from rig.place_and_route.utils import (build_machine,
                                        build_core_constraints,
                                        build_application_map)
 from rig.routing_table import (build_routing_table_target_lengths,
-                               routing_tree_to_tables,
-                               minimise_tables)
+                               routing_tree_to_tables)
 from rig.place_and_route import Cores
 from rig.machine_control.utils import sdram_alloc_for_vertices
 from six import iteritems, itervalues
 
-from nengo_spinnaker.netlist import key_allocation, utils
+from nengo_spinnaker.netlist import (key_allocation, place_and_route_cache,
+                                     readback, staging, utils)
+from nengo_spinnaker.netlist.routing_tables import minimise_tables
+from nengo_spinnaker.utils.build_cache import NoBuildCache
 
 logger = logging.getLogger(__name__)
 
+CIRCULAR_RECORDING_CAPABILITY = 0x43524543
+"""Value written into VCPU user3 by executables which can use their recording
+regions as circular buffers, before their first simulation.
+"""
+
 
 class Netlist(object):
     """A netlist represents a set of executables to run on a SpiNNaker machine
@@ -49,14 +56,32 @@ class Netlist(object):
         Map of vertices to the resources they have been assigned.
     routes : {net: routing tree, ...}
         Map of nets to the routes through the machine to which they correspond.
+    net_keys : {net: (key, mask), ...}
+        Map of nets to the keys and masks of the packets they carry.
     vertices_memory : {vertex: filelike, ...}
         Map of vertices to file-like views of the SDRAM they have been
         allocated.
+    system_info : \
+            :py:class:`~rig.machine_control.machine_controller.SystemInfo`
+        Description of the machine the netlist was placed and routed onto.
+    build_cache : :py:class:`~nengo_spinnaker.utils.build_cache.BuildCache`
+        Cache of the results of placing and routing the netlist and of
+        minimising its routing tables.
+    record : {"signal_ids": ..., "signal_keys": ..., "routing_tables": ...}
+        Record of the identifiers and keys assigned to signals and of the
+        routing tables loaded to the machine, which may be used to keep keys
+        stable (and to avoid minimising unchanged routing tables) when a
+        modified netlist is placed and routed onto the same machine.
+    changed_vertices : {vertex, ...}
+        Vertices which send or receive signals whose routes, keys or masks
+        differ from those of the netlist whose `record` was used when placing
+        and routing this netlist.  If no record was used then all vertices
+        are included.
     """
     def __init__(self, nets, operator_vertices, keyspaces, constraints=list(),
                  load_functions=list(), before_simulation_functions=list(),
                  after_simulation_functions=list(),
-                 signal_id_constraints=dict()):
+                 signal_id_constraints=dict(), build_cache=NoBuildCache()):
         # Store given parameters
         self.nets = nets
         self.operator_vertices = operator_vertices
@@ -66,14 +91,25 @@ class Netlist(object):
         self.before_simulation_functions = list(before_simulation_functions)
         self.after_simulation_functions = list(after_simulation_functions)
         self.signal_id_constraints = signal_id_constraints
+        self.build_cache = build_cache
 
         # Create containers for the attributes that are filled in by place and
         # route.
         self.placements = dict()
         self.allocations = dict()
-        self.net_keyspaces = dict()
+        self.net_keys = dict()
         self.routes = dict()
         self.vertices_memory = dict()
+        self.system_info = None
+        self.record = {"signal_ids": dict(), "signal_keys": dict(),
+                       "routing_tables": dict()}
+        self.changed_vertices = set()
+        self._record_key = None
+
+        # Number of frames in recording buffers last given to the executables
+        # and the addresses of the VCPU structs of chips.
+        self._recording_frames = None
+        self._vcpu_bases = dict()
 
     @property
     def vertices(self):
@@ -85,13 +121,30 @@ class Netlist(object):
         """Total number of cores required by the netlist."""
         return sum(v.resources.get(Cores, 0) for v in self.vertices)
 
+    def as_rig_arguments(self):
+        """Get the netlist in the form of the arguments to the Rig place and
+        route functions.
+
+        Returns
+        -------
+        {"vertices_resources": {vertex: resources, ...},
+         "nets": [:py:class:`~rig.netlist.Net`, ...],
+         "constraints": [constraint, ...]}
+        """
+        return {
+            "vertices_resources": {v: v.resources for v in self.vertices},
+            "nets": list(utils.get_nets_for_placement(itervalues(self.nets))),
+            "constraints": list(self.constraints),
+        }
+
     def place_and_route(self, system_info,
                         place=place_and_route.place,
                         place_kwargs={},
                         allocate=place_and_route.allocate,
                         allocate_kwargs={},
                         route=place_and_route.route,
-                        route_kwargs={}):
+                        route_kwargs={},
+                        previous_record=None):
         """Place and route the netlist onto the given SpiNNaker machine.
 
         Parameters
@@ -116,7 +169,16 @@ class Netlist(object):
             Router function. Must support the interface defined by Rig.
         route_kwargs : dict
             Keyword arguments for the router function.
+        previous_record : dict or None
+            The `record` of a previously placed and routed netlist.  Signals
+            whose routes are unchanged from that netlist keep their
+            identifiers and only the remaining signals are assigned new ones.
+            If None and the build cache is enabled then the record of the
+            last netlist (not necessarily an identical one) placed and routed
+            onto the same machine is used.
         """
+        self.system_info = system_info
+
         # Generate a Machine and set of core-reserving constraints to prevent
         # the use of non-idle cores.
         machine = build_machine(system_info)
@@ -127,13 +189,30 @@ class Netlist(object):
         # constraints.
         vertices_resources = {v: v.resources for v in self.vertices}
 
+        # If the build cache contains the results of placing and routing an
+        # identical netlist onto an identical machine then use them.
+        labels = key = cached = None
+        if self.build_cache.enabled:
+            labels = place_and_route_cache.NetlistLabels(self)
+            key = labels.get_key(self.build_cache, system_info,
+                                 (place, place_kwargs),
+                                 (allocate, allocate_kwargs),
+                                 (route, route_kwargs))
+            if key is not None:
+                cached = self.build_cache.get(key)
+
         # Perform placement and allocation
         place_nets = list(utils.get_nets_for_placement(itervalues(self.nets)))
-        self.placements = place(vertices_resources, place_nets, machine,
-                                constraints, **place_kwargs)
-        self.allocations = allocate(vertices_resources, place_nets, machine,
-                                    constraints, self.placements,
-                                    **allocate_kwargs)
+        if cached is not None:
+            logger.info("Using cached placements and routes")
+            self.placements, self.allocations = \
+                labels.load_placements(cached)
+        else:
+            self.placements = place(vertices_resources, place_nets, machine,
+                                    constraints, **place_kwargs)
+            self.allocations = allocate(vertices_resources, place_nets,
+                                        machine, constraints, self.placements,
+                                        **allocate_kwargs)
 
         # Get the nets for routing
         (route_nets,
@@ -145,9 +224,12 @@ class Netlist(object):
 
         # Finally, route all nets using the extended resource dictionary,
         # placements and allocations.
-        self.routes = route(vertices_resources, route_nets, machine,
-                            constraints, extended_placements,
-                            extended_allocations, **route_kwargs)
+        if cached is not None:
+            self.routes = labels.load_routes(cached, derived_nets)
+        else:
+            self.routes = route(vertices_resources, route_nets, machine,
+                                constraints, extended_placements,
+                                extended_allocations, **route_kwargs)
 
         # Assign keyspaces based on the placement
         signal_routes = collections.defaultdict(collections.deque)
@@ -155,56 +237,178 @@ class Netlist(object):
             for net in itervalues(derived_nets[nmnet]):
                 signal_routes[signal].append(self.routes[net])
 
-        key_allocation.allocate_signal_keyspaces(signal_routes,
-                                                 self.signal_id_constraints,
-                                                 self.keyspaces)
+        # Get the record of an earlier build onto the same machine
+        self._record_key = None
+        if self.build_cache.enabled:
+            self._record_key = place_and_route_cache.get_record_key(
+                self.build_cache, system_info)
+            if previous_record is None:
+                previous_record = self.build_cache.get(self._record_key)
 
-        # Assign cluster IDs based on the placement and the routing
-        key_allocation.assign_cluster_ids(self.operator_vertices,
-                                          signal_routes,
-                                          self.placements)
+        if cached is not None:
+            # Reuse the signal and cluster identifiers
+            signal_ids = labels.load_signal_ids(cached)
+            key_allocation.apply_signal_keyspaces(signal_ids, self.keyspaces)
+        else:
+            if previous_record is not None:
+                # Only assign new identifiers to signals whose routes differ
+                # from those of the earlier build.
+                signal_ids = key_allocation.reallocate_signal_keyspaces(
+                    signal_routes, self.signal_id_constraints,
+                    self.keyspaces, previous_record["signal_ids"]
+                )
+            else:
+                signal_ids = key_allocation.allocate_signal_keyspaces(
+                    signal_routes, self.signal_id_constraints,
+                    self.keyspaces
+                )
 
-        # Get a map from the nets we will route with to keyspaces
-        self.net_keyspaces = utils.get_net_keyspaces(
+            # Assign cluster IDs based on the placement and the routing
+            key_allocation.assign_cluster_ids(self.operator_vertices,
+                                              signal_routes,
+                                              self.placements)
+
+            # Store the results in the cache
+            if key is not None:
+                self.build_cache.set(key, labels.dump(
+                    self.placements, self.allocations, self.routes,
+                    derived_nets, signal_ids
+                ))
+
+        # Get the cluster IDs of the nets we will route with
+        net_cluster_ids = utils.get_net_cluster_ids(
             self.placements, self.nets, derived_nets)
 
-        # Fix all keyspaces
+        # Fix all keyspaces and get a map from the nets we will route with to
+        # keys and masks.
         self.keyspaces.assign_fields()
+        self.net_keys = utils.get_net_keys(self.nets, derived_nets,
+                                           net_cluster_ids,
+                                           self.keyspaces.routing_tag)
+
+        # Record the identifiers and keys assigned to signals and determine
+        # which vertices have had their keys changed.  Keys are compared,
+        # rather than identifiers, as the lengths of the fields of the
+        # keyspace may differ between builds.
+        signal_keys = {
+            signal: frozenset(self.net_keys[net] for net in
+                              itervalues(derived_nets[nmnet]))
+            for signal, nmnet in iteritems(self.nets)
+        }
+        self.record = {
+            "signal_ids": key_allocation.get_signal_id_record(
+                signal_routes, signal_ids),
+            "signal_keys": key_allocation.get_signal_key_record(
+                signal_routes, signal_keys),
+            "routing_tables": (dict() if previous_record is None else
+                               dict(previous_record["routing_tables"])),
+        }
+        if self._record_key is not None:
+            self.build_cache.set(self._record_key, self.record)
 
-    def load_application(self, controller, system_info):
+        if previous_record is None:
+            self.changed_vertices = set(self.vertices)
+        else:
+            self.changed_vertices = utils.get_vertices_for_signals(
+                self.operator_vertices, self.nets,
+                key_allocation.get_changed_signals(
+                    signal_routes, signal_keys,
+                    previous_record["signal_keys"])
+            )
+
+    def load_application(self, controller, system_info,
+                         routing_n_processes=None, routing_time_budget=0.0):
         """Load the netlist to a SpiNNaker machine.
 
         Parameters
         ----------
         controller : :py:class:`~rig.machine_control.MachineController`
             Controller to use to communicate with the machine.
+        routing_n_processes : int or None
+            Number of processes to use to minimise routing tables, if None
+            one process per CPU is used.
+        routing_time_budget : float or None
+            Time, in seconds, which may be spent minimising each routing table
+            which doesn't fit as far as possible before minimising it only
+            until it fits, by default tables are only minimised until they fit
+            (see
+            :py:func:`~nengo_spinnaker.netlist.routing_tables.minimise_tables`).
         """
-        # Build and load the routing tables, first by building a mapping from
-        # nets to keys and masks.
+        # Build and load the routing tables
         logger.debug("Loading routing tables")
-        net_keys = dict()
-        for n, ks in iteritems(self.net_keyspaces):
-            key = ks.get_value(tag=self.keyspaces.routing_tag)
-            mask = ks.get_mask(tag=self.keyspaces.routing_tag)
-            net_keys[n] = (key, mask)
-
-        routing_tables = routing_tree_to_tables(self.routes, net_keys)
+        logger.info("%u of %u vertices have changed keys",
+                    len(self.changed_vertices), len(self.placements))
+        routing_tables = routing_tree_to_tables(self.routes, self.net_keys)
         target_lengths = build_routing_table_target_lengths(system_info)
-        routing_tables = minimise_tables(routing_tables, target_lengths)
 
-        controller.load_routing_tables(routing_tables)
+        # Minimise the tables, reusing previously minimised tables for any
+        # chips whose tables are unchanged.  Each table is loaded as soon as
+        # it is ready, while the remaining tables are minimised.
+        previous_tables = self.record["routing_tables"]
+        tables_record = dict()
+
+        def load_table(chip, table):
+            tables_record[chip] = (_sort_table(routing_tables[chip]), table)
+            if table:
+                x, y = chip
+                controller.load_routing_table_entries(table, x=x, y=y)
 
-        # Assign memory to each vertex as required
+        to_minimise = dict()
+        table_keys = dict()
+        for chip, table in iteritems(routing_tables):
+            # Tables identical to those loaded by the previous build onto
+            # this machine needn't be minimised again.
+            previous = previous_tables.get(chip)
+            if (previous is not None and
+                    previous[0] == _sort_table(table) and
+                    len(previous[1]) <= target_lengths.get(chip, len(table))):
+                load_table(chip, previous[1])
+                continue
+
+            key = (None if not self.build_cache.enabled else
+                   self.build_cache.key("minimise_table", table,
+                                        target_lengths.get(chip)))
+            cached_table = None if key is None else self.build_cache.get(key)
+            if cached_table is not None:
+                load_table(chip, cached_table)
+            else:
+                to_minimise[chip] = table
+                table_keys[chip] = key
+
+        for chip, table in minimise_tables(to_minimise, target_lengths,
+                                           routing_n_processes,
+                                           routing_time_budget):
+            if table_keys[chip] is not None:
+                self.build_cache.set(table_keys[chip], table)
+            load_table(chip, table)
+
+        # Record the loaded tables for use by the next build
+        self.record["routing_tables"] = tables_record
+        if self._record_key is not None:
+            self.build_cache.set(self._record_key, self.record)
+
+        # Assign memory to each vertex as required, writes to this memory are
+        # staged on the host until all the loading functions have been called.
         logger.debug("Assigning application memory")
-        self.vertices_memory = sdram_alloc_for_vertices(
+        vertices_memory = sdram_alloc_for_vertices(
             controller, self.placements, self.allocations
         )
+        stages = list()
+        self.vertices_memory = dict()
+        for vertex, mem in iteritems(vertices_memory):
+            stage = staging.WriteStage(mem, *self.placements[vertex])
+            stages.append(stage)
+            self.vertices_memory[vertex] = staging.StagedMemoryIO(stage)
 
         # Call each loading function in turn
         logger.debug("Loading data")
         for fn in self.load_functions:
             fn(self, controller)
 
+        # Write the staged data into memory
+        logger.debug("Writing staged data")
+        staging.flush_stages(stages, controller, system_info)
+
         # Load the applications onto the machine
         logger.debug("Loading application executables")
         vertices_applications = {v: v.application for v in self.vertices
@@ -214,24 +418,157 @@ class Netlist(object):
         )
         controller.load_application(application_map)
 
-    def before_simulation(self, simulator, n_steps):
+    def before_simulation(self, simulator, n_steps, n_recording_frames=None):
         """Prepare the objects in the netlist for a simulation of a given
         number of steps.
+
+        Parameters
+        ----------
+        n_steps : int or None
+            Number of steps to simulate, or None if the simulation should run
+            until it is stopped.
+        n_recording_frames : int or None
+            Number of frames (time steps) of data which fit in the recording
+            buffers of the vertices.  If given, executables return to the
+            start of their recording buffers once they are full, so that the
+            buffers may be drained while the simulation runs (see
+            :py:meth:`~.get_recorded_frames`).
         """
-        # Write into memory the duration of the simulation
+        # Write into memory the duration of the simulation (UINT32_MAX
+        # indicates that the simulation should run until stopped) and the
+        # number of frames in recording buffers, if this has changed.
+        n_ticks = 0xffffffff if n_steps is None else n_steps
         for vertex in self.vertices:
             x, y = self.placements[vertex]
             p = self.allocations[vertex][Cores].start
-            simulator.controller.write_vcpu_struct_field("user1", n_steps,
+            simulator.controller.write_vcpu_struct_field("user1", n_ticks,
                                                          x, y, p)
 
+        if (n_recording_frames is not None and
+                n_recording_frames != self._recording_frames):
+            for x, y, p in self._get_recording_cores():
+                simulator.controller.write_vcpu_struct_field(
+                    "user2", n_recording_frames, x, y, p)
+            self._recording_frames = n_recording_frames
+
         # Call all the "before simulation" functions
         for fn in self.before_simulation_functions:
             fn(self, simulator, n_steps)
 
-    def after_simulation(self, simulator, n_steps):
+    def prepare_simulation(self, simulator, start_step, n_steps):
+        """Prepare, in advance, the data which will be required for a later
+        simulation of a given number of steps.
+
+        Operators which can prepare data for a simulation before it is needed
+        should provide a method `prepare_simulation(netlist, simulator,
+        start_step, n_steps)`.  This may be called from another thread while
+        the machine is running, so it must not communicate with the machine
+        or rely upon the state of the simulator other than its time step.
+        """
+        for op in self.operator_vertices:
+            if hasattr(op, "prepare_simulation"):
+                op.prepare_simulation(self, simulator, start_step, n_steps)
+
+    def get_recorded_frames(self, controller):
+        """Get the number of frames which have been recorded by every vertex
+        which records data during the current simulation.
+
+        Returns
+        -------
+        int or None
+            Number of frames recorded by all vertices, or None if no vertices
+            record data.
+        """
+        frames = readback.read_vcpu_struct_fields(
+            controller, "user3", self._get_recording_cores(),
+            self._vcpu_bases, self.system_info
+        )
+        return min(itervalues(frames)) if frames else None
+
+    def supports_circular_recording(self, controller):
+        """Determine whether the loaded executables of every vertex which
+        records data can use their recording regions as circular buffers.
+
+        This must be called after the application is loaded and before it is
+        first simulated.
+        """
+        capabilities = readback.read_vcpu_struct_fields(
+            controller, "user3", self._get_recording_cores(),
+            self._vcpu_bases, self.system_info
+        )
+        return all(c == CIRCULAR_RECORDING_CAPABILITY for c in
+                   itervalues(capabilities))
+
+    def _get_recording_cores(self):
+        """Get the cores of the vertices which record data."""
+        cores = list()
+        for vertex in self.vertices:
+            if hasattr(vertex, "get_recording_reads"):
+                x, y = self.placements[vertex]
+                p = self.allocations[vertex][Cores].start
+                cores.append((x, y, p))
+
+        return cores
+
+    def after_simulation(self, simulator, n_steps, start_frame=0):
         """Retrieve data from the objects in the netlist after a simulation of
         a given number of steps.
+
+        Before the "after simulation" functions are called all recorded data
+        is retrieved from the machine in bulk.  Vertices which record data
+        should provide a method `get_recording_reads(n_steps)` which returns a
+        map from region names to pairs of a file-like view of the memory to
+        read and the number of bytes to read from it; the data retrieved from
+        each region is stored in the `recorded_data` attribute of the vertex.
+
+        If recording regions are used as circular buffers then `start_frame`
+        is the index of the first frame to retrieve; data which wraps around
+        the end of a region is reassembled in order.
         """
+        # Gather all the reads required to retrieve recorded data, reads of
+        # data which wraps around the end of a region are split in two.
+        reads = dict()
+        for vertex in self.vertices:
+            if not hasattr(vertex, "get_recording_reads"):
+                continue
+
+            vertex.recorded_data = dict()
+            x, y = self.placements[vertex]
+            for key, (mem, n_bytes) in iteritems(
+                    vertex.get_recording_reads(n_steps)):
+                mem.seek(0)
+                frame_bytes = n_bytes // n_steps if n_steps else 0
+                if frame_bytes <= 0:
+                    continue
+
+                buffer_bytes = len(mem) - len(mem) % frame_bytes
+                n_bytes = min(n_bytes, buffer_bytes)
+                if n_bytes <= 0:
+                    continue
+
+                offset = (start_frame * frame_bytes) % buffer_bytes
+                n_first = min(n_bytes, buffer_bytes - offset)
+                reads[(vertex, key, 0)] = readback.Read(
+                    x, y, mem.address + offset, n_first)
+                if n_first < n_bytes:
+                    reads[(vertex, key, 1)] = readback.Read(
+                        x, y, mem.address, n_bytes - n_first)
+
+        # Read all of the data, store it against the vertices
+        data = readback.read_all(simulator.controller, reads, self.system_info)
+        for (vertex, key, part), vertex_data in sorted(
+                iteritems(data), key=lambda kv: kv[0][2]):
+            if part == 0:
+                vertex.recorded_data[key] = vertex_data
+            else:
+                vertex.recorded_data[key] += vertex_data
+
         for fn in self.after_simulation_functions:
             fn(self, simulator, n_steps)
+
+
+def _sort_table(table):
+    """Get the entries of a routing table in a canonical order, so that
+    tables may be compared.
+    """
+    return sorted(table, key=lambda e: (e.key, e.mask))
@@ -38,6 +38,9 @@ class Vertex(object):
         whatever is an appropriate unit.
     cluster : int or None
         Index of the cluster the vertex is a part of.
+    recorded_data : {region: bytes, ...}
+        Recorded data which has been retrieved from the machine for this
+        vertex, see :py:meth:`~.Netlist.after_simulation`.
     """
     def __init__(self, label, application=None, resources=dict()):
         """Create a new Vertex.
@@ -45,6 +48,7 @@ class Vertex(object):
         self.application = application
         self.resources = dict(resources)
         self.cluster = None
+        self.recorded_data = dict()
         self._label = label
 
     def __repr__(self):
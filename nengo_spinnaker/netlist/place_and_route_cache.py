@@ -0,0 +1,301 @@
+"""Caching of the results of placing and routing netlists.
+
+Placing and routing a large netlist can take minutes, but building the same
+model again for the same machine yields an identical netlist.  The vertices
+and signals of a netlist are new objects every time a model is built, so the
+results of place and route are stored against canonical indices for them:
+vertices and signals are sorted by labels which summarise their structure and
+neighbourhood.
+
+The key under which results are stored is a fingerprint of the entire
+netlist (expressed in terms of these indices) and of the machine.  The
+ordering only needs to be stable for the cache to be useful; even if two
+structurally different netlists were to be given the same ordering they
+would still produce different keys.
+
+A record of the keys and routing tables of the last netlist placed and routed
+onto each machine is also stored, against a key which depends only on the
+machine, so that the keys of a modified netlist can be kept as similar as
+possible to those of the previous one.
+"""
+import os
+from rig.machine_control.consts import AppState
+from rig.place_and_route.routing_tree import RoutingTree
+from six import iteritems, itervalues
+
+from nengo_spinnaker.netlist import utils
+from nengo_spinnaker.utils.build_cache import fingerprint
+from nengo_spinnaker.utils.keyspaces import is_nengo_keyspace
+
+
+class NetlistLabels(object):
+    """Canonical indices for the vertices and signals of a netlist.
+
+    Parameters
+    ----------
+    netlist : :py:class:`~nengo_spinnaker.netlist.Netlist`
+    n_rounds : int
+        Number of times the label of each vertex is refined using the labels
+        of its neighbours.
+
+    Attributes
+    ----------
+    vertices : [vertex, ...]
+        Vertices of the netlist in canonical order.
+    signals : [signal, ...]
+        Signals of the netlist in canonical order.
+    """
+    def __init__(self, netlist, n_rounds=2):
+        self.netlist = netlist
+
+        # Label each vertex with a summary of its structure
+        vertices = list(netlist.vertices)
+        labels = {v: fingerprint(_describe_vertex(v)) for v in vertices}
+
+        # Refine the labels using the labels of the neighbouring vertices
+        neighbours = {v: (list(), list()) for v in vertices}
+        for net in itervalues(netlist.nets):
+            for source in net.sources:
+                for sink in net.sinks:
+                    neighbours[source][0].append((sink, net.weight))
+                    neighbours[sink][1].append((source, net.weight))
+
+        for _ in range(n_rounds):
+            labels = {
+                v: fingerprint(labels[v],
+                               sorted((labels[u], w) for u, w in outs),
+                               sorted((labels[u], w) for u, w in ins))
+                for v, (outs, ins) in iteritems(neighbours)
+            }
+
+        self.vertices = sorted(vertices, key=lambda v: labels[v])
+        self.vertex_ids = {v: i for i, v in enumerate(self.vertices)}
+
+        # Order the operators and signals by the vertices they refer to
+        self.operators = sorted(
+            netlist.operator_vertices,
+            key=lambda op: sorted(self.vertex_ids[v] for v in
+                                  netlist.operator_vertices[op])
+        )
+        self.operator_ids = {op: i for i, op in enumerate(self.operators)}
+
+        self.signals = sorted(netlist.nets,
+                              key=lambda s: self._describe_signal(s))
+        self.signal_ids = {s: i for i, s in enumerate(self.signals)}
+
+    def _describe_signal(self, signal):
+        net = self.netlist.nets[signal]
+        return ([self.vertex_ids[v] for v in net.sources],
+                [self.vertex_ids[v] for v in net.sinks],
+                net.weight,
+                self.operator_ids.get(signal.source, -1),
+                signal.width,
+                signal.keyspace is None,
+                signal.keyspace is not None and
+                is_nengo_keyspace(signal.keyspace))
+
+    def get_key(self, build_cache, system_info, *methods):
+        """Get the key under which results of placing and routing the netlist
+        onto a given machine should be stored.
+
+        Parameters
+        ----------
+        build_cache : :py:class:`~nengo_spinnaker.utils.build_cache.BuildCache`
+        system_info : \
+                :py:class:`~rig.machine_control.machine_controller.SystemInfo`
+            Description of the machine, including any dead chips, links or
+            cores.
+        *methods : (function, kwargs)
+            Place and route functions and the keyword arguments with which
+            they will be called.
+
+        Returns
+        -------
+        str or None
+            Key for the netlist, or None if the results could not be cached
+            (e.g., the keyword arguments to the place and route functions
+            could not be fingerprinted).
+        """
+        netlist = self._describe_netlist()
+        if netlist is None:
+            return None  # Constraints which can't be cached
+
+        # Describe the place and route methods
+        methods_desc = list()
+        for f, kwargs in methods:
+            name = (getattr(f, "__module__", None),
+                    getattr(f, "__name__", None))
+            if None in name:
+                return None
+            methods_desc.append((name, kwargs))
+
+        return build_cache.key("place_and_route", netlist,
+                               _describe_machine(system_info), methods_desc)
+
+    def _describe_netlist(self):
+        """Describe the netlist in terms of the indices of its vertices, or
+        return None if it can't be described.
+        """
+        netlist = self.netlist
+        portable = utils.replace_vertices(netlist.as_rig_arguments(),
+                                          self.vertex_ids)
+        vertices = [_describe_vertex(v) for v in self.vertices]
+        operators = [sorted(self.vertex_ids[v] for v in
+                            netlist.operator_vertices[op])
+                     for op in self.operators]
+        signals = [self._describe_signal(s) for s in self.signals]
+        id_constraints = sorted(
+            (self.signal_ids[u], sorted(self.signal_ids[v] for v in vs))
+            for u, vs in iteritems(netlist.signal_id_constraints)
+        )
+        try:
+            constraints = sorted(fingerprint(_describe_constraint(c))
+                                 for c in portable["constraints"])
+        except TypeError:
+            return None
+
+        return vertices, operators, signals, id_constraints, constraints
+
+    def dump(self, placements, allocations, routes, derived_nets,
+             signal_ids):
+        """Get a portable representation of the results of place and route.
+
+        Parameters
+        ----------
+        placements : {vertex: (x, y), ...}
+        allocations : {vertex: {resource: slice, ...}, ...}
+        routes : {Net: RoutingTree, ...}
+        derived_nets : {NMNet: {(x, y): Net, ...}, ...}
+            Map from multisource nets to the nets which were routed.
+        signal_ids : {signal: int, ...}
+            Identifiers assigned to signals.
+        """
+        signal_routes = dict()
+        for signal, nmnet in iteritems(self.netlist.nets):
+            for placement, net in iteritems(derived_nets[nmnet]):
+                signal_routes[(self.signal_ids[signal], placement)] = \
+                    _dump_tree(routes[net], self.vertex_ids)
+
+        return {
+            "placements": [placements[v] for v in self.vertices],
+            "allocations": [allocations[v] for v in self.vertices],
+            "routes": signal_routes,
+            "signal_ids": {self.signal_ids[s]: i for s, i in
+                           iteritems(signal_ids)},
+            "clusters": [v.cluster for v in self.vertices],
+        }
+
+    def load_placements(self, result):
+        """Get the placements and allocations from a result returned by
+        :py:meth:`~.dump`.
+        """
+        placements = {v: p for v, p in zip(self.vertices,
+                                           result["placements"])}
+        allocations = {v: a for v, a in zip(self.vertices,
+                                            result["allocations"])}
+        return placements, allocations
+
+    def load_routes(self, result, derived_nets):
+        """Get the routes from a result returned by :py:meth:`~.dump`.
+
+        Parameters
+        ----------
+        derived_nets : {NMNet: {(x, y): Net, ...}, ...}
+            Map from multisource nets to the nets which are to be routed.
+        """
+        routes = dict()
+        for (i, placement), tree in iteritems(result["routes"]):
+            net = derived_nets[self.netlist.nets[self.signals[i]]][placement]
+            routes[net] = _load_tree(tree, self.vertices)
+
+        return routes
+
+    def load_signal_ids(self, result):
+        """Get the identifiers assigned to signals and assign cluster IDs to
+        vertices from a result returned by :py:meth:`~.dump`.
+        """
+        for vertex, cluster in zip(self.vertices, result["clusters"]):
+            vertex.cluster = cluster
+
+        return {self.signals[i]: x for i, x in
+                iteritems(result["signal_ids"])}
+
+
+def get_record_key(build_cache, system_info):
+    """Get the key under which the record of the last netlist placed and
+    routed onto a given machine should be stored.
+
+    The key depends only upon the machine (and not upon the netlist or the
+    place and route methods) so that the record may be used when a modified
+    netlist is built for the same machine.
+
+    Parameters
+    ----------
+    build_cache : :py:class:`~nengo_spinnaker.utils.build_cache.BuildCache`
+    system_info : \
+            :py:class:`~rig.machine_control.machine_controller.SystemInfo`
+    """
+    return build_cache.key("netlist_record", _describe_machine(system_info))
+
+
+def _describe_vertex(vertex):
+    """Get a description of a vertex which is independent of the session."""
+    application = getattr(vertex, "application", None)
+    if application is not None:
+        application = os.path.basename(application)
+
+    return (type(vertex).__name__, application,
+            sorted((type(r).__name__, v) for r, v in
+                   iteritems(vertex.resources)))
+
+
+def _describe_machine(system_info):
+    """Get a description of the topology of a machine and of its dead chips,
+    cores and links.
+
+    Properties which may vary between boots of the same machine (e.g., the
+    amount of free memory) are excluded.
+    """
+    return (system_info.width, system_info.height, sorted(
+        (xy, chip.num_cores,
+         [i for i, s in enumerate(chip.core_states) if s == AppState.dead],
+         sorted(link.value for link in chip.working_links),
+         chip.ethernet_up, chip.local_ethernet_chip)
+        for xy, chip in iteritems(system_info)
+    ))
+
+
+def _describe_constraint(constraint):
+    """Get a description of a constraint whose vertices have been replaced by
+    indices.
+    """
+    attrs = dict(vars(constraint))
+    if "resource" in attrs:
+        attrs["resource"] = type(attrs["resource"]).__name__
+
+    return type(constraint).__name__, attrs
+
+
+def _dump_tree(tree, vertex_ids):
+    """Convert a routing tree into nested tuples referring to vertex
+    indices.
+    """
+    children = list()
+    for route, obj in tree.children:
+        if isinstance(obj, RoutingTree):
+            children.append((route, _dump_tree(obj, vertex_ids)))
+        else:
+            children.append((route, vertex_ids[obj]))
+
+    return tree.chip, children
+
+
+def _load_tree(tree, vertices):
+    """Convert nested tuples produced by :py:func:`~._dump_tree` back into a
+    routing tree.
+    """
+    chip, children = tree
+    return RoutingTree(chip, [
+        (route, _load_tree(obj, vertices) if isinstance(obj, tuple) else
+         vertices[obj]) for route, obj in children
+    ])
@@ -0,0 +1,174 @@
+"""Bulk retrieval of data from the SDRAM of a SpiNNaker machine.
+
+Reads are grouped by the board (Ethernet connected chip) through which they
+must be made.  Reads of contiguous (or overlapping) memory on the same chip are
+merged into a single larger read and the reads for each board are performed
+in their own thread, so that the latency of the many boards in a machine is
+overlapped.  All reads for a given board are made from the same thread as the
+SCP connection to a board must not be shared between threads.
+"""
+import collections
+import struct
+from six import iteritems, itervalues
+
+from nengo_spinnaker.netlist.utils import map_over_boards
+
+
+class Read(collections.namedtuple("Read", "x, y, address, n_bytes")):
+    """A read of `n_bytes` of memory starting at `address` on chip `(x, y)`.
+    """
+
+
+def coalesce_reads(reads, max_gap=0):
+    """Merge reads of nearby memory on the same chip into single blocks.
+
+    For example::
+
+        >>> blocks = coalesce_reads([Read(0, 0, 0x100, 8),
+        ...                          Read(0, 0, 0x108, 4),
+        ...                          Read(0, 0, 0x200, 4)])
+        >>> [(block.address, block.n_bytes) for block, _ in blocks]
+        [(256, 12), (512, 4)]
+
+    Parameters
+    ----------
+    reads : [:py:class:`~.Read`, ...]
+        Reads to coalesce.
+    max_gap : int
+        Maximum number of unwanted bytes between two reads for them to still
+        be merged into a single block.
+
+    Returns
+    -------
+    [(:py:class:`~.Read`, [(:py:class:`~.Read`, offset), ...]), ...]
+        List of blocks to read, each paired with the reads they satisfy and
+        the offset of each read's data within the block.
+    """
+    # Sort the reads by chip and address
+    reads = sorted(reads, key=lambda r: (r.x, r.y, r.address, r.n_bytes))
+
+    blocks = list()
+    start = end = None
+    members = list()
+    for read in reads:
+        if (members and (read.x, read.y) == (members[0].x, members[0].y) and
+                read.address <= end + max_gap):
+            # Extend the current block
+            end = max(end, read.address + read.n_bytes)
+            members.append(read)
+        else:
+            # Close the current block and start a new one
+            if members:
+                blocks.append(_make_block(members, start, end))
+
+            start, end = read.address, read.address + read.n_bytes
+            members = [read]
+
+    if members:
+        blocks.append(_make_block(members, start, end))
+
+    return blocks
+
+
+def _make_block(members, start, end):
+    block = Read(members[0].x, members[0].y, start, end - start)
+    return block, [(read, read.address - start) for read in members]
+
+
+def read_all(controller, reads, system_info=None, n_threads=8, max_gap=0):
+    """Perform a number of reads, concurrently across boards which have
+    their own connections.
+
+    Parameters
+    ----------
+    controller : :py:class:`~rig.machine_control.MachineController`
+        Controller to use to perform the reads.
+    reads : {key: :py:class:`~.Read`, ...}
+        Reads to perform.
+    system_info : \
+            :py:class:`~rig.machine_control.machine_controller.SystemInfo`
+        Description of the machine, used to determine which board each chip
+        belongs to.  If None then all reads are assumed to be to the same
+        board and are performed in sequence.
+    n_threads : int
+        Maximum number of connections to read through at once.  Reads to
+        boards which share a connection are always performed in sequence.
+    max_gap : int
+        Maximum number of unwanted bytes between two reads for them to still
+        be merged into a single read.
+
+    Returns
+    -------
+    {key: bytes, ...}
+        The data read for each key.
+    """
+    def read_board(board_reads):
+        # Perform the coalesced reads for a single board
+        data = dict()
+        for block, members in coalesce_reads(board_reads, max_gap):
+            block_data = controller.read(block.address, block.n_bytes,
+                                         block.x, block.y)
+
+            for read, offset in members:
+                data[read] = block_data[offset:offset + read.n_bytes]
+
+        return data
+
+    # Perform the reads for each board in parallel
+    results = map_over_boards(read_board, set(itervalues(reads)),
+                              controller.connections, system_info, n_threads)
+
+    # Map the data back to the keys
+    read_data = dict()
+    for result in results:
+        read_data.update(result)
+
+    return {key: read_data[read] for key, read in iteritems(reads)}
+
+
+def read_vcpu_struct_fields(controller, field_name, cores, vcpu_bases,
+                            system_info=None, n_threads=8):
+    """Read a field of the VCPU structs of many cores, with one read per chip
+    and the chips of different boards read concurrently.
+
+    Parameters
+    ----------
+    controller : :py:class:`~rig.machine_control.MachineController`
+        Controller to use to perform the reads.
+    field_name : str
+        Name of the field to read (e.g., `"user3"`).
+    cores : [(x, y, p), ...]
+        Cores whose VCPU structs should be read.
+    vcpu_bases : {(x, y): address, ...}
+        Addresses of the VCPU structs of chips, this is extended with the
+        address for any chip not already present.
+    system_info : \
+            :py:class:`~rig.machine_control.machine_controller.SystemInfo`
+        Description of the machine, used to determine which board each chip
+        belongs to.
+
+    Returns
+    -------
+    {(x, y, p): value, ...}
+        The value of the field for each core.
+    """
+    vcpu_struct = controller.structs[b"vcpu"]
+    field = vcpu_struct[field_name.encode("ascii")]
+    pack_chars = b"<" + field.pack_chars
+    length = struct.calcsize(pack_chars)
+
+    reads = dict()
+    for x, y, p in cores:
+        if (x, y) not in vcpu_bases:
+            vcpu_bases[(x, y)] = controller.read_struct_field(
+                "sv", "vcpu_base", x, y)
+
+        address = vcpu_bases[(x, y)] + vcpu_struct.size * p + field.offset
+        reads[(x, y, p)] = Read(x, y, address, length)
+
+    # The fields of all the cores of a chip (of which there are at most 18)
+    # are merged into a single read.
+    data = read_all(controller, reads, system_info, n_threads,
+                    max_gap=vcpu_struct.size * 17)
+    return {core: struct.unpack(pack_chars, d)[0] for core, d in
+            iteritems(data)}
@@ -0,0 +1,169 @@
+"""Minimisation of routing tables.
+
+The routing table of each chip is minimised independently of those of the
+other chips, so for large machines the tables are minimised in a pool of
+processes.  Tables which are too large for their routers are minimised with
+ordered covering only until they fit.  Optionally, they may first be
+minimised as far as possible within a time budget (leaving space in the
+router and reducing the number of entries to load, at a considerable cost in
+time); tables which can not be minimised within their budgets fall back to
+ordered covering.  Tables are produced as soon as they are ready so that they
+may be loaded while the remaining tables are being minimised.
+"""
+import collections
+import contextlib
+import multiprocessing
+import signal
+
+from rig.routing_table import MinimisationFailedError, minimise_table
+from six import iteritems
+
+
+def minimise_tables(routing_tables, target_lengths, n_processes=None,
+                    time_budget=0.0):
+    """Minimise the routing tables of many chips, generating each minimised
+    table as soon as it is ready.
+
+    Parameters
+    ----------
+    routing_tables : {(x, y): [\
+            :py:class:`~rig.routing_table.RoutingTableEntry`, ...], ...}
+        Routing tables to minimise.
+    target_lengths : int or {(x, y): int or None, ...} or None
+        Maximum length of each routing table (see
+        :py:func:`rig.routing_table.minimise_tables`).
+    n_processes : int or None
+        Number of processes to use, if None then one process per CPU is used.
+        If 1 then the tables are minimised in this process.
+    time_budget : float or None
+        Time, in seconds, which may be spent minimising each table which
+        doesn't fit as far as possible.  If the budget is exceeded (or the
+        table still doesn't fit) the table is instead minimised only until it
+        fits.  If 0 tables are only minimised until they fit, if None the
+        budget is unlimited.  The budget is only enforced where interval
+        timers are supported.
+
+    Yields
+    ------
+    (x, y), [:py:class:`~rig.routing_table.RoutingTableEntry`, ...]
+        Coordinates of a chip and its minimised routing table, which may be
+        empty.  Tables are generated in the order in which they are ready.
+
+    Raises
+    ------
+    MinimisationFailedError
+        If a table can not be minimised to fit in the router.
+    """
+    # Coerce the target lengths into the correct form
+    if not isinstance(target_lengths, dict):
+        lengths = collections.defaultdict(lambda: target_lengths)
+    else:
+        lengths = target_lengths
+
+    # Minimise the largest tables first so that they don't hold up the end of
+    # the minimisation.
+    problems = sorted(
+        ((chip, table, lengths[chip], time_budget) for
+         chip, table in iteritems(routing_tables)),
+        key=lambda p: len(p[1]), reverse=True
+    )
+
+    if n_processes is None:
+        n_processes = multiprocessing.cpu_count()
+    n_processes = min(n_processes, len(problems))
+
+    if n_processes <= 1:
+        # Minimise each table in this process
+        for problem in problems:
+            yield _get_table(_minimise(problem))
+    else:
+        # Minimise tables in a pool of processes, the pool is terminated if
+        # minimisation fails or the generator is closed early.
+        pool = multiprocessing.Pool(n_processes)
+        try:
+            for result in pool.imap_unordered(_minimise, problems):
+                yield _get_table(result)
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+def _minimise(problem):
+    """Minimise the routing table of a single chip.
+
+    Returns
+    -------
+    ((x, y), table or None, failure)
+        The minimised table or, if the table can not be minimised to fit, the
+        target and final lengths of the table (exceptions can not
+        necessarily be returned from other processes).
+    """
+    chip, table, target_length, time_budget = problem
+
+    # Tables which already fit are left as they are
+    if target_length is not None and len(table) < target_length:
+        return chip, table, None
+
+    # Minimise the table as far as possible
+    new_table = None
+    if time_budget is None or time_budget > 0.0:
+        try:
+            with _time_limit(time_budget):
+                new_table = minimise_table(table, None)
+        except _BudgetExceeded:
+            pass
+
+    # If the table was not minimised within the budget, or is too large, then
+    # minimise it only until it fits.
+    if new_table is None or (target_length is not None and
+                             len(new_table) > target_length):
+        try:
+            new_table = minimise_table(table, target_length)
+        except MinimisationFailedError as exc:
+            return chip, None, (exc.target_length, exc.final_length)
+
+    return chip, new_table, None
+
+
+def _get_table(result):
+    """Get the chip and table from the result of :py:func:`~._minimise`,
+    raising an exception if minimisation failed.
+    """
+    chip, table, failure = result
+    if failure is not None:
+        raise MinimisationFailedError(*failure, chip=chip)
+    return chip, table
+
+
+class _BudgetExceeded(Exception):
+    """Raised when the time budget for minimising a table is exceeded."""
+
+
+@contextlib.contextmanager
+def _time_limit(seconds):
+    """Raise :py:exc:`~._BudgetExceeded` within the context if it takes
+    longer than the given number of seconds.
+
+    There is no limit if `seconds` is None or if the limit can't be enforced
+    (interval timers are not available or this is not the main thread).
+    """
+    def exceeded(signum, frame):
+        raise _BudgetExceeded
+
+    limited = False
+    if seconds is not None and hasattr(signal, "setitimer"):
+        try:
+            old_handler = signal.signal(signal.SIGALRM, exceeded)
+            limited = True
+        except ValueError:
+            pass  # Not the main thread
+
+    if not limited:
+        yield
+    else:
+        try:
+            signal.setitimer(signal.ITIMER_REAL, seconds)
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, old_handler)
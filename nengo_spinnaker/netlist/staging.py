@@ -0,0 +1,228 @@
+"""Staging of writes to the SDRAM of a SpiNNaker machine.
+
+While an application is being loaded the regions of every vertex are written
+into memory through many file-like views, each write of which would otherwise
+be a separate exchange with the machine.  The objects in this module collect
+these writes on the host and then flush them with a single large write per
+allocation of memory (or a few, if the written data is sparse) with the
+allocations on boards with their own connections being written in parallel.
+"""
+import bisect
+import os
+from rig.machine_control.machine_controller import TruncationWarning
+import warnings
+
+from nengo_spinnaker.netlist.utils import map_over_boards
+
+
+class WriteStage(object):
+    """Host-side record of the writes made to a block of SDRAM.
+
+    Parameters
+    ----------
+    memory : :py:class:`~rig.machine_control.machine_controller.MemoryIO`
+        File-like view of the block of memory.
+    x, y : int
+        Co-ordinates of the chip the memory is on.
+
+    Attributes
+    ----------
+    x, y : int
+        Co-ordinates of the chip the memory is on.
+    address : int
+        Address of the start of the block of memory.
+    memory : file-like
+        File-like view of the memory, used once the stage has been flushed.
+    staging : bool
+        Whether writes are still being collected on the host.
+    """
+    def __init__(self, memory, x, y):
+        self.memory = memory
+        self.x = x
+        self.y = y
+        self.size = len(memory)
+        memory.seek(0)
+        self.address = memory.address
+
+        self.writes = list()
+        self.staging = True
+
+    def write(self, offset, data):
+        """Stage a write of `data` at the given offset into the block."""
+        self.writes.append((offset, bytes(data)))
+
+    def get_blocks(self):
+        """Get the data to write to the machine.
+
+        Writes which overlap or are contiguous are merged into single blocks,
+        where writes overlap the later write wins.  Writes separated by any
+        unwritten bytes are kept apart so that memory which was never
+        written is left untouched.
+
+        Returns
+        -------
+        [(offset, bytes), ...]
+            Data to write and the offset at which it should be written.
+        """
+        # Determine the extents of the blocks to write
+        spans = list()
+        for offset, data in sorted(self.writes):
+            end = offset + len(data)
+            if spans and offset <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], end)
+            else:
+                spans.append([offset, end])
+
+        # Fill the blocks with data, in the order the data was written
+        starts = [start for start, _ in spans]
+        blocks = [bytearray(end - start) for start, end in spans]
+        for offset, data in self.writes:
+            i = bisect.bisect_right(starts, offset) - 1
+            start = starts[i]
+            blocks[i][offset - start:offset - start + len(data)] = data
+
+        return [(start, bytes(block))
+                for (start, _), block in zip(spans, blocks)]
+
+    def flush(self):
+        """Write the staged data to the machine, subsequent reads and writes
+        will go directly to the machine.
+        """
+        if self.staging:
+            for offset, data in self.get_blocks():
+                self.memory.seek(offset)
+                self.memory.write(data)
+
+            self.writes = list()
+            self.staging = False
+
+
+class StagedMemoryIO(object):
+    """A file-like view of a block of SDRAM whose writes are staged on the
+    host until the :py:class:`~.WriteStage` it belongs to is flushed.
+
+    The interface mirrors that of
+    :py:class:`~rig.machine_control.machine_controller.MemoryIO`.
+    """
+    def __init__(self, stage, start=0, end=None):
+        self._stage = stage
+        self._start = start
+        self._end = stage.size if end is None else max(start, end)
+        self._offset = 0
+
+    def __getitem__(self, sl):
+        """Get a new file-like view of a contiguous portion of the memory."""
+        if isinstance(sl, slice) and (sl.step is None or sl.step == 1):
+            length = len(self)
+            start, stop, _ = sl.indices(length)
+            return StagedMemoryIO(self._stage, self._start + start,
+                                  self._start + max(start, stop))
+        else:
+            raise ValueError("Can only make contiguous slices of MemoryIO")
+
+    def __len__(self):
+        return self._end - self._start
+
+    def _clip(self, n_bytes, what):
+        """Clip a number of bytes to the end of the view."""
+        remaining = len(self) - self._offset
+        if n_bytes > remaining:
+            warnings.warn("{} truncated from {} to {} bytes".format(
+                what, n_bytes, remaining), TruncationWarning, stacklevel=3)
+            n_bytes = remaining
+
+        return n_bytes
+
+    def _seek_memory(self):
+        """Seek the underlying memory to match our position."""
+        self._stage.memory.seek(self._start + self._offset)
+        return self._stage.memory
+
+    def read(self, n_bytes=-1):
+        """Read a number of bytes from the memory.
+
+        Any staged writes are flushed to the machine first.
+        """
+        if self._stage.staging:
+            self._stage.flush()
+
+        if n_bytes < 0:
+            n_bytes = len(self) - self._offset
+        n_bytes = self._clip(n_bytes, "read")
+
+        if n_bytes <= 0:
+            return b''
+
+        data = self._seek_memory().read(n_bytes)
+        self._offset += n_bytes
+        return data
+
+    def write(self, data):
+        """Write data to the memory (or stage it to be written)."""
+        n_bytes = self._clip(len(data), "write")
+        data = data[:n_bytes]
+
+        if n_bytes <= 0:
+            return 0
+
+        if self._stage.staging:
+            self._stage.write(self._start + self._offset, data)
+        else:
+            self._seek_memory().write(data)
+
+        self._offset += n_bytes
+        return n_bytes
+
+    def flush(self):
+        """Writes are flushed by :py:func:`~.flush_stages`."""
+        pass
+
+    def tell(self):
+        """Get the current offset in the memory region."""
+        return self._offset
+
+    @property
+    def address(self):
+        """Get the current hardware memory address."""
+        return self._stage.address + self._start + self._offset
+
+    def seek(self, n_bytes, from_what=os.SEEK_SET):
+        """Seek to a new position in the memory region."""
+        if from_what == 0:
+            self._offset = n_bytes
+        elif from_what == 1:
+            self._offset += n_bytes
+        elif from_what == 2:
+            self._offset = len(self) - n_bytes
+        else:
+            raise ValueError(
+                "from_what: can only take values 0 (from start), "
+                "1 (from current) or 2 (from end) not {}".format(from_what)
+            )
+
+
+def flush_stages(stages, controller, system_info=None, n_threads=8):
+    """Flush the writes staged for many blocks of memory, in parallel across
+    boards which have their own connections.
+
+    Parameters
+    ----------
+    stages : [:py:class:`~.WriteStage`, ...]
+        Stages to flush.
+    controller : :py:class:`~rig.machine_control.MachineController`
+        Controller through which the stages write, used to determine which
+        boards share a connection.
+    system_info : \
+            :py:class:`~rig.machine_control.machine_controller.SystemInfo`
+        Description of the machine, used to determine which board each chip
+        belongs to.
+    n_threads : int
+        Maximum number of connections to write through at once.  Writes to
+        boards which share a connection are always performed in sequence.
+    """
+    def flush_board(board_stages):
+        for stage in board_stages:
+            stage.flush()
+
+    map_over_boards(flush_board, stages, controller.connections, system_info,
+                    n_threads)
@@ -0,0 +1,122 @@
+"""Retrieval of recorded data while a simulation is running.
+
+If a simulation runs for longer than the recording regions of the executables
+can hold (e.g., when the simulator runs indefinitely) the executables use
+their recording regions as circular buffers.  A :py:class:`~.RecordingReader`
+drains these buffers while the simulation runs, passing the retrieved data to
+the "after simulation" functions of the netlist as though each chunk were a
+short simulation of its own.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RecordingReader(threading.Thread):
+    """Thread which drains the circular recording buffers of a netlist.
+
+    Parameters
+    ----------
+    netlist : :py:class:`~nengo_spinnaker.netlist.Netlist`
+        Placed and loaded netlist whose recorded data should be retrieved.
+    simulator : :py:class:`~nengo_spinnaker.Simulator`
+        Simulator whose controller is used to read the data and to which the
+        data is added.
+    n_buffer_frames : int
+        Number of frames (time steps) of data which fit in the recording
+        buffers.
+    poll_period : float
+        Time, in seconds, between checks for newly recorded data.
+    frame_multiple : int
+        Except when the simulation has finished, data is retrieved in
+        multiples of this many frames; this keeps the samples taken by probes
+        which record every `n` steps aligned.
+
+    Attributes
+    ----------
+    frames_read : int
+        Number of frames retrieved (or lost) so far.
+    frames_lost : int
+        Number of frames which were overwritten before they could be
+        retrieved.
+    """
+    def __init__(self, netlist, simulator, n_buffer_frames, poll_period=0.1,
+                 frame_multiple=1):
+        super(RecordingReader, self).__init__(name="RecordingReader")
+        self.daemon = True
+
+        self.netlist = netlist
+        self.simulator = simulator
+        self.n_buffer_frames = n_buffer_frames
+        self.poll_period = poll_period
+        self.frame_multiple = frame_multiple
+
+        self.frames_read = 0
+        self.frames_lost = 0
+
+        self._halt = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self):
+        while not self._halt.wait(self.poll_period):
+            self.drain()
+
+    def drain(self, n_frames=None):
+        """Retrieve the frames recorded since the last time data was
+        retrieved.
+
+        Parameters
+        ----------
+        n_frames : int or None
+            Total number of frames recorded since the start of the
+            simulation.  If None then the number of frames recorded will be
+            read from the machine and only whole multiples of
+            `frame_multiple` frames will be retrieved.
+
+        Returns
+        -------
+        int
+            Number of frames retrieved.
+        """
+        with self._lock:
+            final = n_frames is not None
+            if not final:
+                n_frames = self.netlist.get_recorded_frames(
+                    self.simulator.controller)
+                if n_frames is None:
+                    return 0  # Nothing is recorded
+
+            n_new = n_frames - self.frames_read
+
+            # If the executables have wrapped around their buffers more than
+            # once since the last read then some data has been lost.
+            if n_new > self.n_buffer_frames:
+                n_lost = n_new - self.n_buffer_frames
+                n_lost += -n_lost % self.frame_multiple
+                logger.warning("Recording buffers overran, %d frames of "
+                               "recorded data were lost", n_lost)
+                self.frames_lost += n_lost
+                self.frames_read += n_lost
+                n_new -= n_lost
+
+            if not final:
+                n_new -= n_new % self.frame_multiple
+
+            if n_new <= 0:
+                return 0
+
+            self.netlist.after_simulation(self.simulator, n_new,
+                                          self.frames_read)
+            self.frames_read += n_new
+            return n_new
+
+    def stop(self):
+        """Stop the thread from retrieving data.
+
+        Any data recorded since the thread last retrieved data remains on the
+        machine, use :py:meth:`~.drain` to retrieve it.
+        """
+        self._halt.set()
+        if self.is_alive():
+            self.join()
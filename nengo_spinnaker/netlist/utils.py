@@ -1,8 +1,12 @@
 import collections
+from multiprocessing.pool import ThreadPool
 import rig.netlist
+from rig.place_and_route.constraints import (LocationConstraint,
+                                             RouteEndpointConstraint,
+                                             SameChipConstraint)
 from six import iteritems, itervalues
 
-from nengo_spinnaker.utils.keyspaces import is_nengo_keyspace
+from nengo_spinnaker.utils.keyspaces import KeyspaceLayout, is_nengo_keyspace
 
 
 def get_nets_for_placement(nets):
@@ -86,12 +90,14 @@ def get_nets_for_routing(resources, nets, placements, allocations):
             extended_allocations, derived_nets)
 
 
-def get_net_keyspaces(placements, nets, derived_nets):
-    """Get a map from the nets used during routing to the keyspaces (NOT the
-    keys and masks) that should be used when building routing tables.
+def get_net_cluster_ids(placements, nets, derived_nets):
+    """Get the cluster IDs which should be added to the keyspaces of the nets
+    used during routing.
 
-    Cluster IDs will be applied to any nets which used the default Nengo
-    keyspace.
+    Cluster IDs are only applied to nets which use the default Nengo
+    keyspace.  The cluster field of each such keyspace is expanded to fit the
+    IDs, so this must be called before the fields of the keyspaces are
+    assigned.
 
     Parameters
     ----------
@@ -105,33 +111,222 @@ def get_net_keyspaces(placements, nets, derived_nets):
 
     Returns
     -------
-    {net: keyspace, ...}
-        A map from nets to :py:class:`~rig.bitfield.BitField`s that can later
-        be used to generate routing tables.
+    {net: int, ...}
+        A map from nets which use the default Nengo keyspace to their cluster
+        IDs.
     """
-    net_keyspaces = dict()  # Map from derived nets to keyspaces
+    net_cluster_ids = dict()  # Map from derived nets to cluster IDs
 
     for signal, original_net in iteritems(nets):
-        ks = signal.keyspace
+        if not is_nengo_keyspace(signal.keyspace):
+            continue
 
         for placement, net in iteritems(derived_nets[original_net]):
-            # If the keyspace is the default Nengo keyspace then add a cluster
-            # ID, otherwise just store the keyspace as is.
-            if is_nengo_keyspace(ks):
-                # Get all the cluster IDs assigned to vertices with the given
-                # placement (there should only be one cluster ID, if there are
-                # more it would imply that multiple Nengo objects ended up in
-                # the sources for a given Net and it is an error from which we
-                # cannot recover).
-                cluster_ids = set(vx.cluster for vx in original_net.sources
-                                  if placements[vx] == placement)
-                assert len(cluster_ids) == 1, "Inconsistent cluster IDs"
-                cluster_id = next(iter(cluster_ids)) or 0  # Get the ID
-
-                # Store the keyspace with the cluster ID attached
-                net_keyspaces[net] = ks(cluster=cluster_id)
-            else:
-                # Store the keyspace as is
-                net_keyspaces[net] = ks
-
-    return net_keyspaces
+            # Get all the cluster IDs assigned to vertices with the given
+            # placement (there should only be one cluster ID, if there are
+            # more it would imply that multiple Nengo objects ended up in the
+            # sources for a given Net and it is an error from which we cannot
+            # recover).
+            cluster_ids = set(vx.cluster for vx in original_net.sources
+                              if placements[vx] == placement)
+            assert len(cluster_ids) == 1, "Inconsistent cluster IDs"
+            net_cluster_ids[net] = next(iter(cluster_ids)) or 0  # Get the ID
+
+        # Expand the keyspace to fit the largest cluster ID
+        if derived_nets[original_net]:
+            signal.keyspace(cluster=max(
+                net_cluster_ids[net] for net in
+                itervalues(derived_nets[original_net])
+            ))
+
+    return net_cluster_ids
+
+
+def get_net_keys(nets, derived_nets, net_cluster_ids, routing_tag):
+    """Get a map from the nets used during routing to the keys and masks that
+    should be used when building routing tables.
+
+    The fields of the keyspaces must have been assigned.
+
+    Parameters
+    ----------
+    nets : {Signal: NMNet, ...}
+        Map from Signals to the multisource nets which implement them.
+    derived_nets : {:py:class:`~nengo_spinnaker.netlist.NMNet`:
+                    {(x, y): :py:class:`~rig.netlist.Net`, ...}, ...}
+        Map from original nets to co-ordinates and the derived nets which
+        originate from them as, returned by :py:func:`~.get_routing_nets`.
+    net_cluster_ids : {net: int, ...}
+        Cluster IDs of the nets, as returned by
+        :py:func:`~.get_net_cluster_ids`.
+    routing_tag : str
+        Tag of the fields of the keyspaces which are used for routing.
+
+    Returns
+    -------
+    {net: (key, mask), ...}
+    """
+    net_keys = dict()
+
+    for signal, original_net in iteritems(nets):
+        routed_nets = list(itervalues(derived_nets[original_net]))
+        if not routed_nets:
+            continue
+
+        # Get the keys for all of the nets of the signal at once
+        layout = KeyspaceLayout(signal.keyspace)
+        if routed_nets[0] in net_cluster_ids:
+            clusters = [net_cluster_ids[net] for net in routed_nets]
+            keys = layout.get_value(tag=routing_tag, cluster=clusters)
+            mask = layout.get_mask(tag=routing_tag, cluster=clusters[0])
+        else:
+            keys = [layout.get_value(tag=routing_tag)] * len(routed_nets)
+            mask = layout.get_mask(tag=routing_tag)
+
+        for net, key in zip(routed_nets, keys):
+            net_keys[net] = (int(key), mask)
+
+    return net_keys
+
+
+def get_vertices_for_signals(operator_vertices, nets, signals):
+    """Get the vertices whose keys, or the keys of the packets they receive,
+    depend upon the keyspaces of the given signals.
+
+    The vertices at either end of the nets implementing each signal are
+    included, as are all the vertices of the operator which is the source of
+    each signal (as the cluster IDs of these vertices may have changed).
+
+    Parameters
+    ----------
+    operator_vertices : {operator: (vertex, ...), ...}
+    nets : {Signal: :py:class:`~nengo_spinnaker.netlist.NMNet`, ...}
+    signals : iterable
+
+    Returns
+    -------
+    {vertex, ...}
+    """
+    vertices = set()
+    for signal in signals:
+        vertices.update(nets[signal].sources)
+        vertices.update(nets[signal].sinks)
+        vertices.update(operator_vertices.get(signal.source, ()))
+
+    return vertices
+
+
+def replace_vertices(netlist_dict, new_vertices):
+    """Get a copy of a netlist, in the form of the arguments to the Rig place
+    and route functions, with all vertices replaced.
+
+    Parameters
+    ----------
+    netlist_dict : {"vertices_resources": ..., "nets": ...,
+                    "constraints": ...}
+        Netlist to copy, as returned by
+        :py:meth:`~nengo_spinnaker.netlist.Netlist.as_rig_arguments`.
+    new_vertices : {vertex: new_vertex, ...}
+        Map from the vertices of the netlist to the objects which should
+        replace them.  A :py:class:`collections.defaultdict` may be used to
+        create new objects as required.
+
+    Returns
+    -------
+    {"vertices_resources": ..., "nets": ..., "constraints": ...}
+        Copy of the netlist referring to the new vertices.
+    """
+    new_dict = dict(netlist_dict)
+
+    new_dict["vertices_resources"] = {
+        new_vertices[vertex]: resources
+        for (vertex, resources)
+        in iteritems(netlist_dict["vertices_resources"])
+    }
+
+    new_dict["nets"] = [
+        rig.netlist.Net(new_vertices[net.source],
+                        [new_vertices[sink] for sink in net.sinks],
+                        net.weight)
+        for net in netlist_dict["nets"]
+    ]
+
+    new_dict["constraints"] = []
+    for constraint in netlist_dict["constraints"]:
+        if isinstance(constraint, LocationConstraint):
+            new_dict["constraints"].append(
+                LocationConstraint(new_vertices[constraint.vertex],
+                                   constraint.location))
+        elif isinstance(constraint, RouteEndpointConstraint):
+            new_dict["constraints"].append(
+                RouteEndpointConstraint(new_vertices[constraint.vertex],
+                                        constraint.route))
+        elif isinstance(constraint, SameChipConstraint):
+            # Get the new vertices
+            vs = [new_vertices[v] for v in constraint.vertices]
+            new_dict["constraints"].append(SameChipConstraint(vs))
+        else:
+            new_dict["constraints"].append(constraint)
+
+    return new_dict
+
+
+def map_over_boards(f, items, connections, system_info=None, n_threads=8):
+    """Apply a function to groups of items, one group per connection to the
+    machine, with the groups for different connections being processed in
+    parallel.
+
+    An SCP connection must not be shared between threads, so all the items
+    for boards which are reached through the same connection are passed to a
+    single call of `f`.  Boards without a connection of their own (e.g.,
+    because the connections to the machine were never discovered) are
+    reached through the default connection.
+
+    Parameters
+    ----------
+    f : `f([item, ...])`
+        Function to apply to the list of items for each connection.
+    items : iterable
+        Items to process, each must have `x` and `y` attributes indicating the
+        chip they refer to.
+    connections : {(x, y) or None: connection, ...}
+        Connections to the machine, by the co-ordinates of the Ethernet
+        connected chip of the board they connect to, as in
+        :py:attr:`~rig.machine_control.MachineController.connections`.  The
+        default connection has the key None.
+    system_info : \
+            :py:class:`~rig.machine_control.machine_controller.SystemInfo`
+        Description of the machine, used to determine which board each chip
+        belongs to.  If None then all items are assumed to belong to the same
+        board.
+    n_threads : int
+        Maximum number of connections to use at once.
+
+    Returns
+    -------
+    [result, ...]
+        Result of calling `f` for each connection.
+    """
+    # Group the items by the connection used to reach their board
+    connection_items = collections.defaultdict(list)
+    for item in items:
+        if system_info is None:
+            board = None
+        else:
+            board = system_info[(item.x, item.y)].local_ethernet_chip
+
+        if board not in connections:
+            board = None  # Reached through the default connection
+
+        connection_items[board].append(item)
+
+    groups = list(itervalues(connection_items))
+    if len(groups) > 1 and n_threads > 1:
+        # Use each connection in its own thread
+        pool = ThreadPool(min(n_threads, len(groups)))
+        try:
+            return pool.map(f, groups)
+        finally:
+            pool.close()
+    else:
+        return [f(group) for group in groups]
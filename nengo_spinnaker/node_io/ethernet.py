@@ -1,18 +1,31 @@
 import collections
 import numpy as np
+from rig.geometry import shortest_torus_path_length, to_xyz
 from rig.machine_control.consts import SCP_PORT
 from rig.machine_control.packets import SCPPacket
 from rig.place_and_route import Cores
-from six import iteritems
+from six import iteritems, itervalues
 import socket
+import struct
 import threading
 
+try:
+    import selectors
+except ImportError:  # pragma: no cover
+    import select
+    selectors = None
+
 from ..builder.builder import spec, ObjectPort
 from ..builder.ports import InputPort, OutputPort
 from ..builder.node import NodeIOController
 from ..operators import SDPReceiver, SDPTransmitter
 from ..utils import type_casts as tp
 
+IPTAG = 1
+"""IP tag, of each Ethernet connected chip, used to send Node inputs to the
+host.
+"""
+
 
 class Ethernet(NodeIOController):
     """Ethernet implementation of SpiNNaker to host node communication."""
@@ -33,16 +46,24 @@ class Ethernet(NodeIOController):
         self._sdp_receivers = dict()
         self._sdp_transmitters = dict()
 
-        # Node -> [(Connection, (x, y, p), ...]
+        # Node -> [((pre_slice, function, transform), (x, y, p)), ...]
         self._node_outgoing = collections.defaultdict(list)
 
+        # Node -> NodeSendPlan
+        self._node_send_plans = dict()
+
         # (x, y, p) -> Node
         self._node_incoming = dict()
 
-        # Sockets
+        # Sockets, packets from each board (i.e., each Ethernet connected chip
+        # which is used) are received by a separate socket.
         self._hostname = None
         self.in_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.out_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.in_sockets = [self.in_socket]
+
+        # (x, y) of Ethernet connected chip -> socket
+        self._board_sockets = dict()
 
     def get_spinnaker_source_for_node(self, model, connection):
         """Get the source for a connection originating from a Node.
@@ -83,29 +104,43 @@ class Ethernet(NodeIOController):
         controller.
         """
         # Store the hostname
-        # TODO Store a map of (x, y) to hostname
         self._hostname = controller.initial_host
 
-        # Set up the IP tag (will need to do this for each ethernet connected
-        # chip that we expect to use).
+        # Get the Ethernet connected chips of the machine
+        system_info = netlist.system_info
+        if system_info is None:
+            system_info = controller.get_system_info()
+        ethernet_chips = _EthernetChips(system_info)
+
+        # Get the addresses of the Ethernet connected chips, the board to
+        # which we're connected is addressed by the hostname we were given.
+        ip_addresses = dict(ethernet_chips.ip_addresses)
+        ip_addresses[(0, 0)] = socket.gethostbyname(self._hostname)
+
+        # Set up the IP tag of the board to which we're connected
         self.in_socket.bind(('', 0))
-        with controller(x=0, y=0):
-            controller.iptag_set(1, *self.in_socket.getsockname())
+        self._board_sockets[(0, 0)] = self.in_socket
+        _set_ip_tag(controller, (0, 0), ip_addresses[(0, 0)], self.in_socket)
 
         # Build a map of Node to outgoing connections and SDP receivers
+        sdp_rx_chips = set()
         for node, sdp_rx in iteritems(self._sdp_receivers):
-            for transmission_params, vertex in \
-                    iteritems(sdp_rx.connection_vertices):
+            for vertex, connections in iteritems(sdp_rx.vertex_connections):
                 # Get the placement and core
                 x, y = netlist.placements[vertex]
                 p = netlist.allocations[vertex][Cores].start
-
-                # Store this transmission parameters to (x, y, p) map
-                self._node_outgoing[node].append((
-                    (transmission_params.pre_slice,
-                     transmission_params.function,
-                     transmission_params.full_transform(slice_out=False)),
-                    (x, y, p)))
+                sdp_rx_chips.add((x, y))
+
+                # Store the transmission parameters (restricted to the rows
+                # transmitted by this core) to (x, y, p) map
+                for transmission_params, rows in connections:
+                    transform = \
+                        transmission_params.full_transform(slice_out=False)
+                    self._node_outgoing[node].append((
+                        (transmission_params.pre_slice,
+                         transmission_params.function,
+                         transform[rows]),
+                        (x, y, p)))
 
         # Build a map of (x, y, p) to Node for incoming values
         for node, sdp_tx in iteritems(self._sdp_transmitters):
@@ -116,24 +151,35 @@ class Ethernet(NodeIOController):
             # Store this mapping (x, y, p) -> Node
             self._node_incoming[(x, y, p)] = node
 
+            # Send the values through the nearest Ethernet connected chip,
+            # to an IP tag of that chip which refers to a socket for the
+            # board.
+            sdp_tx.ethernet_chip = ethernet_chips.nearest(x, y)
+            sdp_tx.ip_tag = IPTAG
+            if sdp_tx.ethernet_chip not in self._board_sockets:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.bind(('', 0))
+                self._board_sockets[sdp_tx.ethernet_chip] = sock
+                self.in_sockets.append(sock)
+
+                _set_ip_tag(controller, sdp_tx.ethernet_chip,
+                            ip_addresses[sdp_tx.ethernet_chip], sock)
+
+        # Send the values for each SDP receiver through the nearest Ethernet
+        # connected chip.
+        addresses = {(x, y): (ip_addresses[ethernet_chips.nearest(x, y)],
+                              SCP_PORT) for x, y in sdp_rx_chips}
+
+        # Compile the plans for transmitting the output of each Node
+        for node, outgoing in iteritems(self._node_outgoing):
+            self._node_send_plans[node] = NodeSendPlan(node.size_out,
+                                                       outgoing, addresses)
+
     def set_node_output(self, node, value):
         """Transmit the value output by a Node."""
-        # Build an SDP packet to transmit for each outgoing connection for the
-        # node
-        for (pre_slice, function, transform), (x, y, p) in \
-                self._node_outgoing[node]:
-            # Apply the pre-slice, the connection function and the transform.
-            c_value = value[pre_slice]
-            if function is not None:
-                c_value = function(c_value)
-            c_value = np.dot(transform, c_value)
-
-            # Transmit the packet
-            data = bytes(tp.np_to_fix(c_value).data)
-            packet = SCPPacket(dest_port=1, dest_cpu=p, dest_x=x, dest_y=y,
-                               cmd_rc=0, arg1=0, arg2=0, arg3=0, data=data)
-            self.out_socket.sendto(packet.bytestring,
-                                   (self._hostname, SCP_PORT))
+        plan = self._node_send_plans.get(node)
+        if plan is not None:
+            plan.send(self.out_socket, value)
 
     def spawn(self):
         """Get a new thread which will manage transmitting and receiving Node
@@ -143,46 +189,294 @@ class Ethernet(NodeIOController):
 
     def close(self):
         """Close the sockets used by the ethernet Node IO."""
-        self.in_socket.close()
+        for sock in self.in_sockets:
+            sock.close()
         self.out_socket.close()
 
 
+def _set_ip_tag(controller, ethernet_chip, board_address, sock):
+    """Set the IP tag of an Ethernet connected chip to refer to a socket.
+
+    The socket is bound to every interface of the host, so the tag is set to
+    the address of the interface through which the host reaches the board.
+    Once the connections to the machine have been discovered the command is
+    sent through the connection to the board itself.
+    """
+    x, y = ethernet_chip
+    host = _get_host_address(board_address)
+    controller.iptag_set(IPTAG, host, sock.getsockname()[1], x=x, y=y)
+
+
+def _get_host_address(board_address):
+    """Get the address of the host as seen by a board."""
+    # Connecting a UDP socket sends nothing, but selects the interface (and
+    # hence the address) which would be used to reach the board.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.connect((board_address, SCP_PORT))
+        return sock.getsockname()[0]
+    finally:
+        sock.close()
+
+
+class _EthernetChips(object):
+    """The Ethernet connected chips of a machine and the chips which should
+    communicate with the host through each of them.
+
+    Each chip uses the Ethernet connected chip of its own board if that chip's
+    Ethernet connection is up, otherwise the closest Ethernet connected chip.
+    """
+    def __init__(self, system_info):
+        self.system_info = system_info
+        self.ip_addresses = dict(system_info.ethernet_connected_chips())
+
+    def nearest(self, x, y):
+        """Get the Ethernet connected chip through which the chip at (x, y)
+        should communicate with the host.
+        """
+        chip_info = self.system_info.get((x, y))
+        if chip_info is not None and \
+                chip_info.local_ethernet_chip in self.ip_addresses:
+            return chip_info.local_ethernet_chip
+
+        if not self.ip_addresses:
+            return (0, 0)
+
+        return min(self.ip_addresses, key=lambda xy: (
+            shortest_torus_path_length(to_xyz((x, y)), to_xyz(xy),
+                                       self.system_info.width,
+                                       self.system_info.height),
+            xy
+        ))
+
+
 class EthernetThread(threading.Thread):
-    """Thread which handles transmitting and receiving IO values."""
-    def __init__(self, ethernet_handler):
+    """Thread which handles transmitting and receiving IO values.
+
+    The thread blocks until packets arrive (on any of the sockets of the
+    handler) and then drains every pending packet from the sockets before
+    publishing the inputs of the Nodes; only the most recent value received
+    from each core is kept.
+
+    Parameters
+    ----------
+    ethernet_handler : :py:class:`~.Ethernet`
+    timeout : float
+        Maximum time, in seconds, to block waiting for packets before checking
+        whether the thread should stop.
+    """
+    # Source of an SDP packet, (src_port_cpu, src_y, src_x), and the offset
+    # of the data of an SCP packet.
+    _source_struct = struct.Struct("<5xB2xBB")
+    _data_offset = 26
+
+    def __init__(self, ethernet_handler, timeout=0.1):
         # Initialise the thread
         super(EthernetThread, self).__init__(name="EthernetIO")
 
         # Set up internal references
         self.halt = False
         self.handler = ethernet_handler
-        self.in_sock = ethernet_handler.in_socket
-        self.in_sock.settimeout(0.0001)
+        self.timeout = timeout
+        self.in_socks = list(ethernet_handler.in_sockets)
+        for sock in self.in_socks:
+            sock.setblocking(False)
+
+        # Buffer into which packets are received
+        self._buffer = bytearray(512)
+        self._view = memoryview(self._buffer)
+
+        if selectors is not None:
+            self._selector = selectors.DefaultSelector()
+            for sock in self.in_socks:
+                self._selector.register(sock, selectors.EVENT_READ)
+
+    def _wait(self):
+        """Block until a socket is readable or the timeout expires, returning
+        the readable sockets.
+        """
+        if selectors is not None:
+            return [key.fileobj for key, _ in
+                    self._selector.select(self.timeout)]
+        else:  # pragma: no cover
+            return select.select(self.in_socks, [], [], self.timeout)[0]
 
     def run(self):
+        latest = dict()
         while not self.halt:
-            # Read as many packets from the socket as we can
-            while True:
-                try:
-                    data = self.in_sock.recv(512)
-                except IOError:
-                    break  # No more to read
-
-                # Unpack the data, and store it as the input for the
-                # appropriate Node.
-                packet = SCPPacket.from_bytestring(data)
-                values = tp.fix_to_np(
-                    np.frombuffer(packet.data, dtype=np.int32)
-                )
-
-                # Get the Node
-                node = self.handler._node_incoming[(packet.src_x,
-                                                    packet.src_y,
-                                                    packet.src_cpu)]
-                with self.handler.node_input_lock:
-                    self.handler.node_input[node] = values[:]
+            ready = self._wait()
+            if not ready:
+                continue
+
+            # Read every pending packet, keeping the data of only the most
+            # recent packet from each core.
+            for sock in ready:
+                while True:
+                    try:
+                        n_bytes = sock.recv_into(self._buffer)
+                    except (IOError, socket.error):
+                        break  # No more to read
+
+                    if n_bytes < self._data_offset:
+                        continue  # Not an SCP packet, e.g., a wake-up
+
+                    src_cpu, src_y, src_x = \
+                        self._source_struct.unpack_from(self._buffer)
+                    latest[(src_x, src_y, src_cpu & 0x1f)] = \
+                        self._view[self._data_offset:n_bytes].tobytes()
+
+            # Decode the values and store them as the inputs of the
+            # appropriate Nodes.
+            inputs = list()
+            for source, data in iteritems(latest):
+                node = self.handler._node_incoming.get(source)
+                if node is not None:
+                    inputs.append((node, tp.fix_to_np(
+                        np.frombuffer(data, dtype=np.int32))))
+            latest.clear()
+
+            with self.handler.node_input_lock:
+                for node, values in inputs:
+                    self.handler.node_input[node] = values
 
     def stop(self):
         """Stop the thread from running."""
         self.halt = True
+
+        # Wake the thread by sending an empty packet to a socket
+        try:
+            port = self.in_socks[0].getsockname()[1]
+            self.handler.out_socket.sendto(b"", ("127.0.0.1", port))
+        except (IOError, socket.error):  # pragma: no cover
+            pass  # The thread will wake when it times out
+
         self.join()
+
+        if selectors is not None:
+            self._selector.close()
+
+
+class NodeSendPlan(object):
+    """Precompiled plan for transmitting the output of a Node to the cores
+    which receive it.
+
+    The transforms (and pre-slices) of all the outgoing connections without
+    functions are fused into a single matrix, so that their values are
+    computed with one matrix-vector product; each function is evaluated only
+    once even if the values of its connection are sent to several cores.  The
+    SCP packet sent to each core is allocated once and its header prebuilt;
+    every time step the values are converted to fixed point directly into the
+    data portion of each packet.
+
+    Parameters
+    ----------
+    size_in : int
+        Size of the output of the Node.
+    outgoing : [((pre_slice, function, transform), (x, y, p)), ...]
+        Outgoing connections (or blocks of rows of connections) of the Node
+        and the cores which receive them.  The values for all the connections
+        received by a core are sent in a single packet, in the order in which
+        they are listed.
+    address : (str, int) or {(x, y): (str, int), ...}
+        Address to which packets should be sent, or a map from the chips to
+        which packets are sent to the address of the Ethernet connected chip
+        through which the packets for each chip should be sent.
+    """
+    def __init__(self, size_in, outgoing, address):
+        # Order the connections such that those without functions are first
+        # and those which apply the same function to the same input are
+        # adjacent, the values for each connection occupy a contiguous block
+        # of rows of the output vector.
+        function_groups = collections.OrderedDict()
+        for i, ((pre_slice, function, _), _) in enumerate(outgoing):
+            if function is not None:
+                key = (id(function), id(pre_slice))
+                function_groups.setdefault(key, list()).append(i)
+
+        fused = [i for i, ((_, f, _), _) in enumerate(outgoing) if f is None]
+        order = fused + [i for group in itervalues(function_groups) for
+                         i in group]
+
+        rows = [None] * len(outgoing)
+        n_rows = 0
+        for i in order:
+            (_, _, transform), _ = outgoing[i]
+            rows[i] = slice(n_rows, n_rows + transform.shape[0])
+            n_rows += transform.shape[0]
+
+        # Fuse the pre-slices and transforms of the connections without
+        # functions.
+        indices = np.arange(size_in)
+        self.n_fused_rows = rows[fused[-1]].stop if fused else 0
+        self.fused_transform = np.zeros((self.n_fused_rows, size_in))
+        for i in fused:
+            (pre_slice, _, transform), _ = outgoing[i]
+            np.add.at(self.fused_transform[rows[i]].T, indices[pre_slice],
+                      np.asarray(transform).T)
+
+        # Stack the transforms of connections which share a function
+        self.function_connections = list()
+        for group in itervalues(function_groups):
+            (pre_slice, function, _), _ = outgoing[group[0]]
+            transform = np.vstack([np.asarray(outgoing[i][0][2]) for
+                                   i in group])
+            sl = slice(rows[group[0]].start, rows[group[-1]].stop)
+            self.function_connections.append(
+                (pre_slice, function, transform, sl))
+
+        # Buffers for the values in floating and fixed point
+        self.values = np.zeros(n_rows)
+
+        # Determine which rows of the values are sent to each core
+        core_rows = collections.OrderedDict()
+        for (_, core), sl in zip(outgoing, rows):
+            core_rows.setdefault(core, list()).append(sl)
+
+        # Allocate a packet for each core and get views of the data portion of
+        # each as an array of fixed point values; keep views of the data for
+        # each connection.
+        self.packets = list()
+        self.addresses = list()
+        self.segments = list()
+        for (x, y, p), sls in iteritems(core_rows):
+            self.addresses.append(address if isinstance(address, tuple) else
+                                  address[(x, y)])
+
+            header = SCPPacket(dest_port=1, dest_cpu=p, dest_x=x, dest_y=y,
+                               cmd_rc=0, arg1=0, arg2=0, arg3=0,
+                               data=b"").bytestring
+            n_values = sum(sl.stop - sl.start for sl in sls)
+            packet = bytearray(header) + bytearray(4 * n_values)
+            self.packets.append(packet)
+
+            data = np.frombuffer(packet, dtype=np.int32, offset=len(header))
+            offset = 0
+            for sl in sls:
+                size = sl.stop - sl.start
+                self.segments.append((data[offset:offset + size], sl))
+                offset += size
+
+    def send(self, sock, value):
+        """Compute the values to transmit and send them using a socket."""
+        values = self.values
+
+        # Compute the values for all the connections
+        if self.n_fused_rows:
+            np.dot(self.fused_transform, value,
+                   out=values[:self.n_fused_rows])
+        for pre_slice, function, transform, sl in self.function_connections:
+            fvalue = np.asarray(function(value[pre_slice]), dtype=float)
+            values[sl] = np.dot(transform, fvalue.reshape(-1))
+
+        # Convert to S16.15 in place, saturating as for `np_to_fix`, and copy
+        # into the packets.
+        values *= 2.0**15
+        np.clip(values, tp.np_to_fix.min_value, tp.np_to_fix.max_value,
+                out=values)
+        for data, sl in self.segments:
+            np.copyto(data, values[sl], casting="unsafe")
+
+        # Send all the packets
+        sendto = sock.sendto
+        for packet, address in zip(self.packets, self.addresses):
+            sendto(packet, address)
@@ -329,14 +329,9 @@ class FilterCore(Vertex):
             "cluster": self.cluster})
 
         # Write the regions into memory
-        for key in Regions:
-            # Get the arguments
-            args, kwargs = self.region_arguments[key]
-
-            # Get the region
-            self.regions[key].write_subregion_to_file(
-                self.region_memory[key], *args, **kwargs
-            )
+        regions.utils.write_regions_named(
+            self.region_memory, self.regions, self.region_arguments
+        )
 
 
 class SystemRegion(object):
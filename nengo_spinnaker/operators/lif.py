@@ -7,7 +7,9 @@ appropriate sized slices.
 """
 
 import collections
+import csv
 import enum
+import io
 import itertools
 import math
 from nengo.base import ObjView
@@ -29,8 +31,11 @@ from nengo_spinnaker.regions.utils import Args
 from .. import regions
 from nengo_spinnaker.netlist import Vertex
 from nengo_spinnaker import partition
+from nengo_spinnaker.rc import rc
 from nengo_spinnaker.utils.application import get_application
 from nengo_spinnaker.utils.config import getconfig
+from nengo_spinnaker.utils.cost_model import CostModel
+from nengo_spinnaker.utils import profiling
 from nengo_spinnaker.utils import type_casts as tp
 from nengo_spinnaker.utils import neurons as neuron_utils
 
@@ -426,8 +431,15 @@ class EnsembleLIF(object):
         cpu_constraint = partition.Constraint(cycles, 0.4)  # 40% of cycles
         dtcm_constraint = partition.Constraint(56*2**10, 0.75)  # 75% DTCM
 
+        cost_model = getconfig(model.config, self.ensemble, "cost_model")
+        if cost_model is None:
+            cost_model = get_ensemble_cost_model()
+
+        n_pes_rules = len(ens_regions[Regions.pes].learning_rules)
+        n_voja_rules = len(ens_regions[Regions.voja].learning_rules)
         cluster_usage = ClusterResourceUsage(
-            size_in, size_out, size_learnt_out
+            size_in, size_out, size_learnt_out, n_pes_rules=n_pes_rules,
+            n_voja_rules=n_voja_rules, cost_model=cost_model
         )
         partition_constraints = {dtcm_constraint: cluster_usage.dtcm_usage,
                                  cpu_constraint: cluster_usage.cpu_usage}
@@ -448,7 +460,7 @@ class EnsembleLIF(object):
             self.clusters.append(cluster)
 
             # Get the vertices for the cluster
-            cluster_vertices = cluster.make_vertices(cycles)
+            cluster_vertices = cluster.make_vertices(cycles, cost_model)
             vertices.extend(cluster_vertices)
 
             # Create a constraint which forces these vertices to be present on
@@ -614,11 +626,8 @@ class EnsembleLIF(object):
             elif p.attr == "scaled_encoders":
                 probe_data = encoders[::sample_every, neuron_slice, :]
 
-            # Store the probe data
-            if p in simulator.data:
-                # Append the new probe data to the existing probe data
-                probe_data = np.vstack((simulator.data[p], probe_data))
-            simulator.data[p] = probe_data
+            # Append the new probe data to any existing probe data
+            simulator.data.append(p, probe_data)
 
 
 class EnsembleCluster(object):
@@ -636,14 +645,19 @@ class EnsembleCluster(object):
         self.n_learnt_input_signals = n_learnt_input_signals
         self._label = label
 
-    def make_vertices(self, cycles):
+    def make_vertices(self, cycles, cost_model=None):
         """Partition the neurons onto multiple cores."""
         dtcm_constraint = partition.Constraint(56 * 2**10, 0.75)  # 75% of DTCM
         cpu_constraint = partition.Constraint(cycles, 0.4)  # 40% of compute
 
         # Get the number of neurons in this cluster
         n_neurons = self.neuron_slice.stop - self.neuron_slice.start
-        core_usage = CoreResouceUsage(self.encoder_width, n_neurons)
+        core_usage = CoreResouceUsage(
+            self.encoder_width, n_neurons,
+            n_pes_rules=len(self.regions[Regions.pes].learning_rules),
+            n_voja_rules=len(self.regions[Regions.voja].learning_rules),
+            cost_model=cost_model or ensemble_cost_model
+        )
         constraints = {dtcm_constraint: core_usage.dtcm_usage,
                        cpu_constraint: core_usage.cpu_usage}
 
@@ -856,17 +870,10 @@ class EnsembleSlice(Vertex):
         self.region_arguments[Regions.learnt_keys].kwargs["cluster"] = \
             self.cluster
 
-        # Write each region into memory
-        for key in Regions:
-            # Get the arguments and the memory
-            args, kwargs = self.region_arguments[key]
-            mem = self.region_memory[key]
-
-            # Get the region
-            region = self.regions[key]
-
-            # Perform the write
-            region.write_subregion_to_file(mem, *args, **kwargs)
+        # Write the regions into memory
+        regions.utils.write_regions_named(
+            self.region_memory, self.regions, self.region_arguments
+        )
 
     def get_profiler_data(self):
         """Retrieve profiler data from the simulation."""
@@ -878,10 +885,24 @@ class EnsembleSlice(Vertex):
         profiler = self.regions[Regions.profiler]
         return profiler.read_from_mem(mem, self.profiler_tag_names)
 
+    def get_recording_reads(self, n_steps):
+        """Get the memory which must be read to retrieve recorded data."""
+        return {
+            key: (self.region_memory[key],
+                  self.regions[key].sizeof_recording(self.neuron_slice,
+                                                     n_steps))
+            for key in (Regions.spike_recording, Regions.voltage_recording,
+                        Regions.encoder_recording)
+        }
+
     def get_probe_data(self, region_name, n_steps):
         """Retrieve probed data from the simulation."""
-        # Get the memory block
-        mem = self.region_memory[region_name]
+        # Get the memory block, or the data which has already been retrieved
+        # from it.
+        if region_name in self.recorded_data:
+            mem = io.BytesIO(self.recorded_data.pop(region_name))
+        else:
+            mem = self.region_memory[region_name]
         mem.seek(0)
 
         # Read the data from memory
@@ -1259,30 +1280,142 @@ def iceil(val):
     return int(math.ceil(val))
 
 
-def get_input_filtering_cycles(size_in):
+ensemble_cost_model = CostModel(
+    collections.OrderedDict([
+        ("Input filter", [("size_in", ), ()]),
+        ("Neuron update", [("n_neurons", "size_in"), ("n_neurons", ), ()]),
+        ("Decode and transmit output", [("n_neurons_in_cluster", "size_out"),
+                                        ("size_out", ), ()]),
+        ("PES", [("n_neurons_in_cluster", "size_learnt_out"),
+                 ("n_neurons_in_cluster", "n_pes_rules"),
+                 ("n_pes_rules", )]),
+        ("Voja", [("n_neurons", "size_in", "n_voja_rules"),
+                  ("n_neurons", "n_voja_rules"),
+                  ("n_voja_rules", )]),
+    ]),
+    {
+        # Based on thesis profiling
+        "Input filter": [39, 135],
+        "Neuron update": [9, 61, 174],
+        "Decode and transmit output": [2, 143, 173],
+        # PES and Voja are yet to be profiled; PES is assumed to cost as much
+        # as decoding and Voja as much as applying the encoders.
+        "PES": [2, 0, 173],
+        "Voja": [9, 0, 174],
+    }
+)
+"""Default model of the cycles spent by an ensemble core in each profiled
+stage of a time step."""
+
+ensemble_profiler_columns = {
+    "Num neurons": "n_neurons",
+    "Dimensions": "size_in",
+}
+"""Alternative names for the variables of the ensemble cost model which may
+be used in profiler CSV files."""
+
+
+def get_ensemble_cost_model():
+    """Get the model of the cost of simulating ensembles.
+
+    If the ``path`` option of the ``[cost_model]`` section of the
+    nengo_spinnaker rc files names a file saved by
+    :py:func:`~.fit_ensemble_cost_model` its coefficients will be used in
+    place of the defaults.
+    """
+    if rc.has_option("cost_model", "path"):
+        return ensemble_cost_model.update(
+            CostModel.load(rc.get("cost_model", "path")))
+    else:
+        return ensemble_cost_model
+
+
+def fit_ensemble_cost_model(csv_paths, save_path=None, cost_model=None):
+    """Fit the ensemble cost model to profiler data.
+
+    Parameters
+    ----------
+    csv_paths : [str, ...]
+        Profiler CSV files (written by
+        :py:mod:`nengo_spinnaker.utils.profiling`) with a row per profiled
+        core.  Columns should give the variables of the cost model (e.g.,
+        "n_neurons", "size_in", "n_neurons_in_cluster", "size_out",
+        "size_learnt_out", "n_pes_rules" and "n_voja_rules") and the mean
+        time spent in each profiled stage.  Stages for which no data is
+        available retain their current costs.
+    save_path : str, optional
+        File to which the fitted model should be saved.
+    cost_model : :py:class:`~nengo_spinnaker.utils.cost_model.CostModel`
+        Model to fit, defaults to the model returned by
+        :py:func:`~.get_ensemble_cost_model`.
+    """
+    rows = list()
+    for path in csv_paths:
+        with open(path) as fp:
+            for row in profiling.read_csv_rows(csv.reader(fp)):
+                rows.append({ensemble_profiler_columns.get(k, k): v for
+                             k, v in iteritems(row)})
+
+    if cost_model is None:
+        cost_model = get_ensemble_cost_model()
+    cost_model = cost_model.fit(rows)
+
+    if save_path is not None:
+        cost_model.save(save_path)
+
+    return cost_model
+
+
+def get_input_filtering_cycles(size_in, cost_model=ensemble_cost_model):
     """Cycles required to perform filtering of received values."""
-    # Based on thesis profiling
-    return 39*size_in + 135
+    return cost_model.cycles("Input filter", size_in=size_in)
 
 
-def get_neuron_update_cycles(size_in, n_neurons_on_core):
+def get_neuron_update_cycles(size_in, n_neurons_on_core,
+                             cost_model=ensemble_cost_model):
     """Cycles required to simulate neurons."""
-    # Based on thesis profiling
-    return 9*n_neurons_on_core*size_in + 61*n_neurons_on_core + 174
+    return cost_model.cycles("Neuron update", size_in=size_in,
+                             n_neurons=n_neurons_on_core)
 
 
-def get_decode_and_transmit_cycles(n_neurons_in_cluster, size_out):
+def get_decode_and_transmit_cycles(n_neurons_in_cluster, size_out,
+                                   cost_model=ensemble_cost_model):
     """Cycles required to decode spikes and transmit packets."""
-    # Based on thesis profiling
-    return 2*n_neurons_in_cluster*size_out + 143*size_out + 173
+    return cost_model.cycles("Decode and transmit output", size_out=size_out,
+                             n_neurons_in_cluster=n_neurons_in_cluster)
+
+
+def get_pes_cycles(n_neurons_in_cluster, size_learnt_out, n_pes_rules,
+                   cost_model=ensemble_cost_model):
+    """Cycles required to apply PES learning rules to the decoders of a
+    core.
+    """
+    return cost_model.cycles("PES", n_neurons_in_cluster=n_neurons_in_cluster,
+                             size_learnt_out=size_learnt_out,
+                             n_pes_rules=n_pes_rules)
+
+
+def get_voja_cycles(size_in, n_neurons_on_core, n_voja_rules,
+                    cost_model=ensemble_cost_model):
+    """Cycles required to apply Voja learning rules to the encoders of a
+    core.
+    """
+    return cost_model.cycles("Voja", size_in=size_in,
+                             n_neurons=n_neurons_on_core,
+                             n_voja_rules=n_voja_rules)
 
 
 class ClusterResourceUsage(object):
-    def __init__(self, size_in, size_out, size_learnt_out, n_cores=16):
+    def __init__(self, size_in, size_out, size_learnt_out, n_cores=16,
+                 n_pes_rules=0, n_voja_rules=0,
+                 cost_model=ensemble_cost_model):
         self.n_cores = n_cores
         self.size_in = size_in
         self.size_out = size_out
         self.size_learnt_out = size_learnt_out
+        self.n_pes_rules = n_pes_rules
+        self.n_voja_rules = n_voja_rules
+        self.cost_model = cost_model
 
         # Compute the loading for the most heavily loaded core
         self.fn_cores = float(n_cores)
@@ -1302,16 +1435,21 @@ class ClusterResourceUsage(object):
         neurons_per_core = iceil(float(n_neurons) / self.fn_cores)
 
         # Compute the loading
-        # TODO Profile PES and Voja
+        cm = self.cost_model
         return (
             get_input_filtering_cycles(
-                self.size_in_per_core) +
+                self.size_in_per_core, cm) +
             get_neuron_update_cycles(
-                self.size_in, neurons_per_core) +
+                self.size_in, neurons_per_core, cm) +
             get_decode_and_transmit_cycles(
-                n_neurons, self.size_out_per_core) +
+                n_neurons, self.size_out_per_core, cm) +
             get_decode_and_transmit_cycles(
-                n_neurons, self.size_learnt_out_per_core)
+                n_neurons, self.size_learnt_out_per_core, cm) +
+            get_pes_cycles(
+                n_neurons, self.size_learnt_out_per_core, self.n_pes_rules,
+                cm) +
+            get_voja_cycles(
+                self.size_in, neurons_per_core, self.n_voja_rules, cm)
         )
 
     def dtcm_usage(self, neuron_slice):
@@ -1332,9 +1470,13 @@ class ClusterResourceUsage(object):
 
 
 class CoreResouceUsage(object):
-    def __init__(self, size_in, n_neurons_in_cluster):
+    def __init__(self, size_in, n_neurons_in_cluster, n_pes_rules=0,
+                 n_voja_rules=0, cost_model=ensemble_cost_model):
         self.size_in = size_in
         self.n_neurons_in_cluster = n_neurons_in_cluster
+        self.n_pes_rules = n_pes_rules
+        self.n_voja_rules = n_voja_rules
+        self.cost_model = cost_model
 
     def cpu_usage(self, input_slice, neuron_slice,
                   output_slice, learnt_output_slice):
@@ -1345,14 +1487,18 @@ class CoreResouceUsage(object):
         size_learnt_out = learnt_output_slice.stop - learnt_output_slice.start
 
         # Compute the loading
-        # TODO Profile PES and Voja
+        cm = self.cost_model
         return (
-            get_input_filtering_cycles(filtered_dims) +
-            get_neuron_update_cycles(self.size_in, n_neurons) +
+            get_input_filtering_cycles(filtered_dims, cm) +
+            get_neuron_update_cycles(self.size_in, n_neurons, cm) +
             get_decode_and_transmit_cycles(
-                self.n_neurons_in_cluster, size_out) +
+                self.n_neurons_in_cluster, size_out, cm) +
             get_decode_and_transmit_cycles(
-                self.n_neurons_in_cluster, size_learnt_out)
+                self.n_neurons_in_cluster, size_learnt_out, cm) +
+            get_pes_cycles(
+                self.n_neurons_in_cluster, size_learnt_out, self.n_pes_rules,
+                cm) +
+            get_voja_cycles(self.size_in, n_neurons, self.n_voja_rules, cm)
         )
 
     def dtcm_usage(self, input_slice, neuron_slice,
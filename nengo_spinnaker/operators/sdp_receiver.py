@@ -1,22 +1,38 @@
+import collections
 from rig.place_and_route import Cores, SDRAM
-import six
 import struct
 
 from nengo_spinnaker.builder.ports import OutputPort
 from nengo_spinnaker.builder.netlist import netlistspec
 from nengo_spinnaker.netlist import Vertex
+from nengo_spinnaker.partition import Constraint, partition
 from nengo_spinnaker.regions import KeyspacesRegion, KeyField, Region
 from nengo_spinnaker.regions import utils as region_utils
 from nengo_spinnaker.utils.application import get_application
 
+MAX_DIMENSIONS = 64
+"""Greatest number of values which may be sent to an SDP receiver core in a
+single SDP packet.
+"""
+
 
 class SDPReceiver(object):
     """An operator which receives SDP packets and transmits the contained data
     as a stream of multicast packets.
+
+    Connections wider than fit in an SDP packet are split across several
+    cores and narrow connections share cores.
+
+    Attributes
+    ----------
+    vertex_connections : {Vertex: [(transmission_params, slice), ...], ...}
+        The rows of the connections whose values are transmitted by each
+        vertex, in the order in which the values are expected in SDP packets
+        sent to the vertex.
     """
     def __init__(self, label):
-        # Create a mapping of which connection is broadcast by which vertex
-        self.connection_vertices = dict()
+        # Create a mapping of which connections are broadcast by which vertex
+        self.vertex_connections = collections.OrderedDict()
         self._sys_regions = dict()
         self._key_regions = dict()
         self._label = label
@@ -37,21 +53,36 @@ class SDPReceiver(object):
         # actually necessary; the way to avoid this is to modify how the
         # builder deals with signals when creating netlists.
 
-        # Get all outgoing signals and their associated transmission parameters
+        # Split each outgoing connection into as few blocks of rows as will
+        # fit in an SDP packet.
+        constraints = {
+            Constraint(MAX_DIMENSIONS): lambda sl: sl.stop - sl.start
+        }
+        blocks = list()
         for signal, transmission_params in \
                 model.get_signals_from_object(self)[OutputPort.standard]:
-            # Get the transform, and from this the keys
             transform = transmission_params.full_transform(slice_out=False)
-            keys = [(signal, {"index": i}) for i in
-                    range(transform.shape[0])]
-
-            # Create a vertex for this connection (assuming its size out <= 64)
-            if len(keys) > 64:
-                raise NotImplementedError(
-                    "Connection is too wide to transmit to SpiNNaker. "
-                    "Consider breaking the connection up or making the "
-                    "originating node a function of time Node."
-                )
+            for rows in partition(slice(0, transform.shape[0]), constraints):
+                if rows.stop > rows.start:
+                    blocks.append((signal, transmission_params, rows))
+
+        # Pack the blocks onto as few cores as possible, placing the largest
+        # blocks first.
+        cores = list()
+        for block in sorted(blocks, key=lambda b: b[2].start - b[2].stop):
+            size = block[2].stop - block[2].start
+            for core in cores:
+                if sum(b[2].stop - b[2].start for b in core) + size <= \
+                        MAX_DIMENSIONS:
+                    core.append(block)
+                    break
+            else:
+                cores.append([block])
+
+        for core in cores:
+            # Get the keys for the values transmitted by the core
+            keys = [(signal, {"index": i}) for signal, _, rows in core for
+                    i in range(rows.start, rows.stop)]
 
             # Create the regions for the system
             sys_region = SystemRegion(model.machine_timestep, len(keys))
@@ -66,19 +97,20 @@ class SDPReceiver(object):
             }
 
             # Create the vertex
-            v = self.connection_vertices[transmission_params] = \
-                Vertex(self._label, get_application("rx"), resources)
+            v = Vertex(self._label, get_application("rx"), resources)
+            self.vertex_connections[v] = [(transmission_params, rows) for
+                                          _, transmission_params, rows in core]
             self._sys_regions[v] = sys_region
             self._key_regions[v] = keys_region
 
         # Return the netlist specification
-        return netlistspec(list(self.connection_vertices.values()),
+        return netlistspec(list(self.vertex_connections),
                            load_function=self.load_to_machine)
 
     def load_to_machine(self, netlist, controller):
         """Load data to the machine."""
         # Write each vertex region to memory
-        for vx in six.itervalues(self.connection_vertices):
+        for vx in self.vertex_connections:
             sys_mem, key_mem = region_utils.create_app_ptr_and_region_files(
                 netlist.vertices_memory[vx],
                 [self._sys_regions[vx], self._key_regions[vx]],
@@ -13,9 +13,19 @@ from nengo_spinnaker.utils.application import get_application
 class SDPTransmitter(object):
     """An operator which receives multicast packets, performs filtering and
     transmits the filtered vector as an SDP packet.
+
+    Attributes
+    ----------
+    ethernet_chip : (x, y)
+        Ethernet connected chip through which SDP packets are sent to the
+        host.
+    ip_tag : int
+        IP tag, of the Ethernet connected chip, to which SDP packets are sent.
     """
     def __init__(self, size_in, label):
         self.size_in = size_in
+        self.ethernet_chip = (0, 0)
+        self.ip_tag = 1
         self._vertex = None
         self._sys_region = None
         self._filter_region = None
@@ -77,6 +87,8 @@ class SDPTransmitter(object):
             )
 
         # Write the regions into memory
+        self._sys_region.ethernet_chip = self.ethernet_chip
+        self._sys_region.ip_tag = self.ip_tag
         self._sys_region.write_region_to_file(sys_mem)
         self._filter_region.write_subregion_to_file(filter_mem)
         self._routing_region.write_subregion_to_file(routing_mem)
@@ -84,15 +96,20 @@ class SDPTransmitter(object):
 
 class SystemRegion(Region):
     """System region for SDP Tx."""
-    def __init__(self, machine_timestep, size_in, delay):
+    def __init__(self, machine_timestep, size_in, delay,
+                 ethernet_chip=(0, 0), ip_tag=1):
         self.machine_timestep = machine_timestep
         self.size_in = size_in
         self.transmission_delay = delay
+        self.ethernet_chip = ethernet_chip
+        self.ip_tag = ip_tag
 
     def sizeof(self, *args, **kwargs):
-        return 12
+        return 20
 
     def write_region_to_file(self, fp, *args, **kwargs):
         """Write the region to file."""
-        fp.write(struct.pack("<3I", self.size_in, self.machine_timestep,
-                             self.transmission_delay))
+        x, y = self.ethernet_chip
+        fp.write(struct.pack("<5I", self.size_in, self.machine_timestep,
+                             self.transmission_delay, (x << 8) | y,
+                             self.ip_tag))
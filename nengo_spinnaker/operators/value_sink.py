@@ -1,4 +1,5 @@
 import enum
+import io
 import numpy as np
 from rig.place_and_route import Cores, SDRAM
 import struct
@@ -116,11 +117,8 @@ class ValueSink(object):
         # Apply the sampling
         data = data[::self.sample_every]
 
-        # Store the probe data in the simulator
-        if self.probe in simulator.data:
-            # Include any existing probed data
-            data = np.vstack((simulator.data[self.probe], data))
-        simulator.data[self.probe] = data
+        # Append the probe data to any existing probe data in the simulator
+        simulator.data.append(self.probe, data)
 
 
 class ValueSinkVertex(Vertex):
@@ -175,19 +173,28 @@ class ValueSinkVertex(Vertex):
             )
 
         # Write the regions into memory
-        for key in Regions:
-            # Get the arguments
-            args, kwargs = self.region_arguments[key]
+        regions.utils.write_regions_named(
+            self.region_memory, self.regions, self.region_arguments
+        )
 
-            # Get the region
-            self.regions[key].write_subregion_to_file(
-                self.region_memory[key], *args, **kwargs
-            )
+    def get_recording_reads(self, n_steps):
+        """Get the memory which must be read to retrieve recorded data."""
+        region = self.regions[Regions.recording]
+        return {
+            Regions.recording: (
+                self.region_memory[Regions.recording],
+                region.sizeof_recording(self.input_slice, n_steps)
+            ),
+        }
 
     def read_recording(self, n_steps):
         """Read back the recorded values."""
-        # Grab the block of memory and seek to the start
-        mem = self.region_memory[Regions.recording]
+        # Grab the block of memory (or the data which has already been
+        # retrieved from it) and seek to the start.
+        if Regions.recording in self.recorded_data:
+            mem = io.BytesIO(self.recorded_data.pop(Regions.recording))
+        else:
+            mem = self.region_memory[Regions.recording]
         mem.seek(0)
 
         # Perform the read
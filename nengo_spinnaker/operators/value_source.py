@@ -1,7 +1,9 @@
 import collections
 import math
+import multiprocessing
 import numpy as np
 from rig.place_and_route import Cores, SDRAM
+from six.moves import cPickle as pickle
 import struct
 
 from nengo.processes import Process
@@ -18,13 +20,35 @@ from nengo_spinnaker.utils.type_casts import np_to_fix
 
 class ValueSource(object):
     """Operator which transmits values from a buffer."""
-    def __init__(self, function, size_out, period, label):
+    output_cache_size = 2
+    """Number of output buffers to retain."""
+
+    def __init__(self, function, size_out, period, label, vectorized=False,
+                 n_processes=None):
         """Create a new source which evaluates the given function over a period
         of time.
+
+        Parameters
+        ----------
+        vectorized : bool
+            Whether the function may be called with an array of times to
+            produce an array of outputs, one row per time.  The functions of
+            outgoing connections are always called once per time.
+        n_processes : int or None
+            Functions which are not vectorised may be evaluated by a pool of
+            this many processes.
         """
         self.function = function
         self.size_out = size_out
         self.period = period
+        self.vectorized = vectorized
+        self.n_processes = n_processes
+
+        # Output buffers of periodic sources, in fixed point, and what was
+        # last written to memory.
+        self._output_cache = collections.OrderedDict()
+        self._written_output = None
+        self._written_n_steps = None
 
         # Vertices
         self.system_region = None
@@ -104,6 +128,9 @@ class ValueSource(object):
         """Load the values into memory."""
         # For each slice
         self.vertices_region_memory = collections.defaultdict(dict)
+        self._written_output = None
+        self._written_n_steps = self.system_region.n_steps
+        self._max_output_steps = self.system_region.n_steps
 
         for vertex in self.vertices:
             # Layout the slice of SDRAM we have been given
@@ -129,71 +156,247 @@ class ValueSource(object):
     def before_simulation(self, netlist, simulator, n_steps):
         """Generate the values to output for the next set of simulation steps.
         """
-        # Write out the system region to deal with the current run-time
-        self.system_region.n_steps = n_steps
-
         # Evaluate the node for this period of time
+        max_n = self.get_n_output_steps(n_steps, simulator.dt)
+        if max_n > self._max_output_steps:
+            raise ValueError(
+                "{}: the period of the function of time Node ({} steps) does "
+                "not fit in the memory allocated for its output ({} "
+                "steps)".format(self._label, max_n, self._max_output_steps)
+            )
+
+        # Get the output, if this is the same as the output which is already
+        # in memory then it needn't be written again.
+        key = self.get_output_key(simulator.steps, max_n, simulator.dt)
+        if key != self._written_output:
+            output_matrix = self.get_fixed_output(simulator.steps, max_n,
+                                                  simulator.dt)
+            new_output_region = regions.MatrixRegion(
+                output_matrix,
+                sliced_dimension=regions.MatrixPartitioning.columns
+            )
+
+            for vertex in self.vertices:
+                self.vertices_region_memory[vertex][self.output_region].seek(0)
+                new_output_region.write_subregion_to_file(
+                    self.vertices_region_memory[vertex][self.output_region],
+                    vertex.slice
+                )
+
+            self._written_output = key
+
+        # Write the system region if the number of steps has changed
+        self.system_region.n_steps = max_n
+        if max_n != self._written_n_steps:
+            for vertex in self.vertices:
+                self.vertices_region_memory[vertex][self.system_region].seek(0)
+                self.system_region.write_subregion_to_file(
+                    self.vertices_region_memory[vertex][self.system_region],
+                    vertex.slice
+                )
+
+            self._written_n_steps = max_n
+
+    def prepare_simulation(self, netlist, simulator, start_step, n_steps):
+        """Generate, in advance, the values to output for a later set of
+        simulation steps.
+        """
+        max_n = self.get_n_output_steps(n_steps, simulator.dt)
+        self.get_fixed_output(start_step, max_n, simulator.dt, retain=True)
+
+    def get_n_output_steps(self, n_steps, dt):
+        """Get the number of steps of output required to simulate a number of
+        steps (or to simulate indefinitely, if `n_steps` is None).
+        """
         if self.period is not None:
-            max_n = min(n_steps, int(np.ceil(self.period / simulator.dt)))
+            period_steps = int(np.ceil(self.period / dt))
+            return period_steps if n_steps is None else min(n_steps,
+                                                            period_steps)
+        elif n_steps is None:
+            raise ValueError(
+                "{}: the output of a function of time Node without a period "
+                "cannot be computed for an indefinite simulation".format(
+                    self._label)
+            )
+        else:
+            return n_steps
+
+    @property
+    def _is_periodic(self):
+        return (self.period is not None and
+                not isinstance(self.function, Process))
+
+    def get_output_key(self, start_step, n_steps, dt):
+        """Get a key identifying the output of the source.
+
+        The output of a periodic function of time depends only on when in the
+        period it is first evaluated, how many steps it is evaluated for and
+        on the outgoing connections.  The output of other sources depends on
+        the time at which they are first evaluated.
+        """
+        tps = tuple(tp for tp, _ in self.transmission_parameters)
+        if self._is_periodic:
+            period_steps = int(np.ceil(self.period / dt))
+            return (self.period, dt, start_step % period_steps, n_steps, tps)
         else:
-            max_n = n_steps
+            return (None, dt, start_step, n_steps, tps)
 
-        ts = np.arange(simulator.steps, simulator.steps + max_n) * simulator.dt
+    def get_fixed_output(self, start_step, n_steps, dt, retain=False):
+        """Get the values to transmit for a number of simulation steps in
+        fixed point.
+
+        The output of periodic sources is retained so that it may be reused,
+        output prepared in advance (`retain=True`) is retained until it is
+        used.
+        """
+        key = self.get_output_key(start_step, n_steps, dt)
+        if key in self._output_cache:
+            if self._is_periodic or retain:
+                return self._output_cache[key]
+            else:
+                return self._output_cache.pop(key)
+
+        output = np_to_fix(self.get_output(start_step, n_steps, dt))
+
+        if self._is_periodic or retain:
+            self._output_cache[key] = output
+            while len(self._output_cache) > self.output_cache_size:
+                self._output_cache.popitem(last=False)
+
+        return output
+
+    def get_output(self, start_step, n_steps, dt):
+        """Get the values to transmit for a number of simulation steps.
+
+        Returns
+        -------
+        array
+            An array with a row for each simulation step and a column for each
+            transmitted value.
+        """
+        # Create a single pool of processes for all the functions which must
+        # be evaluated once per time step, if there are any.
+        pool = None
+        if self.n_processes and (
+                (callable(self.function) and not self.vectorized) or
+                any(tps.function is not None for tps, _ in
+                    self.transmission_parameters)):
+            pool = multiprocessing.Pool(self.n_processes)
+
+        try:
+            return self._get_output(start_step, n_steps, dt, pool)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def _get_output(self, start_step, n_steps, dt, pool):
+        ts = np.arange(start_step, start_step + n_steps) * dt
         if callable(self.function):
-            values = np.array([self.function(t) for t in ts])
+            values = evaluate_rows(self.function, ts, self.vectorized, pool)
         elif isinstance(self.function, Process):
-            values = self.function.run_steps(max_n, d=self.size_out,
-                                             dt=simulator.dt)
+            values = self.function.run_steps(n_steps, d=self.size_out, dt=dt)
         else:
-            values = np.array([self.function for t in ts])
+            values = np.tile(np.asarray(self.function, dtype=float).ravel(),
+                             (n_steps, 1))
 
         # Ensure that the values can be sliced, regardless of how they were
         # generated.
         values = npext.array(values, min_dims=2)
 
-        # Compute the output for each connection
-        outputs = []
+        # Compute the output for each connection.  The transforms of all the
+        # connections without functions are stacked so that they may be
+        # applied to all the values as a single matrix product, connections
+        # with functions have their function applied to all the values at
+        # once before their transform is applied.
+        outputs = list()
+        stacked = list()
+        stacked_transforms = list()
+        all_columns = np.arange(values.shape[1])
         for transmission_params, transform in self.transmission_parameters:
-            output = []
-
-            # For each f(t) for the next set of simulations we calculate the
-            # output at the end of the connection.  To do this we first apply
-            # the pre-slice, then the function and then the post-slice.
-            for v in values:
-                # Apply the pre-slice
-                v = v[transmission_params.pre_slice]
-
-                # Apply the function on the connection, if there is one.
-                if transmission_params.function is not None:
-                    v = np.asarray(transmission_params.function(v),
-                                   dtype=float)
+            columns = all_columns[transmission_params.pre_slice]
+            transform = transform.reshape(transform.shape[0], -1)
+
+            if transmission_params.function is None:
+                # Expand the transform to apply to all of the values, the
+                # output will be filled in once the product is computed.
+                full_transform = np.zeros((transform.shape[0],
+                                           values.shape[1]))
+                np.add.at(full_transform, (slice(None), columns), transform)
+                stacked.append(len(outputs))
+                stacked_transforms.append(full_transform)
+                outputs.append(None)
+            else:
+                fvalues = evaluate_rows(transmission_params.function,
+                                        values[:, columns], pool=pool)
+                outputs.append(np.dot(fvalues, transform.T))
+
+        if stacked_transforms:
+            stacked_output = np.dot(values, np.vstack(stacked_transforms).T)
+            start = 0
+            for i, transform in zip(stacked, stacked_transforms):
+                stop = start + transform.shape[0]
+                outputs[i] = stacked_output[:, start:stop]
+                start = stop
+
+        return np.hstack(outputs)
+
+
+def evaluate_rows(function, xs, vectorized=False, pool=None):
+    """Evaluate a function for each element (or row) of an array.
+
+    For example::
+
+        >>> evaluate_rows(lambda t: [t, 2*t], np.array([0.0, 1.0]))
+        array([[0., 0.],
+               [1., 2.]])
+
+    Parameters
+    ----------
+    function : callable
+    xs : array
+        Times (or rows of values) with which to call the function.
+    vectorized : bool
+        If True then the function is called once with all of `xs` and must
+        return an array with a row for every element of `xs`, otherwise the
+        function is called once for every element of `xs`.
+    pool : :py:class:`multiprocessing.pool.Pool` or None
+        Pool of processes to use when calling the function for every element
+        of `xs`.  Functions which cannot be pickled are always evaluated in
+        this process.
+
+    Returns
+    -------
+    array
+        An array with a row for every element of `xs`.
+    """
+    n = len(xs)
+
+    if vectorized:
+        values = np.asarray(function(xs), dtype=float)
+        if values.ndim not in (1, 2) or values.shape[0] != n:
+            raise ValueError(
+                "Vectorised function returned an array of shape {}, expected "
+                "({}, ...)".format(values.shape, n)
+            )
+        return values.reshape(n, -1)
 
-                output.append(np.dot(transform, v.T))
-            outputs.append(np.array(output).reshape(max_n, -1))
+    # Call the function for each element of xs
+    if pool is not None and n > 1 and _can_pickle(function):
+        values = pool.map(function, list(xs))
+    else:
+        values = [function(x) for x in xs]
 
-        # Combine all of the output values to form a large matrix which we can
-        # dump into memory.
-        output_matrix = np.hstack(outputs)
+    return np.array([np.asarray(v, dtype=float).ravel() for v in values]
+                    ).reshape(n, -1)
 
-        new_output_region = regions.MatrixRegion(
-            np_to_fix(output_matrix),
-            sliced_dimension=regions.MatrixPartitioning.columns
-        )
 
-        # Write the simulation values into memory
-        for vertex in self.vertices:
-            self.vertices_region_memory[vertex][self.system_region].seek(0)
-            self.system_region.n_steps = max_n
-            self.system_region.write_subregion_to_file(
-                self.vertices_region_memory[vertex][self.system_region],
-                vertex.slice
-            )
-
-            self.vertices_region_memory[vertex][self.output_region].seek(0)
-            new_output_region.write_subregion_to_file(
-                self.vertices_region_memory[vertex][self.output_region],
-                vertex.slice
-            )
+def _can_pickle(function):
+    try:
+        pickle.dumps(function, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return False
+    return True
 
 
 class SystemRegion(regions.Region):
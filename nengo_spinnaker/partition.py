@@ -1,6 +1,8 @@
 """Tools for partitioning large vertices.  """
+import bisect
 import collections
 import math
+import numpy as np
 from six import iteritems
 from six.moves import zip
 
@@ -37,7 +39,7 @@ class Constraint(collections.namedtuple("Constraint",
         )
 
 
-def partition(initial_slice, constraints_and_getters):
+def partition(initial_slice, constraints_and_getters, costs=None):
     """Construct a list of slices which satisfy a set of constraints.
 
     Parameters
@@ -47,10 +49,14 @@ def partition(initial_slice, constraints_and_getters):
     constraints_and_getters : {:py:class:`~.Constraint`: func, ...}
         Dictionary mapping constraints to functions which will accept a slice
         and return the current usage of the resource for the given slice.
+    costs : array_like, optional
+        Cost of each atom in the initial slice.  If given the slices are
+        chosen to minimise the greatest total cost of any slice, otherwise
+        all atoms are assumed to have the same cost.
 
     ..note::
-        It is assumed that the object being sliced is homogeneous, i.e., there
-        is no difference in usage for `slice(0, 10)` and `slice(10, 20)`.
+        It is assumed that the usage of every resource does not increase as
+        the number of slices is increased.
 
     Yields
     ------
@@ -64,11 +70,12 @@ def partition(initial_slice, constraints_and_getters):
     """
     # Partition using `partition_multiple` and return the first (and only)
     # element of each of the resulting tuples of slices.
-    for sl, in partition_multiple((initial_slice, ), constraints_and_getters):
+    for sl, in partition_multiple((initial_slice, ), constraints_and_getters,
+                                  costs=(costs, )):
         yield sl
 
 
-def partition_multiple(initial_slices, constraints_and_getters):
+def partition_multiple(initial_slices, constraints_and_getters, costs=None):
     """Construct a list of slices which satisfy a set of constraints.
 
     Parameters
@@ -78,10 +85,17 @@ def partition_multiple(initial_slices, constraints_and_getters):
     constraints_and_getters : {:py:class:`~.Constraint`: func, ...}
         Dictionary mapping constraints to functions which will accept slices
         and return the current usage of the resource for the given slices.
+    costs : (array_like or None, ...), optional
+        Cost of each atom in each of the initial slices.  Where costs are
+        given the slices are chosen to minimise the greatest total cost of
+        any slice (see :py:func:`~.divide_slice_by_cost`), otherwise all atoms
+        are assumed to have the same cost.  The ensemble cost model gives
+        every neuron, input dimension and output of an ensemble the same
+        cost, so ensembles are partitioned without costs.
 
     ..note::
-        It is assumed that the object being sliced is homogeneous, i.e., there
-        is no difference in usage for `slice(0, 10)` and `slice(10, 20)`.
+        It is assumed that the usage of every resource does not increase as
+        the number of slices is increased.
 
     Yields
     ------
@@ -93,42 +107,62 @@ def partition_multiple(initial_slices, constraints_and_getters):
     UnpartitionableError
         If the given problem cannot be solved by this partitioner.
     """
-    def constraints_unsatisfied(slices, constraints):
-        for s in slices:
-            for constraint, usage in iteritems(constraints):
-                yield constraint.max_usage < usage(*s)
-
     # Normalise the slice
     initial_slices = tuple(slice(0, sl.stop) if sl.start is None else sl
                            for sl in initial_slices)
+    if costs is None:
+        costs = (None, ) * len(initial_slices)
 
-    # While any of the slices fail to satisfy a constraint we partition further
-    n_cuts = 1
-    max_cuts = max(sl.stop - sl.start for sl in initial_slices)
-    slices = [initial_slices]
-
-    while any(constraints_unsatisfied(slices, constraints_and_getters)):
-        if n_cuts == 1:
-            # If we haven't performed any partitioning then we get the first
-            # number of cuts to make.
-            n_cuts = max(
-                int(math.ceil(usage(*initial_slices) / c.max_usage)) for
-                c, usage in iteritems(constraints_and_getters)
-            )
-        else:
-            # Otherwise just increment the number of cuts rather than honing in
-            # on the expensive elements.
-            n_cuts += 1
+    def divide(n_cuts):
+        return list(zip(*(divide_slice(sl, n_cuts) if c is None else
+                          divide_slice_by_cost(sl, n_cuts, c) for
+                          sl, c in zip(initial_slices, costs))))
 
-        if n_cuts > max_cuts:
-            # We can't cut any further, so the problem can't be solved.
+    def constraints_satisfied(slices):
+        return all(constraint.max_usage >= usage(*s) for s in slices for
+                   constraint, usage in iteritems(constraints_and_getters))
+
+    # If no partitioning is required then return the initial slices
+    slices = divide(1)
+    if constraints_satisfied(slices):
+        return slices
+
+    # Otherwise estimate the least number of cuts which could be made
+    max_cuts = max(sl.stop - sl.start for sl in initial_slices)
+    n_cuts = max(
+        int(math.ceil(usage(*initial_slices) / c.max_usage)) for
+        c, usage in iteritems(constraints_and_getters)
+    )
+    if n_cuts > max_cuts:
+        # We can't cut any further, so the problem can't be solved.
+        raise UnpartitionableError
+
+    # Double the number of cuts until the constraints are satisfied, the
+    # smallest number of cuts which satisfy the constraints must then lie
+    # between the last two numbers of cuts which were tried.  The estimate is
+    # a lower bound, so no fewer cuts can suffice.
+    n_cuts = max(n_cuts, 2)
+    lower = n_cuts - 1  # Largest number of cuts known not to suffice
+    while True:
+        slices = divide(n_cuts)
+        if constraints_satisfied(slices):
+            break
+        elif n_cuts == max_cuts:
             raise UnpartitionableError
 
-        # Partition
-        slices = zip(*(divide_slice(sl, n_cuts) for sl in initial_slices))
+        lower, n_cuts = n_cuts, min(2 * n_cuts, max_cuts)
 
-    # Yield the partitioned slices
-    return zip(*(divide_slice(sl, n_cuts) for sl in initial_slices))
+    # Binary search for the smallest number of cuts
+    upper = n_cuts
+    while upper - lower > 1:
+        n_cuts = (lower + upper) // 2
+        candidate = divide(n_cuts)
+        if constraints_satisfied(candidate):
+            upper, slices = n_cuts, candidate
+        else:
+            lower = n_cuts
+
+    return slices
 
 
 def divide_slice(initial_slice, n_slices):
@@ -165,5 +199,109 @@ def divide_slice(initial_slice, n_slices):
         pos += chunk
 
 
+def divide_slice_by_cost(initial_slice, n_slices, costs):
+    """Create a set of smaller slices from an original slice such that the
+    greatest total cost of the atoms in any slice is minimised.
+
+    For example::
+
+        >>> list(divide_slice_by_cost(slice(0, 6), 2, [4, 4, 1, 1, 1, 1]))
+        [slice(0, 2, None), slice(2, 6, None)]
+
+    Parameters
+    ----------
+    initial_slice : :py:class:`slice`
+        A slice which must have `start` and `stop` set.
+    n_slices : int
+        Number of slices to produce.
+    costs : array_like
+        Non-negative cost of each atom in the slice, i.e., `costs[0]` is the
+        cost of the atom at `initial_slice.start`.
+
+    Returns
+    -------
+    [:py:class:`slice`, ...]
+        Slices which when combined would be equivalent to `initial_slice`.
+        Where there is a choice of where to cut the slices are made as even
+        in cost as possible; if there are more slices than atoms then some
+        slices will be empty.
+    """
+    start = initial_slice.start
+    n_atoms = initial_slice.stop - start
+    costs = np.asarray(costs, dtype=float)
+    assert costs.shape == (n_atoms, )
+
+    # Positions are found by bisecting the cumulative costs, a list is used
+    # because bisecting it is much faster than many calls to `searchsorted`.
+    prefix = np.zeros(n_atoms + 1)
+    np.cumsum(costs, out=prefix[1:])
+    prefix = prefix.tolist()
+    total = prefix[-1]
+
+    def furthest(pos, limit):
+        # Get the furthest position which may be reached from `pos` while
+        # adding no more than `limit` to the cost.
+        return bisect.bisect_right(prefix, prefix[pos] + limit) - 1
+
+    def n_required(limit):
+        # Get the number of slices required if no slice may cost more than
+        # `limit`.
+        pos, n = 0, 0
+        while pos < n_atoms and n <= n_slices:
+            pos, n = furthest(pos, limit), n + 1
+        return n
+
+    # Bisect for the least limit on the cost of a slice which may be met with
+    # the given number of slices.  No slice need cost more than an even share
+    # of the total plus the cost of the most expensive atom.  If the costs are
+    # integers then so is the limit.
+    max_cost = costs.max() if n_atoms else 0.0
+    lower = max(total / n_slices, max_cost)
+    upper = max(lower, total / n_slices + max_cost)
+    integral = bool(np.all(costs == np.floor(costs)))
+    if integral:
+        lower, upper = np.ceil(lower), np.floor(upper)
+    if n_required(upper) > n_slices:  # pragma: no cover
+        upper = total  # Guard against rounding error
+
+    if n_required(lower) <= n_slices:
+        upper = lower
+    while upper - lower > (1.0 if integral else 1e-9 * upper):
+        mid = 0.5 * (lower + upper)
+        if integral:
+            mid = np.floor(mid)
+        elif mid in (lower, upper):
+            break
+
+        if n_required(mid) <= n_slices:
+            upper = mid
+        else:
+            lower = mid
+    limit = upper
+
+    # Determine the earliest position at which each cut may be made such that
+    # the remaining atoms may be covered by the remaining slices.
+    earliest = [n_atoms] * (n_slices + 1)
+    for i in range(n_slices - 1, 0, -1):
+        earliest[i] = bisect.bisect_left(prefix,
+                                         prefix[earliest[i + 1]] - limit)
+
+    # Make each cut as close to an even share of the cost as possible while
+    # respecting the limit.
+    cuts = [0]
+    for i in range(1, n_slices):
+        low = max(earliest[i], cuts[-1])
+        high = max(furthest(cuts[-1], limit), low)
+        ideal = bisect.bisect_left(prefix, total * i / n_slices)
+        if (0 < ideal <= n_atoms and
+                total * i / n_slices - prefix[ideal - 1] <
+                prefix[ideal] - total * i / n_slices):
+            ideal -= 1
+        cuts.append(min(max(ideal, low), high))
+    cuts.append(n_atoms)
+
+    return [slice(start + a, start + b) for a, b in zip(cuts[:-1], cuts[1:])]
+
+
 class UnpartitionableError(Exception):
     """Indicates that a given partitioning problem cannot be solved."""
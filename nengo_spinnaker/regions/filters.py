@@ -7,8 +7,9 @@ from six import iterkeys, iteritems, itervalues
 import struct
 
 from .region import Region
-from nengo_spinnaker.utils.ccf import minimise as ccf_minimise
+from nengo_spinnaker.utils.ccf import minimise_memoised as ccf_minimise
 from nengo_spinnaker.utils.collections import registerabledict
+from nengo_spinnaker.utils.keyspaces import KeyspaceLayout
 from nengo_spinnaker.utils import type_casts as tp
 
 
@@ -142,17 +143,34 @@ class FilterRegion(Region):
 
     def write_subregion_to_file(self, fp, *args, **kwargs):
         """Write the region to a file-like object."""
-        # Create a buffer for the region to write into, write in the first word
-        # and then write in each region in turn.
+        # Create a buffer for the region to write into and write in the first
+        # word.
         data = bytearray(self.sizeof())
-        struct.pack_into("<I", data, 0, len(self.filters))
-
-        # Write in each region
-        filter_width = kwargs.get("filter_width")
-        offset = 1
-        for f in self.filters:
-            f.pack_into(self.dt, data, offset*4, width=filter_width)
-            offset += f.size_words() + 4
+        words = np.frombuffer(data, dtype=np.uint32)
+        words[0] = len(self.filters)
+
+        if self.filters:
+            # Write in the headers of all the filters at once
+            filter_width = kwargs.get("filter_width")
+            sizes = np.array([f.size_words() for f in self.filters])
+            offsets = 1 + np.cumsum(sizes + 4) - (sizes + 4)
+            words[offsets] = sizes
+            words[offsets + 1] = [f.method_index() for f in self.filters]
+            words[offsets + 2] = [filter_width or f.width for f in
+                                  self.filters]
+            words[offsets + 3] = [0x1 if f.latching else 0x0 for f in
+                                  self.filters]
+
+            # Write in the data for all the filters of each type at once
+            filters_by_type = collections.OrderedDict()
+            for f, offset in zip(self.filters, offsets):
+                fs, fs_offsets = filters_by_type.setdefault(
+                    type(f), (list(), list()))
+                fs.append(f)
+                fs_offsets.append(4 * (offset + 4))
+
+            for filter_type, (fs, fs_offsets) in iteritems(filters_by_type):
+                filter_type.pack_data_many(self.dt, fs, data, fs_offsets)
 
         # Write the data block to file
         fp.write(data)
@@ -186,6 +204,16 @@ class Filter(object):
         # Pack any data
         self.pack_data(dt, buffer, offset + 16)
 
+    @classmethod
+    def pack_data_many(cls, dt, filters, buffer, offsets):
+        """Pack the structs describing several filters of this type into the
+        buffer at the given (byte) offsets.
+
+        Override this method to pack the data of many filters at once.
+        """
+        for f, offset in zip(filters, offsets):
+            f.pack_data(dt, buffer, int(offset))
+
 
 @FilterRegion.supported_filter_types.register(type(None))
 class NoneFilter(Filter):
@@ -247,6 +275,22 @@ class LowpassFilter(Filter):
         struct.pack_into("<2I", buffer, offset,
                          tp.value_to_fix(a), tp.value_to_fix(b))
 
+    @classmethod
+    def pack_data_many(cls, dt, filters, buffer, offsets):
+        """Pack the structs describing several filters into the buffer."""
+        # Compute the coefficients of all the filters
+        time_constants = np.array([f.time_constant for f in filters])
+        a = np.zeros(len(filters))
+        nonzero = time_constants != 0.0
+        a[nonzero] = np.exp(-dt / time_constants[nonzero])
+        b = 1.0 - a
+
+        # Write them into the buffer
+        words = np.frombuffer(buffer, dtype=np.int32)
+        indices = np.asarray(offsets) // 4
+        words[indices] = tp.np_to_fix(a)
+        words[indices + 1] = tp.np_to_fix(b)
+
 
 @FilterRegion.supported_filter_types.register(nengo.synapses.LinearFilter)
 class LinearFilter(Filter):
@@ -367,7 +411,7 @@ class FilterRoutingRegion(Region):
         # Loop of the list of signals matched by this region and extract their
         # keys and masks.
         for signal, _ in self.signal_routes:
-            ks = signal.keyspace
+            ks = KeyspaceLayout(signal.keyspace)
             keys_and_masks.add((ks.get_value(tag=self.filter_routing_tag),
                                 ks.get_mask(tag=self.filter_routing_tag)))
 
@@ -399,7 +443,7 @@ class FilterRoutingRegion(Region):
         targets_to_keymasks = collections.defaultdict(set)
         for signal_id, targets in iteritems(signal_id_to_targets):
             # Get the signal to get the key, mask and dmask
-            ks = signal_id_to_signals[signal_id].keyspace
+            ks = KeyspaceLayout(signal_id_to_signals[signal_id].keyspace)
             keymask = (ks.get_value(tag=self.filter_routing_tag),
                        ks.get_mask(tag=self.filter_routing_tag))
             dmask = ks.get_mask(field=self.index_field)
@@ -441,13 +485,16 @@ class FilterRoutingRegion(Region):
     def write_subregion_to_file(self, fp, *args, **kwargs):
         """Write the routing region to a file-like object."""
         data = bytearray(self.sizeof())
+        words = np.frombuffer(data, dtype=np.uint32)
 
         # Write the number of entries
-        struct.pack_into("<I", data, 0, len(self.filter_routes))
+        n_routes = len(self.filter_routes)
+        words[0] = n_routes
 
-        # Write each entry in turn
-        for i, route in enumerate(self.filter_routes):
-            struct.pack_into("<4I", data, 4 + 16*i, *route)
+        # Write all the entries
+        if n_routes:
+            words[1:1 + 4*n_routes] = np.array(self.filter_routes,
+                                               dtype=np.uint32).flat
 
         # Write to file
         fp.write(data)
@@ -1,7 +1,9 @@
-from six import iteritems
-import struct
+import collections
+import numpy as np
+from six import iteritems, itervalues
 
 from .region import Region
+from nengo_spinnaker.utils.keyspaces import KeyspaceLayout
 
 
 class KeyspacesRegion(Region):
@@ -66,33 +68,46 @@ class KeyspacesRegion(Region):
     def write_subregion_to_file(self, fp, vertex_slice=None, **field_args):
         """Write the data contained in a portion of this region out to file.
         """
-        data = b''
-
         # Get a slice onto the keys
         if self.partitioned:
             assert vertex_slice.stop < len(self.signals_and_arguments) + 1
         key_slice = vertex_slice if self.partitioned else slice(None)
+        signals_and_arguments = self.signals_and_arguments[key_slice]
+
+        # Create a buffer for the region
+        n_prepends = 1 if self.prepend_num_keyspaces else 0
+        data = bytearray(self.bytes_per_field * (
+            n_prepends + len(signals_and_arguments) * len(self.fields)))
+        words = np.frombuffer(data, dtype=np.uint32)
 
         # Write the prepends
         if self.prepend_num_keyspaces:
-            nks = len(self.signals_and_arguments[key_slice])
-            data += struct.pack("<I", nks)
-
-        # For each key fill in each field
-        for signal, kwargs in self.signals_and_arguments[key_slice]:
-            ks = signal.keyspace(**kwargs)  # Construct the keyspace
-            for field in self.fields:
-                data += struct.pack("<I", field(ks, **field_args))
+            words[0] = len(signals_and_arguments)
+
+        # Fill in each field for each key, if possible generating the fields
+        # of all the keys of a signal at once.
+        table = words[n_prepends:].reshape(len(signals_and_arguments),
+                                           len(self.fields))
+        vectorised = all(_get_values(f) is not None for f in self.fields)
+        if vectorised:
+            for layout, rows, values in _group_keys(signals_and_arguments):
+                for col, field in enumerate(self.fields):
+                    table[rows, col] = _get_values(field)(
+                        layout, values, **field_args)
+        else:
+            table[:] = [
+                [field(ks, **field_args) for field in self.fields] for ks in
+                (signal.keyspace(**kwargs) for signal, kwargs in
+                 signals_and_arguments)
+            ]
 
         # Write out
         fp.write(data)
 
 
-# NOTE: This closure intentionally tries to look like a class.
-# TODO: Neaten this docstring.
-def KeyField(maps={}, field=None, tag=None):
-    """Create new field for a :py:class:`~KeyspacesRegion` that will fill in
-    specified fields of the key and will then write out a key.
+class KeyField(object):
+    """Field for a :py:class:`~KeyspacesRegion` that will fill in specified
+    fields of the key and will then write out a key.
 
     Parameters
     ----------
@@ -114,26 +129,36 @@ def KeyField(maps={}, field=None, tag=None):
 
     Will return the key with the 'i' key set to 11.
     """
-    key_field = field
+    def __init__(self, maps={}, field=None, tag=None):
+        self.maps = dict(maps)
+        self.field = field
+        self.tag = tag
 
-    def key_getter(keyspace, **kwargs):
+    def __call__(self, keyspace, **kwargs):
         # Build a set of fields to fill in
         fills = {}
-        for (kwarg, field) in iteritems(maps):
+        for (kwarg, field) in iteritems(self.maps):
             fills[field] = kwargs[kwarg]
 
         # Build the key with these fills made
         key = keyspace(**fills)
 
-        return key.get_value(field=key_field, tag=tag)
+        return key.get_value(field=self.field, tag=self.tag)
 
-    return key_getter
+    def get_values(self, layout, field_values, **kwargs):
+        """Get the keys for many sets of field values at once."""
+        fills = dict(field_values)
+        for (kwarg, field) in iteritems(self.maps):
+            if field in fills:
+                raise ValueError("Field '{}' already has value.".format(field))
+            fills[field] = kwargs[kwarg]
+
+        return layout.get_value(field=self.field, tag=self.tag, **fills)
 
 
-# NOTE: This closure intentionally tries to look like a class.
-def MaskField(**kwargs):
-    """Create a new field for a :py:class:`~.KeyspacesRegion` that will write
-    out a mask value from a keyspace.
+class MaskField(object):
+    """Field for a :py:class:`~.KeyspacesRegion` that will write out a mask
+    value from a keyspace.
 
     Parameters
     ----------
@@ -146,29 +171,63 @@ def MaskField(**kwargs):
     ------
     TypeError
         If both or neither field and tag are specified.
+    """
+    def __init__(self, **kwargs):
+        # Process the arguments
+        self.field = kwargs.get("field")
+        self.tag = kwargs.get("tag")
+
+        if (self.field is None) == (self.tag is None):
+            raise TypeError("MaskField expects 1 argument, "
+                            "either 'field' or 'tag'.")
+
+    def __call__(self, keyspace, **kwargs):
+        if self.field is not None:
+            return keyspace.get_mask(field=self.field)
+        else:
+            return keyspace.get_mask(tag=self.tag)
 
-    Returns
-    -------
-    function
-        A function which can be used in the `fields` argument to
-        :py:class:`~.KeyspacesRegion` that will include a specified mask in the
-        region data.
+    def get_values(self, layout, field_values, **kwargs):
+        """Get the masks for many sets of field values at once."""
+        if self.field is not None:
+            return layout.get_mask(field=self.field, **field_values)
+        else:
+            return layout.get_mask(tag=self.tag, **field_values)
+
+
+def _get_values(field):
+    """Get the function which generates a field for many keys at once, if
+    the field is a :py:class:`~.KeyField` or :py:class:`~.MaskField`.
+    """
+    if isinstance(field, (KeyField, MaskField)):
+        return field.get_values
+    return None
+
+
+def _group_keys(signals_and_arguments):
+    """Group keys by the signal from which they are derived.
+
+    Yields
+    ------
+    layout : :py:class:`~nengo_spinnaker.utils.keyspaces.KeyspaceLayout`
+        Layout of the keyspace of a signal.
+    rows : [int, ...]
+        Indices of the keys derived from the signal.
+    {field: :py:class:`numpy.ndarray`, ...}
+        Values of the fields of each key which are set when deriving it from
+        the signal.
     """
-    # Process the arguments
-    field = kwargs.get("field")
-    tag = kwargs.get("tag")
-
-    # Create the field method
-    if field is not None and tag is None:
-        def mask_getter(keyspace, **kwargs):
-            return keyspace.get_mask(field=field)
-
-        return mask_getter
-    elif tag is not None and field is None:
-        def mask_getter(keyspace, **kwargs):
-            return keyspace.get_mask(tag=tag)
-
-        return mask_getter
-    else:
-        raise TypeError("MaskField expects 1 argument, "
-                        "either 'field' or 'tag'.")
+    groups = collections.OrderedDict()
+    for row, (signal, kwargs) in enumerate(signals_and_arguments):
+        group = groups.get((id(signal), tuple(sorted(kwargs))))
+        if group is None:
+            group = (signal, list(), collections.defaultdict(list))
+            groups[(id(signal), tuple(sorted(kwargs)))] = group
+
+        group[1].append(row)
+        for field, value in iteritems(kwargs):
+            group[2][field].append(value)
+
+    for signal, rows, values in itervalues(groups):
+        yield (KeyspaceLayout(signal.keyspace), rows,
+               {f: np.array(v) for f, v in iteritems(values)})
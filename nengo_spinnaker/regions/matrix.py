@@ -1,6 +1,5 @@
 import enum
 import numpy as np
-import struct
 
 from .region import Region
 
@@ -89,15 +88,26 @@ class MatrixRegion(Region):
         # Partition the data
         data = self.matrix[self.expanded_slice(vertex_slice)]
 
-        # Write the prepends
+        # Get the prepends
+        prepends = list()
         if self.prepend_n_rows:
-            fp.write(struct.pack('I', data.shape[0]))
+            prepends.append(data.shape[0])
 
         if self.prepend_n_columns:
             if self.matrix.ndim >= 2:
-                fp.write(struct.pack('I', data.shape[1]))
+                prepends.append(data.shape[1])
             else:
-                fp.write(struct.pack('I', 1))
-
-        # Format the data and then write to file
-        fp.write(data.tostring())
+                prepends.append(1)
+
+        # Copy the prepends and the (possibly non-contiguous) data into a
+        # single buffer and then write it to file.
+        n_prepend_bytes = 4 * len(prepends)
+        buf = bytearray(n_prepend_bytes + data.nbytes)
+        if prepends:
+            np.frombuffer(buf, dtype=np.uint32,
+                          count=len(prepends))[:] = prepends
+        if data.size:
+            np.frombuffer(buf, dtype=data.dtype,
+                          offset=n_prepend_bytes).reshape(data.shape)[...] = \
+                data
+        fp.write(buf)
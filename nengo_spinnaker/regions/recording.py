@@ -1,4 +1,3 @@
-from bitarray import bitarray
 import numpy as np
 
 from rig.type_casts import NumpyFixToFloatConverter
@@ -12,9 +11,12 @@ class RecordingRegion(Region):
         self.n_steps = n_steps
 
     def sizeof(self, vertex_slice):
-        # Get the number of words per frame
+        return self.sizeof_recording(vertex_slice, self.n_steps)
+
+    def sizeof_recording(self, vertex_slice, n_steps):
+        """Get the number of bytes recorded in the given number of steps."""
         n_atoms = vertex_slice.stop - vertex_slice.start
-        return self.bytes_per_frame(n_atoms) * self.n_steps
+        return self.bytes_per_frame(n_atoms) * n_steps
 
     def _read(self, mem, vertex_slice, n_steps):
         """Read a suitable amount of data out of the memory view."""
@@ -23,7 +25,7 @@ class RecordingRegion(Region):
         # Determine how many bytes to read, then read
         width = vertex_slice.stop - vertex_slice.start
         framelength = self.bytes_per_frame(width)
-        data = mem.read(n_steps * framelength)
+        data = mem.read(self.sizeof_recording(vertex_slice, n_steps))
 
         return data, framelength, width
 
@@ -63,22 +65,19 @@ class SpikeRecordingRegion(RecordingRegion):
         results.
         """
         # Read from the memory
-        data, framelength, _ = self._read(mem, vertex_slice, n_steps)
-
-        # Format the data as a bitarray
-        spikes = bitarray(endian="little")
-        spikes.frombytes(data)
-
-        # Break this into timesteps
-        steps = [spikes[i * framelength * 8:(i+1) * framelength * 8] for
-                 i in range(n_steps)]
-
-        # Convert this into a NumPy array
-        array = np.array(
-            [[x for x in step[vertex_slice]] for step in steps],
-            dtype=np.bool
-        )
-        return array
+        data, framelength, n_neurons = self._read(mem, vertex_slice, n_steps)
+
+        # View the data as one row of bytes per timestep and expand each byte
+        # into its bits.  Spikes are packed little-endian within each word so
+        # reverse the (MSB-first) bits of every byte to get them in neuron
+        # order.
+        data = np.frombuffer(data, dtype=np.uint8)
+        data = data.reshape(n_steps, framelength, 1)
+        bits = np.unpackbits(data, axis=2)[:, :, ::-1]
+        bits = bits.reshape(n_steps, framelength * 8)
+
+        # Discard the padding at the end of each frame
+        return bits[:, 0:n_neurons].astype(np.bool)
 
 
 class VoltageRecordingRegion(RecordingRegion):
@@ -60,6 +60,25 @@ def create_app_ptr_and_region_files_named(fp, regions, region_args):
     return region_memory
 
 
+def write_regions_named(region_memory, regions, region_args):
+    """Write each region into its file-like view of memory.
+
+    Parameters
+    ----------
+    region_memory : {name: file-like}
+        Map from keys to file-like views of memory, as returned by
+        :py:func:`~.create_app_ptr_and_region_files_named`.
+    regions : {name: Region, ...}
+        Map from keys to region objects.
+    region_args : {name: (*args, **kwargs)}
+        Map from keys to the arguments and keyword-arguments that should be
+        used when writing out a region.
+    """
+    for k, region in iteritems(regions):
+        args, kwargs = region_args[k]
+        region.write_subregion_to_file(region_memory[k], *args, **kwargs)
+
+
 def create_app_ptr_and_region_files(fp, regions, vertex_slice):
     """Split up a file-like view of memory into smaller views, one per region,
     and write into the first region of memory the offsets to these later
@@ -1,4 +1,5 @@
 import atexit
+import collections
 import logging
 import nengo
 from nengo.cache import get_default_decoder_cache
@@ -8,15 +9,26 @@ from rig.machine_control.consts import AppState
 from rig.place_and_route import Cores
 import rig.place_and_route
 import six
+import threading
 import time
 
 from .builder import Model
+from .netlist.streaming import RecordingReader
 from .node_io import Ethernet
 from .rc import rc
+from .utils.build_cache import get_default_build_cache
 from .utils.config import getconfig
+from .utils.probe_store import ProbeStore
+from .utils.realtime import RealtimeScheduler
 
 logger = logging.getLogger(__name__)
 
+PeriodTimes = collections.namedtuple("PeriodTimes",
+                                     "prepare, run, retrieve")
+"""Times (in seconds) spent preparing for, running and retrieving the data
+from a period of a simulation.
+"""
+
 
 class Simulator(object):
     """SpiNNaker simulator for Nengo models.
@@ -59,7 +71,11 @@ class Simulator(object):
         ----------
         period : float or None
             Duration of one period of the simulator. This determines how much
-            memory will be allocated to store precomputed and probed data.
+            memory will be allocated to store precomputed and probed data.  If
+            None the simulator may run for any length of time (or until it is
+            stopped) and probed data is retrieved while the simulation runs;
+            this requires executables which support circular recording
+            buffers, otherwise :py:exc:`NotImplementedError` is raised.
         timescale : float
             Scaling factor to apply to the simulation, e.g., a value of `0.5`
             will cause the simulation to run at half real-time.
@@ -99,19 +115,54 @@ class Simulator(object):
 
         self.steps = 0  # Steps simulated
 
+        # Whether the data for the next period of a simulation should be
+        # prepared while the current period is running and the times taken
+        # by each period.
+        self.pipeline_periods = getconfig(network.config, Simulator,
+                                          "pipeline_periods", False)
+        self.period_times = list()
+
+        # How the host simulation keeps to real time, and how closely it kept
+        # to it during the last run.
+        self.host_catch_up = getconfig(network.config, Simulator,
+                                       "host_catch_up", "burst")
+        self.host_spin_time = getconfig(network.config, Simulator,
+                                        "host_spin_time", 0.002)
+        self.host_timing = None
+
         # If the simulator is in "run indefinite" mode (i.e., max_steps=None)
-        # then we modify the builders to ignore function of time Nodes and
-        # probes.
+        # then probed data is recorded into circular buffers which are drained
+        # while the simulation runs and function of time Nodes without a
+        # period are simulated on the host.
         builder_kwargs = self.io_controller.builder_kwargs
         if self.max_steps is None:
-            raise NotImplementedError
+            recording_period = getconfig(network.config, Simulator,
+                                         "recording_buffer_period", 1.0)
+            self.recording_steps = int(recording_period / dt)
+            self.io_controller.precompute_aperiodic = False
+        else:
+            self.recording_steps = self.max_steps
+
+        # Data is retrieved from circular buffers in multiples of the sampling
+        # periods of the probes so that the samples remain evenly spaced.
+        self._sample_steps = int(np.lcm.reduce(
+            [1] + [int(np.round(p.sample_every / dt)) for p in
+                   network.all_probes if p.sample_every is not None]
+        ))
+        self._stop_event = threading.Event()
 
         # Create a model from the network, using the IO controller
         logger.debug("Building model")
         start_build = time.time()
         self.model = Model(dt=dt, machine_timestep=machine_timestep,
-                           decoder_cache=get_default_decoder_cache())
-        self.model.build(network, **builder_kwargs)
+                           decoder_cache=get_default_decoder_cache(),
+                           build_cache=get_default_build_cache())
+        self.model.build(
+            network,
+            decoder_n_threads=getconfig(network.config, Simulator,
+                                        "decoder_n_threads", 1),
+            **builder_kwargs
+        )
         self.model.add_interposers()
 
         print "nengo obj map"
@@ -137,7 +188,11 @@ class Simulator(object):
         self.host_sim = self._create_host_sim()
 
         # Holder for probe data
-        self.data = {}
+        store_cls = getconfig(network.config, Simulator, "probe_store",
+                              ProbeStore)
+        store_kwargs = getconfig(network.config, Simulator,
+                                 "probe_store_kwargs", dict())
+        self.data = store_cls(**store_kwargs)
 
         # Holder for profiling data
         self.profiler_data = {}
@@ -145,7 +200,11 @@ class Simulator(object):
         # Convert the model into a netlist
         logger.info("Building netlist")
         start = time.time()
-        self.netlist = self.model.make_netlist(self.max_steps or 0)
+        self.netlist = self.model.make_netlist(
+            self.recording_steps,
+            n_processes=getconfig(network.config, Simulator,
+                                  "netlist_n_processes", 1)
+        )
 
         # Determine whether to use a spalloc machine or not
         if use_spalloc is None:
@@ -193,6 +252,11 @@ class Simulator(object):
         self.controller = MachineController(hostname)
         self.controller.boot()
 
+        # Connect to every board directly so that boards may be loaded and
+        # read from in parallel.
+        n_connections = self.controller.discover_connections()
+        logger.info("Connected to %d additional board(s)", n_connections)
+
         # Get a system-info object to place & route against
         logger.info("Getting SpiNNaker machine specification")
         system_info = self.controller.get_system_info()
@@ -217,7 +281,14 @@ class Simulator(object):
 
         # Load the application
         logger.info("Loading application")
-        self.netlist.load_application(self.controller, system_info)
+        self.netlist.load_application(
+            self.controller, system_info,
+            routing_n_processes=getconfig(network.config, Simulator,
+                                          "routing_n_processes", None),
+            routing_time_budget=getconfig(network.config, Simulator,
+                                          "routing_time_budget", 0.0),
+        )
+        self.model.build_cache.shrink()
 
         # Check if any cores are in bad states
         if self.controller.count_cores_in_state(["exit", "dead", "watchdog",
@@ -231,6 +302,17 @@ class Simulator(object):
                     print(self.controller.get_iobuf(p, x, y))
             raise Exception("Unexpected core failures.")
 
+        # Simulations which run indefinitely require executables which can
+        # use their recording regions as circular buffers.
+        if (self.max_steps is None and
+                not self.netlist.supports_circular_recording(self.controller)):
+            self.close()
+            raise NotImplementedError(
+                "The loaded executables cannot record data indefinitely; "
+                "rebuild the binaries in spinnaker_components or create the "
+                "simulator with a period."
+            )
+
         logger.info("Preparing and loading machine took {:3f} seconds".format(
             time.time() - start
         ))
@@ -254,20 +336,51 @@ class Simulator(object):
         self.close()
 
     def run(self, time_in_seconds):
-        """Simulate for the given length of time."""
+        """Simulate for the given length of time.
+
+        Simulators created with `period=None` may be run indefinitely by
+        passing None, see :py:meth:`~.run_steps`.
+        """
         # Determine how many steps to simulate for
-        steps = int(np.round(float(time_in_seconds) / self.dt))
+        if time_in_seconds is None:
+            steps = None
+        else:
+            steps = int(np.round(float(time_in_seconds) / self.dt))
         self.run_steps(steps)
 
     def run_steps(self, steps):
-        """Simulate a give number of steps."""
+        """Simulate a give number of steps.
+
+        Simulators created with `period=None` may be run indefinitely by
+        passing None; the simulation then runs until :py:meth:`~.stop` is
+        called (e.g., from another thread) or it is interrupted, after which
+        the simulator is closed.
+
+        Afterwards `host_timing` holds a
+        :py:class:`~nengo_spinnaker.utils.realtime.SchedulerStats` describing
+        how closely the host simulation kept to real time during the run.
+        """
+        self.host_timing = None
+        if self.max_steps is None:
+            # Simulations of any duration may be run in one go
+            if steps is None or steps > 0:
+                self._stop_event.clear()
+                self._run_steps(steps)
+            return
+
         while steps > 0:
             n_steps = min((steps, self.max_steps))
-            self._run_steps(n_steps)
+            next_steps = min((steps - n_steps, self.max_steps))
+            self._run_steps(n_steps, next_steps)
             steps -= n_steps
 
-    def _run_steps(self, steps):
-        """Simulate for the given number of steps."""
+    def _run_steps(self, steps, next_steps=0):
+        """Simulate for the given number of steps.
+
+        If `next_steps` is non-zero and periods are pipelined then the data
+        for the following period of the simulation will be prepared while
+        this period is running.
+        """
         if self._closed:
             raise Exception("Simulator has been closed and can't be used to "
                             "run further simulations.")
@@ -279,11 +392,13 @@ class Simulator(object):
                     "specified. Create a new simulator with Simulator(model, "
                     "period=None) to perform indefinite time simulations."
                 )
-        else:
+        elif self.max_steps is not None:
             assert steps <= self.max_steps
 
         # Prepare the simulation
-        self.netlist.before_simulation(self, steps)
+        start = time.time()
+        self.netlist.before_simulation(self, steps, self.recording_steps)
+        prepare_time = time.time() - start
 
         # Wait for all cores to hit SYNC0 (either by remaining it or entering
         # it from init)
@@ -294,10 +409,31 @@ class Simulator(object):
         # Get a new thread for the IO
         io_thread = self.io_controller.spawn()
 
+        # Get a new thread to prepare the next period of the simulation
+        prepare_thread = None
+        if self.pipeline_periods and next_steps:
+            prepare_thread = threading.Thread(
+                target=self.netlist.prepare_simulation,
+                args=(self, self.steps + steps, next_steps),
+                name="PreparePeriod"
+            )
+            prepare_thread.daemon = True
+
+        # Get a new thread to retrieve recorded data while simulating
+        reader = None
+        if self.max_steps is None:
+            reader = RecordingReader(self.netlist, self, self.recording_steps,
+                                     frame_multiple=self._sample_steps)
+
+        # Get a scheduler to keep the host simulation in step with the machine
+        scheduler = RealtimeScheduler(self.dt / self.timescale,
+                                      catch_up=self.host_catch_up,
+                                      spin_time=self.host_spin_time)
+
         # Run the simulation
+        start_time = time.time()
         try:
             # Prep
-            exp_time = steps * self.dt / self.timescale
             io_thread.start()
 
             # Wait for all cores to hit SYNC1
@@ -306,40 +442,95 @@ class Simulator(object):
             logger.info("Running simulation...")
             self.controller.send_signal("sync1")
 
+            if prepare_thread is not None:
+                prepare_thread.start()
+            if reader is not None:
+                reader.start()
+
             # Execute the local model
-            host_steps = 0
             start_time = time.time()
-            run_time = 0.0
-            local_timestep = self.dt / self.timescale
-            while run_time < exp_time:
-                # Run a step
-                self.host_sim.step()
-                run_time = time.time() - start_time
-
-                # If that step took less than timestep then spin
-                time.sleep(0.0001)
-                while run_time < host_steps * local_timestep:
-                    time.sleep(0.0001)
-                    run_time = time.time() - start_time
+            scheduler.run(self.host_sim.step, steps, self._stop_event.is_set)
+        except KeyboardInterrupt:
+            # Interrupting an indefinite simulation stops it
+            if steps is not None:
+                raise
         finally:
             # Stop the IO thread whatever occurs
             io_thread.stop()
+            self._record_host_timing(scheduler.stats)
+            if reader is not None:
+                reader.stop()
+
+            # Wait for the next period to be prepared
+            if prepare_thread is not None and prepare_thread.is_alive():
+                prepare_thread.join()
+
+        if steps is None:
+            # Executables which run indefinitely can't be returned to a state
+            # from which they can be run again, so retrieve the last of the
+            # recorded data and then close the simulator.
+            run_time = time.time() - start_time
+            start = time.time()
+            n_frames = self.netlist.get_recorded_frames(self.controller)
+            if n_frames is None:
+                n_frames = int(run_time * self.timescale / self.dt)
+            else:
+                reader.drain(n_frames)
+            self.steps += n_frames
+            self.period_times.append(
+                PeriodTimes(prepare_time, run_time, time.time() - start))
+            self.close()
+            return
 
         # Wait for cores to re-enter sync0
         self._wait_for_transition(AppState.run, AppState.sync0,
                                   self.netlist.n_cores)
 
+        run_time = time.time() - start_time
+
         # Retrieve simulation data
         start = time.time()
         logger.info("Retrieving simulation data")
-        self.netlist.after_simulation(self, steps)
+        if reader is not None:
+            reader.drain(steps)
+        else:
+            self.netlist.after_simulation(self, steps)
+        retrieve_time = time.time() - start
         logger.info("Retrieving data took {:3f} seconds".format(
-            time.time() - start
+            retrieve_time
+        ))
+
+        # Record the time spent on the host between periods
+        self.period_times.append(
+            PeriodTimes(prepare_time, run_time, retrieve_time))
+        logger.info("Preparing and retrieving data took {:3f} seconds".format(
+            prepare_time + retrieve_time
         ))
 
         # Increase the steps count
         self.steps += steps
 
+    def _record_host_timing(self, stats):
+        """Add the statistics of how closely the host simulation kept to real
+        time during a period to those of the current run.
+        """
+        if self.host_timing is None:
+            self.host_timing = stats
+        else:
+            self.host_timing += stats
+
+        if stats.n_late or stats.n_skipped:
+            logger.info("Host simulation fell behind real time: "
+                        "{!r}".format(stats))
+
+    def stop(self):
+        """Stop a simulation which is running indefinitely.
+
+        This may be called from another thread (or a signal handler) while
+        :py:meth:`~.run` or :py:meth:`~.run_steps` is running.
+        """
+        self._stop_event.set()
+
     def _wait_for_transition(self, from_state, desired_to_state, num_verts):
         while True:
             # If no cores are still in from_state, stop
@@ -411,6 +602,9 @@ class Simulator(object):
             self.io_controller.close()
             self.controller.send_signal("stop")
 
+            # Release the probe store (e.g., remove temporary files)
+            self.data.close()
+
             # Destroy the job if we allocated one
             if self.job is not None:
                 self.job.destroy()
@@ -0,0 +1,294 @@
+"""Persistent, content-addressed cache of build products.
+
+Items are stored in files named after a fingerprint of the objects they were
+derived from, so an unchanged network rebuilt in a later session can reuse
+them.  The cache follows the conventions of the Nengo decoder cache: it is
+configured through the ``[build_cache]`` section of the nengo_spinnaker rc
+files and may be shrunk to a size limit by removing the least recently used
+items.
+"""
+import enum
+import errno
+import logging
+from nengo.utils.cache import human2bytes
+import numpy as np
+import os
+from rig.bitfield import BitField
+from six import iteritems, string_types, integer_types
+from six.moves import cPickle as pickle
+import tempfile
+
+from nengo_spinnaker.rc import rc
+from nengo_spinnaker.utils import paths
+
+try:
+    from xxhash import xxh64 as fasthash
+except ImportError:  # pragma: no cover
+    from hashlib import md5 as fasthash
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+"""Version of the format of the items stored in the cache.
+
+This is mixed into every key so that items stored by older versions of
+nengo_spinnaker are never retrieved.  It is not derived from the code which
+generates the items, so it must be increased by hand whenever the way in
+which a cached item is generated or stored changes (e.g., when the placer or
+the format of the stored routing tables changes).
+"""
+
+
+def fingerprint(*objs):
+    """Get a fingerprint of the content of some objects.
+
+    Numbers, strings, slices, enums, NumPy arrays, containers of these,
+    Rig :py:class:`~rig.bitfield.BitField` objects and the objects defined in
+    nengo_spinnaker (by way of their attributes) may be fingerprinted.
+
+    For example::
+
+        >>> fingerprint(np.arange(4), slice(0, 2)) == \\
+        ...     fingerprint(np.arange(4), slice(0, 2))
+        True
+        >>> fingerprint(np.arange(4)) == fingerprint(np.arange(5))
+        False
+
+    Raises
+    ------
+    TypeError
+        If any of the objects cannot be fingerprinted, e.g. functions or
+        objects which reference themselves.
+    """
+    h = fasthash()
+    _update_fingerprint(h, objs, set())
+    return h.hexdigest()
+
+
+def _update_fingerprint(h, obj, visiting):  # noqa: C901
+    """Add an object to a fingerprint."""
+    def update(*xs):
+        h.update("{};".format(xs).encode("utf-8"))
+
+    if obj is None or isinstance(obj, (bool, float, complex) + integer_types +
+                                 string_types + (bytes, enum.Enum)):
+        update(type(obj).__name__, obj)
+    elif isinstance(obj, slice):
+        update("slice", obj.start, obj.stop, obj.step)
+    elif isinstance(obj, (np.ndarray, np.generic)):
+        obj = np.ascontiguousarray(obj)
+        update("ndarray", obj.dtype.str, obj.shape)
+        h.update(obj.view(np.uint8).data if obj.size else b"")
+    elif isinstance(obj, BitField):
+        # Keyspaces are fingerprinted by the keys and masks they represent
+        try:
+            update("BitField", obj.length, sorted(iteritems(obj.field_values)),
+                   obj.get_value(), obj.get_mask())
+        except Exception:
+            raise TypeError("Cannot fingerprint unassigned keyspace")
+    else:
+        # Guard against cycles
+        if id(obj) in visiting:
+            raise TypeError("Cannot fingerprint self-referential objects")
+        visiting.add(id(obj))
+
+        if isinstance(obj, (tuple, list)):
+            update(type(obj).__name__, len(obj))
+            for x in obj:
+                _update_fingerprint(h, x, visiting)
+        elif isinstance(obj, (set, frozenset)):
+            # Unordered containers are fingerprinted by the sorted
+            # fingerprints of their contents.
+            update(type(obj).__name__,
+                   sorted(_sub_fingerprint(x, visiting) for x in obj))
+        elif isinstance(obj, dict):
+            update("dict", sorted((_sub_fingerprint(k, visiting),
+                                   _sub_fingerprint(v, visiting)) for
+                                  k, v in iteritems(obj)))
+        elif (type(obj).__module__.startswith("nengo_spinnaker.") and
+                not callable(obj)):
+            # Objects are fingerprinted by their type and attributes
+            update(type(obj).__module__, type(obj).__name__)
+            attrs = dict(getattr(obj, "__dict__", {}))
+            for slot in getattr(type(obj), "__slots__", ()):
+                attrs[slot] = getattr(obj, slot, None)
+            _update_fingerprint(h, attrs, visiting)
+        else:
+            raise TypeError("Cannot fingerprint {!r}".format(type(obj)))
+
+        visiting.remove(id(obj))
+
+
+def _sub_fingerprint(obj, visiting):
+    h = fasthash()
+    _update_fingerprint(h, obj, visiting)
+    return h.hexdigest()
+
+
+class BuildCache(object):
+    """Content-addressed cache of build products stored on disk.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory in which to store the cached items.
+    readonly : bool
+        If True items will be retrieved from the cache but never added to it.
+    """
+    _suffix = ".pkl"
+    enabled = True
+
+    def __init__(self, cache_dir=paths.build_cache_dir, readonly=False):
+        self.cache_dir = cache_dir
+        self.readonly = readonly
+
+        if not readonly and not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except OSError as e:  # pragma: no cover
+                if e.errno != errno.EEXIST:
+                    raise
+
+    def key(self, *objs):
+        """Get the key under which something derived from the given objects
+        should be stored, or None if the objects cannot be fingerprinted.
+        """
+        try:
+            return fingerprint(FORMAT_VERSION, *objs)
+        except TypeError:
+            return None
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self._suffix)
+
+    def get(self, key, default=None):
+        """Retrieve an item from the cache."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fp:
+                value = pickle.load(fp)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return default
+
+        # Mark the item as recently used
+        if not self.readonly:
+            try:
+                os.utime(path, None)
+            except OSError:  # pragma: no cover
+                pass
+
+        return value
+
+    def set(self, key, value):
+        """Store an item in the cache."""
+        if self.readonly:
+            return
+
+        # Write to a temporary file and then move it into place so that
+        # partially written items are never read.
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                pickle.dump(value, fp, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_path, self._path(key))
+        except (IOError, OSError):  # pragma: no cover
+            logger.warning("Failed to write to build cache %s",
+                           self.cache_dir)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_size(self):
+        """Get the size of the cache in bytes."""
+        return sum(size for _, size, _ in self._get_files())
+
+    def _get_files(self):
+        files = list()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self._suffix):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:  # pragma: no cover
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        return files
+
+    def shrink(self, limit=None):
+        """Reduce the size of the cache to meet a limit by removing the least
+        recently used items.
+
+        Parameters
+        ----------
+        limit : int or str, optional
+            Maximum size of the cache in bytes, or a human readable size (e.g.,
+            "512 MB").  If not given the size specified in the rc files is
+            used.
+        """
+        if self.readonly:
+            logger.info("Tried to shrink a readonly cache.")
+            return
+
+        if limit is None:
+            limit = (rc.get("build_cache", "size") if
+                     rc.has_option("build_cache", "size") else "512 MB")
+        if isinstance(limit, string_types):
+            limit = human2bytes(limit)
+
+        # Remove the least recently used files first
+        files = sorted(self._get_files())
+        excess = sum(size for _, size, _ in files) - limit
+        for _, size, path in files:
+            if excess <= 0:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:  # pragma: no cover
+                continue
+            excess -= size
+
+    def invalidate(self):
+        """Remove all items from the cache."""
+        self.shrink(limit=0)
+
+
+class NoBuildCache(object):
+    """Build cache which stores nothing."""
+    enabled = False
+
+    def key(self, *objs):
+        return None
+
+    def get(self, key, default=None):
+        return default
+
+    def set(self, key, value):
+        pass
+
+    def get_size(self):
+        return 0
+
+    def shrink(self, limit=None):
+        pass
+
+    def invalidate(self):
+        pass
+
+
+def get_default_build_cache():
+    """Get a build cache configured as specified in the rc files.
+
+    The cache is disabled unless the ``enabled`` option of the
+    ``[build_cache]`` section is set.
+    """
+    if (rc.has_option("build_cache", "enabled") and
+            rc.getboolean("build_cache", "enabled")):
+        readonly = (rc.has_option("build_cache", "readonly") and
+                    rc.getboolean("build_cache", "readonly"))
+        path = (rc.get("build_cache", "path") if
+                rc.has_option("build_cache", "path") else
+                paths.build_cache_dir)
+        return BuildCache(path, readonly)
+    else:
+        return NoBuildCache()
@@ -0,0 +1,151 @@
+"""Models of the processor time spent simulating a time step.
+
+Partitioning objects across cores requires an estimate of the number of CPU
+cycles each core will spend simulating a time step.  A
+:py:class:`~.CostModel` expresses the cycles spent in each stage of an
+application (named as in the tags recorded by the profiler, e.g., "Neuron
+update") as a weighted sum of products of the parameters of the core (e.g.,
+the number of neurons it simulates).
+
+The weights may be fitted to profiler data (as written to CSV files by
+:py:mod:`nengo_spinnaker.utils.profiling`) and saved so that they may be
+used when building later models.  For example::
+
+    >>> model = CostModel({"Update": [("n_neurons", ), ()]},
+    ...                   {"Update": [61.0, 174.0]})
+    >>> model.cycles("Update", n_neurons=10)
+    784.0
+    >>> rows = [{"n_neurons": n, "Update": (5.0 * n + 100.0) * MS_PER_CYCLE}
+    ...         for n in (10, 20, 30)]
+    >>> fitted = model.fit(rows)
+    >>> round(fitted.cycles("Update", n_neurons=10), 3)
+    150.0
+"""
+from __future__ import absolute_import
+
+import collections
+import json
+import numpy as np
+from six import iteritems
+
+from nengo_spinnaker.regions.profiler import MS_SCALE
+
+MS_PER_CYCLE = MS_SCALE
+"""Number of milliseconds corresponding to a single profiler sample tick."""
+
+
+class CostModel(object):
+    """Linear model of the number of CPU cycles spent in stages of simulating
+    a time step.
+
+    Parameters
+    ----------
+    terms : {stage: [(variable, ...), ...], ...}
+        For each stage the features used to model its cost, each feature is
+        the product of a number of named variables (an empty tuple represents
+        a constant).
+    coefficients : {stage: [float, ...], ...}
+        The number of cycles contributed by each feature of each stage.
+    """
+    def __init__(self, terms, coefficients):
+        self.terms = collections.OrderedDict(
+            (stage, [tuple(f) for f in features]) for
+            stage, features in iteritems(terms)
+        )
+        self.coefficients = {stage: [float(c) for c in coefficients[stage]]
+                             for stage in self.terms}
+
+        for stage, features in iteritems(self.terms):
+            if len(features) != len(self.coefficients[stage]):
+                raise ValueError(
+                    "Stage {!r} has {} features but {} coefficients".format(
+                        stage, len(features), len(self.coefficients[stage]))
+                )
+
+    def cycles(self, stage, **variables):
+        """Get the number of cycles spent in a stage.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage.
+        **variables : number
+            Values of the variables used by the features of the stage.
+        """
+        return sum(c * _product(variables[v] for v in feature) for c, feature
+                   in zip(self.coefficients[stage], self.terms[stage]))
+
+    def fit(self, rows, cycles_per_ms=1.0/MS_PER_CYCLE):
+        """Get a new model with coefficients fitted to profiler data.
+
+        Parameters
+        ----------
+        rows : [{name: number, ...}, ...]
+            Each row should contain the values of the variables used in the
+            model and, for some stages, the mean time (in milliseconds) spent
+            in the stage in each time step.  Stages for which there is no data
+            (or for which some variables are unknown) retain their current
+            coefficients.
+        cycles_per_ms : float
+            Number of cycles in a millisecond.
+
+        Returns
+        -------
+        :py:class:`~.CostModel`
+        """
+        rows = list(rows)
+        coefficients = dict(self.coefficients)
+
+        for stage, features in iteritems(self.terms):
+            variables = set(v for f in features for v in f) | {stage}
+            stage_rows = [r for r in rows if
+                          all(r.get(v) is not None for v in variables)]
+            if not stage_rows:
+                continue
+
+            # Least-squares fit of the features to the number of cycles
+            x = np.array([[_product(r[v] for v in f) for f in features]
+                          for r in stage_rows], dtype=float)
+            y = np.array([r[stage] for r in stage_rows],
+                         dtype=float) * cycles_per_ms
+            coefficients[stage] = np.linalg.lstsq(x, y, rcond=None)[0]
+
+        return CostModel(self.terms, coefficients)
+
+    def update(self, other):
+        """Get a new model which uses the stages of another model in
+        preference to those of this model.
+        """
+        terms = collections.OrderedDict(self.terms)
+        terms.update(other.terms)
+        coefficients = dict(self.coefficients)
+        coefficients.update(other.coefficients)
+        return CostModel(terms, coefficients)
+
+    def save(self, path):
+        """Save the model to a file."""
+        with open(path, "w") as fp:
+            json.dump({stage: {"features": features,
+                               "coefficients": self.coefficients[stage]}
+                       for stage, features in iteritems(self.terms)},
+                      fp, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        """Load a model previously saved with :py:meth:`~.save`."""
+        with open(path) as fp:
+            data = json.load(fp)
+
+        terms = collections.OrderedDict(
+            (stage, [tuple(str(v) for v in f) for f in d["features"]])
+            for stage, d in sorted(iteritems(data))
+        )
+        return cls(terms, {stage: d["coefficients"] for stage, d in
+                           iteritems(data)})
+
+
+def _product(xs):
+    p = 1.0
+    for x in xs:
+        p *= x
+    return p
@@ -1,7 +1,9 @@
 from __future__ import absolute_import
 
 import collections
+import numpy as np
 from rig.bitfield import BitField
+from six import iteritems, itervalues
 
 
 def get_derived_keyspaces(keyspace, values, max_v=None,
@@ -65,6 +67,253 @@ def get_derived_keyspaces(keyspace, values, max_v=None,
             yield x
 
 
+class KeyspaceLayout(object):
+    """The fixed integer layout of the fields of a keyspace.
+
+    Once the fields of a keyspace have been assigned (see
+    :py:meth:`~.KeyspaceContainer.assign_fields`) the position and length of
+    each field never changes.  A layout captures the shift and mask of each
+    field of a keyspace so that keys and masks may be generated with integer
+    arithmetic (and for whole arrays of field values at once) rather than by
+    deriving a new :py:class:`~rig.bitfield.BitField` for every key.
+
+    For example::
+
+        >>> ks = BitField(length=32)
+        >>> ks.add_field("cluster", length=8, start_at=8, tags="routing")
+        >>> ks.add_field("index", length=8, start_at=0)
+        >>> layout = KeyspaceLayout(ks(cluster=3))
+        >>> hex(layout.get_value(index=5))
+        '0x305'
+        >>> print(layout.get_value(index=np.arange(3)))
+        [768 769 770]
+        >>> hex(layout.get_mask(tag="routing"))
+        '0xff00'
+
+    Keys and masks are the same as would be produced by calling the keyspace
+    with the given field values and then calling `get_value` or `get_mask`
+    on the result, and the same exceptions are raised.  If any of the given
+    field values would change which fields of the keyspace exist (i.e., some
+    fields only exist when the given field has a particular value) then the
+    keyspace is called for each key.
+
+    Parameters
+    ----------
+    keyspace : :py:class:`~rig.bitfield.BitField`
+        Keyspace whose layout to capture, the fields of the keyspace should
+        have been assigned.
+    """
+    def __init__(self, keyspace):
+        self.keyspace = keyspace
+        self.field_values = dict(keyspace.field_values)
+
+        # The fields which exist given the current field values
+        self.fields = collections.OrderedDict(
+            keyspace.fields.enabled_fields(self.field_values))
+
+        # The fields on whose values the existence of other fields depends
+        self._conditions = set(_get_conditions(keyspace.fields))
+
+        self._masks = dict()
+
+    def get_value(self, tag=None, field=None, **field_values):
+        """Get the key formed by setting the given fields of the keyspace.
+
+        Parameters
+        ----------
+        tag : str
+            Only include fields with this tag in the key.
+        field : str
+            Only include this field in the key.
+        **field_values : int or array of ints
+            Values of fields which are not set in the keyspace.  If any are
+            arrays then they are broadcast against each other and an array of
+            keys is returned.
+
+        Returns
+        -------
+        int or :py:class:`numpy.ndarray`
+        """
+        if tag is not None and field is not None:
+            raise TypeError("get_value() takes exactly one keyword argument, "
+                            "either 'field' or 'tag' (both given)")
+
+        if not self._is_fixed_for(field_values):
+            return self._call_keyspace("get_value", tag, field, field_values)
+
+        shape, field_values = self._check_values(field_values)
+        selected = self._select(tag, field)
+
+        # Check that all selected fields have values
+        missing = [i for i in selected if
+                   i not in self.field_values and i not in field_values]
+        if missing:
+            raise ValueError(
+                "Cannot generate value with undefined fields {}.".format(
+                    ", ".join("'{}'".format(i) for i in missing)))
+
+        # Build the key from the fixed fields and then add those which vary
+        key = 0
+        for identifier, (start_at, _) in iteritems(selected):
+            if identifier in self.field_values:
+                key |= self.field_values[identifier] << start_at
+
+        if shape is None:
+            for identifier, value in iteritems(field_values):
+                if identifier in selected:
+                    key |= int(value) << selected[identifier][0]
+            return key
+
+        keys = np.full(shape, key, dtype=np.uint64)
+        for identifier, values in iteritems(field_values):
+            if identifier in selected:
+                keys |= values << np.uint64(selected[identifier][0])
+        return keys.astype(self._dtype)
+
+    def get_mask(self, tag=None, field=None, **field_values):
+        """Get the mask of some or all fields of the keyspace.
+
+        Parameters
+        ----------
+        tag : str
+            Only include fields with this tag in the mask.
+        field : str
+            Only include this field in the mask.
+        **field_values : int or array of ints
+            Values of fields which are not set in the keyspace.  If any are
+            arrays then they are broadcast against each other and an array of
+            masks is returned.
+
+        Returns
+        -------
+        int or :py:class:`numpy.ndarray`
+        """
+        if tag is not None and field is not None:
+            raise TypeError("get_mask() takes exactly one keyword argument, "
+                            "either 'field' or 'tag' (both given)")
+
+        if not self._is_fixed_for(field_values):
+            return self._call_keyspace("get_mask", tag, field, field_values)
+
+        shape, _ = self._check_values(field_values)
+
+        # Build the mask (the mask is the same for every key)
+        mask = self._masks.get((tag, field))
+        if mask is None:
+            mask = 0
+            for start_at, length in itervalues(self._select(tag, field)):
+                mask |= ((1 << length) - 1) << start_at
+            self._masks[(tag, field)] = mask
+
+        if shape is None:
+            return mask
+        return np.full(shape, mask, dtype=self._dtype)
+
+    @property
+    def _dtype(self):
+        return np.uint32 if self.keyspace.length <= 32 else np.uint64
+
+    def _is_fixed_for(self, field_values):
+        """Determine whether the layout of the keyspace is the same whatever
+        the values of the given fields.
+        """
+        return all(i in self.fields and i not in self._conditions for
+                   i in field_values)
+
+    def _check_values(self, field_values):
+        """Check that the given field values may be set.
+
+        Returns
+        -------
+        shape : tuple or None
+            The broadcast shape of the field values or None if all are
+            scalars.
+        {identifier: int or :py:class:`numpy.ndarray`, ...}
+            The values, arrays are broadcast and converted to unsigned
+            integers.
+        """
+        for identifier in field_values:
+            if identifier in self.field_values:
+                raise ValueError(
+                    "Field '{}' already has value.".format(identifier))
+
+        arrays = {i: np.asarray(v) for i, v in iteritems(field_values)}
+        if all(v.ndim == 0 for v in itervalues(arrays)):
+            shape = None
+        else:
+            shape = np.broadcast(*itervalues(arrays)).shape
+
+        for identifier, values in iteritems(arrays):
+            length = self.fields[identifier].length
+            if np.any(values < 0):
+                raise ValueError("Fields must be positive.")
+            elif length is not None and np.any(values >= (1 << length)):
+                raise ValueError(
+                    "Value {} too large for {}-bit field '{}'.".format(
+                        np.max(values), length, identifier))
+
+        if shape is None:
+            return None, field_values
+        return shape, {i: np.broadcast_to(v, shape).astype(np.uint64) for
+                       i, v in iteritems(arrays)}
+
+    def _select(self, tag, field):
+        """Get the position and length of the fields selected by a tag or
+        field name.
+        """
+        if field is not None:
+            if field not in self.fields:
+                self.keyspace.get_mask(field=field)  # Raise the error
+            selected = [(field, self.fields[field])]
+        elif tag is not None:
+            selected = [(i, f) for i, f in iteritems(self.fields) if
+                        tag in f.tags]
+            if not selected:
+                self.keyspace.get_mask(tag=tag)  # Raise the error
+        else:
+            selected = list(iteritems(self.fields))
+
+        positions = collections.OrderedDict()
+        for identifier, f in selected:
+            if f.length is None or f.start_at is None:
+                raise ValueError(
+                    "Field '{}' does not have a fixed size/position.".format(
+                        identifier))
+            positions[identifier] = (f.start_at, f.length)
+
+        return positions
+
+    def _call_keyspace(self, method, tag, field, field_values):
+        """Get keys or masks by calling the keyspace with each set of field
+        values.
+        """
+        arrays = {i: np.asarray(v) for i, v in iteritems(field_values)}
+        if all(v.ndim == 0 for v in itervalues(arrays)):
+            ks = self.keyspace(**{i: int(v) for i, v in iteritems(arrays)})
+            return getattr(ks, method)(tag=tag, field=field)
+
+        identifiers = list(arrays)
+        values = np.broadcast_arrays(*(arrays[i] for i in identifiers))
+        out = np.empty(values[0].shape, dtype=self._dtype)
+        for index in np.ndindex(*out.shape):
+            ks = self.keyspace(**{i: int(v[index]) for i, v in
+                                  zip(identifiers, values)})
+            out[index] = getattr(ks, method)(tag=tag, field=field)
+        return out
+
+
+def _get_conditions(tree):
+    """Get the identifiers of the fields on whose values the existence of
+    other fields in a tree of fields depends.
+    """
+    for requirements, child in iteritems(tree.children):
+        for identifier, _ in requirements:
+            yield identifier
+
+        for identifier in _get_conditions(child):
+            yield identifier
+
+
 class KeyspaceContainer(collections.defaultdict):
     """A container which can recall or allocate specific keyspaces to modules
     and users on request.
@@ -1,5 +1,5 @@
 import os
-from nengo.utils.paths import config_dir
+from nengo.utils.paths import cache_dir, config_dir
 
 
 install_dir = os.path.abspath(os.path.join(
@@ -13,3 +13,5 @@ nengo_spinnaker_rc = {
     "user": os.path.join(config_dir, _conf_file),
     "project": os.path.abspath(os.path.join(os.curdir, _conf_file)),
 }
+
+build_cache_dir = os.path.join(cache_dir, "spinnaker_build")
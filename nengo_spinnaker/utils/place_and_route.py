@@ -4,17 +4,10 @@ from __future__ import absolute_import
 
 import pickle
 
-from six import iteritems
-
 from collections import defaultdict
 
-from rig.netlist import Net
-
-from rig.place_and_route.constraints import (LocationConstraint,
-                                             RouteEndpointConstraint,
-                                             SameChipConstraint)
-
 from nengo_spinnaker.builder import Model
+from nengo_spinnaker.netlist.utils import replace_vertices
 from nengo_spinnaker.node_io import Ethernet
 
 
@@ -40,36 +33,4 @@ def pickle_netlist(netlist_dict, fp, **kwargs):
     """
     # {old_vertex: new_vertex, ...}
     new_vertices = defaultdict(object)
-
-    netlist_dict["vertices_resources"] = {
-        new_vertices[vertex]: resources
-        for (vertex, resources)
-        in iteritems(netlist_dict["vertices_resources"])
-    }
-
-    netlist_dict["nets"] = [
-        Net(new_vertices[net.source],
-            [new_vertices[sink] for sink in net.sinks],
-            net.weight)
-        for net in netlist_dict["nets"]
-    ]
-
-    old_constraints = netlist_dict["constraints"]
-    netlist_dict["constraints"] = []
-    for constraint in old_constraints:
-        if isinstance(constraint, LocationConstraint):
-            netlist_dict["constraints"].append(
-                LocationConstraint(new_vertices[constraint.vertex],
-                                   constraint.location))
-        elif isinstance(constraint, RouteEndpointConstraint):
-            netlist_dict["constraints"].append(
-                RouteEndpointConstraint(new_vertices[constraint.vertex],
-                                        constraint.route))
-        elif isinstance(constraint, SameChipConstraint):
-            # Get the new vertices
-            vs = [new_vertices[v] for v in constraint.vertices]
-            netlist_dict["constraints"].append(SameChipConstraint(vs))
-        else:
-            netlist_dict["constraints"].append(constraint)
-
-    pickle.dump(netlist_dict, fp, **kwargs)
+    pickle.dump(replace_vertices(netlist_dict, new_vertices), fp, **kwargs)
@@ -0,0 +1,183 @@
+"""Storage for data retrieved from probes.
+
+Each simulation period yields a new chunk of data for every probe.  Rather
+than repeatedly stacking the new chunk onto everything recorded so far (which
+copies all previous data every period) the stores in this module append
+chunks in place and hand out views of the data recorded so far.
+"""
+from __future__ import absolute_import
+
+import atexit
+import numpy as np
+import os
+import shutil
+import tempfile
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # pragma: no cover
+    from collections import Mapping
+
+
+class ProbeStore(Mapping):
+    """In-memory store of probe data.
+
+    Data for each probe is held in a buffer which grows geometrically as
+    chunks are appended, so storing `n` rows costs amortised `O(n)` copies.
+    Indexing the store returns a view of the rows recorded so far.
+
+    For example::
+
+        >>> store = ProbeStore()
+        >>> store.append("probe", np.zeros((2, 3)))
+        >>> store.append("probe", np.ones((1, 3)))
+        >>> store["probe"].shape
+        (3, 3)
+        >>> "probe" in store
+        True
+    """
+    def __init__(self):
+        self._buffers = dict()
+        self._n_rows = dict()
+
+    def append(self, key, data):
+        """Append a chunk of data to the data stored for a key.
+
+        Parameters
+        ----------
+        key :
+            Object (usually a :py:class:`nengo.Probe`) to store data against.
+        data : array
+            Data to append; the first axis is time and any remaining axes
+            must match those of previously appended chunks.
+        """
+        data = np.asarray(data)
+
+        if key not in self._buffers:
+            self._buffers[key] = data.copy()
+            self._n_rows[key] = data.shape[0]
+            return
+
+        # Check the chunk is compatible with the existing data
+        buf = self._buffers[key]
+        if data.shape[1:] != buf.shape[1:]:
+            raise ValueError(
+                "Cannot append data of shape {} to data of shape {} for "
+                "{}".format(data.shape, buf.shape, key)
+            )
+
+        # Grow the buffer if necessary and then copy the data in
+        n_rows = self._n_rows[key]
+        if n_rows + data.shape[0] > buf.shape[0]:
+            new_buf = np.empty((max(2 * buf.shape[0], n_rows + data.shape[0]),
+                                ) + buf.shape[1:], dtype=buf.dtype)
+            new_buf[:n_rows] = buf[:n_rows]
+            self._buffers[key] = buf = new_buf
+
+        buf[n_rows:n_rows + data.shape[0]] = data
+        self._n_rows[key] = n_rows + data.shape[0]
+
+    def __getitem__(self, key):
+        return self._buffers[key][:self._n_rows[key]]
+
+    def close(self):
+        """Release any resources held by the store.
+
+        Data remains available from the store after it is closed.
+        """
+        pass
+
+    def __iter__(self):
+        return iter(self._buffers)
+
+    def __len__(self):
+        return len(self._buffers)
+
+
+class MemmapProbeStore(ProbeStore):
+    """Store of probe data backed by files on disk.
+
+    Each probe has its own file to which chunks are appended as raw bytes;
+    indexing the store returns a read-only :py:class:`numpy.memmap` of the
+    data recorded so far.  Resident memory is therefore bounded by the
+    operating system's page cache rather than by the length of the
+    simulation.
+
+    Parameters
+    ----------
+    directory : str or None
+        Directory in which to store the data files.  If None a new temporary
+        directory is created and removed when the store is closed (or, at the
+        latest, when the interpreter exits).
+    """
+    def __init__(self, directory=None):
+        super(MemmapProbeStore, self).__init__()
+
+        # Get the directory to store data in
+        self._owns_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="nengo_spinnaker_probes_")
+            atexit.register(shutil.rmtree, directory, True)
+        elif not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+
+        self._paths = dict()
+        self._views = dict()
+
+    def append(self, key, data):
+        """Append a chunk of data to the file holding the data for a key."""
+        data = np.asarray(data)
+
+        if key not in self._buffers:
+            # Store the dtype and shape of the data in a zero-length "buffer"
+            # and assign a file for the data.
+            self._buffers[key] = np.empty((0, ) + data.shape[1:],
+                                          dtype=data.dtype)
+            self._n_rows[key] = 0
+            self._paths[key] = os.path.join(
+                self.directory, "probe_{:d}.dat".format(len(self._paths))
+            )
+        elif data.shape[1:] != self._buffers[key].shape[1:]:
+            raise ValueError(
+                "Cannot append data of shape {} to data of shape {} for "
+                "{}".format(data.shape, self[key].shape, key)
+            )
+
+        # Append the data to the end of the file and invalidate any existing
+        # view of the file.
+        data = np.ascontiguousarray(data, dtype=self._buffers[key].dtype)
+        with open(self._paths[key], "ab") as fp:
+            fp.write(data.tostring())
+
+        self._n_rows[key] += data.shape[0]
+        self._views.pop(key, None)
+
+    def __getitem__(self, key):
+        if key not in self._views:
+            template = self._buffers[key]
+            shape = (self._n_rows[key], ) + template.shape[1:]
+
+            if template.dtype.itemsize * np.prod(shape) == 0:
+                # Can't memory map an empty file
+                self._views[key] = template.reshape(shape)
+            else:
+                self._views[key] = np.memmap(self._paths[key], mode="r",
+                                             dtype=template.dtype,
+                                             shape=shape)
+
+        return self._views[key]
+
+    def close(self):
+        """Remove the data files if they were stored in a temporary
+        directory.
+
+        Every file is mapped before it is removed so that, on platforms which
+        allow open files to be removed, the data remains available from the
+        store until the store itself is released.
+        """
+        if self._owns_directory and os.path.isdir(self.directory):
+            for key in self:
+                self[key]
+
+            shutil.rmtree(self.directory, ignore_errors=True)
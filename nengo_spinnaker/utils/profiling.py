@@ -64,3 +64,19 @@ def write_csv_row(profiling_data, duration_s, dt_s, csv_writer,
 
     # Write extra column followed by means
     csv_writer.writerow(extra_column_values + mean_times)
+
+
+def read_csv_rows(csv_reader):
+    """
+    Read the rows of a standard profiler format CSV file (or any other CSV
+    file with a header row) as dictionaries mapping column headers to values
+    """
+    rows = list()
+    header = None
+    for row in csv_reader:
+        if header is None:
+            header = row
+        elif row:
+            rows.append({h: float(v) for h, v in zip(header, row) if v != ""})
+
+    return rows
@@ -0,0 +1,245 @@
+"""Scheduling the steps of a simulation in real time.
+
+The part of a model simulated on the host must keep pace with the part
+simulated on SpiNNaker.  A :py:class:`~.RealtimeScheduler` runs a step
+function at fixed intervals; the deadline of each step is computed from the
+time at which the schedule started (rather than from the time at which the
+previous step finished) so that small errors don't accumulate.  To wake close
+to each deadline without occupying the processor for the whole interval the
+scheduler sleeps until shortly before the deadline and then spins.
+
+For example::
+
+    >>> scheduler = RealtimeScheduler(0.001)
+    >>> stats = scheduler.run(lambda: None, 10)
+    >>> stats.n_steps, stats.n_skipped
+    (10, 0)
+"""
+import time
+
+import numpy as np
+
+CATCH_UP_POLICIES = ("burst", "skip")
+"""Names of the ways in which a :py:class:`~.RealtimeScheduler` may recover
+when it falls behind its schedule.
+"""
+
+
+class RealtimeScheduler(object):
+    """Runs a step function at regular intervals of real time.
+
+    Parameters
+    ----------
+    timestep : float
+        Interval, in seconds, between the deadlines of successive steps.
+    catch_up : "burst" or "skip"
+        How to recover when a step starts more than one timestep after its
+        deadline.  If "burst" then every step is run, back-to-back, until the
+        schedule is caught up.  If "skip" then the steps whose deadlines have
+        passed are not run (and are counted in the statistics), so that the
+        next step runs as close to its deadline as possible.
+    spin_time : float
+        Time, in seconds, before each deadline at which the scheduler stops
+        sleeping and starts spinning.  Larger values give more accurate
+        timing at the cost of processor time.
+    clock : callable
+        Function returning the current time in seconds.
+    sleep : callable
+        Function which sleeps for a given number of seconds.
+
+    Attributes
+    ----------
+    stats : :py:class:`~.SchedulerStats`
+        Statistics of the most recent (or current) run of the schedule, these
+        remain available if the run is interrupted.
+    """
+    def __init__(self, timestep, catch_up="burst", spin_time=0.002,
+                 clock=time.time, sleep=time.sleep):
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(
+                "Unknown catch up policy {!r}, expected one of {}".format(
+                    catch_up, ", ".join(CATCH_UP_POLICIES))
+            )
+
+        self.timestep = timestep
+        self.catch_up = catch_up
+        self.spin_time = spin_time
+        self.clock = clock
+        self.sleep = sleep
+
+        self.stats = SchedulerStats(timestep)
+
+    def wait_until(self, deadline):
+        """Wait until the clock reaches the given time."""
+        remaining = deadline - self.clock()
+        if remaining > self.spin_time:
+            self.sleep(remaining - self.spin_time)
+
+        while self.clock() < deadline:
+            pass
+
+    def run(self, step, n_steps=None, should_stop=None):
+        """Run a step function according to the schedule.
+
+        The first step is run immediately.
+
+        Parameters
+        ----------
+        step : callable
+            Function to call once per step.
+        n_steps : int or None
+            Number of steps in the schedule, if None the schedule continues
+            until `should_stop` returns True.
+        should_stop : callable or None
+            Function called before each step, if it returns True then the
+            schedule ends early.
+
+        Returns
+        -------
+        :py:class:`~.SchedulerStats`
+            How late the steps which were run started and the number of
+            steps which were skipped.
+        """
+        self.stats = stats = SchedulerStats(self.timestep)
+
+        start = self.clock()
+        k = 0  # Index of the next deadline in the schedule
+        while n_steps is None or k < n_steps:
+            if should_stop is not None and should_stop():
+                break
+
+            deadline = start + k * self.timestep
+            self.wait_until(deadline)
+            late = self.clock() - deadline
+
+            if self.catch_up == "skip" and late >= self.timestep:
+                # Drop the steps whose deadlines have passed
+                n_missed = int(late // self.timestep)
+                if n_steps is not None:
+                    n_missed = min(n_missed, n_steps - k)
+                stats.n_skipped += n_missed
+                k += n_missed
+                late -= n_missed * self.timestep
+
+                if n_steps is not None and k >= n_steps:
+                    break
+
+            step()
+            stats.add(late)
+            k += 1
+
+        return stats
+
+
+class SchedulerStats(object):
+    """How closely a :py:class:`~.RealtimeScheduler` kept to its schedule.
+
+    Rather than the lateness of every step, which would grow without bound
+    for simulations which run indefinitely, running totals and a histogram
+    of the lateness are kept.  Percentiles are therefore accurate to within
+    one bin of the histogram, steps later than `max_timesteps` timesteps are
+    counted in a single bin.
+
+    Statistics of several runs may be combined by adding them together.
+
+    Attributes
+    ----------
+    timestep : float
+        Interval, in seconds, between deadlines.
+    n_steps : int
+        Number of steps which were run.
+    n_skipped : int
+        Number of steps which weren't run because the schedule had fallen
+        behind.
+    n_late : int
+        Number of steps which started more than one timestep after their
+        deadlines.
+    """
+    bins_per_timestep = 100
+    """Number of bins of the histogram of lateness in each timestep."""
+
+    max_timesteps = 10
+    """Lateness, in timesteps, beyond which steps share a single bin."""
+
+    def __init__(self, timestep, lateness=(), n_skipped=0):
+        self.timestep = timestep
+        self.n_skipped = n_skipped
+
+        self.n_steps = 0
+        self.n_late = 0
+        self._total = 0.0
+        self._min = None
+        self._max = None
+        self._bin_width = float(timestep) / self.bins_per_timestep
+        self._counts = np.zeros(
+            self.bins_per_timestep * self.max_timesteps + 1, dtype=int)
+
+        for late in lateness:
+            self.add(late)
+
+    def add(self, late):
+        """Record the lateness, in seconds, of a step which was run."""
+        self.n_steps += 1
+        self._total += late
+        if self._min is None or late < self._min:
+            self._min = late
+        if self._max is None or late > self._max:
+            self._max = late
+        if late >= self.timestep:
+            self.n_late += 1
+
+        i = min(max(int(late / self._bin_width), 0), self._counts.size - 1)
+        self._counts[i] += 1
+
+    @property
+    def mean(self):
+        """Mean lateness of the steps, in seconds."""
+        return self._total / self.n_steps if self.n_steps else 0.0
+
+    @property
+    def min(self):
+        """Least lateness of any step, in seconds."""
+        return self._min if self.n_steps else 0.0
+
+    @property
+    def max(self):
+        """Greatest lateness of any step, in seconds."""
+        return self._max if self.n_steps else 0.0
+
+    def percentile(self, q):
+        """Get a percentile (in the range 0-100) of the lateness of the steps,
+        in seconds.
+
+        The lateness which no more than `q` percent of the steps exceeded is
+        returned, to within the width of one bin of the histogram.
+        """
+        if not self.n_steps:
+            return 0.0
+
+        # Find the first bin by which enough steps have been counted and
+        # return its upper edge, limited to the observed range.
+        rank = max(q / 100.0 * self.n_steps, 1)
+        i = int(np.searchsorted(np.cumsum(self._counts), rank))
+        if i >= self._counts.size - 1:
+            return self._max
+        return min(max((i + 1) * self._bin_width, self._min), self._max)
+
+    def __add__(self, other):
+        stats = SchedulerStats(self.timestep,
+                               n_skipped=self.n_skipped + other.n_skipped)
+        stats.n_steps = self.n_steps + other.n_steps
+        stats.n_late = self.n_late + other.n_late
+        stats._total = self._total + other._total
+        stats._counts = self._counts + other._counts
+
+        extrema = [s for s in (self, other) if s.n_steps]
+        if extrema:
+            stats._min = min(s._min for s in extrema)
+            stats._max = max(s._max for s in extrema)
+
+        return stats
+
+    def __repr__(self):
+        return ("<SchedulerStats: {} steps, {} skipped, mean lateness "
+                "{:.3g} s, max lateness {:.3g} s>".format(
+                    self.n_steps, self.n_skipped, self.mean, self.max))
@@ -91,7 +91,7 @@ setup(
 
     # Requirements
     install_requires=["nengo>=2.1.1, <2.3.0", "rig>=2.4.0, <3.0.0",
-                      "bitarray>=0.8.1, <1.0.0", "toposort >= 1.4"],
+                      "toposort >= 1.4"],
     zip_safe=False,  # Partly for performance reasons
 
     # Scripts
@@ -13,11 +13,32 @@ static inline void nop (void) { return; }
 
 extern uint32_t simulation_ticks;
 
+//! Number of frames which fit in recording buffers, once this many frames
+//! have been recorded the buffers are reused from the start.  0 indicates
+//! that recording buffers are never reused.
+extern uint32_t recording_frames;
+
 address_t system_load_sram();
 address_t region_start(uint32_t n, address_t sdram_base);
 
-/** Get the number of ticks for the next simulation.
+/** Get the number of ticks for the next simulation and the number of frames
+ * in recording buffers.
  */
 void config_get_n_ticks();
 
+/** Indicate to the host how many ticks have been completed (and hence how
+ * many frames have been recorded).
+ */
+void config_set_ticks_completed(uint32_t ticks);
+
+//! Value written into VCPU->User3 to indicate to the host that recording
+//! buffers may be used as circular buffers (see config_get_n_ticks).
+#define CIRCULAR_RECORDING_CAPABILITY 0x43524543
+
+/** Indicate to the host that this executable can use its recording buffers
+ * as circular buffers.  Must be called after initialisation and before the
+ * first simulation.
+ */
+void config_advertise_circular_recording();
+
 #endif  // __COMMON_IMPL_H__
@@ -4,6 +4,7 @@
 #include "common-impl.h"
 
 uint32_t simulation_ticks = 0;  // TODO: Remove this
+uint32_t recording_frames = 0;
 
 address_t system_load_sram()
 {
@@ -23,4 +24,26 @@ void config_get_n_ticks()
   // Read the number of ticks from VCPU->User1
   vcpu_t vcpu = ((vcpu_t*)SV_VCPU)[spin1_get_core_id()];
   simulation_ticks = vcpu.user1;
+
+  // Read the number of frames in recording buffers from VCPU->User2
+  recording_frames = vcpu.user2;
+
+  // No ticks of the new simulation have been completed
+  config_set_ticks_completed(0);
+}
+
+
+void config_set_ticks_completed(uint32_t ticks)
+{
+  // Write the number of completed ticks into VCPU->User3
+  vcpu_t *vcpu = &((vcpu_t*)SV_VCPU)[spin1_get_core_id()];
+  vcpu->user3 = ticks;
+}
+
+
+void config_advertise_circular_recording()
+{
+  // Write the capability into VCPU->User3, this is replaced by the number of
+  // completed ticks once a simulation starts.
+  config_set_ticks_completed(CIRCULAR_RECORDING_CAPABILITY);
 }
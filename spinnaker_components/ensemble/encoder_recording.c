@@ -14,4 +14,5 @@ void record_learnt_encoders_reset(encoder_recording_buffer_t *buffer)
 {
   // Reset the position of the recording region
   buffer->sdram_current = buffer->sdram_start;
+  buffer->frame = 0;
 }
\ No newline at end of file
@@ -24,6 +24,7 @@
 #include "spin1_api.h"
 #include "common-typedefs.h"
 #include "nengo_typedefs.h"
+#include "common-impl.h"
 
 //-----------------------------------------------------------------------------
 // Structs
@@ -38,6 +39,9 @@ typedef struct encoder_recording_buffer_t
 
   //! Current location in the SDRAM buffer
   value_t *sdram_current;
+
+  //! Index of the current frame in the buffer
+  uint32_t frame;
 } encoder_recording_buffer_t;
 
 //-----------------------------------------------------------------------------
@@ -58,6 +62,18 @@ static inline void record_learnt_encoders(encoder_recording_buffer_t *buffer,
   }
 }
 
+static inline void record_learnt_encoders_end_frame(
+  encoder_recording_buffer_t *buffer)
+{
+  // Return to the start of the buffer if it is being used as a circular
+  // buffer and is full.
+  if (buffer->record && ++buffer->frame == recording_frames)
+  {
+    buffer->sdram_current = buffer->sdram_start;
+    buffer->frame = 0;
+  }
+}
+
 
 //-----------------------------------------------------------------------------
 // Functions
@@ -246,6 +246,8 @@ void simulate_neurons(
   // Finish up the recording
   record_buffer_flush(&record_voltages);
   record_buffer_flush(&record_spikes);
+  record_learnt_encoders_end_frame(&record_encoders);
+  config_set_ticks_completed(spin1_get_simulation_time());
 
   profiler_write_entry(PROFILER_EXIT | PROFILER_NEURON_UPDATE);
 }
@@ -852,6 +854,9 @@ void c_main(void)
   spin1_callback_on(DMA_TRANSFER_DONE, dma_complete, 0);
   spin1_callback_on(MCPL_PACKET_RECEIVED, mcpl_received, -1);
   spin1_callback_on(USER_EVENT, user_event, 1);
+
+  // Recording buffers may be used as circular buffers
+  config_advertise_circular_recording();
   // --------------------------------------------------------------------------
 
   // --------------------------------------------------------------------------
@@ -867,6 +872,7 @@ void c_main(void)
     // Reset the recording regions
     record_buffer_reset(&record_spikes);
     record_buffer_reset(&record_voltages);
+    record_learnt_encoders_reset(&record_encoders);
 
     // Check on the status of the packet queue
     if (queue_overflows)
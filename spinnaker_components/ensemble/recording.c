@@ -23,6 +23,7 @@ void record_buffer_reset(recording_buffer_t *buffer)
 {
   // Reset the position of the recording region
   buffer->_sdram_current = buffer->_sdram_start;
+  buffer->_frame = 0;
 }
 
 /*****************************************************************************/
@@ -17,6 +17,7 @@
 #include "common-typedefs.h"
 #include "nengo_typedefs.h"
 #include "nengo-common.h"
+#include "common-impl.h"
 #include <string.h>
 
 typedef struct _recording_buffer_t
@@ -28,6 +29,7 @@ typedef struct _recording_buffer_t
 
   uint32_t *_sdram_start;    //!< Start of the buffer in SDRAM
   uint32_t *_sdram_current;  //!< Current location in the SDRAM buffer
+  uint32_t _frame;           //!< Index of the current frame in the buffer
 } recording_buffer_t;
 
 /*!\brief Reset the recording region for a new period of simulation.
@@ -51,8 +53,14 @@ static inline void record_buffer_flush(recording_buffer_t *buffer)
   // Empty the buffer
   memset(buffer->buffer, 0x0, buffer->block_length_words * sizeof(uint32_t));
 
-  // Progress the pointer
+  // Progress the pointer, returning to the start of the buffer if it is
+  // being used as a circular buffer and is full.
   buffer->_sdram_current += buffer->block_length_words;
+  if (++buffer->_frame == recording_frames)
+  {
+    buffer->_sdram_current = buffer->_sdram_start;
+    buffer->_frame = 0;
+  }
 }
 
 /*****************************************************************************/
@@ -26,6 +26,9 @@ typedef struct sdp_tx_parameters {
 
   uint n_dimensions;       //!< Number of dimensions to represent
 
+  uint ethernet_chip;      //!< P2P address of the chip to send SDP via
+  uint ip_tag;             //!< IP tag of that chip to send SDP to
+
   value_t *input;          //!< Input buffer
   uint *keys;              //!< Output keys
 } sdp_tx_parameters_t;
@@ -13,6 +13,7 @@ typedef struct _region_system_t
 region_system_t params;
 
 address_t rec_start, rec_curr;
+uint32_t rec_frame;
 
 if_collection_t filters;
 
@@ -96,6 +97,15 @@ void sink_update(uint ticks, uint arg1)
   input_filtering_step(&filters);
   spin1_memcpy(rec_curr, filters.output, params.input_size * sizeof(value_t));
   rec_curr = &rec_curr[params.input_size];
+
+  // Return to the start of the recording region if it is being used as a
+  // circular buffer and is full.
+  if (++rec_frame == recording_frames)
+  {
+    rec_curr = rec_start;
+    rec_frame = 0;
+  }
+  config_set_ticks_completed(ticks);
 }
 
 void c_main(void)
@@ -124,6 +134,9 @@ void c_main(void)
   spin1_callback_on(TIMER_TICK, sink_update, 2);
   spin1_callback_on(USER_EVENT, user_event, 2);
 
+  // Recording buffers may be used as circular buffers
+  config_advertise_circular_recording();
+
   while(true)
   {
     // Wait for data loading, etc.
@@ -134,6 +147,7 @@ void c_main(void)
 
     // Reset the recording region location
     rec_curr = rec_start;
+    rec_frame = 0;
 
     // Check on the status of the packet queue
     if (queue_overflows)
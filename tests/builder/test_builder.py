@@ -274,6 +274,66 @@ class TestMakeConnection(object):
             transmission_parameters, sink, sink_port, reception_parameters
         )
 
+    def test_deferred_connections(self):
+        """Test that when connections are built concurrently they are made
+        after the rest of the network, once the registered solvers have been
+        called with all of the connections from objects of each type.
+        """
+        class A(object):
+            pass
+
+        class B(object):
+            pass
+
+        connections = list()
+        for pre in (A(), B(), A()):
+            conn = mock.Mock(name="connection")
+            conn.pre_obj = pre
+            conn.post_obj = A()
+            connections.append(conn)
+
+        network = mock.Mock()
+        network.seed = None
+        network.connections = connections
+        network.ensembles = []
+        network.nodes = []
+        network.networks = []
+        network.probes = []
+
+        # Record the order in which things happen
+        calls = list()
+
+        def solver(model, conns, n_threads):
+            calls.append(("solve", list(conns), n_threads))
+
+        def transmission_builder(model, conn):
+            calls.append(("build", conn, model.seeds[conn]))
+
+        def source_getter(model, conn):
+            return spec(ObjectPort(mock.Mock(name="source"), None))
+
+        def no_sink(model, conn):
+            return None  # Don't add the connection to the connection map
+
+        m = Model()
+        with mock.patch.object(m, "source_getters", {object: source_getter}), \
+                mock.patch.object(m, "sink_getters", {object: no_sink}), \
+                mock.patch.object(m, "transmission_parameter_builders",
+                                  {object: transmission_builder}), \
+                mock.patch.object(m, "reception_parameter_builders",
+                                  {object: no_sink}):
+            m.build(network, extra_connection_solvers={A: solver},
+                    decoder_n_threads=3)
+
+        # Only the connections from As were solved for, then each connection
+        # was built in order.
+        assert calls[0] == ("solve", [connections[0], connections[2]], 3)
+        assert calls[1:] == [("build", c, m.seeds[c]) for c in connections]
+
+        # Connections made later are not deferred
+        m.make_connection(connections[0])
+        assert calls[-1][:2] == ("build", connections[0])
+
     @pytest.mark.parametrize("no_source, no_sink", ((True, False),
                                                     (False, True)))
     def test_source_is_none(self, no_source, no_sink):
@@ -2,6 +2,7 @@ import mock
 import nengo
 import numpy as np
 import pytest
+import time
 
 from nengo_spinnaker.builder import builder, ensemble
 from nengo_spinnaker.builder.ports import InputPort, OutputPort
@@ -443,6 +444,132 @@ class TestBuildFromNeuronsConnection(object):
         assert params.solver_info is None
 
 
+class RecordingCache(object):
+    """Decoder cache which stores decoders in memory and records how many
+    threads use it at once.
+    """
+    def __init__(self):
+        self.decoders = dict()
+        self.n_misses = 0
+        self.n_active = 0
+        self.max_active = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def wrap_solver(self, solver_fn):
+        def cached_solver(solver, neuron_type, gain, bias, x, targets,
+                          rng=None, E=None):
+            self.n_active += 1
+            self.max_active = max(self.max_active, self.n_active)
+            try:
+                time.sleep(0.001)  # Let other threads try to use the cache
+                key = (x.tostring(), targets.tostring())
+                if key not in self.decoders:
+                    self.n_misses += 1
+                    self.n_active -= 1
+                    try:
+                        self.decoders[key] = solver_fn(
+                            solver, neuron_type, gain, bias, x, targets,
+                            rng=rng, E=E
+                        )
+                    finally:
+                        self.n_active += 1
+                return self.decoders[key]
+            finally:
+                self.n_active -= 1
+
+        return cached_solver
+
+
+class TestSolveEnsembleConnections(object):
+    """Test solving for the decoders of many connections at once."""
+    @staticmethod
+    def make_network():
+        with nengo.Network(seed=3) as network:
+            ens = [nengo.Ensemble(50, 2) for _ in range(4)]
+            with nengo.Network():
+                sub_ens = nengo.Ensemble(50, 1)
+                nengo.Connection(sub_ens, sub_ens, function=np.sin)
+
+            for a, b in zip(ens, ens[1:]):
+                nengo.Connection(a, b, function=lambda x: x ** 2)
+                nengo.Connection(a, b, function=lambda x: -x)
+            nengo.Connection(ens[0], sub_ens, transform=[[0.5, 0.5]])
+            nengo.Probe(ens[-1], synapse=0.01)
+
+        return network
+
+    @pytest.mark.parametrize("n_threads", [2, None])
+    def test_matches_serial_build(self, n_threads):
+        """Decoders solved for concurrently should be exactly those solved for
+        in turn.
+        """
+        network = self.make_network()
+
+        serial = builder.Model()
+        serial.build(network)
+        concurrent = builder.Model()
+        concurrent.build(network, decoder_n_threads=n_threads)
+
+        # The seeds are the same (the connection made for the probe differs
+        # between the builds).
+        common = set(serial.seeds) & set(concurrent.seeds)
+        assert len(common) == len(serial.seeds) - 1
+        for obj in common:
+            assert concurrent.seeds[obj] == serial.seeds[obj]
+
+        for conn in network.all_connections:
+            assert np.array_equal(concurrent.params[conn].decoders,
+                                  serial.params[conn].decoders)
+            assert np.array_equal(concurrent.params[conn].eval_points,
+                                  serial.params[conn].eval_points)
+
+        assert (len(list(concurrent.connection_map.get_signals())) ==
+                len(list(serial.connection_map.get_signals())))
+
+    def test_cache(self):
+        """The decoder cache should be used by one thread at a time but the
+        decoders should be solved for concurrently.
+        """
+        solve_for_decoders = ensemble.connection_b.solve_for_decoders
+        state = {"active": 0, "max_active": 0}
+
+        def slow_solve_for_decoders(*args, **kwargs):
+            state["active"] += 1
+            state["max_active"] = max(state["max_active"], state["active"])
+            time.sleep(0.05)
+            state["active"] -= 1
+            return solve_for_decoders(*args, **kwargs)
+
+        network = self.make_network()
+        cache = RecordingCache()
+        with mock.patch.object(ensemble.connection_b, "solve_for_decoders",
+                               slow_solve_for_decoders):
+            model = builder.Model(decoder_cache=cache)
+            model.build(network, decoder_n_threads=4)
+
+        n_conns = len(network.all_connections) + 1  # Including the probe
+        assert cache.n_misses == n_conns
+        assert cache.max_active == 1
+        assert state["max_active"] > 1
+
+        # Building again should use the cache
+        with mock.patch.object(ensemble.connection_b, "solve_for_decoders",
+                               side_effect=solve_for_decoders) as solver:
+            cached_model = builder.Model(decoder_cache=cache)
+            cached_model.build(network, decoder_n_threads=4)
+
+        assert not solver.called
+        assert cache.n_misses == n_conns
+        for conn in network.all_connections:
+            assert np.array_equal(cached_model.params[conn].decoders,
+                                  model.params[conn].decoders)
+
+
 class TestProbeEnsemble(object):
     """Test probing ensembles."""
     @pytest.mark.parametrize("with_slice", [False, True])
@@ -96,9 +96,42 @@ class TestNodeIOController(object):
             assert model.object_operators[a].period == period
         else:
             assert model.object_operators[a].period is None
+        assert model.object_operators[a].vectorized is False
+        assert model.object_operators[a].n_processes is None
 
         assert model.extra_operators == list()
 
+    @pytest.mark.parametrize("period", [None, 23.0])
+    def test_build_node_function_of_time_not_precomputed(self, period):
+        """Test that function of time Nodes without a period are simulated on
+        the host if their output may not be computed in advance.
+        """
+        with nengo.Network() as net:
+            a = nengo.Node(lambda t: [t, t**2], size_in=0)
+            b = nengo.Node(np.array([0.5, 0.1]))
+
+        add_spinnaker_params(net.config)
+        net.config[a].function_of_time = True
+        net.config[a].function_of_time_period = period
+
+        # Create the model
+        model = Model()
+        model.config = net.config
+
+        # Build the Nodes
+        nioc = NodeIOController()
+        nioc.precompute_aperiodic = False
+        nioc.build_node(model, a)
+        nioc.build_node(model, b)
+
+        # Constant Nodes and periodic Nodes are still functions of time
+        assert model.object_operators[b].function is b.output
+        if period is None:
+            assert a not in model.object_operators
+            assert a in nioc.host_network.all_nodes
+        else:
+            assert model.object_operators[a].period == period
+
     def test_build_node_constant_value_is_function_of_time(self):
         """Test that building a Node with a constant value is equivalent to
         building a function of time Node.
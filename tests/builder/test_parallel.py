@@ -0,0 +1,247 @@
+import collections
+import nengo
+import numpy as np
+import pytest
+from six.moves import cPickle as pickle
+from rig.bitfield import BitField
+
+from nengo_spinnaker.builder import Model
+from nengo_spinnaker.builder.model import SignalParameters
+from nengo_spinnaker.builder.netlist import netlistspec
+from nengo_spinnaker.builder import parallel
+from nengo_spinnaker.builder.parallel import make_vertices
+from nengo_spinnaker.config import add_spinnaker_params
+from nengo_spinnaker.netlist import Vertex
+from nengo_spinnaker.node_io import Ethernet
+from nengo_spinnaker.operators.lif import EnsembleLIF, Regions
+from nengo_spinnaker import regions
+
+
+class StatefulOperator(object):
+    """Operator which records what it made in itself, as the real operators
+    do.
+    """
+    __slots__ = ()  # Subclasses choose where their state is stored
+
+    def __init__(self, name, signal_parameters):
+        self.name = name
+        self.signal_parameters = signal_parameters
+        self.history = list()
+        self.function = lambda x: x + 1
+
+    def make_vertices(self, model, n_steps, fail=False):
+        if fail and self.name == "b":
+            raise ValueError("Failed to make vertices for b")
+
+        self.vertex = Vertex(self.name)
+        self.region = regions.KeyspacesRegion(
+            [(self.signal_parameters, {"index": i}) for i in range(3)],
+            fields=[regions.KeyField({"index": "index"})]
+        )
+        self.history.append((model.dt, n_steps))
+
+        return netlistspec((self.vertex, ), self.load_to_machine,
+                           after_simulation_function=self.after_simulation)
+
+    def load_to_machine(self, netlist, controller):
+        pass
+
+    def after_simulation(self, netlist, simulator, n_steps):
+        pass
+
+
+class DictOperator(StatefulOperator):
+    """Operator which stores its state in its `__dict__`."""
+
+
+class SlottedOperator(StatefulOperator):
+    """Operator which stores its state in slots."""
+    __slots__ = ("name", "signal_parameters", "history", "function",
+                 "vertex", "region", "__private")
+
+    def make_vertices(self, model, n_steps, fail=False):
+        self.__private = n_steps
+        return super(SlottedOperator, self).make_vertices(model, n_steps,
+                                                          fail)
+
+    @property
+    def private(self):
+        return self.__private
+
+
+def make_model(operator_type=DictOperator):
+    model = Model()
+    for name in "abc":
+        sig_params = SignalParameters(keyspace=BitField(32))
+        op = operator_type(name, sig_params)
+        model.object_operators[name] = op
+        model.connection_map.add_connection(op, None, sig_params, None,
+                                            op, None, None)
+    return model
+
+
+@pytest.mark.parametrize("operator_type", [DictOperator, SlottedOperator])
+@pytest.mark.parametrize("n_processes", [1, 2, None])
+def test_make_vertices(n_processes, operator_type):
+    """The state of each operator should be as though it had made its
+    vertices in this process, with its callbacks bound to it and with objects
+    shared with the model (rather than copies of them).
+    """
+    model = make_model(operator_type)
+    ops = [model.object_operators[name] for name in "abc"]
+    functions = [op.function for op in ops]
+
+    specs = list(make_vertices(model, ops, n_processes, 100))
+
+    for op, function, spec in zip(ops, functions, specs):
+        assert spec.vertices == (op.vertex, )
+        assert spec.load_function == op.load_to_machine
+        assert spec.load_function.__self__ is op
+        assert spec.after_simulation_function.__self__ is op
+
+        # The operator's state is updated
+        assert op.history == [(model.dt, 100)]
+        assert str(op.vertex) == op.name
+        assert op.function is function
+
+        # Shared objects are not copied
+        assert all(s is op.signal_parameters for s, _ in
+                   op.region.signals_and_arguments)
+
+        if operator_type is SlottedOperator:
+            assert op.private == 100
+
+
+@pytest.mark.parametrize("n_processes", [1, 2])
+def test_make_vertices_fails(n_processes):
+    model = make_model()
+    ops = [model.object_operators[name] for name in "abc"]
+
+    with pytest.raises(ValueError) as excinfo:
+        list(make_vertices(model, ops, n_processes, 100, fail=True))
+    assert "b" in str(excinfo.value)
+
+
+def make_network_model(network):
+    io = Ethernet()
+    model = Model()
+    model.build(network, **io.builder_kwargs)
+    model.add_interposers()
+    return model
+
+
+def test_make_netlist_in_processes():
+    """Netlists built in several processes should be the same as those built
+    in one.
+    """
+    with nengo.Network(seed=1) as network:
+        stim = nengo.Node(lambda t: [np.sin(t), np.cos(t)])
+        ens = [nengo.Ensemble(100, 2) for _ in range(4)]
+        nengo.Connection(stim, ens[0])
+        for a, b in zip(ens, ens[1:]):
+            nengo.Connection(a, b, function=lambda x: x ** 2)
+        nengo.Probe(ens[-1], synapse=0.01)
+    add_spinnaker_params(network.config)
+
+    model = make_network_model(network)
+    netlist = model.make_netlist(100)
+    parallel_model = make_network_model(network)
+    parallel_netlist = parallel_model.make_netlist(100, n_processes=3)
+
+    assert len(parallel_netlist.nets) == len(netlist.nets)
+    assert (len(parallel_netlist.load_functions) ==
+            len(netlist.load_functions))
+    parallel_signal_parameters = set(
+        id(sig._params) for sig, _ in
+        parallel_model.connection_map.get_signals()
+    )
+
+    for obj, op in model.object_operators.items():
+        parallel_op = parallel_model.object_operators[obj]
+        assert (len(parallel_netlist.operator_vertices.get(parallel_op, ())) ==
+                len(netlist.operator_vertices.get(op, ())))
+
+        if isinstance(op, EnsembleLIF):
+            # The regions contain the same data
+            for name, region in op.regions.items():
+                parallel_region = parallel_op.regions[name]
+                assert type(parallel_region) is type(region)
+                if isinstance(region, regions.MatrixRegion):
+                    assert np.array_equal(parallel_region.matrix,
+                                          region.matrix)
+
+            # Signals are shared with the model
+            keys = parallel_op.regions[Regions.keys].signals_and_arguments
+            assert len(keys) == 2
+            for sig_params, _ in keys:
+                assert id(sig_params) in parallel_signal_parameters
+
+
+def get_shared_state(model, operators):
+    """Get the pickled state of each object shared between the operators and
+    the model (other than the operators themselves), by ID.
+    """
+    barriers = list(operators) + list(model.extra_operators)
+    shared = parallel._get_shared_objects(model, barriers)
+    operator_ids = set(id(op) for op in barriers)
+
+    state = dict()
+    for key, shared_obj in list(shared.items()):
+        obj = shared_obj
+        if (key in operator_ids or
+                isinstance(obj, parallel._OPAQUE_TYPES)):
+            continue
+
+        if isinstance(obj, collections.defaultdict):
+            # Looking up missing keys adds empty values, which is harmless
+            obj = {k: v for k, v in obj.items()
+                   if not (isinstance(v, (list, dict, set)) and not v)}
+
+        # Pickle only this object, storing references to the others
+        del shared[key]
+        try:
+            state[key] = parallel._dumps(obj, shared)
+        except (pickle.PicklingError, TypeError, NotImplementedError):
+            pass  # Objects which can't be pickled aren't sent to workers
+        finally:
+            shared[key] = shared_obj
+
+    return state
+
+
+def test_make_vertices_only_modifies_operators():
+    """Operators which make their vertices in a pool of processes may only
+    modify themselves, changes to objects shared with the model would be
+    lost.
+    """
+    with nengo.Network(seed=1) as network:
+        stim = nengo.Node(np.sin)
+        ens = nengo.Ensemble(100, 1)
+        nengo.Connection(stim, ens)
+        nengo.Connection(ens, ens, function=lambda x: x ** 2)
+        nengo.Probe(ens, synapse=0.01)
+    add_spinnaker_params(network.config)
+
+    model = make_network_model(network)
+    operators = list(model.object_operators.values()) + model.extra_operators
+    operator_types = set(type(op) for op in operators)
+    assert EnsembleLIF in operator_types
+
+    # The incoming signals are found before the operators are called, as by
+    # `make_netlist`.  The configuration of each object and the dictionaries
+    # of some shared objects are created when they are first used, losing
+    # them in a worker is harmless.
+    model._incoming_signals = model.connection_map.get_signals_to_all_objects()
+    for obj in network.all_objects:
+        model.config[obj]
+    get_shared_state(model, operators)
+
+    for op in operators:
+        before = get_shared_state(model, operators)
+        op.make_vertices(model, 100)
+        after = get_shared_state(model, operators)
+
+        # Objects which weren't shared before may be new objects owned by
+        # the operator.
+        for key, state in before.items():
+            assert after.get(key) == state, type(op).__name__
@@ -1,12 +1,18 @@
+from collections import defaultdict, deque
+import numpy as np
 import pytest
 from rig.place_and_route.routing_tree import RoutingTree
 from rig.routing_table import Routes
-from six import iteritems
+from six import iteritems, iterkeys, itervalues
 
+from nengo_spinnaker.builder.model import Signal, SignalParameters
 from nengo_spinnaker.netlist.key_allocation import (
     build_mn_net_graph, colour_graph, assign_mn_net_ids,
-    build_cluster_graph
+    build_cluster_graph, allocate_signal_keyspaces,
+    reallocate_signal_keyspaces, get_route_signature, get_signal_id_record,
+    get_changed_signals
 )
+from nengo_spinnaker.utils.keyspaces import KeyspaceContainer
 
 
 @pytest.mark.parametrize(
@@ -199,6 +205,139 @@ def test_colour_graph():
             assert colours[net] != colours[other]
 
 
+def reference_build_mn_net_graph(nets_routes):
+    """Previous implementation of building the net graph, comparing each net
+    against the nets taking every other route at each chip as it is added.
+    """
+    net_graph = {net: set() for net in iterkeys(nets_routes)}
+    chip_route_nets = defaultdict(lambda: defaultdict(deque))
+    for net, trees in iteritems(nets_routes):
+        for tree in trees:
+            for _, chip, routes in tree.traverse():
+                route = 0x0
+                for r in routes:
+                    route |= (1 << r)
+
+                chip_route_nets[chip][route].append(net)
+                for other_route, nets in iteritems(chip_route_nets[chip]):
+                    if other_route != route:
+                        for other_net in nets:
+                            if net != other_net:
+                                net_graph[net].add(other_net)
+                                net_graph[other_net].add(net)
+
+    return net_graph
+
+
+def reference_colour_graph(graph):
+    """Previous implementation of colouring a graph: first-fit colouring of
+    the nodes in breadth-first order.
+    """
+    colours = deque()
+    unvisited = set(iterkeys(graph))
+    while unvisited:
+        queue = deque([max(unvisited, key=lambda vx: len(graph[vx]))])
+        while queue:
+            node = queue.popleft()
+            if node in unvisited:
+                unvisited.remove(node)
+                for group in colours:
+                    if graph[node].isdisjoint(group):
+                        group.add(node)
+                        break
+                else:
+                    colours.append({node})
+
+                queue.extend(graph[node])
+
+    return {vx: i for i, group in enumerate(colours) for vx in group}
+
+
+def make_routing_tree(rng, width, height, n_sinks, radius):
+    """Make a routing tree using dimension-order routes from a random chip to
+    a number of random chips nearby.
+    """
+    source = (rng.randint(width), rng.randint(height))
+    trees = {source: RoutingTree(source)}
+    for _ in range(n_sinks):
+        sink = tuple(int(np.clip(s + rng.randint(-radius, radius + 1),
+                                 0, limit - 1))
+                     for s, limit in zip(source, (width, height)))
+
+        # Route in x and then in y
+        (x, y), tree = source, trees[source]
+        while (x, y) != sink:
+            if x != sink[0]:
+                route = Routes.east if x < sink[0] else Routes.west
+                x += 1 if x < sink[0] else -1
+            else:
+                route = Routes.north if y < sink[1] else Routes.south
+                y += 1 if y < sink[1] else -1
+
+            if (x, y) not in trees:
+                trees[(x, y)] = RoutingTree((x, y))
+                tree.children.append((route, trees[(x, y)]))
+            tree = trees[(x, y)]
+
+        tree.children.append((Routes.core(rng.randint(1, 17)), object()))
+
+    return trees[source]
+
+
+def make_nets_routes(n_nets, width, height, radius, seed=None):
+    rng = np.random.RandomState(seed)
+    return {net: [make_routing_tree(rng, width, height, rng.randint(1, 4),
+                                    radius)]
+            for net in range(n_nets)}
+
+
+def assert_valid_colouring(graph, colours):
+    assert set(colours) == set(graph)
+    for node, others in iteritems(graph):
+        for other in others:
+            assert colours[node] != colours[other]
+
+
+@pytest.mark.parametrize("n_nets, radius", [(200, 8), (500, 3)])
+def test_build_mn_net_graph_matches_reference(n_nets, radius):
+    nets_routes = make_nets_routes(n_nets, 16, 16, radius, seed=n_nets)
+    assert (build_mn_net_graph(nets_routes) ==
+            reference_build_mn_net_graph(nets_routes))
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("n_nodes, p", [(50, 0.1), (200, 0.05), (100, 0.5)])
+def test_colour_graph_no_worse_than_reference(n_nodes, p, seed):
+    """The colouring should be valid and use no more colours than the
+    breadth-first heuristic.
+    """
+    rng = np.random.RandomState(seed)
+    adjacency = np.triu(rng.uniform(size=(n_nodes, n_nodes)) < p, 1)
+    graph = {i: set() for i in range(n_nodes)}
+    for u, v in zip(*np.nonzero(adjacency)):
+        graph[u].add(v)
+        graph[v].add(u)
+
+    colours = colour_graph(graph)
+    assert_valid_colouring(graph, colours)
+    assert (max(itervalues(colours)) <=
+            max(itervalues(reference_colour_graph(graph))))
+
+
+def test_assign_mn_net_ids_large():
+    """Identifiers assigned to 10^4 nets on a 48x48 machine should be valid
+    and no more numerous than with the previous implementation.
+    """
+    nets_routes = make_nets_routes(10000, 48, 48, 3, seed=1)
+    net_ids = assign_mn_net_ids(nets_routes)
+
+    graph = reference_build_mn_net_graph(nets_routes)
+    reference_ids = reference_colour_graph(graph)
+
+    assert_valid_colouring(graph, net_ids)
+    assert max(itervalues(net_ids)) <= max(itervalues(reference_ids))
+
+
 @pytest.mark.parametrize(
     "prior_constraints",
     [{},  # No constraints
@@ -303,6 +442,95 @@ def test_assign_net_ids(prior_constraints):
             assert net_ids[net] != net_ids[other]
 
 
+class TestReallocateSignalKeyspaces(object):
+    """Test reusing identifiers assigned to signals in an earlier build."""
+    def make_signals(self, nets_routes):
+        """Make a signal for each net."""
+        return {Signal(object(), [], SignalParameters(weight=1)): routes
+                for routes in itervalues(nets_routes)}
+
+    def get_ids(self, signal_routes):
+        return {routes[0].chip: signal.keyspace.field_values["connection_id"]
+                for signal, routes in iteritems(signal_routes)}
+
+    def test_unchanged(self):
+        # Allocate identifiers for a set of signals
+        nets_routes = make_nets_routes(300, 8, 8, 3, seed=2)
+        signal_routes = self.make_signals(nets_routes)
+        signal_ids = allocate_signal_keyspaces(signal_routes, {},
+                                               KeyspaceContainer())
+        record = get_signal_id_record(signal_routes, signal_ids)
+
+        # Allocate identifiers for a new set of identical signals, these
+        # should be assigned the same identifiers.
+        new_signal_routes = self.make_signals(nets_routes)
+        new_signal_ids = reallocate_signal_keyspaces(
+            new_signal_routes, {}, KeyspaceContainer(), record)
+
+        assert sorted(itervalues(signal_ids)) == \
+            sorted(itervalues(new_signal_ids))
+        assert get_changed_signals(new_signal_routes, new_signal_ids,
+                                   record) == set()
+        assert get_signal_id_record(new_signal_routes,
+                                    new_signal_ids) == record
+
+    def test_changed_route(self):
+        # Allocate identifiers for a set of signals
+        nets_routes = make_nets_routes(300, 8, 8, 3, seed=3)
+        signal_routes = self.make_signals(nets_routes)
+        signal_ids = allocate_signal_keyspaces(signal_routes, {},
+                                               KeyspaceContainer())
+        record = get_signal_id_record(signal_routes, signal_ids)
+
+        # Change the routes of one net and reallocate the identifiers
+        rng = np.random.RandomState(4)
+        nets_routes[0] = [make_routing_tree(rng, 8, 8, 3, 3)]
+        nets_routes[1] = [make_routing_tree(rng, 8, 8, 3, 3)]
+        new_signal_routes = self.make_signals(nets_routes)
+        new_signal_ids = reallocate_signal_keyspaces(
+            new_signal_routes, {}, KeyspaceContainer(), record)
+
+        # The colouring should be valid
+        graph = build_mn_net_graph(new_signal_routes)
+        assert_valid_colouring(graph, new_signal_ids)
+
+        # Only the changed signals should have been assigned new identifiers
+        changed = get_changed_signals(new_signal_routes, new_signal_ids,
+                                      record)
+        assert 0 < len(changed) <= 2
+        assert all(new_signal_routes[s] in (nets_routes[0], nets_routes[1])
+                   for s in changed)
+
+        unchanged = {signal: routes for signal, routes in
+                     iteritems(new_signal_routes) if signal not in changed}
+        old_ids = {get_route_signature(routes): signal_ids[signal] for
+                   signal, routes in iteritems(signal_routes)}
+        for signal, routes in iteritems(unchanged):
+            assert (new_signal_ids[signal] ==
+                    old_ids[get_route_signature(routes)])
+
+    def test_new_constraint(self):
+        """If a new prior constraint is violated by the old identifiers then
+        one of the signals should be recoloured.
+        """
+        tree = RoutingTree((0, 0), [(Routes.core(1), object())])
+        nets_routes = {"a": [tree], "b": [tree]}
+        signal_routes = self.make_signals(nets_routes)
+        signal_ids = allocate_signal_keyspaces(signal_routes, {},
+                                               KeyspaceContainer())
+        assert len(set(itervalues(signal_ids))) == 1
+        record = get_signal_id_record(signal_routes, signal_ids)
+
+        # Add a constraint between the two signals
+        new_signal_routes = self.make_signals(nets_routes)
+        a, b = list(new_signal_routes)
+        new_signal_ids = reallocate_signal_keyspaces(
+            new_signal_routes, {a: {b}}, KeyspaceContainer(), record)
+        assert new_signal_ids[a] != new_signal_ids[b]
+        assert len(get_changed_signals(new_signal_routes, new_signal_ids,
+                                       record)) == 1
+
+
 def test_build_cluster_graph_completely_connected():
     """Test the construction of a graph which indicates which of the clusters
     of the vertices of an operator may not share an identifier.
@@ -44,6 +44,64 @@ def test_before_simulation():
     )
 
 
+def test_before_simulation_indefinite():
+    """Test that indefinite simulations are indicated to the executables and
+    that the size of the recording buffers is only written (to the vertices
+    which record data) when it changes.
+    """
+    vertex = mock.Mock(spec_set=["get_recording_reads"])
+    other_vertex = mock.Mock(spec_set=[])
+    model = netlist.Netlist(
+        nets=[],
+        operator_vertices={object(): (vertex, ), object(): (other_vertex, )},
+        keyspaces={},
+        load_functions=[],
+    )
+    model.placements[vertex] = (1, 2)
+    model.allocations[vertex] = {Cores: slice(5, 7)}
+    model.placements[other_vertex] = (3, 4)
+    model.allocations[other_vertex] = {Cores: slice(1, 2)}
+
+    simulator = mock.Mock(name="Simulator")
+    model.before_simulation(simulator, None, 1000)
+    calls = simulator.controller.write_vcpu_struct_field.call_args_list
+    assert sorted(c[0] for c in calls) == [
+        ("user1", 0xffffffff, 1, 2, 5),
+        ("user1", 0xffffffff, 3, 4, 1),
+        ("user2", 1000, 1, 2, 5),
+    ]
+
+    simulator.controller.reset_mock()
+    model.before_simulation(simulator, 200, 1000)
+    calls = simulator.controller.write_vcpu_struct_field.call_args_list
+    assert sorted(c[0] for c in calls) == [("user1", 200, 1, 2, 5),
+                                           ("user1", 200, 3, 4, 1)]
+
+
+def test_prepare_simulation():
+    """Test that operators which can prepare simulations in advance are asked
+    to do so.
+    """
+    # Create an operator which can prepare simulations and one which can't
+    op_a = mock.Mock(spec_set=["prepare_simulation"])
+    op_b = mock.Mock(spec_set=[])
+
+    # Create a netlist
+    model = netlist.Netlist(
+        nets=[],
+        operator_vertices={op_a: (mock.Mock(), ), op_b: (mock.Mock(), )},
+        keyspaces={},
+        load_functions=[],
+    )
+
+    # Prepare the simulation, nothing should be written to the machine
+    simulator = mock.Mock(name="Simulator")
+    model.prepare_simulation(simulator, 200, 100)
+
+    op_a.prepare_simulation.assert_called_once_with(model, simulator, 200, 100)
+    assert not simulator.controller.method_calls
+
+
 def test_after_simulation():
     """Test that all methods are called when asked to finish a simulation."""
     # Create some "before_simulation" functions
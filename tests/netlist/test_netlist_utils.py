@@ -135,8 +135,8 @@ def test_get_nets_for_routing():
         assert extended_allocations[v] == allocations[v]
 
 
-def test_get_net_keyspaces():
-    """Test the correct specification of keyspaces for nets."""
+def test_get_net_keys():
+    """Test the correct specification of keys and masks for nets."""
     # Create the vertices
     vertex_A = [Vertex() for _ in range(4)]
     vertex_B = Vertex()
@@ -179,28 +179,42 @@ def test_get_net_keyspaces():
     _, _, _, _, derived_nets = utils.get_nets_for_routing(
         resources, nets, placements, allocations)
 
-    # Get the net keyspaces
-    net_keyspaces = utils.get_net_keyspaces(placements, nets, derived_nets)
+    # Get the cluster IDs and then the keys
+    net_cluster_ids = utils.get_net_cluster_ids(placements, nets,
+                                                derived_nets)
+    ksc.assign_fields()
+    net_keys = utils.get_net_keys(nets, derived_nets, net_cluster_ids,
+                                  ksc.routing_tag)
 
-    # Check the net keyspaces are correct
+    def get_key(ks):
+        return (ks.get_value(tag=ksc.routing_tag),
+                ks.get_mask(tag=ksc.routing_tag))
+
+    # Check the net keys are correct
     # A -> B
     for xy, vertex in [((0, 0), vertex_A[0]), ((0, 1), vertex_A[2])]:
         net = derived_nets[nets[signal_a]][xy]
         cluster = vertex.cluster
-        assert net_keyspaces[net] == signal_a.keyspace(cluster=cluster)
+        assert net_cluster_ids[net] == cluster
+        assert net_keys[net] == get_key(signal_a.keyspace(cluster=cluster))
+
+    # The keys of different clusters differ
+    assert (net_keys[derived_nets[nets[signal_a]][(0, 0)]] !=
+            net_keys[derived_nets[nets[signal_a]][(0, 1)]])
 
     # B -> A
     net = derived_nets[nets[signal_b]][(0, 0)]
-    assert net_keyspaces[net] == signal_b.keyspace(cluster=0)
+    assert net_keys[net] == get_key(signal_b.keyspace(cluster=0))
 
     # A -> A
     for xy in [(0, 0), (0, 1)]:
         net = derived_nets[nets[signal_c]][xy]
-        assert net_keyspaces[net] == signal_c.keyspace  # No change
+        assert net not in net_cluster_ids
+        assert net_keys[net] == get_key(signal_c.keyspace)  # No change
 
 
-def test_get_net_keyspaces_fails_for_inconsistent_cluster():
-    """Test specification of keyspaces for nets fails in the case that
+def test_get_net_cluster_ids_fails_for_inconsistent_cluster():
+    """Test specification of cluster IDs for nets fails in the case that
     inconsistent cluster IDs are assigned (this is unlikely to happen unless a
     Net somehow ends up having two different Nengo objects in its source
     list)."""
@@ -249,6 +263,29 @@ def test_get_net_keyspaces_fails_for_inconsistent_cluster():
     _, _, _, _, derived_nets = utils.get_nets_for_routing(
         resources, nets, placements, allocations)
 
-    # Get the net keyspaces
+    # Get the net cluster IDs
     with pytest.raises(AssertionError):
-        utils.get_net_keyspaces(placements, nets, derived_nets)
+        utils.get_net_cluster_ids(placements, nets, derived_nets)
+
+
+def test_get_vertices_for_signals():
+    # Create the operators and their vertices
+    op_a, op_b, op_c = object(), object(), object()
+    vxs_a = (Vertex("a0"), Vertex("a1"))
+    vx_b = Vertex("b")
+    vx_c = Vertex("c")
+    operator_vertices = {op_a: vxs_a, op_b: (vx_b, ), op_c: (vx_c, )}
+
+    # Create the signals, one of which is only transmitted by one of the
+    # vertices of its operator.
+    sig_ab = Signal(op_a, [op_b], SignalParameters())
+    sig_bc = Signal(op_b, [op_c], SignalParameters())
+    nets = {sig_ab: NMNet(vxs_a[0], vx_b, 1), sig_bc: NMNet(vx_b, vx_c, 1)}
+
+    assert utils.get_vertices_for_signals(operator_vertices, nets, []) == set()
+    assert (utils.get_vertices_for_signals(operator_vertices, nets,
+                                           [sig_ab]) ==
+            {vxs_a[0], vxs_a[1], vx_b})
+    assert (utils.get_vertices_for_signals(operator_vertices, nets,
+                                           [sig_bc]) ==
+            {vx_b, vx_c})
@@ -0,0 +1,357 @@
+import mock
+import pytest
+from rig.machine_control.consts import AppState
+from rig.machine_control.machine_controller import ChipInfo, SystemInfo
+from rig.links import Links
+from rig import place_and_route
+from rig.place_and_route import Cores, SDRAM
+from rig.place_and_route.constraints import LocationConstraint
+from rig.place_and_route.routing_tree import RoutingTree
+from rig.routing_table import Routes
+from six import iteritems, itervalues
+
+from nengo_spinnaker.builder.model import Signal, SignalParameters
+from nengo_spinnaker.netlist import Netlist, NMNet, Vertex
+from nengo_spinnaker.netlist.place_and_route_cache import (
+    NetlistLabels, get_record_key)
+from nengo_spinnaker.netlist.routing_tables import minimise_tables
+from nengo_spinnaker.utils.build_cache import BuildCache
+from nengo_spinnaker.utils.keyspaces import KeyspaceContainer
+
+
+def make_system_info(dead_chips=set()):
+    """Make a description of a 2x2 machine."""
+    chips = dict()
+    for x in range(2):
+        for y in range(2):
+            if (x, y) not in dead_chips:
+                chips[(x, y)] = ChipInfo(
+                    num_cores=18,
+                    core_states=[AppState.run] + [AppState.idle] * 17,
+                    working_links=set(Links),
+                    largest_free_sdram_block=100 << 20,
+                    largest_free_sram_block=1 << 10,
+                    largest_free_rtr_mc_block=1024,
+                    ethernet_up=(x, y) == (0, 0),
+                    ip_address="127.0.0.1" if (x, y) == (0, 0) else None,
+                    local_ethernet_chip=(0, 0),
+                )
+
+    return SystemInfo(2, 2, chips)
+
+
+def make_netlist(build_cache, n_vertices=20):
+    """Make a netlist with three operators, the first of which has many
+    vertices.
+    """
+    resources = {Cores: 1, SDRAM: 1024}
+    op_a, op_b, op_c = object(), object(), object()
+    vxs_a = tuple(Vertex("a", "app_a", resources) for _ in range(n_vertices))
+    vx_b = Vertex("b", "app_b", resources)
+    vx_c = Vertex("c", "app_c", resources)
+
+    sig_ab = Signal(op_a, [op_b], SignalParameters(weight=4))
+    sig_ac = Signal(op_a, [op_c], SignalParameters(weight=2))
+    sig_bc = Signal(op_b, [op_c], SignalParameters(weight=3))
+
+    return Netlist(
+        nets={sig_ab: NMNet(list(vxs_a), vx_b, 4),
+              sig_ac: NMNet(list(vxs_a), vx_c, 2),
+              sig_bc: NMNet(vx_b, vx_c, 3)},
+        operator_vertices={op_a: vxs_a, op_b: (vx_b, ), op_c: (vx_c, )},
+        keyspaces=KeyspaceContainer(),
+        constraints=[LocationConstraint(vx_c, (1, 1))],
+        signal_id_constraints={sig_ab: {sig_ac}, sig_ac: {sig_ab}},
+        build_cache=build_cache,
+    )
+
+
+def describe_results(netlist, labels):
+    """Describe the results of place and route in terms of the canonical
+    indices of vertices and signals.
+    """
+    return (
+        [netlist.placements[v] for v in labels.vertices],
+        [netlist.allocations[v] for v in labels.vertices],
+        [v.cluster for v in labels.vertices],
+        [str(s.keyspace) for s in labels.signals],
+        sorted((keys, str(netlist.routes[net])) for net, keys in
+               iteritems(netlist.net_keys)),
+    )
+
+
+def test_labels_independent_of_construction_order(tmpdir):
+    """Vertices and signals should be given the same indices in separately
+    constructed but identical netlists.
+    """
+    cache = BuildCache(str(tmpdir))
+    labels_a = NetlistLabels(make_netlist(cache))
+    labels_b = NetlistLabels(make_netlist(cache))
+
+    assert ([v._label for v in labels_a.vertices] ==
+            [v._label for v in labels_b.vertices])
+    assert ([s.weight for s in labels_a.signals] ==
+            [s.weight for s in labels_b.signals])
+
+    system_info = make_system_info()
+    methods = ((place_and_route.place, {}), )
+    assert (labels_a.get_key(cache, system_info, *methods) ==
+            labels_b.get_key(cache, system_info, *methods))
+
+
+def test_key_changes(tmpdir):
+    cache = BuildCache(str(tmpdir))
+    labels = NetlistLabels(make_netlist(cache))
+    key = labels.get_key(cache, make_system_info(),
+                         (place_and_route.place, {}))
+
+    # Different netlist
+    assert key != NetlistLabels(make_netlist(cache, 19)).get_key(
+        cache, make_system_info(), (place_and_route.place, {}))
+
+    # Dead chip
+    assert key != labels.get_key(cache, make_system_info({(1, 0)}),
+                                 (place_and_route.place, {}))
+
+    # Dead core or link
+    system_info = make_system_info()
+    system_info[(1, 1)] = system_info[(1, 1)]._replace(
+        core_states=[AppState.run, AppState.dead] + [AppState.idle] * 16)
+    assert key != labels.get_key(cache, system_info,
+                                 (place_and_route.place, {}))
+
+    system_info = make_system_info()
+    system_info[(1, 1)] = system_info[(1, 1)]._replace(
+        working_links=set(Links) - {Links.north})
+    assert key != labels.get_key(cache, system_info,
+                                 (place_and_route.place, {}))
+
+    # The amount of free memory varies between boots of the same machine and
+    # doesn't change the key.
+    system_info = make_system_info()
+    system_info[(1, 1)] = system_info[(1, 1)]._replace(
+        largest_free_sdram_block=99 << 20)
+    assert key == labels.get_key(cache, system_info,
+                                 (place_and_route.place, {}))
+
+    # Different placer or arguments
+    assert key != labels.get_key(cache, make_system_info(),
+                                 (place_and_route.place, {"effort": 0.5}))
+    assert key != labels.get_key(cache, make_system_info(),
+                                 (place_and_route.allocate, {}))
+
+    # Placers which can't be identified prevent caching
+    assert labels.get_key(cache, make_system_info(),
+                          (mock.Mock(), {})) is None
+
+
+def test_record_key_changes(tmpdir):
+    """The record of signal identifiers is stored against the machine, but
+    not the netlist or the place and route methods.
+    """
+    cache = BuildCache(str(tmpdir))
+    key = get_record_key(cache, make_system_info())
+
+    assert key == get_record_key(cache, make_system_info())
+    assert key != NetlistLabels(make_netlist(cache)).get_key(
+        cache, make_system_info())
+
+    # Dead chip
+    assert key != get_record_key(cache, make_system_info({(1, 0)}))
+
+
+@pytest.mark.parametrize("dead_chips", [set(), {(1, 0)}])
+def test_place_and_route_uses_cache(tmpdir, dead_chips):
+    """Placing and routing an identical netlist a second time should reuse the
+    results of the first.
+    """
+    cache = BuildCache(str(tmpdir))
+    system_info = make_system_info(dead_chips)
+
+    # Place and route the first netlist
+    place = mock.Mock(wraps=place_and_route.place,
+                      __module__="rig.place_and_route", __name__="place")
+    netlist_a = make_netlist(cache)
+    netlist_a.place_and_route(system_info, place=place)
+    assert place.call_count == 1
+
+    # Place and route a second netlist, this should be retrieved from the
+    # cache.
+    netlist_b = make_netlist(cache)
+    netlist_b.place_and_route(system_info, place=place)
+    assert place.call_count == 1
+
+    # Check the results are equivalent
+    assert (describe_results(netlist_a, NetlistLabels(netlist_a)) ==
+            describe_results(netlist_b, NetlistLabels(netlist_b)))
+
+    # All vertices are placed and the routes refer to the vertices of the
+    # new netlist.
+    assert set(netlist_b.placements) == set(netlist_b.vertices)
+    for tree in itervalues(netlist_b.routes):
+        for _, obj in tree.children:
+            assert not hasattr(obj, "_label") or obj in netlist_b.placements
+
+    # Changing the machine results in the netlist being placed again
+    netlist_c = make_netlist(cache)
+    netlist_c.place_and_route(make_system_info({(0, 1)}), place=place)
+    assert place.call_count == 2
+    assert (0, 1) not in set(itervalues(netlist_c.placements))
+
+
+def get_operator(netlist, application):
+    """Get the operator and the first vertex of the operator with the given
+    application.
+    """
+    for op, vxs in iteritems(netlist.operator_vertices):
+        if vxs[0].application == application:
+            return op, vxs[0]
+
+
+def make_pinned_netlist(build_cache):
+    """Make a netlist in which "b" and "c" are placed on the same chip."""
+    netlist = make_netlist(build_cache)
+    _, vx_b = get_operator(netlist, "app_b")
+    netlist.constraints.append(LocationConstraint(vx_b, (1, 1)))
+    return netlist
+
+
+def make_modified_netlist(netlist):
+    """Make a netlist with the same vertices as a netlist which has been
+    placed and routed, and an additional signal from "c" to "b", along with
+    place and route methods which reproduce the results of placing and
+    routing the original netlist.
+    """
+    nets = dict()
+    new_signals = dict()
+    for signal, net in iteritems(netlist.nets):
+        new_signal = Signal(signal.source, signal.sinks,
+                            SignalParameters(weight=signal.weight))
+        nets[new_signal] = NMNet(net.sources, net.sinks, net.weight)
+        new_signals[signal] = new_signal
+
+    # Add the new signal
+    op_b, vx_b = get_operator(netlist, "app_b")
+    op_c, vx_c = get_operator(netlist, "app_c")
+    sig_cb = Signal(op_c, [op_b], SignalParameters(weight=1))
+    nets[sig_cb] = NMNet(vx_c, vx_b, 1)
+
+    new_netlist = Netlist(
+        nets=nets,
+        operator_vertices=netlist.operator_vertices,
+        keyspaces=KeyspaceContainer(),
+        constraints=netlist.constraints,
+        signal_id_constraints={
+            new_signals[u]: {new_signals[v] for v in vs} for u, vs in
+            iteritems(netlist.signal_id_constraints)
+        },
+        build_cache=netlist.build_cache,
+    )
+
+    # Reuse the placements and routes of the original netlist
+    def place(vertices_resources, nets, machine, constraints):
+        return netlist.placements
+
+    def allocate(vertices_resources, nets, machine, constraints, placements):
+        return netlist.allocations
+
+    old_routes = {(tree.chip, tuple(net.sinks)): tree for net, tree in
+                  iteritems(netlist.routes)}
+
+    def route(vertices_resources, nets, machine, constraints, placements,
+              allocations):
+        routes = dict()
+        for net in nets:
+            key = (placements[net.source], tuple(net.sinks))
+            if key in old_routes:
+                routes[net] = old_routes[key]
+            else:
+                core = allocations[vx_b][Cores].start
+                routes[net] = RoutingTree(placements[vx_b],
+                                          [(Routes.core(core), vx_b)])
+        return routes
+
+    return new_netlist, {vx_b, vx_c}, place, allocate, route
+
+
+def test_record_used_by_modified_netlist(tmpdir):
+    """The record of the previous netlist placed and routed onto a machine
+    should be used to keep the keys of a modified netlist the same.
+    """
+    cache = BuildCache(str(tmpdir))
+    system_info = make_system_info()
+
+    netlist_a = make_pinned_netlist(cache)
+    netlist_a.place_and_route(system_info)
+    assert netlist_a.changed_vertices == set(netlist_a.vertices)
+
+    # The record is stored against the machine
+    record_key = get_record_key(cache, system_info)
+    assert cache.get(record_key) == netlist_a.record
+
+    # Only the vertices at either end of the new signal are changed
+    netlist_b, changed, place, allocate, route = \
+        make_modified_netlist(netlist_a)
+    netlist_b.place_and_route(system_info, place=place, allocate=allocate,
+                              route=route)
+    assert netlist_b.changed_vertices == changed
+    assert cache.get(record_key) == netlist_b.record
+
+    # The keys of the unchanged signals are the same
+    keys_a = {(tree.chip, tuple(net.sinks)): netlist_a.net_keys[net]
+              for net, tree in iteritems(netlist_a.routes)}
+    for net, tree in iteritems(netlist_b.routes):
+        if not changed.intersection(net.sinks):
+            assert (netlist_b.net_keys[net] ==
+                    keys_a[(tree.chip, tuple(net.sinks))])
+
+
+def test_load_application_reuses_routing_tables(tmpdir):
+    """Routing tables which are identical to those loaded by the previous
+    build onto the same machine should not be minimised again.
+    """
+    cache = BuildCache(str(tmpdir))
+    system_info = make_system_info()
+    controller = mock.Mock()
+
+    netlist_a = make_pinned_netlist(cache)
+    netlist_a.place_and_route(system_info)
+    with mock.patch("nengo_spinnaker.netlist.netlist.minimise_tables",
+                    wraps=minimise_tables) as minimise, \
+            mock.patch("nengo_spinnaker.netlist.netlist."
+                       "sdram_alloc_for_vertices", return_value={}):
+        netlist_a.load_application(controller, system_info)
+        (tables, _, _, _), _ = minimise.call_args
+        assert (1, 1) in tables
+        assert set(netlist_a.record["routing_tables"]) == set(tables)
+
+        # Remove one table from the record, only this table should be looked
+        # up in the cache of minimised tables when the modified netlist is
+        # loaded.
+        record_key = get_record_key(cache, system_info)
+        record = cache.get(record_key)
+        del record["routing_tables"][(1, 1)]
+        cache.set(record_key, record)
+
+        netlist_b, _, place, allocate, route = \
+            make_modified_netlist(netlist_a)
+        netlist_b.place_and_route(system_info, place=place,
+                                  allocate=allocate, route=route)
+        with mock.patch.object(cache, "key", wraps=cache.key) as key:
+            netlist_b.load_application(controller, system_info)
+
+        tables = [args[1] for args, _ in key.call_args_list if
+                  args[0] == "minimise_table"]
+        assert len(tables) == 1
+        assert (sorted(tables[0], key=lambda e: e.key) ==
+                netlist_a.record["routing_tables"][(1, 1)][0])
+
+    assert ({chip: t for chip, (t, _) in
+             iteritems(netlist_b.record["routing_tables"])} ==
+            {chip: t for chip, (t, _) in
+             iteritems(netlist_a.record["routing_tables"])})
+    assert cache.get(record_key) == netlist_b.record
+
+    # All the tables were loaded
+    assert controller.load_routing_table_entries.call_count == \
+        2 * len(netlist_a.record["routing_tables"])
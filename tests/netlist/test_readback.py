@@ -0,0 +1,249 @@
+import collections
+import mock
+import pytest
+from rig.machine_control.machine_controller import ChipInfo, MemoryIO
+import threading
+import time
+
+from nengo_spinnaker.netlist import Netlist, Vertex
+from nengo_spinnaker.netlist.readback import Read, coalesce_reads, read_all
+
+
+class MockController(object):
+    """Controller which serves reads from a fake SDRAM and counts the number
+    of requests made and the maximum number of concurrent requests through
+    each connection.  There are connections to the given boards, and a
+    default connection.
+
+    If `n_wait` is given then each read waits (for at most `timeout` seconds)
+    until `n_wait` reads are in progress at once.
+    """
+    def __init__(self, board_of=lambda x, y: (0, 0), n_wait=0, timeout=5.0,
+                 boards=()):
+        self.board_of = board_of
+        self.connections = {board: board for board in boards}
+        self.connections[None] = None
+        self.n_wait = n_wait
+        self.timeout = timeout
+        self.reads = list()
+        self.concurrent = collections.defaultdict(int)
+        self.max_concurrent = collections.defaultdict(int)
+        self.max_total_concurrent = 0
+        self.lock = threading.Condition()
+
+    @staticmethod
+    def memory(address, n_bytes, x, y):
+        """Contents of the fake memory."""
+        return bytes(bytearray((a + x + y) % 256
+                               for a in range(address, address + n_bytes)))
+
+    def read(self, address, length_bytes, x, y, p=0):
+        # Boards without their own connection share the default connection
+        board = self.board_of(x, y)
+        connection = board if board in self.connections else None
+        with self.lock:
+            self.reads.append((address, length_bytes, x, y))
+            self.concurrent[connection] += 1
+            self.max_concurrent[connection] = max(
+                self.max_concurrent[connection], self.concurrent[connection])
+            total = sum(self.concurrent.values())
+            self.max_total_concurrent = max(self.max_total_concurrent, total)
+            self.lock.notify_all()
+
+            # Wait for other reads to start
+            deadline = time.time() + self.timeout
+            while (self.max_total_concurrent < self.n_wait and
+                    time.time() < deadline):
+                self.lock.wait(deadline - time.time())
+
+            self.concurrent[connection] -= 1
+
+        return self.memory(address, length_bytes, x, y)
+
+
+class TestCoalesceReads(object):
+    def test_merges_contiguous_and_overlapping(self):
+        reads = [Read(0, 0, 0x110, 0x10),
+                 Read(0, 0, 0x100, 0x10),
+                 Read(0, 0, 0x118, 0x10),  # Overlaps previous read
+                 Read(0, 0, 0x200, 0x4),
+                 Read(1, 0, 0x128, 0x4)]  # Different chip
+
+        blocks = coalesce_reads(reads)
+        assert [b for b, _ in blocks] == [Read(0, 0, 0x100, 0x28),
+                                          Read(0, 0, 0x200, 0x4),
+                                          Read(1, 0, 0x128, 0x4)]
+        assert blocks[0][1] == [(Read(0, 0, 0x100, 0x10), 0x00),
+                                (Read(0, 0, 0x110, 0x10), 0x10),
+                                (Read(0, 0, 0x118, 0x10), 0x18)]
+
+    @pytest.mark.parametrize("max_gap, n_blocks", [(0, 2), (4, 2), (8, 1)])
+    def test_max_gap(self, max_gap, n_blocks):
+        reads = [Read(0, 0, 0x100, 0x10), Read(0, 0, 0x118, 0x10)]
+        assert len(coalesce_reads(reads, max_gap)) == n_blocks
+
+
+class TestReadAll(object):
+    def test_data_and_coalescing(self):
+        controller = MockController()
+        reads = {
+            "a": Read(0, 0, 0x1000, 12),
+            "b": Read(0, 0, 0x100c, 8),
+            "c": Read(0, 1, 0x1000, 4),
+            "d": Read(0, 0, 0x2000, 4),
+        }
+
+        data = read_all(controller, reads)
+
+        # Check the data is correct
+        for key, read in reads.items():
+            assert data[key] == MockController.memory(
+                read.address, read.n_bytes, read.x, read.y)
+
+        # Check that "a" and "b" were read together
+        assert sorted(controller.reads) == [(0x1000, 4, 0, 1),
+                                            (0x1000, 20, 0, 0),
+                                            (0x2000, 4, 0, 0)]
+
+    def test_parallel_across_boards(self):
+        """Reads to different boards should be overlapped, reads to the same
+        board should not.
+        """
+        n_boards, n_chips = 4, 3
+        system_info = {(x, y): ChipInfo(local_ethernet_chip=(x, 0))
+                       for x in range(n_boards) for y in range(n_chips)}
+
+        def board_of(x, y):
+            return system_info[(x, y)].local_ethernet_chip
+
+        reads = {(x, y): Read(x, y, 0x1000, 64) for (x, y) in system_info}
+
+        boards = set(board_of(x, y) for (x, y) in system_info)
+
+        # Reads made one at a time
+        controller = MockController(board_of, boards=boards)
+        data_seq = read_all(controller, reads, system_info, n_threads=1)
+        assert controller.max_total_concurrent == 1
+
+        # Each read waits until one read to every board is in progress
+        controller = MockController(board_of, n_wait=n_boards, boards=boards)
+        data_par = read_all(controller, reads, system_info)
+
+        assert data_seq == data_par
+        assert len(controller.reads) == n_boards * n_chips
+
+        # Each board only served one request at once, but boards were read
+        # in parallel
+        assert max(controller.max_concurrent.values()) == 1
+        assert controller.max_total_concurrent == n_boards
+
+    def test_shared_connection(self):
+        """Reads to boards without their own connections share the default
+        connection, which must only be used by one thread at once.
+        """
+        n_boards, n_chips = 4, 3
+        system_info = {(x, y): ChipInfo(local_ethernet_chip=(x, 0))
+                       for x in range(n_boards) for y in range(n_chips)}
+
+        def board_of(x, y):
+            return system_info[(x, y)].local_ethernet_chip
+
+        reads = {(x, y): Read(x, y, 0x1000, 64) for (x, y) in system_info}
+
+        # Only the first two boards have their own connections, each read
+        # waits (briefly) for reads through other connections to start.
+        controller = MockController(board_of, n_wait=n_boards, timeout=0.05,
+                                    boards=[(0, 0), (1, 0)])
+        data = read_all(controller, reads, system_info)
+
+        assert data == {key: MockController.memory(read.address,
+                                                   read.n_bytes, *key)
+                        for key, read in reads.items()}
+        assert max(controller.max_concurrent.values()) == 1
+        assert controller.max_total_concurrent == 3
+
+
+class TestNetlistAfterSimulation(object):
+    def test_recorded_data_prefetched(self):
+        """Check that recorded data is read for all vertices before the
+        after simulation functions are called.
+        """
+        controller = MockController()
+
+        class RecordingVertex(Vertex):
+            def __init__(self, mem):
+                super(RecordingVertex, self).__init__("rec")
+                self.mem = mem
+
+            def get_recording_reads(self, n_steps):
+                return {"rec": (self.mem, 4 * n_steps),
+                        "empty": (self.mem[0:0], 4 * n_steps)}
+
+        # Adjacent regions on the same chip and a region elsewhere
+        v_a = RecordingVertex(MemoryIO(controller, 0, 0, 0x100, 0x128))
+        v_b = RecordingVertex(MemoryIO(controller, 0, 0, 0x128, 0x150))
+        v_c = RecordingVertex(MemoryIO(controller, 1, 0, 0x100, 0x200))
+        v_d = Vertex("no recording")
+
+        # Check the data is in place when the functions are called
+        def after_fn(netlist, simulator, n_steps):
+            for v in (v_a, v_b, v_c):
+                assert v.recorded_data == {"rec": MockController.memory(
+                    v.mem.address, 4 * n_steps, *netlist.placements[v])}
+            assert v_d.recorded_data == {}
+
+        after_fn = mock.Mock(wraps=after_fn)
+
+        netlist = Netlist(nets=[],
+                          operator_vertices={0: (v_a, v_b), 1: (v_c, v_d)},
+                          keyspaces={},
+                          after_simulation_functions=[after_fn])
+        netlist.placements = {v_a: (0, 0), v_b: (0, 0), v_c: (1, 0),
+                              v_d: (1, 0)}
+
+        simulator = mock.Mock()
+        simulator.controller = controller
+        netlist.after_simulation(simulator, 10)
+
+        after_fn.assert_called_once_with(netlist, simulator, 10)
+
+        # Reads of the two adjacent regions should have been merged
+        assert sorted(controller.reads) == [(0x100, 40, 1, 0),
+                                            (0x100, 80, 0, 0)]
+
+    def test_circular_buffers(self):
+        """Check that data which wraps around the end of a circular recording
+        buffer is reassembled in order.
+        """
+        controller = MockController()
+
+        class RecordingVertex(Vertex):
+            def __init__(self, mem):
+                super(RecordingVertex, self).__init__("rec")
+                self.mem = mem
+
+            def get_recording_reads(self, n_steps):
+                return {"rec": (self.mem, 8 * n_steps)}
+
+        # A buffer of 8 frames of 8 bytes
+        vertex = RecordingVertex(MemoryIO(controller, 0, 0, 0x100, 0x140))
+        netlist = Netlist(nets=[], operator_vertices={0: (vertex, )},
+                          keyspaces={})
+        netlist.placements = {vertex: (0, 0)}
+
+        simulator = mock.Mock()
+        simulator.controller = controller
+
+        # Frames 14 to 18 occupy the last two and first three frames
+        netlist.after_simulation(simulator, 5, start_frame=14)
+        assert vertex.recorded_data == {"rec": (
+            MockController.memory(0x130, 16, 0, 0) +
+            MockController.memory(0x100, 24, 0, 0)
+        )}
+
+        # Frames which don't wrap are read in one go
+        del controller.reads[:]
+        netlist.after_simulation(simulator, 4, start_frame=9)
+        assert vertex.recorded_data == {
+            "rec": MockController.memory(0x108, 32, 0, 0)}
+        assert controller.reads == [(0x108, 32, 0, 0)]
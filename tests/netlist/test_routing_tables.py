@@ -0,0 +1,181 @@
+import mock
+import numpy as np
+import pytest
+import threading
+import time
+
+from rig.place_and_route.routing_tree import RoutingTree
+from rig.routing_table import (MinimisationFailedError, Routes,
+                               minimise_table, routing_tree_to_tables,
+                               table_is_subset_of)
+import rig.routing_table
+from six import iteritems
+
+from nengo_spinnaker.netlist import routing_tables
+from nengo_spinnaker.netlist.routing_tables import minimise_tables
+
+
+def make_routing_trees(n_nets, width, height, n_sinks, seed):
+    """Make dimension-order routes from random source chips to random sink
+    chips and a key and mask for each, the keys of nets from the same chip
+    share a prefix.
+    """
+    rng = np.random.RandomState(seed)
+    routes = dict()
+    net_keys = dict()
+
+    for net in range(n_nets):
+        source = (rng.randint(width), rng.randint(height))
+        root = RoutingTree(source)
+        nodes = {source: root}
+
+        for _ in range(rng.randint(1, n_sinks + 1)):
+            sink = (rng.randint(width), rng.randint(height))
+
+            # Travel first along x and then along y
+            (x, y), node = source, root
+            while (x, y) != sink:
+                if x != sink[0]:
+                    direction = Routes.east if x < sink[0] else Routes.west
+                    x += 1 if x < sink[0] else -1
+                else:
+                    direction = Routes.north if y < sink[1] else Routes.south
+                    y += 1 if y < sink[1] else -1
+
+                if (x, y) not in nodes:
+                    nodes[(x, y)] = RoutingTree((x, y))
+                    node.children.append((direction, nodes[(x, y)]))
+                node = nodes[(x, y)]
+
+            node.children.append((Routes.core(rng.randint(1, 17)), object()))
+
+        routes[net] = root
+        net_keys[net] = ((source[0] << 24) | (source[1] << 16) | net,
+                         0xffffffff)
+
+    return routes, net_keys
+
+
+def assert_equivalent(original, minimised, target_length):
+    """Assert that minimised tables route every key of the original tables
+    as the original tables do and that they fit.
+    """
+    assert set(minimised) == set(original)
+    for chip, table in minimised.items():
+        assert table_is_subset_of(original[chip], table)
+        assert len(table) <= target_length
+
+
+@pytest.fixture(scope="module")
+def tables():
+    """Tables of between 36 and 104 entries."""
+    routes, net_keys = make_routing_trees(300, 6, 6, 5, seed=1)
+    return dict(routing_tree_to_tables(routes, net_keys))
+
+
+@pytest.mark.parametrize("n_processes", [1, 3])
+@pytest.mark.parametrize("time_budget, full", [(0.0, False), (None, True),
+                                               (60.0, True)])
+def test_minimise_tables(tables, n_processes, time_budget, full):
+    """Tables which don't fit should be minimised until they fit or, given a
+    time budget, as far as possible, and tables should be generated in order
+    of decreasing size when minimised in this process.
+    """
+    minimised = list(minimise_tables(tables, 70, n_processes, time_budget))
+
+    assert_equivalent(tables, dict(minimised), 70)
+    for chip, table in minimised:
+        if len(tables[chip]) < 70:
+            assert table is tables[chip] or table == tables[chip]
+        else:
+            assert table == minimise_table(tables[chip], None if full else 70)
+
+    if n_processes == 1:
+        sizes = [len(tables[chip]) for chip, _ in minimised]
+        assert sizes == sorted(sizes, reverse=True)
+
+
+def test_target_lengths_dict(tables):
+    """Target lengths may be given for each chip, tables with no target are
+    minimised as far as possible.
+    """
+    target_lengths = {chip: 1024 for chip in tables}
+    no_target = sorted(tables)[:5]
+    for chip in no_target:
+        target_lengths[chip] = None
+
+    with mock.patch.object(routing_tables, "minimise_table",
+                           side_effect=minimise_table) as minimiser:
+        minimised = dict(minimise_tables(tables, target_lengths, 1))
+
+    assert_equivalent(tables, minimised, 1024)
+    assert minimiser.call_count == len(no_target)
+    for chip in no_target:
+        assert len(minimised[chip]) < len(tables[chip])
+
+
+@pytest.mark.parametrize("n_processes", [1, 2])
+def test_time_budget(tables, n_processes):
+    """If a table can't be minimised as far as possible within the budget it
+    should be minimised only until it fits.
+    """
+    def slow_minimise_table(table, target_length):
+        if target_length is None:
+            time.sleep(10.0)
+            raise AssertionError("Minimisation was not interrupted")
+        return minimise_table(table, target_length)
+
+    with mock.patch.object(routing_tables, "minimise_table",
+                           slow_minimise_table):
+        minimised = dict(minimise_tables(tables, 70, n_processes,
+                                         time_budget=0.01))
+
+    assert_equivalent(tables, minimised, 70)
+    for chip, table in iteritems(minimised):
+        assert table == minimise_table(tables[chip], 70)
+
+
+@pytest.mark.parametrize("n_processes", [1, 2])
+def test_minimisation_fails(tables, n_processes):
+    chip = max(tables, key=lambda c: len(tables[c]))
+    target_lengths = {c: 1024 for c in tables}
+    target_lengths[chip] = 10
+
+    with pytest.raises(MinimisationFailedError) as excinfo:
+        list(minimise_tables(tables, target_lengths, n_processes))
+
+    assert excinfo.value.chip == chip
+    assert excinfo.value.target_length == 10
+    assert excinfo.value.final_length > 10
+
+
+def test_time_limit_not_main_thread():
+    """The time budget can't be enforced outside the main thread, so tables
+    are minimised without a limit.
+    """
+    def minimise():
+        with routing_tables._time_limit(0.001):
+            time.sleep(0.01)
+        finished.append(True)
+
+    finished = list()
+    thread = threading.Thread(target=minimise)
+    thread.start()
+    thread.join()
+    assert finished == [True]
+
+
+def test_minimise_tables_large():
+    """Building and minimising the tables for a machine of 64 chips should
+    give the same result as rig's serial minimiser.
+    """
+    routes, net_keys = make_routing_trees(800, 8, 8, 5, seed=2)
+    tables = dict(routing_tree_to_tables(routes, net_keys))
+
+    reference = rig.routing_table.minimise_tables(tables, 120)
+    minimised = dict(minimise_tables(tables, 120))
+    compacted = dict(minimise_tables(tables, 120, time_budget=1.0))
+
+    assert_equivalent(tables, minimised, 120)
+    assert minimised == reference
+    assert_equivalent(tables, compacted, 120)
@@ -0,0 +1,273 @@
+import collections
+import numpy as np
+import pytest
+from rig.machine_control.machine_controller import ChipInfo, MemoryIO
+import threading
+import time
+
+from nengo_spinnaker import regions
+from nengo_spinnaker.netlist.staging import (WriteStage, StagedMemoryIO,
+                                             flush_stages)
+from nengo_spinnaker.regions.utils import (
+    Args, create_app_ptr_and_region_files_named, sizeof_regions_named)
+
+
+class MockController(object):
+    """Controller with a fake SDRAM which counts the number of writes made
+    and the maximum number of concurrent writes through each connection.
+    There are connections to the given boards, and a default connection.
+
+    If `n_wait` is given then each write waits (for at most `timeout`
+    seconds) until `n_wait` writes are in progress at once.
+    """
+    def __init__(self, board_of=lambda x, y: (0, 0), n_wait=0, timeout=5.0,
+                 boards=()):
+        self.board_of = board_of
+        self.connections = {board: board for board in boards}
+        self.connections[None] = None
+        self.n_wait = n_wait
+        self.timeout = timeout
+        self.memory = collections.defaultdict(lambda: bytearray(0x10000))
+        self.n_writes = 0
+        self.n_reads = 0
+        self.concurrent = collections.defaultdict(int)
+        self.max_concurrent = collections.defaultdict(int)
+        self.max_total_concurrent = 0
+        self.lock = threading.Condition()
+
+    def write(self, address, data, x, y, p=0):
+        # Boards without their own connection share the default connection
+        board = self.board_of(x, y)
+        connection = board if board in self.connections else None
+        with self.lock:
+            self.n_writes += 1
+            self.concurrent[connection] += 1
+            self.max_concurrent[connection] = max(
+                self.max_concurrent[connection], self.concurrent[connection])
+            total = sum(self.concurrent.values())
+            self.max_total_concurrent = max(self.max_total_concurrent, total)
+            self.lock.notify_all()
+
+            # Wait for other writes to start
+            deadline = time.time() + self.timeout
+            while (self.max_total_concurrent < self.n_wait and
+                    time.time() < deadline):
+                self.lock.wait(deadline - time.time())
+
+            self.memory[(x, y)][address:address + len(data)] = data
+            self.concurrent[connection] -= 1
+
+    def read(self, address, length_bytes, x, y, p=0):
+        self.n_reads += 1
+        return bytes(self.memory[(x, y)][address:address + length_bytes])
+
+
+class TestWriteStage(object):
+    def test_get_blocks(self):
+        controller = MockController()
+        stage = WriteStage(MemoryIO(controller, 0, 0, 0x100, 0x200), 0, 0)
+        assert stage.address == 0x100
+
+        stage.write(4, b"\x01\x02\x03\x04")
+        stage.write(0, b"\xff" * 4)
+        stage.write(6, b"\xaa")  # Overwrites earlier data
+        stage.write(0x20, b"\x05")
+        stage.write(0x40, b"\x06")
+
+        assert stage.get_blocks() == [
+            (0, b"\xff\xff\xff\xff\x01\x02\xaa\x04"),
+            (0x20, b"\x05"),
+            (0x40, b"\x06"),
+        ]
+
+    def test_gaps_not_written(self):
+        """Memory between staged writes should be left untouched."""
+        controller = MockController()
+        controller.memory[(0, 0)][0x100:0x200] = b"\xee" * 0x100
+        stage = WriteStage(MemoryIO(controller, 0, 0, 0x100, 0x200), 0, 0)
+
+        stage.write(0, b"\x01\x02")
+        stage.write(4, b"\x03\x04")
+        stage.flush()
+
+        assert controller.n_writes == 2
+        assert (controller.memory[(0, 0)][0x100:0x108] ==
+                b"\x01\x02\xee\xee\x03\x04\xee\xee")
+
+    def test_flush(self):
+        controller = MockController()
+        stage = WriteStage(MemoryIO(controller, 0, 0, 0x100, 0x200), 0, 0)
+        stage.write(0, b"\x01\x02")
+        stage.write(2, b"\x03\x04")
+
+        # Nothing written until flushed
+        assert controller.n_writes == 0
+        stage.flush()
+        assert controller.n_writes == 1
+        assert controller.memory[(0, 0)][0x100:0x104] == b"\x01\x02\x03\x04"
+
+        # Flushing again does nothing
+        stage.flush()
+        assert controller.n_writes == 1
+
+
+class TestStagedMemoryIO(object):
+    @pytest.fixture
+    def controller(self):
+        return MockController()
+
+    @pytest.fixture
+    def stage(self, controller):
+        return WriteStage(MemoryIO(controller, 1, 2, 0x100, 0x140), 1, 2)
+
+    def test_file_like(self, stage):
+        mem = StagedMemoryIO(stage)
+        assert len(mem) == 0x40
+        assert mem.address == 0x100
+
+        # Slices
+        sub = mem[0x10:0x20]
+        assert len(sub) == 0x10
+        assert sub.address == 0x110
+        assert len(sub[4:]) == 0xc
+        assert sub[4:].address == 0x114
+
+        # Seeking
+        sub.seek(4)
+        assert sub.tell() == 4 and sub.address == 0x114
+        sub.seek(4, 1)
+        assert sub.tell() == 8
+        sub.seek(2, 2)
+        assert sub.tell() == 0xe
+
+        with pytest.raises(ValueError):
+            sub.seek(0, 3)
+
+        with pytest.raises(ValueError):
+            mem[0:10:2]
+
+    def test_writes_staged_until_flushed(self, controller, stage):
+        mem = StagedMemoryIO(stage)
+        sub = mem[0x10:0x14]
+
+        assert sub.write(b"\x01\x02") == 2
+        with pytest.warns(Warning):
+            assert sub.write(b"\x03\x04\x05") == 2  # Truncated
+        assert controller.n_writes == 0
+
+        # Reading flushes the staged writes
+        sub.seek(0)
+        assert sub.read() == b"\x01\x02\x03\x04"
+        assert controller.n_writes == 1
+
+        # Subsequent writes go straight through
+        sub.seek(0)
+        sub.write(b"\xff")
+        assert controller.n_writes == 2
+        assert controller.memory[(1, 2)][0x110:0x114] == b"\xff\x02\x03\x04"
+
+
+def test_staged_region_writes_round_trips():
+    """Compare the number of writes made when loading regions directly to
+    memory with the number made when staging the writes.
+    """
+    n_vertices = 8
+
+    # Create some regions for each vertex
+    region_dict = {
+        1: regions.MatrixRegion(np.arange(32, dtype=np.uint32),
+                                prepend_n_rows=True),
+        2: regions.MatrixRegion(np.ones((4, 8), dtype=np.uint32),
+                                prepend_n_rows=True, prepend_n_columns=True),
+        3: regions.MatrixRegion(np.zeros(0, dtype=np.uint32),
+                                prepend_n_rows=True),
+        4: regions.WordRecordingRegion(10),  # Unwritten
+        5: regions.MatrixRegion(np.arange(16, dtype=np.uint32),
+                                prepend_n_rows=True),
+    }
+    region_args = {k: Args(slice(0, 16)) for k in region_dict}
+    size = sizeof_regions_named(region_dict, region_args)
+
+    def load(memories):
+        for mem in memories:
+            region_memory = create_app_ptr_and_region_files_named(
+                mem, region_dict, region_args)
+            for k, region in region_dict.items():
+                args, kwargs = region_args[k]
+                region.write_subregion_to_file(region_memory[k], *args,
+                                               **kwargs)
+
+    def memories(controller):
+        return [MemoryIO(controller, 0, i, 0x1000, 0x1000 + size)
+                for i in range(n_vertices)]
+
+    # Load directly
+    direct = MockController()
+    load(memories(direct))
+
+    # Load with staging
+    staged = MockController()
+    stages = [WriteStage(mem, 0, i)
+              for i, mem in enumerate(memories(staged))]
+    load(StagedMemoryIO(stage) for stage in stages)
+    assert staged.n_writes == 0
+    flush_stages(stages, staged)
+
+    # The same data should be written with one write per vertex for the
+    # regions on either side of the unwritten recording region.
+    assert staged.memory == direct.memory
+    assert staged.n_writes == 2 * n_vertices
+    # (directly, the pointer table and each written region is a write)
+    assert direct.n_writes == 5 * n_vertices
+    assert staged.n_reads == direct.n_reads == 0
+
+
+def test_flush_stages_parallel_across_boards():
+    """Writes to different boards should be overlapped, writes to the same
+    board should not.
+    """
+    n_boards, n_chips = 4, 2
+    system_info = {(x, y): ChipInfo(local_ethernet_chip=(x, 0))
+                   for x in range(n_boards) for y in range(n_chips)}
+    controller = MockController(
+        lambda x, y: system_info[(x, y)].local_ethernet_chip,
+        n_wait=n_boards,
+        boards=set(chip.local_ethernet_chip for chip in system_info.values())
+    )
+
+    stages = list()
+    for (x, y) in system_info:
+        stage = WriteStage(MemoryIO(controller, x, y, 0x0, 0x100), x, y)
+        StagedMemoryIO(stage).write(b"\x01" * 16)
+        stages.append(stage)
+
+    flush_stages(stages, controller, system_info)
+
+    assert controller.n_writes == n_boards * n_chips
+    assert max(controller.max_concurrent.values()) == 1
+    assert controller.max_total_concurrent == n_boards
+
+
+def test_flush_stages_shared_connection():
+    """Writes to boards without their own connections share the default
+    connection, which must only be used by one thread at once.
+    """
+    n_boards, n_chips = 4, 2
+    system_info = {(x, y): ChipInfo(local_ethernet_chip=(x, 0))
+                   for x in range(n_boards) for y in range(n_chips)}
+    controller = MockController(
+        lambda x, y: system_info[(x, y)].local_ethernet_chip,
+        n_wait=n_boards, timeout=0.05, boards=[(0, 0), (1, 0)]
+    )
+
+    stages = list()
+    for (x, y) in system_info:
+        stage = WriteStage(MemoryIO(controller, x, y, 0x0, 0x100), x, y)
+        StagedMemoryIO(stage).write(b"\x01" * 16)
+        stages.append(stage)
+
+    flush_stages(stages, controller, system_info)
+
+    assert controller.n_writes == n_boards * n_chips
+    assert max(controller.max_concurrent.values()) == 1
+    assert controller.max_total_concurrent == 3
@@ -0,0 +1,258 @@
+import collections
+import mock
+import numpy as np
+import pkg_resources
+import pytest
+from rig.machine_control import struct_file
+from rig.machine_control.machine_controller import MemoryIO
+from rig.place_and_route import Cores
+import struct
+import threading
+import time
+
+from nengo_spinnaker.netlist import Netlist, Vertex
+from nengo_spinnaker.netlist.netlist import CIRCULAR_RECORDING_CAPABILITY
+from nengo_spinnaker.netlist.streaming import RecordingReader
+
+
+class StandInMachine(object):
+    """Stand-in for a machine controller which holds the memory of some chips,
+    including the VCPU structs of their cores.
+    """
+    structs = struct_file.read_struct_file(
+        pkg_resources.resource_string("rig", "boot/sark.struct"))
+    vcpu_base = 0x8000
+    connections = {None: None}
+
+    def __init__(self):
+        self.sdram = collections.defaultdict(lambda: bytearray(0x10000))
+        self.n_reads = 0
+        self.lock = threading.Lock()
+
+    def read(self, address, length_bytes, x, y, p=0):
+        with self.lock:
+            self.n_reads += 1
+            mem = self.sdram[(x, y)]
+            return bytes(mem[address:address + length_bytes])
+
+    def write(self, address, data, x, y, p=0):
+        with self.lock:
+            self.sdram[(x, y)][address:address + len(data)] = data
+
+    def read_struct_field(self, struct_name, field_name, x, y, p=0):
+        assert (struct_name, field_name) == ("sv", "vcpu_base")
+        return self.vcpu_base
+
+    def write_vcpu_struct_field(self, field_name, value, x, y, p):
+        vcpu = self.structs[b"vcpu"]
+        field = vcpu[field_name.encode("ascii")]
+        self.write(self.vcpu_base + vcpu.size * p + field.offset,
+                   struct.pack(b"<" + field.pack_chars, value), x, y)
+
+
+class StandInRecordingCore(object):
+    """Stand-in for an executable which records a frame of `width` words each
+    time step into a circular buffer, as the executables do.
+
+    The words of the frame recorded in time step `t` all take the value `t`.
+    """
+    def __init__(self, machine, x, y, p, address, width, n_frames):
+        self.machine = machine
+        self.x, self.y, self.p = x, y, p
+        self.address = address
+        self.width = width
+        self.n_frames = n_frames
+        self.ticks = 0
+
+    def step(self, n_ticks=1):
+        for _ in range(n_ticks):
+            offset = (self.ticks % self.n_frames) * self.width * 4
+            frame = np.zeros(self.width, dtype=np.uint32) + self.ticks
+            self.machine.write(self.address + offset, frame.tostring(),
+                               self.x, self.y)
+            self.ticks += 1
+            self.machine.write_vcpu_struct_field("user3", self.ticks,
+                                                 self.x, self.y, self.p)
+
+
+class RecordingVertex(Vertex):
+    def __init__(self, mem, width):
+        super(RecordingVertex, self).__init__("rec")
+        self.mem = mem
+        self.width = width
+
+    def get_recording_reads(self, n_steps):
+        return {"rec": (self.mem, 4 * self.width * n_steps)}
+
+
+def make_netlist(machine, n_frames, widths=(3, 5)):
+    """Make a netlist of recording vertices and stand-in cores for them, the
+    data recorded by each vertex is accumulated in `netlist.recorded`.
+    """
+    cores = list()
+    vertices = list()
+    for i, width in enumerate(widths):
+        core = StandInRecordingCore(machine, i, 0, 1, 0x100, width, n_frames)
+        mem = MemoryIO(machine, i, 0, 0x100, 0x100 + 4 * width * n_frames)
+        cores.append(core)
+        vertices.append(RecordingVertex(mem, width))
+
+    def after_fn(netlist, simulator, n_steps):
+        for v in vertices:
+            data = np.frombuffer(v.recorded_data.pop("rec"), dtype=np.uint32)
+            netlist.recorded[v].append(data.reshape(n_steps, v.width))
+            netlist.chunks.append(n_steps)
+
+    netlist = Netlist(nets=[], operator_vertices={0: tuple(vertices)},
+                      keyspaces={}, after_simulation_functions=[after_fn])
+    for i, v in enumerate(vertices):
+        netlist.placements[v] = (i, 0)
+        netlist.allocations[v] = {Cores: slice(1, 2)}
+    netlist.recorded = {v: list() for v in vertices}
+    netlist.chunks = list()
+
+    return netlist, cores
+
+
+def check_recorded(netlist, start, stop):
+    """Check that the frames recorded by each vertex are those of the given
+    time steps.
+    """
+    for v, chunks in netlist.recorded.items():
+        data = np.vstack(chunks)
+        assert np.all(data == np.arange(start, stop)[:, np.newaxis])
+
+
+def test_get_recorded_frames():
+    """The recorded frames of all the cores of a chip should be read at
+    once.
+    """
+    machine = StandInMachine()
+    netlist, cores = make_netlist(machine, 10, widths=(3, 5, 2))
+
+    # Put the first two cores on the same chip
+    vertex = netlist.operator_vertices[0][1]
+    netlist.placements[vertex] = (0, 0)
+    netlist.allocations[vertex] = {Cores: slice(4, 5)}
+    cores[1].x, cores[1].p = 0, 4
+
+    cores[0].step(5)
+    cores[1].step(4)
+    cores[2].step(6)
+    assert netlist.get_recorded_frames(machine) == 4
+    assert machine.n_reads == 2
+
+
+def test_supports_circular_recording():
+    machine = StandInMachine()
+    netlist, cores = make_netlist(machine, 10)
+    assert not netlist.supports_circular_recording(machine)
+
+    # Every recording core must advertise support
+    machine.write_vcpu_struct_field("user3", CIRCULAR_RECORDING_CAPABILITY,
+                                    0, 0, 1)
+    assert not netlist.supports_circular_recording(machine)
+
+    machine.write_vcpu_struct_field("user3", CIRCULAR_RECORDING_CAPABILITY,
+                                    1, 0, 1)
+    assert netlist.supports_circular_recording(machine)
+
+
+class TestRecordingReader(object):
+    def test_drain(self):
+        machine = StandInMachine()
+        netlist, cores = make_netlist(machine, 10)
+        reader = RecordingReader(netlist, mock.Mock(controller=machine), 10)
+
+        # Nothing is read until something is recorded
+        assert reader.drain() == 0
+
+        # The slowest core limits what is read
+        cores[0].step(7)
+        cores[1].step(6)
+        assert reader.drain() == 6
+        check_recorded(netlist, 0, 6)
+
+        # Data which wraps around the buffers is read in order
+        cores[0].step(7)
+        cores[1].step(8)
+        assert reader.drain() == 8
+        check_recorded(netlist, 0, 14)
+
+        # The final drain reads exactly the requested number of frames
+        cores[0].step(3)
+        cores[1].step(3)
+        assert reader.drain(16) == 2
+        check_recorded(netlist, 0, 16)
+        assert reader.frames_read == 16
+        assert reader.frames_lost == 0
+
+    def test_frame_multiple(self):
+        """Only multiples of the frame multiple are read while the simulation
+        is running.
+        """
+        machine = StandInMachine()
+        netlist, cores = make_netlist(machine, 12)
+        reader = RecordingReader(netlist, mock.Mock(controller=machine), 12,
+                                 frame_multiple=4)
+
+        for core in cores:
+            core.step(7)
+        assert reader.drain() == 4
+
+        for core in cores:
+            core.step(6)
+        assert reader.drain() == 8
+
+        # Except when the simulation is over
+        assert reader.drain(13) == 1
+        check_recorded(netlist, 0, 13)
+        assert netlist.chunks == [4, 4, 8, 8, 1, 1]
+
+    def test_overrun(self):
+        """If the buffers are overwritten before they can be read the oldest
+        data which remains is read and a warning is given.
+        """
+        machine = StandInMachine()
+        netlist, cores = make_netlist(machine, 10)
+        reader = RecordingReader(netlist, mock.Mock(controller=machine), 10)
+
+        for core in cores:
+            core.step(25)
+
+        with mock.patch("nengo_spinnaker.netlist.streaming.logger") as logger:
+            assert reader.drain() == 10
+            assert logger.warning.called
+
+        check_recorded(netlist, 15, 25)
+        assert reader.frames_lost == 15
+        assert reader.frames_read == 25
+
+    @pytest.mark.parametrize("n_frames", [50, 64])
+    def test_streams_while_recording(self, n_frames):
+        """Data recorded into small buffers by cores running concurrently is
+        retrieved completely and in order by the thread.
+        """
+        machine = StandInMachine()
+        netlist, cores = make_netlist(machine, n_frames)
+        reader = RecordingReader(netlist, mock.Mock(controller=machine),
+                                 n_frames, poll_period=0.001)
+        reader.start()
+
+        # Run the cores for many times the length of their buffers, pausing
+        # regularly to allow the reader to keep up.
+        n_ticks = 1000
+        for _ in range(n_ticks // 10):
+            for core in cores:
+                core.step(10)
+            time.sleep(0.002)
+            while cores[0].ticks - reader.frames_read > n_frames // 2:
+                time.sleep(0.001)
+
+        reader.stop()
+        assert not reader.is_alive()
+        reader.drain(n_ticks)
+
+        check_recorded(netlist, 0, n_ticks)
+        assert reader.frames_lost == 0
+        assert len(netlist.chunks) > 2 * n_ticks // n_frames
@@ -1,10 +1,21 @@
+import collections
+import mock
 import nengo
+import numpy as np
 import pytest
+from rig.machine_control.consts import SCP_PORT
+from rig.machine_control.machine_controller import ChipInfo, SystemInfo
+from rig.machine_control.packets import SCPPacket
+from rig.place_and_route import Cores
+import socket
+import threading
+import time
 
 from nengo_spinnaker.builder import Model
 from nengo_spinnaker.builder.ports import OutputPort, InputPort
 from nengo_spinnaker.node_io import ethernet as ethernet_io
 from nengo_spinnaker.operators import SDPReceiver, SDPTransmitter
+from nengo_spinnaker.utils import type_casts as tp
 
 
 @pytest.mark.parametrize("transmission_period", [0.001, 0.002])
@@ -106,3 +117,459 @@ def test_get_spinnaker_sink_for_node_repeated():
 
     assert spec0.target.obj is spec1.target.obj
     assert model.extra_operators == [spec0.target.obj]
+
+
+def reference_send(outgoing, value):
+    """Packets which would be sent for the outgoing connections of a Node by
+    transmitting the values of each connection separately, the values for
+    connections received by the same core are sent in one packet.
+    """
+    core_data = collections.OrderedDict()
+    for (pre_slice, function, transform), (x, y, p) in outgoing:
+        c_value = value[pre_slice]
+        if function is not None:
+            c_value = np.asarray(function(c_value), dtype=float).reshape(-1)
+        c_value = np.dot(transform, c_value)
+
+        core_data.setdefault((x, y, p), list()).append(
+            bytes(tp.np_to_fix(c_value).data))
+
+    packets = list()
+    for (x, y, p), data in core_data.items():
+        packet = SCPPacket(dest_port=1, dest_cpu=p, dest_x=x, dest_y=y,
+                           cmd_rc=0, arg1=0, arg2=0, arg3=0,
+                           data=b"".join(data))
+        packets.append((x, y, p, packet.bytestring))
+
+    return packets
+
+
+def make_outgoing(size_in, n_connections, rng):
+    outgoing = list()
+    for i in range(n_connections):
+        pre_slice = [slice(None), slice(1, 3), [0, 0, 2]][i % 3]
+        function = [None, None, lambda x: x**2][i % 3 if i % 2 else 0]
+        size_pre = np.arange(size_in)[pre_slice].size
+        size_post = function(np.zeros(size_pre)).size if function else size_pre
+        transform = rng.uniform(-3.0, 3.0, size=(1 + i % 4, size_post))
+        outgoing.append(((pre_slice, function, transform),
+                         (i % 5, i // 5, 1 + i % 16)))
+
+    return outgoing
+
+
+class TestNodeSendPlan(object):
+    @pytest.mark.parametrize("n_connections", [0, 1, 2, 9])
+    def test_packets_match_reference(self, n_connections):
+        """The packets sent using a plan should be the same as those sent by
+        transmitting each connection separately (though they may be sent in a
+        different order).
+        """
+        rng = np.random.RandomState(n_connections)
+        outgoing = make_outgoing(3, n_connections, rng)
+        plan = ethernet_io.NodeSendPlan(3, outgoing, ("127.0.0.1", 17893))
+        sock = mock.Mock()
+
+        for _ in range(3):
+            # Include values which saturate
+            value = rng.uniform(-2.0, 2.0, size=3) * 3e4**rng.randint(2)
+
+            sock.reset_mock()
+            plan.send(sock, value)
+
+            sent = list()
+            for (data, address), _ in sock.sendto.call_args_list:
+                assert address == ("127.0.0.1", 17893)
+                packet = SCPPacket.from_bytestring(bytes(data))
+                sent.append((packet.dest_x, packet.dest_y, packet.dest_cpu,
+                             bytes(data)))
+
+            assert sorted(sent) == sorted(reference_send(outgoing, value))
+
+    def test_shared_cores(self):
+        """Connections may be split into blocks of rows which are sent to
+        different cores and cores may receive several connections, functions
+        should be evaluated once per time step.
+        """
+        rng = np.random.RandomState(1)
+        calls = list()
+
+        def f(x):
+            calls.append(x)
+            return np.hstack((x, x**2))
+
+        pre_slice = slice(0, 2)
+        transform = rng.uniform(-1.0, 1.0, size=(5, 4))
+        wide = rng.uniform(-1.0, 1.0, size=(7, 3))
+        outgoing = [
+            # A connection with a function split across two cores
+            ((pre_slice, f, transform[:3]), (0, 0, 1)),
+            ((pre_slice, f, transform[3:]), (0, 0, 2)),
+            # A connection without a function split across two cores, one of
+            # which also receives a narrow connection.
+            ((slice(None), None, wide[:4]), (0, 0, 3)),
+            ((slice(None), None, wide[4:]), (1, 0, 1)),
+            ((slice(1, 2), None, np.eye(1)), (0, 0, 3)),
+        ]
+        plan = ethernet_io.NodeSendPlan(3, outgoing, ("127.0.0.1", 17893))
+        assert len(plan.packets) == 4
+
+        sock = mock.Mock()
+        value = rng.uniform(-1.0, 1.0, size=3)
+        plan.send(sock, value)
+        assert len(calls) == 1
+
+        sent = list()
+        for (data, address), _ in sock.sendto.call_args_list:
+            packet = SCPPacket.from_bytestring(bytes(data))
+            sent.append((packet.dest_x, packet.dest_y, packet.dest_cpu,
+                         bytes(data)))
+
+        assert sorted(sent) == sorted(reference_send(outgoing, value))
+
+    def test_scalar_function(self):
+        """Connection functions may return scalars rather than vectors."""
+        rng = np.random.RandomState(2)
+        transform = rng.uniform(-1.0, 1.0, size=(3, 1))
+        outgoing = [
+            ((slice(None), lambda x: x[0] * x[1], transform), (0, 0, 1)),
+            ((slice(1, 2), lambda x: 0.5, transform[:2]), (0, 0, 1)),
+        ]
+        plan = ethernet_io.NodeSendPlan(2, outgoing, ("127.0.0.1", 17893))
+
+        sock = mock.Mock()
+        value = rng.uniform(-1.0, 1.0, size=2)
+        plan.send(sock, value)
+
+        sent = list()
+        for (data, address), _ in sock.sendto.call_args_list:
+            packet = SCPPacket.from_bytestring(bytes(data))
+            sent.append((packet.dest_x, packet.dest_y, packet.dest_cpu,
+                         bytes(data)))
+
+        assert sorted(sent) == sorted(reference_send(outgoing, value))
+
+    def test_many_connections(self):
+        """Sending the output of a Node with many connections using a plan
+        should send the same packets as transmitting each connection
+        separately.
+        """
+        rng = np.random.RandomState(0)
+        outgoing = [
+            ((slice(None), None, rng.uniform(size=(16, 16))),
+             (i % 8, i // 8, 1 + i % 16)) for i in range(64)
+        ]
+        plan = ethernet_io.NodeSendPlan(16, outgoing, ("127.0.0.1", 17893))
+        assert len(plan.packets) == 64
+
+        sent = list()
+        sock = mock.Mock(spec_set=["sendto"])
+        sock.sendto = lambda data, address: sent.append(bytes(data))
+
+        for value in rng.uniform(-1.0, 1.0, size=(20, 16)):
+            del sent[:]
+            plan.send(sock, value)
+            assert (sorted(sent) ==
+                    sorted(p[3] for p in reference_send(outgoing, value)))
+
+
+class SDPStandIn(threading.Thread):
+    """Stand-in for SpiNNaker cores which transmit SDP packets containing
+    Node inputs to the host at a given rate.
+
+    Parameters
+    ----------
+    address : (str, int)
+        Address to send packets to.
+    sources : {(x, y, p): [value, ...], ...}
+        Cores to send packets from and the values they send.
+    rate : float
+        Number of times per second each core sends a packet.
+    """
+    def __init__(self, address, sources, rate):
+        super(SDPStandIn, self).__init__(name="SDPStandIn")
+        self.address = address
+        self.rate = rate
+        self.halt = threading.Event()
+        self.n_sent = 0
+
+        self.packets = [
+            SCPPacket(dest_port=0xff, dest_cpu=0x1f, dest_x=0, dest_y=0,
+                      src_port=1, src_cpu=p, src_x=x, src_y=y, cmd_rc=1,
+                      arg1=0, arg2=0, arg3=0,
+                      data=bytes(tp.np_to_fix(np.asarray(values)).data)
+                      ).bytestring
+            for (x, y, p), values in sources.items()
+        ]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def run(self):
+        period = 1.0 / self.rate
+        while not self.halt.wait(period):
+            for packet in self.packets:
+                self.sock.sendto(packet, self.address)
+                self.n_sent += 1
+
+    def stop(self):
+        self.halt.set()
+        self.join()
+        self.sock.close()
+
+
+def make_receiving_ethernet(sources):
+    """Create an Ethernet IO whose input socket is bound to a local port and
+    which expects packets from the given cores.
+    """
+    io = ethernet_io.Ethernet()
+    io.in_socket.bind(("127.0.0.1", 0))
+    for i, source in enumerate(sources):
+        io._node_incoming[source] = "node {}".format(i)
+    return io
+
+
+class TestEthernetThread(object):
+    def test_receive(self):
+        """Test that the most recent value from each core is stored as the
+        input of the appropriate Node and that packets from unknown cores are
+        ignored.
+        """
+        io = make_receiving_ethernet([(1, 2, 3), (0, 0, 17)])
+        address = io.in_socket.getsockname()
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        def send(x, y, p, values):
+            packet = SCPPacket(dest_port=0xff, dest_cpu=0x1f, dest_x=0,
+                               dest_y=0, src_port=1, src_cpu=p, src_x=x,
+                               src_y=y, cmd_rc=1, arg1=0, arg2=0, arg3=0,
+                               data=bytes(tp.np_to_fix(
+                                   np.asarray(values)).data))
+            sock.sendto(packet.bytestring, address)
+
+        # Packets which are pending before the thread starts
+        send(1, 2, 3, [0.5, 0.25])
+        send(1, 2, 3, [1.5, -0.25])
+        send(0, 0, 17, [3.0])
+        send(4, 4, 4, [9.0])  # Unknown
+
+        thread = io.spawn()
+        thread.timeout = 10.0
+        thread.start()
+
+        deadline = time.time() + 2.0
+        while len(io.node_input) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        with io.node_input_lock:
+            assert np.all(io.node_input["node 0"] == [1.5, -0.25])
+            assert np.all(io.node_input["node 1"] == [3.0])
+            assert len(io.node_input) == 2
+
+        send(0, 0, 17, [-2.0])
+        deadline = time.time() + 2.0
+        while io.node_input["node 1"][0] != -2.0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert io.node_input["node 1"][0] == -2.0
+
+        # The thread stops promptly even though its timeout is long
+        start = time.time()
+        thread.stop()
+        assert time.time() - start < 1.0
+        assert not thread.is_alive()
+
+        sock.close()
+        io.close()
+
+    def test_receive_stream(self):
+        """Test that the inputs of every Node are received while many cores
+        are streaming packets to the host.
+        """
+        sources = {(x, 0, p): [0.1 * p, -0.5] for x in range(2)
+                   for p in range(1, 5)}
+        io = make_receiving_ethernet(sources)
+        stand_in = SDPStandIn(io.in_socket.getsockname(), sources, 500)
+        thread = io.spawn()
+
+        thread.start()
+        stand_in.start()
+        deadline = time.time() + 2.0
+        while len(io.node_input) < len(sources) and time.time() < deadline:
+            time.sleep(0.01)
+        stand_in.stop()
+        thread.stop()
+        io.close()
+
+        assert stand_in.n_sent > 0
+        with io.node_input_lock:
+            assert len(io.node_input) == len(sources)
+            for source, values in sources.items():
+                node = io._node_incoming[source]
+                assert np.allclose(io.node_input[node], values, atol=1e-4)
+
+
+def make_system_info():
+    """Make a description of a machine of two boards, the Ethernet connected
+    chips of which are (0, 0), whose address is 127.0.0.1, and (4, 8), whose
+    address is 127.0.0.2.  The Ethernet connection of a third board, on which
+    (8, 4) would be the Ethernet connected chip, is down.
+    """
+    chips = {
+        (0, 0): ChipInfo(ethernet_up=True, ip_address="127.0.0.1",
+                         local_ethernet_chip=(0, 0)),
+        (1, 1): ChipInfo(local_ethernet_chip=(0, 0)),
+        (4, 8): ChipInfo(ethernet_up=True, ip_address="127.0.0.2",
+                         local_ethernet_chip=(4, 8)),
+        (5, 9): ChipInfo(local_ethernet_chip=(4, 8)),
+        (8, 4): ChipInfo(local_ethernet_chip=(8, 4)),
+        (7, 9): ChipInfo(local_ethernet_chip=(8, 4)),
+    }
+    return SystemInfo(12, 12, chips)
+
+
+class TestEthernetChips(object):
+    @pytest.mark.parametrize("x, y, ethernet_chip",
+                             [(0, 0, (0, 0)), (1, 1, (0, 0)),
+                              (4, 8, (4, 8)), (5, 9, (4, 8)),
+                              (7, 9, (4, 8)),  # Board's Ethernet is down
+                              (8, 4, (0, 0)),
+                              (2, 2, (0, 0)),  # Missing chip
+                              ])
+    def test_nearest(self, x, y, ethernet_chip):
+        chips = ethernet_io._EthernetChips(make_system_info())
+        assert chips.nearest(x, y) == ethernet_chip
+
+    def test_no_ethernet_chips(self):
+        chips = ethernet_io._EthernetChips(SystemInfo(2, 2, {
+            (0, 0): ChipInfo(local_ethernet_chip=(0, 0))}))
+        assert chips.nearest(0, 0) == (0, 0)
+
+
+def test_get_host_address():
+    """The address of the host as seen by a board is that of the interface
+    through which the board is reached, not the wildcard address.
+    """
+    assert ethernet_io._get_host_address("127.0.0.2") == "127.0.0.1"
+
+
+class TestEthernetMultipleBoards(object):
+    """Node IO with SDP receivers and transmitters on two boards."""
+    @pytest.fixture
+    def io(self):
+        # Nodes, an SDP receiver on each board for the output of the first
+        # and an SDP transmitter on each board for the input of the others.
+        node = mock.Mock(size_out=2)
+        in_nodes = ["in 0", "in 1"]
+        params = [mock.Mock(pre_slice=slice(None), function=None,
+                            full_transform=lambda slice_out, t=t: t)
+                  for t in (np.eye(2), np.array([[1.0, -1.0]]))]
+        sdp_rx = mock.Mock(vertex_connections={
+            "rx0": [(params[0], slice(0, 2))],
+            "rx1": [(params[1], slice(0, 1))]})
+        sdp_txs = [mock.Mock(_vertex="tx0"), mock.Mock(_vertex="tx1")]
+
+        placements = {"rx0": (1, 1), "rx1": (5, 9), "tx0": (0, 0),
+                      "tx1": (7, 9)}
+        netlist = mock.Mock(spec_set=["system_info", "placements",
+                                      "allocations"])
+        netlist.system_info = make_system_info()
+        netlist.placements = placements
+        netlist.allocations = {v: {Cores: slice(3, 4)} for v in placements}
+
+        io = ethernet_io.Ethernet()
+        io._sdp_receivers[node] = sdp_rx
+        io._sdp_transmitters.update(zip(in_nodes, sdp_txs))
+
+        controller = mock.MagicMock()
+        controller.initial_host = "127.0.0.1"
+        io.prepare(mock.Mock(), controller, netlist)
+
+        io.test_node = node
+        io.test_sdp_txs = sdp_txs
+        io.test_controller = controller
+        yield io
+        io.close()
+
+    def test_prepare(self, io):
+        """An IP tag is set on the Ethernet connected chip of each board, and
+        SDP transmitters send to the tag of the nearest Ethernet connected
+        chip.
+        """
+        ports = [s.getsockname()[1] for s in io.in_sockets]
+        assert len(set(ports)) == 2
+        assert io.in_sockets[0] is io.in_socket
+
+        # Each tag refers to the address of the host as seen by the board and
+        # is set on that board's Ethernet connected chip (and hence through
+        # the connection to that board).
+        controller = io.test_controller
+        assert controller.iptag_set.call_args_list == [
+            mock.call(ethernet_io.IPTAG, "127.0.0.1", ports[0], x=0, y=0),
+            mock.call(ethernet_io.IPTAG, "127.0.0.1", ports[1], x=4, y=8),
+        ]
+
+        assert io.test_sdp_txs[0].ethernet_chip == (0, 0)
+        assert io.test_sdp_txs[1].ethernet_chip == (4, 8)
+        assert all(tx.ip_tag == ethernet_io.IPTAG for tx in io.test_sdp_txs)
+
+        assert io._node_incoming == {(0, 0, 3): "in 0", (7, 9, 3): "in 1"}
+
+    def test_send(self, io):
+        """Node outputs are sent through the nearest Ethernet connected chip
+        of each receiving core.
+        """
+        # Stand-ins for the Ethernet connected chips
+        stand_ins = list()
+        for address in ("127.0.0.1", "127.0.0.2"):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.bind((address, SCP_PORT))
+            except socket.error:  # pragma: no cover
+                pytest.skip("Can't bind to {}:{}".format(address, SCP_PORT))
+            sock.settimeout(1.0)
+            stand_ins.append(sock)
+
+        try:
+            io.set_node_output(io.test_node, np.array([0.5, 0.25]))
+
+            received = list()
+            for sock in stand_ins:
+                packet = SCPPacket.from_bytestring(sock.recv(512))
+                received.append((packet.dest_x, packet.dest_y,
+                                 tp.fix_to_np(np.frombuffer(packet.data,
+                                                            dtype=np.int32))))
+        finally:
+            for sock in stand_ins:
+                sock.close()
+
+        (x0, y0, data0), (x1, y1, data1) = received
+        assert (x0, y0) == (1, 1)
+        assert np.all(data0 == [0.5, 0.25])
+        assert (x1, y1) == (5, 9)
+        assert np.all(data1 == [0.25])
+
+    def test_receive(self, io):
+        """Node inputs sent to the IP tags of each board are received."""
+        stand_ins = [
+            SDPStandIn(("127.0.0.1", sock.getsockname()[1]), {xyp: values},
+                       100)
+            for sock, xyp, values in zip(io.in_sockets,
+                                         [(0, 0, 3), (7, 9, 3)],
+                                         [[0.5], [-1.0, 2.0]])
+        ]
+
+        thread = io.spawn()
+        thread.start()
+        for stand_in in stand_ins:
+            stand_in.start()
+
+        deadline = time.time() + 2.0
+        while len(io.node_input) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        for stand_in in stand_ins:
+            stand_in.stop()
+        thread.stop()
+
+        with io.node_input_lock:
+            assert np.all(io.node_input["in 0"] == [0.5])
+            assert np.all(io.node_input["in 1"] == [-1.0, 2.0])
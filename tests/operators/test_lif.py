@@ -1,4 +1,5 @@
 import itertools
+import mock
 import nengo
 import numpy as np
 import pytest
@@ -6,6 +7,7 @@ import struct
 import tempfile
 
 from nengo_spinnaker.operators import lif
+from nengo_spinnaker.utils.cost_model import MS_PER_CYCLE
 from nengo_spinnaker.utils import type_casts as tp
 
 
@@ -258,3 +260,70 @@ def test_get_basic_region_arguments(neuron_slice, out_slice, learnt_out_slice,
 
     assert region_args[lif.Regions.population_length] == \
         lif.Args(cluster_lengths)
+
+
+def test_resource_usage_default_cost_model():
+    """Test that without learning rules the default cost model matches the
+    profiled costs.
+    """
+    usage = lif.CoreResouceUsage(4, 200)
+    assert usage.cpu_usage(slice(0, 2), slice(0, 100), slice(0, 3),
+                           slice(0, 0)) == (
+        (39*2 + 135) +
+        (9*100*4 + 61*100 + 174) +
+        (2*200*3 + 143*3 + 173) +
+        173
+    )
+
+
+@pytest.mark.parametrize("n_pes_rules, n_voja_rules", [(1, 0), (0, 2)])
+def test_resource_usage_learning(n_pes_rules, n_voja_rules):
+    """Test that learning rules add to the cost of a cluster and of a core."""
+    without = lif.ClusterResourceUsage(4, 3, 2)
+    with_learning = lif.ClusterResourceUsage(4, 3, 2, n_pes_rules=n_pes_rules,
+                                             n_voja_rules=n_voja_rules)
+    sl = slice(0, 200)
+    assert with_learning.cpu_usage(sl) > without.cpu_usage(sl)
+
+    without = lif.CoreResouceUsage(4, 200)
+    with_learning = lif.CoreResouceUsage(4, 200, n_pes_rules=n_pes_rules,
+                                         n_voja_rules=n_voja_rules)
+    slices = (slice(0, 4), slice(0, 100), slice(0, 3), slice(0, 2))
+    assert with_learning.cpu_usage(*slices) > without.cpu_usage(*slices)
+
+
+def test_fit_ensemble_cost_model(tmpdir):
+    """Test fitting the ensemble cost model to a profiler CSV file and using
+    the saved model.
+    """
+    # Write a CSV in the format produced by the profiling example, the time
+    # spent updating neurons is half that of the default model.
+    csv_path = str(tmpdir.join("profile.csv"))
+    with open(csv_path, "w") as fp:
+        fp.write("Num neurons,Dimensions,Neuron update\n")
+        for n_neurons in (50, 100, 200):
+            for size_in in (1, 2, 4):
+                cycles = 0.5 * lif.get_neuron_update_cycles(size_in,
+                                                            n_neurons)
+                fp.write("{},{},{!r}\n".format(n_neurons, size_in,
+                                               cycles * MS_PER_CYCLE))
+
+    model_path = str(tmpdir.join("model.json"))
+    model = lif.fit_ensemble_cost_model([csv_path], model_path,
+                                        lif.ensemble_cost_model)
+    assert np.isclose(lif.get_neuron_update_cycles(4, 100, model),
+                      0.5 * lif.get_neuron_update_cycles(4, 100))
+    assert (lif.get_input_filtering_cycles(4, model) ==
+            lif.get_input_filtering_cycles(4))
+
+    # Use the saved model for partitioning
+    with mock.patch.object(lif, "rc") as rc:
+        rc.has_option.return_value = True
+        rc.get.return_value = model_path
+        loaded = lif.get_ensemble_cost_model()
+
+    assert np.isclose(lif.get_neuron_update_cycles(4, 100, loaded),
+                      0.5 * lif.get_neuron_update_cycles(4, 100))
+    usage = lif.ClusterResourceUsage(4, 1, 0, cost_model=loaded)
+    assert usage.cpu_usage(slice(0, 400)) < \
+        lif.ClusterResourceUsage(4, 1, 0).cpu_usage(slice(0, 400))
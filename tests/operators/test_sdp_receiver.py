@@ -1,3 +1,4 @@
+import collections
 import mock
 import numpy as np
 import pytest
@@ -9,8 +10,11 @@ import tempfile
 from nengo_spinnaker.builder.builder import Model, ObjectPort
 from nengo_spinnaker.builder.model import SignalParameters
 from nengo_spinnaker.builder.node import NodeTransmissionParameters
+from nengo_spinnaker.builder.ports import OutputPort
 from nengo_spinnaker.operators import SDPReceiver
-from nengo_spinnaker.operators.sdp_receiver import SystemRegion
+from nengo_spinnaker.operators.sdp_receiver import (MAX_DIMENSIONS,
+                                                    SystemRegion)
+from nengo_spinnaker.regions import utils as region_utils
 
 
 class TestSystemRegion(object):
@@ -29,3 +33,63 @@ class TestSystemRegion(object):
 
         fp.seek(0)
         assert fp.read() == struct.pack("<2I", machine_timestep, size_out)
+
+
+class TestMakeVertices(object):
+    def make_model(self, widths):
+        """Make a model with an outgoing signal from an SDP receiver for each
+        of the given widths.
+        """
+        signals = [(mock.Mock(name="signal {}".format(i)),
+                    mock.Mock(full_transform=lambda slice_out, w=w:
+                              np.ones((w, 2))))
+                   for i, w in enumerate(widths)]
+        model = mock.Mock(machine_timestep=1000)
+        model.get_signals_from_object.return_value = {
+            OutputPort.standard: signals}
+        return model, signals
+
+    def check_vertices(self, sdp_rx, signals):
+        """Check that the keys of each vertex match its connections and that
+        every row of every connection is transmitted exactly once.
+        """
+        rows = collections.defaultdict(list)
+        for vertex, connections in six.iteritems(sdp_rx.vertex_connections):
+            keys = list()
+            for transmission_params, sl in connections:
+                signal, = [s for s, t in signals if t is transmission_params]
+                keys.extend((signal, {"index": i}) for i in
+                            range(sl.start, sl.stop))
+                rows[transmission_params].extend(range(sl.start, sl.stop))
+
+            assert 0 < len(keys) <= MAX_DIMENSIONS
+            assert sdp_rx._key_regions[vertex].signals_and_arguments == keys
+            assert sdp_rx._sys_regions[vertex].size_out == len(keys)
+            assert vertex.resources[Cores] == 1
+            assert (vertex.resources[SDRAM] ==
+                    region_utils.sizeof_regions(
+                        [sdp_rx._sys_regions[vertex],
+                         sdp_rx._key_regions[vertex]], None))
+
+        for _, transmission_params in signals:
+            w = transmission_params.full_transform(False).shape[0]
+            assert sorted(rows[transmission_params]) == list(range(w))
+
+    def test_narrow_connections_share_cores(self):
+        model, signals = self.make_model([3, 1, 40, 30])
+        sdp_rx = SDPReceiver("rx")
+        spec = sdp_rx.make_vertices(model)
+
+        assert len(spec.vertices) == 2
+        assert set(spec.vertices) == set(sdp_rx.vertex_connections)
+        self.check_vertices(sdp_rx, signals)
+
+    def test_wide_connections_are_split(self):
+        model, signals = self.make_model([150, 64, 10])
+        sdp_rx = SDPReceiver("rx")
+        spec = sdp_rx.make_vertices(model)
+
+        # 150 rows are split into 3 blocks of 50, one of which shares a core
+        # with the 10 rows of the last connection.
+        assert len(spec.vertices) == 4
+        self.check_vertices(sdp_rx, signals)
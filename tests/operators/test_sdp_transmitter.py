@@ -0,0 +1,25 @@
+import pytest
+import struct
+import tempfile
+
+from nengo_spinnaker.operators.sdp_transmitter import SystemRegion
+
+
+class TestSystemRegion(object):
+    @pytest.mark.parametrize("ethernet_chip, ip_tag",
+                             [((0, 0), 1), ((8, 4), 3)])
+    def test_all(self, ethernet_chip, ip_tag):
+        # Create a system region
+        region = SystemRegion(1000, 3, 10, ethernet_chip, ip_tag)
+
+        # Check that the size is correct
+        assert region.sizeof(slice(None)) == 20
+
+        # Write the data to a file and check that it is correct
+        fp = tempfile.TemporaryFile()
+        region.write_region_to_file(fp)
+
+        fp.seek(0)
+        x, y = ethernet_chip
+        assert fp.read() == struct.pack("<5I", 3, 1000, 10, (x << 8) | y,
+                                        ip_tag)
@@ -1,11 +1,15 @@
 import mock
+import multiprocessing
+import nengo
 import numpy as np
 import tempfile
 import pytest
 import struct
 
+from nengo_spinnaker.builder.transmission_parameters import (
+    NodeTransmissionParameters, Transform)
 from nengo_spinnaker.operators.value_source import (
-    SystemRegion, get_transform_keys)
+    SystemRegion, ValueSource, evaluate_rows, get_transform_keys)
 
 
 def test_get_transform_keys():
@@ -65,3 +69,332 @@ class TestSystemRegion(object):
             timestep, vertex_slice.stop - vertex_slice.start,
             0x1 if periodic else 0x0, n_blocks, block_length, last_block_length
         )
+
+
+def square(t):
+    """Non-vectorised function which may be pickled."""
+    return float(t) ** 2
+
+
+class TestEvaluateRows(object):
+    def test_vectorized(self):
+        calls = list()
+
+        def f(t):
+            calls.append(t)
+            return np.vstack((t, 2*t)).T
+
+        ts = np.arange(10) * 0.1
+        values = evaluate_rows(f, ts, vectorized=True)
+        assert values.shape == (10, 2)
+        assert np.array_equal(values, np.vstack((ts, 2*ts)).T)
+        assert len(calls) == 1
+
+    def test_not_vectorized_by_default(self):
+        """Test that functions are called exactly once per time by default,
+        so that stateful functions behave as they would in Nengo.
+        """
+        ts = np.arange(10) * 0.1
+        f = mock.Mock(side_effect=lambda t: np.sin(t))
+        assert np.array_equal(evaluate_rows(f, ts),
+                              np.sin(ts).reshape(10, 1))
+        assert f.call_count == 10
+        assert [c[0][0] for c in f.call_args_list] == list(ts)
+
+    def test_vectorized_wrong_shape(self):
+        with pytest.raises(ValueError):
+            evaluate_rows(lambda t: [t, 2*t], np.arange(10), vectorized=True)
+
+    def test_rows(self):
+        """Test evaluating a connection function for rows of values."""
+        xs = np.random.uniform(size=(20, 3))
+        values = evaluate_rows(lambda x: x[:2] * x[2], xs)
+        assert np.allclose(values, xs[:, :2] * xs[:, 2:])
+
+    def test_process_pool(self):
+        ts = np.arange(20) * 0.1
+        pool = multiprocessing.Pool(2)
+        try:
+            values = evaluate_rows(square, ts, pool=pool)
+            assert np.allclose(values, (ts**2).reshape(20, 1))
+
+            # Functions which cannot be pickled are evaluated in this process
+            values = evaluate_rows(lambda t: float(t)**2, ts, pool=pool)
+            assert np.allclose(values, (ts**2).reshape(20, 1))
+        finally:
+            pool.close()
+            pool.join()
+
+
+def reference_get_output(vs, start_step, n_steps, dt):
+    """Evaluate the output of a value source one time step at a time."""
+    ts = np.arange(start_step, start_step + n_steps) * dt
+    values = np.array([vs.function(t) for t in ts]).reshape(n_steps, -1)
+
+    outputs = []
+    for transmission_params, transform in vs.transmission_parameters:
+        output = []
+        for v in values:
+            v = v[transmission_params.pre_slice]
+            if transmission_params.function is not None:
+                v = np.asarray(transmission_params.function(v), dtype=float)
+            output.append(np.dot(transform, v.T))
+        outputs.append(np.array(output).reshape(n_steps, -1))
+
+    return np.hstack(outputs)
+
+
+def make_value_source(function, size_out, connections, **kwargs):
+    """Make a value source with the given outgoing connections, each a tuple
+    of the pre-slice, function, size of the function output and transform.
+    """
+    vs = ValueSource(function, size_out, None, "vs", **kwargs)
+    vs.transmission_parameters = list()
+    for pre_slice, f, size_in, transform in connections:
+        tps = NodeTransmissionParameters(
+            Transform(size_in, transform.shape[0], transform),
+            pre_slice, f
+        )
+        vs.transmission_parameters.append(
+            (tps, tps.full_transform(slice_in=False, slice_out=False)))
+    return vs
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_get_output(vectorized):
+    """Test that the output is the same as evaluating the function and the
+    connections one time step at a time.
+    """
+    rng = np.random.RandomState(3)
+
+    def f(t):
+        return np.vstack((np.sin(t), np.cos(t), t)).T if vectorized else \
+            [np.sin(t), np.cos(t), t]
+
+    vs = make_value_source(
+        f, 3,
+        [(slice(None), None, 3, rng.uniform(size=(4, 3))),
+         (slice(0, 2), lambda x: x[0] * x[1], 1, rng.uniform(size=(2, 1))),
+         ([2, 2], lambda x: x ** 2, 2, rng.uniform(size=(3, 2))),
+         ([1, 1], None, 2, rng.uniform(size=(1, 2)))],
+        vectorized=vectorized
+    )
+
+    output = vs.get_output(10, 50, 0.001)
+    assert output.shape == (50, 10)
+    assert np.allclose(output, reference_get_output(vs, 10, 50, 0.001))
+
+
+def test_get_output_constant_and_process():
+    vs = make_value_source([1.0, 2.0], 2,
+                           [(slice(None), None, 2, np.eye(2))])
+    assert np.array_equal(vs.get_output(0, 3, 0.001),
+                          [[1.0, 2.0]] * 3)
+
+    process = nengo.processes.WhiteNoise(seed=1)
+    vs = make_value_source(process, 2, [(slice(None), None, 2, np.eye(2))])
+    assert np.allclose(vs.get_output(0, 10, 0.001),
+                       process.run_steps(10, d=2, dt=0.001))
+
+
+def test_get_output_process_pool():
+    """Test that a single pool of processes is used to evaluate the function
+    of time and the functions of the connections, and that connection
+    functions are evaluated once per time step even if the function of time
+    is vectorised.
+    """
+    connections = [(slice(0, 2), lambda x: x[0] * x[1], 1, np.ones((3, 1))),
+                   (slice(None), None, 2, np.eye(2))]
+    ts = np.arange(10, 60) * 0.001
+    expected_values = np.vstack((np.sin(ts), np.cos(ts))).T
+    expected = np.hstack((np.tile(np.prod(expected_values, axis=1),
+                                  (3, 1)).T,
+                          expected_values))
+
+    for function, vectorized in (
+            (lambda t: np.vstack((np.sin(t), np.cos(t))).T, True),
+            (lambda t: [np.sin(t), np.cos(t)], False)):
+        vs = make_value_source(function, 2, connections,
+                               vectorized=vectorized, n_processes=2)
+
+        with mock.patch("multiprocessing.Pool",
+                        wraps=multiprocessing.Pool) as pool:
+            output = vs.get_output(10, 50, 0.001)
+
+        assert pool.call_count == 1
+        assert np.allclose(output, expected)
+
+
+def test_get_output_vectorized():
+    """Compare evaluating a vectorised function of time with many outgoing
+    connections against evaluating it one time step at a time.
+    """
+    rng = np.random.RandomState(4)
+    freqs = rng.uniform(1, 10, size=64)
+    connections = [
+        (slice(None), None, 64, rng.uniform(size=(32, 64))) for _ in range(4)
+    ] + [(slice(None), lambda x: x**2, 64, rng.uniform(size=(64, 64)))]
+    vs = make_value_source(lambda t: np.sin(np.outer(t, freqs)), 64,
+                           connections, vectorized=True)
+
+    expected = reference_get_output(
+        make_value_source(lambda t: np.sin(t * freqs), 64, connections),
+        0, 1000, 0.001
+    )
+    output = vs.get_output(0, 1000, 0.001)
+    assert np.allclose(output, expected)
+
+
+class TestBeforeSimulation(object):
+    """Test that the output of periodic sources is reused."""
+    def make_loaded_value_source(self, function, period):
+        vs = make_value_source(function, 2,
+                               [(slice(None), None, 2, np.eye(2))])
+        vs.period = period
+        vs.system_region = SystemRegion(1000, period is not None, 100)
+        vs.output_region = mock.Mock(name="output_region")
+        vs.keys_region = mock.Mock(name="keys_region")
+        vs.regions = [vs.system_region, vs.keys_region, vs.output_region]
+
+        # Load the source with a single vertex
+        vertex = mock.Mock(slice=slice(0, 2), cluster=None)
+        vs.vertices = [vertex]
+        memory = {r: mock.Mock(name=str(i)) for i, r in enumerate(vs.regions)}
+        with mock.patch("nengo_spinnaker.regions.utils."
+                        "create_app_ptr_and_region_files") as create:
+            create.return_value = [memory[r] for r in vs.regions]
+            vs.load_to_machine(mock.Mock(vertices_memory={vertex: None}),
+                               mock.Mock())
+
+        for m in memory.values():
+            m.reset_mock()
+
+        return vs, memory[vs.system_region], memory[vs.output_region]
+
+    def test_periodic(self):
+        f = mock.Mock(side_effect=lambda t: np.vstack((np.sin(t),
+                                                       np.cos(t))).T)
+        vs, system_mem, output_mem = self.make_loaded_value_source(f, 0.05)
+        sim = mock.Mock(dt=0.001, steps=0)
+
+        # The first run generates and writes the output and system region
+        vs.before_simulation(None, sim, 100)
+        assert f.called
+        assert output_mem.write.call_count == 1
+        assert system_mem.write.call_count == 1
+        assert vs.system_region.n_steps == 50
+        written = output_mem.write.call_args[0][0]
+
+        # Running for a whole number of periods again doesn't require the
+        # function to be evaluated or anything to be written.
+        f.reset_mock()
+        output_mem.reset_mock()
+        system_mem.reset_mock()
+        sim.steps = 100
+        vs.before_simulation(None, sim, 200)
+        assert not f.called
+        assert not output_mem.write.called
+        assert not system_mem.write.called
+
+        # A shorter run requires the output and system region to be rewritten
+        sim.steps = 300
+        vs.before_simulation(None, sim, 20)
+        assert f.called
+        assert output_mem.write.call_count == 1
+        assert system_mem.write.call_count == 1
+        assert vs.system_region.n_steps == 20
+
+        # Returning to the longer run reuses the cached output, but must
+        # rewrite it.
+        f.reset_mock()
+        output_mem.reset_mock()
+        system_mem.reset_mock()
+        sim.steps = 400
+        vs.before_simulation(None, sim, 100)
+        assert not f.called
+        assert output_mem.write.call_args[0][0] == written
+        assert system_mem.write.call_count == 1
+
+    def test_periodic_different_phase(self):
+        """Test that the output is regenerated if it would start at a
+        different point in the period.
+        """
+        vs, system_mem, output_mem = self.make_loaded_value_source(
+            lambda t: [t, t], 0.05)
+        sim = mock.Mock(dt=0.001, steps=0)
+        vs.before_simulation(None, sim, 100)
+
+        output_mem.reset_mock()
+        system_mem.reset_mock()
+        sim.steps = 110
+        vs.before_simulation(None, sim, 100)
+        assert output_mem.write.call_count == 1
+        assert not system_mem.write.called  # Still 50 steps
+
+    def test_not_periodic(self):
+        f = mock.Mock(side_effect=lambda t: [t, t])
+        vs, system_mem, output_mem = self.make_loaded_value_source(f, None)
+        sim = mock.Mock(dt=0.001, steps=0)
+
+        vs.before_simulation(None, sim, 100)
+        output_mem.reset_mock()
+        f.reset_mock()
+
+        sim.steps = 100
+        vs.before_simulation(None, sim, 100)
+        assert f.called
+        assert output_mem.write.call_count == 1
+
+    @pytest.mark.parametrize("period", [None, 0.05])
+    def test_prepare_simulation(self, period):
+        """Test that output prepared in advance is written without evaluating
+        the function again.
+        """
+        f = mock.Mock(side_effect=lambda t: np.vstack((np.sin(t),
+                                                       np.cos(t))).T)
+        vs, system_mem, output_mem = self.make_loaded_value_source(f, period)
+        sim = mock.Mock(dt=0.001, steps=0)
+        vs.before_simulation(None, sim, 100)
+
+        # Prepare the next period while the first would be running
+        f.reset_mock()
+        output_mem.reset_mock()
+        vs.prepare_simulation(None, sim, 100, 100)
+        assert f.called == (period is None)
+        assert not output_mem.write.called
+
+        # Starting the next period shouldn't require the function to be
+        # evaluated.
+        f.reset_mock()
+        sim.steps = 100
+        vs.before_simulation(None, sim, 100)
+        assert not f.called
+
+        if period is None:
+            # The prepared output is written, and is only used once
+            assert output_mem.write.call_count == 1
+            assert not vs._output_cache
+        else:
+            # The same output is already in memory
+            assert not output_mem.write.called
+
+    def test_indefinite(self):
+        """Test that periodic sources may be run indefinitely if their period
+        fits in memory, and that other sources may not.
+        """
+        sim = mock.Mock(dt=0.001, steps=0)
+
+        vs, system_mem, output_mem = self.make_loaded_value_source(
+            lambda t: [t, t], 0.05)
+        vs.before_simulation(None, sim, None)
+        assert vs.system_region.n_steps == 50
+        assert output_mem.write.call_count == 1
+
+        vs, _, _ = self.make_loaded_value_source(lambda t: [t, t], 0.5)
+        with pytest.raises(ValueError) as excinfo:
+            vs.before_simulation(None, sim, None)
+        assert "500 steps" in str(excinfo.value)
+
+        vs, _, _ = self.make_loaded_value_source(lambda t: [t, t], None)
+        with pytest.raises(ValueError):
+            vs.before_simulation(None, sim, None)
@@ -532,3 +532,61 @@ class TestMakeFilterRegions(object):
         for f in filter_region.filters:
             assert (f == LowpassFilter(1, False, 0.01) or
                     f == NoneFilter(1, False))  # noqa: E711
+
+
+class TestWriteMatchesReference(object):
+    """The bytes written by the filter regions should be identical to those
+    produced by packing each filter and route separately.
+    """
+    @pytest.mark.parametrize("filter_width", [None, 7])
+    def test_filter_region(self, filter_width):
+        filters = [
+            LowpassFilter(3, False, 0.05),
+            NoneFilter(2, True),
+            LinearFilter(4, False, [1.0], [0.001, 0.1, 1.0]),
+            LowpassFilter(1, True, 0.0),
+            LowpassFilter(5, False, 0.005),
+            LinearFilter(1, True, [1.0], [0.05, 1.0]),
+            NoneFilter(9, False),
+        ]
+        region = FilterRegion(filters, 0.001)
+
+        # Reference
+        expected = bytearray(region.sizeof())
+        struct.pack_into("<I", expected, 0, len(filters))
+        offset = 1
+        for f in filters:
+            f.pack_into(region.dt, expected, offset*4, width=filter_width)
+            offset += f.size_words() + 4
+
+        fp = tempfile.TemporaryFile()
+        region.write_subregion_to_file(fp, filter_width=filter_width)
+        fp.seek(0)
+        assert fp.read() == bytes(expected)
+
+    def test_empty_filter_region(self):
+        region = FilterRegion([], 0.001)
+
+        fp = tempfile.TemporaryFile()
+        region.write_subregion_to_file(fp)
+        fp.seek(0)
+        assert fp.read() == struct.pack("<I", 0)
+
+    @pytest.mark.parametrize("n_routes", [0, 1, 10])
+    def test_filter_routing_region(self, n_routes):
+        region = FilterRoutingRegion([None] * (n_routes + 2))
+        region.filter_routes = [
+            (0xfedc0000 + i, 0xffff0000, 0x0000001f, i % 3)
+            for i in range(n_routes)
+        ]
+
+        # Reference
+        expected = bytearray(region.sizeof())
+        struct.pack_into("<I", expected, 0, n_routes)
+        for i, route in enumerate(region.filter_routes):
+            struct.pack_into("<4I", expected, 4 + 16*i, *route)
+
+        fp = tempfile.TemporaryFile()
+        region.write_subregion_to_file(fp)
+        fp.seek(0)
+        assert fp.read() == bytes(expected)
@@ -6,6 +6,7 @@ import tempfile
 from rig.bitfield import BitField
 from nengo_spinnaker.regions.keyspaces import (
     KeyspacesRegion, KeyField, MaskField)
+from nengo_spinnaker.utils.keyspaces import KeyspaceContainer
 
 
 class Signal(object):
@@ -205,3 +206,76 @@ class TestKeyField(object):
                       maps={'subvertex_index': 'p', 'spam': 'y'})
         assert (kf(k, subvertex_index=3, spam=4) ==
                 k(y=4, p=3).get_value(tag='routing'))
+
+
+def reference_write(region, vertex_slice=None, **field_args):
+    """Serialise a keyspaces region by packing each field of each key
+    separately.
+    """
+    key_slice = vertex_slice if region.partitioned else slice(None)
+
+    data = b''
+    if region.prepend_num_keyspaces:
+        data += struct.pack("<I",
+                            len(region.signals_and_arguments[key_slice]))
+
+    for signal, kwargs in region.signals_and_arguments[key_slice]:
+        ks = signal.keyspace(**kwargs)
+        for field in region.fields:
+            data += struct.pack("<I", field(ks, **field_args))
+
+    return data
+
+
+@pytest.mark.parametrize("partitioned, vertex_slice",
+                         [(False, None), (True, slice(3, 17)),
+                          (True, slice(0, 0))])
+@pytest.mark.parametrize("prepend_num_keyspaces", [False, True])
+def test_write_matches_reference(ks, partitioned, vertex_slice,
+                                 prepend_num_keyspaces):
+    """The bytes written should be identical to those produced by packing
+    each field of each key separately.
+    """
+    keys = [(Signal(ks), {"x": i % 7, "y": i // 7, "p": 1 + i % 17})
+            for i in range(30)]
+    fields = [KeyField({"c": "c"}), MaskField(tag="routing"),
+              KeyField({"c": "c"}, field="p")]
+    region = KeyspacesRegion(keys, fields, partitioned,
+                             prepend_num_keyspaces)
+
+    fp = tempfile.TemporaryFile()
+    region.write_subregion_to_file(fp, vertex_slice, c=5)
+    fp.seek(0)
+    data = fp.read()
+
+    assert data == reference_write(region, vertex_slice, c=5)
+    assert len(data) == region.sizeof(vertex_slice)
+
+
+def test_write_nengo_keyspaces():
+    """Keys for many signals in the Nengo keyspace should be the same as
+    those generated by deriving a keyspace for each key.
+    """
+    kss = KeyspaceContainer()
+    signals = [Signal(kss["nengo"](connection_id=i)) for i in range(5)]
+    keys = [(s, {"index": i}) for s in signals for i in range(20)]
+    keys += [(signals[2], {})]  # Keys with different arguments
+    for s, kwargs in keys:
+        s.keyspace(cluster=7, **kwargs)
+    kss.assign_fields()
+
+    fields = [KeyField({"cluster": "cluster"}),
+              KeyField({"cluster": "cluster"}, tag=kss.routing_tag),
+              MaskField(tag=kss.filter_routing_tag),
+              MaskField(field="index")]
+    region = KeyspacesRegion(keys, fields, partitioned_by_atom=True)
+
+    fp = tempfile.TemporaryFile()
+    region.write_subregion_to_file(fp, slice(10, 81), cluster=7)
+    fp.seek(0)
+    assert fp.read() == reference_write(region, slice(10, 81), cluster=7)
+
+    # Fields which set a field already set by the keys fail
+    region = KeyspacesRegion(keys, [KeyField({"i": "index"})])
+    with pytest.raises(ValueError):
+        region.write_subregion_to_file(tempfile.TemporaryFile(), i=1)
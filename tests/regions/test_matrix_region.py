@@ -119,3 +119,46 @@ class TestMatrixRegion(object):
         data = np.frombuffer(read_data, dtype=matrix.dtype).reshape(
             matrix.shape)
         assert np.all(data == matrix)
+
+
+def reference_write(region, vertex_slice=slice(None)):
+    """Serialise a matrix region by writing each part separately."""
+    data = region.matrix[region.expanded_slice(vertex_slice)]
+
+    out = b""
+    if region.prepend_n_rows:
+        out += struct.pack('I', data.shape[0])
+    if region.prepend_n_columns:
+        out += struct.pack('I', data.shape[1] if region.matrix.ndim >= 2 else
+                           1)
+    return out + data.tostring()
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.int16, np.int32, np.float64])
+@pytest.mark.parametrize("prepend_n_rows, prepend_n_cols",
+                         [(False, False), (True, True), (False, True)])
+@pytest.mark.parametrize(
+    "shape, vertex_slice, sliced_dimension",
+    [((4, 3), slice(0, 4), None),
+     ((7, 5), slice(2, 6), MatrixPartitioning.rows),
+     ((4, 9), slice(1, 8), MatrixPartitioning.columns),
+     ((4, 9), slice(3, 3), MatrixPartitioning.columns),
+     ((100, ), slice(10, 20), 0),
+     ((4, 3, 5), slice(1, 4), 2),
+     ])
+def test_write_matches_reference(dtype, prepend_n_rows, prepend_n_cols,
+                                 shape, vertex_slice, sliced_dimension):
+    """The bytes written should be identical to those produced by writing
+    each part of the region separately, including for slices of columns.
+    """
+    matrix = np.random.RandomState(1).uniform(-1e3, 1e3, size=shape)
+    region = MatrixRegion(matrix.astype(dtype), prepend_n_rows,
+                          prepend_n_cols, sliced_dimension)
+
+    fp = tempfile.TemporaryFile()
+    region.write_subregion_to_file(fp, vertex_slice)
+    fp.seek(0)
+    data = fp.read()
+
+    assert data == reference_write(region, vertex_slice)
+    assert len(data) == region.sizeof(vertex_slice)
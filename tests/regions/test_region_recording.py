@@ -77,6 +77,54 @@ class TestSpikeRegion(object):
 
         assert np.all(array == expected)
 
+    def test_to_array_offset_slice(self):
+        """Check that the first bits of each frame are used regardless of
+        where the vertex slice starts.
+        """
+        data = struct.pack("<2I", 0b101, 0b010)
+
+        # Construct a memory to read from
+        mem = mock.Mock()
+        mem.read.return_value = data
+
+        # Get the array
+        sr = rr.SpikeRecordingRegion(100)
+        array = sr.to_array(mem, slice(40, 43), 2)
+
+        # Check that the right neurons have fired
+        assert array.shape == (2, 3)
+        assert np.all(array == [[True, False, True], [False, True, False]])
+
+    def test_to_array_large(self):
+        """Check that the vectorised decode matches a per-bit reference
+        decode on a large synthetic buffer.
+        """
+        n_steps, n_neurons = 200, 1000
+        sr = rr.SpikeRecordingRegion(n_steps)
+        framelength = sr.bytes_per_frame(n_neurons)
+
+        # Construct random spike data
+        rng = np.random.RandomState(1234)
+        data = rng.randint(0, 256, size=n_steps * framelength,
+                           dtype=np.uint8).tostring()
+
+        mem = mock.Mock()
+        mem.read.return_value = data
+
+        def reference_decode():
+            words = struct.unpack("<{}I".format(len(data) // 4), data)
+            words_per_frame = framelength // 4
+            return np.array([
+                [bool(words[t*words_per_frame + n // 32] & (1 << (n % 32)))
+                 for n in range(n_neurons)]
+                for t in range(n_steps)
+            ], dtype=np.bool)
+
+        # Check that the results agree
+        expected = reference_decode()
+        array = sr.to_array(mem, slice(0, n_neurons), n_steps)
+        assert np.array_equal(array, expected)
+
 
 class TestVoltageRegion(object):
     """Voltage regions use 1 short per neuron per timestep but pad each frame
@@ -1,5 +1,7 @@
 import enum
+import io
 import mock
+import numpy as np
 import pytest
 from six import iteritems, itervalues
 import struct
@@ -239,3 +241,24 @@ def test_sizeof_regions(vertex_slice, include_app_ptr):
     assert (utils.sizeof_regions(regions, vertex_slice, include_app_ptr) ==
             37*4 + (len(regions)*4 + 4 if include_app_ptr else 0))
     assert all(r.called for r in regions if r is not None)
+
+
+def test_write_regions_named():
+    """Test that each region is written into its memory with its
+    arguments.
+    """
+    from nengo_spinnaker.regions import MatrixRegion
+
+    regions = {
+        1: MatrixRegion(np.arange(4, dtype=np.uint32), prepend_n_rows=True),
+        2: MatrixRegion(np.ones((2, 2), dtype=np.uint32)),
+    }
+    region_args = {k: utils.Args(slice(0, 1)) for k in regions}
+    region_memory = {k: io.BytesIO() for k in regions}
+
+    utils.write_regions_named(region_memory, regions, region_args)
+
+    assert {k: mem.getvalue() for k, mem in iteritems(region_memory)} == {
+        1: struct.pack("<5I", 4, 0, 1, 2, 3),
+        2: struct.pack("<4I", 1, 1, 1, 1),
+    }
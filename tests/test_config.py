@@ -6,6 +6,7 @@ from rig import place_and_route as par
 from nengo_spinnaker import Simulator, add_spinnaker_params
 from nengo_spinnaker.config import CallableParameter
 from nengo_spinnaker import node_io
+from nengo_spinnaker.utils.probe_store import ProbeStore
 
 
 def test_add_spinnaker_params():
@@ -21,6 +22,8 @@ def test_add_spinnaker_params():
     for param, value in [
             ("function_of_time", True),
             ("function_of_time_period", 0.5),
+            ("function_of_time_vectorized", True),
+            ("function_of_time_n_processes", 4),
             ]:
         with pytest.raises(AttributeError) as excinfo:
             setattr(net.config[n_ft], param, value)
@@ -41,6 +44,16 @@ def test_add_spinnaker_params():
             ("router_kwargs", {}),
             ("node_io", None),
             ("node_io_kwargs", {}),
+            ("probe_store", None),
+            ("probe_store_kwargs", {}),
+            ("pipeline_periods", True),
+            ("recording_buffer_period", 2.0),
+            ("host_catch_up", "skip"),
+            ("host_spin_time", 0.001),
+            ("decoder_n_threads", 4),
+            ("netlist_n_processes", 4),
+            ("routing_n_processes", 4),
+            ("routing_time_budget", 2.0),
             ]:
         with pytest.raises(ConfigError) as excinfo:
             setattr(net.config[Simulator], param, value)
@@ -51,6 +64,8 @@ def test_add_spinnaker_params():
 
     assert net.config[nengo.Node].function_of_time is False
     assert net.config[nengo.Node].function_of_time_period is None
+    assert net.config[nengo.Node].function_of_time_vectorized is False
+    assert net.config[nengo.Node].function_of_time_n_processes is None
     assert net.config[nengo.Node].optimize_out is None
 
     assert net.config[Simulator].placer is par.place
@@ -63,6 +78,17 @@ def test_add_spinnaker_params():
     assert net.config[Simulator].node_io is node_io.Ethernet
     assert net.config[Simulator].node_io_kwargs == {}
 
+    assert net.config[Simulator].probe_store is ProbeStore
+    assert net.config[Simulator].probe_store_kwargs == {}
+    assert net.config[Simulator].pipeline_periods is False
+    assert net.config[Simulator].recording_buffer_period == 1.0
+    assert net.config[Simulator].host_catch_up == "burst"
+    assert net.config[Simulator].host_spin_time == 0.002
+    assert net.config[Simulator].decoder_n_threads == 1
+    assert net.config[Simulator].netlist_n_processes == 1
+    assert net.config[Simulator].routing_n_processes is None
+    assert net.config[Simulator].routing_time_budget == 0.0
+
 
 def test_callable_parameter_validate():
     """Test that the callable parameter fails to validate if passed something
@@ -1,3 +1,6 @@
+import itertools
+import math
+import numpy as np
 import pytest
 from rig.bitfield import UnavailableFieldError
 
@@ -139,6 +142,134 @@ class TestPartitionMultiple(object):
         with pytest.raises(pac.UnpartitionableError):
             list(pac.partition_multiple((slice(10), slice(2)), constraints))
 
+    @pytest.mark.parametrize("overhead", [0, 10, 100, 1000])
+    def test_least_cuts(self, overhead):
+        """Test that the least number of cuts which satisfies the constraints
+        is found when the initial estimate is poor.
+        """
+        constraint = pac.Constraint(2000)
+
+        def cons(*slices):
+            return sum(sl.stop - sl.start for sl in slices) * 10 + overhead
+
+        constraints = {constraint: cons}
+
+        slices = list(pac.partition_multiple((slice(5000), slice(100)),
+                                             constraints))
+        assert slices == list(reference_partition_multiple(
+            (slice(5000), slice(100)), constraints))
+
+    def test_estimate_suffices(self):
+        """Test that no further divisions are tried when the estimated number
+        of cuts satisfies the constraints.
+        """
+        constraint = pac.Constraint(50)
+        calls = list()
+
+        def cons(*slices):
+            calls.append(slices)
+            return sum(sl.stop - sl.start for sl in slices)
+
+        slices = list(pac.partition_multiple((slice(800), ),
+                                             {constraint: cons}))
+        assert len(slices) == 16
+
+        # The usage is determined for the initial slice (twice, once to
+        # estimate the number of cuts) and then for each of the 16 slices.
+        assert len(calls) == 1 + 1 + 16
+
+    def test_heterogeneous_costs(self):
+        """Test that slices are uneven when the cost of atoms differs."""
+        costs = np.array([5] * 10 + [1] * 50)
+        constraint = pac.Constraint(50)
+
+        def cons(sl):
+            return costs[sl].sum()
+
+        constraints = {constraint: cons}
+
+        # Without the costs the even division requires 6 slices
+        assert len(list(pac.partition(slice(60), constraints))) == 6
+
+        # With the costs only 2 slices (of cost 50) are needed
+        assert (list(pac.partition(slice(60), constraints, costs=costs)) ==
+                [slice(0, 10), slice(10, 60)])
+
+    def test_partition_large(self):
+        """Compare the number of cores required against partitioning by
+        incrementing the number of cuts and dividing slices evenly.
+        """
+        # When a fixed overhead dominates the usage the initial estimate of
+        # the number of cuts is poor.
+        n_atoms = 10000
+        constraints = {
+            pac.Constraint(2000): lambda sl: 10 * (sl.stop - sl.start) + 1900
+        }
+
+        ref_slices = reference_partition_multiple((slice(n_atoms), ),
+                                                  constraints)
+        slices = list(pac.partition_multiple((slice(n_atoms), ),
+                                             constraints))
+        assert slices == ref_slices
+
+        # Atoms whose costs vary, e.g., neurons with different fan-in
+        costs = np.random.RandomState(2).randint(1, 100, n_atoms)
+        costs[n_atoms // 4:n_atoms // 2] *= 4
+        prefix = np.hstack(([0], np.cumsum(costs)))
+        dtcm_constraint = pac.Constraint(2000)
+        cpu_constraint = pac.Constraint(20000)
+
+        def dtcm_usage(sl):
+            return 2 * (sl.stop - sl.start) + 100
+
+        def cpu_usage(sl):
+            return prefix[sl.stop] - prefix[sl.start] + 500
+
+        constraints = {dtcm_constraint: dtcm_usage,
+                       cpu_constraint: cpu_usage}
+
+        ref_slices = reference_partition_multiple((slice(n_atoms), ),
+                                                  constraints)
+        slices = list(pac.partition_multiple((slice(n_atoms), ), constraints,
+                                             costs=(costs, )))
+        for sl, in slices:
+            assert dtcm_usage(sl) <= dtcm_constraint.max_usage
+            assert cpu_usage(sl) <= cpu_constraint.max_usage
+        assert len(slices) < 0.75 * len(ref_slices)
+
+
+def reference_partition_multiple(initial_slices, constraints_and_getters):
+    """Partition by incrementing the number of cuts until the constraints are
+    satisfied.
+    """
+    def constraints_unsatisfied(slices, constraints):
+        for s in slices:
+            for constraint, usage in constraints.items():
+                yield constraint.max_usage < usage(*s)
+
+    initial_slices = tuple(slice(0, sl.stop) if sl.start is None else sl
+                           for sl in initial_slices)
+    n_cuts = 1
+    max_cuts = max(sl.stop - sl.start for sl in initial_slices)
+    slices = [initial_slices]
+
+    while any(constraints_unsatisfied(slices, constraints_and_getters)):
+        if n_cuts == 1:
+            n_cuts = max(
+                int(math.ceil(usage(*initial_slices) / c.max_usage)) for
+                c, usage in constraints_and_getters.items()
+            )
+        else:
+            n_cuts += 1
+
+        if n_cuts > max_cuts:
+            raise pac.UnpartitionableError
+
+        slices = list(zip(*(pac.divide_slice(sl, n_cuts)
+                            for sl in initial_slices)))
+
+    return slices
+
 
 @pytest.mark.parametrize(
     "start, stop, n_items",
@@ -149,3 +280,37 @@ def test_divide_slice(start, stop, n_items):
     assert slices[0].start == start
     assert slices[-1].stop == stop
     assert len(slices) == n_items
+
+
+@pytest.mark.parametrize("n_atoms, n_slices", [(0, 2), (3, 5), (8, 3), (9, 4)])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_divide_slice_by_cost(n_atoms, n_slices, seed):
+    """Test that the greatest cost of any slice is minimised."""
+    costs = np.random.RandomState(seed).randint(0, 10, n_atoms)
+    slices = pac.divide_slice_by_cost(slice(10, 10 + n_atoms), n_slices,
+                                      costs)
+
+    # The slices should cover the initial slice
+    assert len(slices) == n_slices
+    assert slices[0].start == 10
+    assert slices[-1].stop == 10 + n_atoms
+    for a, b in zip(slices[:-1], slices[1:]):
+        assert a.stop == b.start
+
+    # Compare the greatest cost of a slice against that found by exhaustive
+    # search.
+    def max_cost(cuts):
+        bounds = (0, ) + cuts + (n_atoms, )
+        return max(costs[a:b].sum() for a, b in zip(bounds[:-1], bounds[1:]))
+
+    best = min(max_cost(cuts) for cuts in
+               itertools.combinations_with_replacement(range(n_atoms + 1),
+                                                       n_slices - 1))
+    assert max(costs[sl.start - 10:sl.stop - 10].sum() for sl in slices) == \
+        best
+
+
+def test_divide_slice_by_cost_uniform():
+    """Test that slices of atoms with equal costs are balanced."""
+    slices = pac.divide_slice_by_cost(slice(0, 10), 4, np.ones(10))
+    assert sorted(sl.stop - sl.start for sl in slices) == [2, 2, 3, 3]
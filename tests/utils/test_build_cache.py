@@ -0,0 +1,162 @@
+import mock
+import numpy as np
+import os
+import pytest
+from rig.bitfield import BitField
+import time
+
+from nengo_spinnaker.regions import MatrixRegion
+from nengo_spinnaker.utils import build_cache
+from nengo_spinnaker.utils.build_cache import (
+    fingerprint, BuildCache, NoBuildCache, get_default_build_cache)
+
+
+class TestFingerprint(object):
+    @pytest.mark.parametrize(
+        "a, b",
+        [(1, 1),
+         ("abc", "abc"),
+         (np.arange(10), np.arange(10)),
+         ([1, (2.0, slice(0, 3))], [1, (2.0, slice(0, 3))]),
+         ({"a": 1, "b": {2, 3}}, {"b": {3, 2}, "a": 1}),
+         (MatrixRegion(np.eye(3)), MatrixRegion(np.eye(3))),
+         ])
+    def test_equal(self, a, b):
+        assert fingerprint(a) == fingerprint(b)
+
+    @pytest.mark.parametrize(
+        "a, b",
+        [(1, 2),
+         (1, 1.0),
+         ("abc", "abd"),
+         (np.arange(10), np.arange(10, dtype=np.float)),
+         (np.zeros((2, 3)), np.zeros((3, 2))),
+         ([1, 2], (1, 2)),
+         (slice(0, 3), slice(0, 4)),
+         ({"a": 1}, {"a": 2}),
+         (MatrixRegion(np.eye(3)), MatrixRegion(np.eye(3),
+                                                prepend_n_rows=True)),
+         ])
+    def test_different(self, a, b):
+        assert fingerprint(a) != fingerprint(b)
+
+    def test_bitfield(self):
+        def make_keyspace(value):
+            ks = BitField(32)
+            ks.add_field("x", length=8, start_at=0)
+            ks.add_field("y", length=8, start_at=8)
+            return ks(x=value, y=3)
+
+        assert (fingerprint(make_keyspace(1)) ==
+                fingerprint(make_keyspace(1)))
+        assert (fingerprint(make_keyspace(1)) !=
+                fingerprint(make_keyspace(2)))
+
+    def test_bitfield_unassigned(self):
+        ks = BitField(32)
+        ks.add_field("x", length=8, start_at=0)
+        ks.add_field("y", length=8, start_at=8)
+
+        with pytest.raises(TypeError):
+            fingerprint(ks(x=1))
+
+    @pytest.mark.parametrize(
+        "obj",
+        [lambda x: x,
+         object(),
+         mock.Mock(),
+         ])
+    def test_unsupported(self, obj):
+        with pytest.raises(TypeError):
+            fingerprint(obj)
+
+    def test_self_referential(self):
+        a = list()
+        a.append(a)
+
+        with pytest.raises(TypeError):
+            fingerprint(a)
+
+
+class TestBuildCache(object):
+    def test_get_set(self, tmpdir):
+        cache = BuildCache(str(tmpdir))
+
+        key = cache.key(np.arange(3))
+        assert cache.get(key) is None
+        assert cache.get(key, 5) == 5
+
+        cache.set(key, b"\x00\x01")
+        assert cache.get(key) == b"\x00\x01"
+
+        # The item is persistent
+        assert BuildCache(str(tmpdir)).get(key) == b"\x00\x01"
+
+    def test_key_includes_format_version(self, tmpdir):
+        """Items stored in an earlier format should not be retrieved."""
+        cache = BuildCache(str(tmpdir))
+        key = cache.key(np.arange(3))
+
+        with mock.patch.object(build_cache, "FORMAT_VERSION",
+                               build_cache.FORMAT_VERSION + 1):
+            assert cache.key(np.arange(3)) != key
+
+    def test_key_unsupported(self, tmpdir):
+        assert BuildCache(str(tmpdir)).key(lambda: None) is None
+
+    def test_readonly(self, tmpdir):
+        BuildCache(str(tmpdir)).set("abc", 1)
+
+        cache = BuildCache(str(tmpdir), readonly=True)
+        cache.set("def", 2)
+        assert cache.get("abc") == 1
+        assert cache.get("def") is None
+
+    def test_shrink_removes_least_recently_used(self, tmpdir):
+        cache = BuildCache(str(tmpdir))
+
+        # Store some items, ensuring the modification times are distinct
+        for i, key in enumerate(("a", "b", "c")):
+            cache.set(key, b"\x00" * 100)
+            t = time.time() - 100 + i
+            os.utime(cache._path(key), (t, t))
+
+        # Using "a" makes it the most recently used
+        cache.get("a")
+
+        size = cache.get_size()
+        cache.shrink(size - 1)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+        cache.shrink("0 MB")
+        assert cache.get_size() == 0
+
+    def test_no_build_cache(self):
+        cache = NoBuildCache()
+        assert cache.key(np.arange(3)) is None
+
+        cache.set("a", 1)
+        assert cache.get("a") is None
+        assert cache.get_size() == 0
+
+
+@pytest.mark.parametrize("enabled", [None, "False", "True"])
+def test_get_default_build_cache(tmpdir, enabled):
+    from six.moves import configparser
+    rc = configparser.ConfigParser()
+    rc.add_section("build_cache")
+    if enabled is not None:
+        rc.set("build_cache", "enabled", enabled)
+    rc.set("build_cache", "path", str(tmpdir))
+
+    with mock.patch.object(build_cache, "rc", rc):
+        cache = get_default_build_cache()
+
+    if enabled == "True":
+        assert isinstance(cache, BuildCache)
+        assert cache.cache_dir == str(tmpdir)
+        assert not cache.readonly
+    else:
+        assert isinstance(cache, NoBuildCache)
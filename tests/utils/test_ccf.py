@@ -1,4 +1,8 @@
-from nengo_spinnaker.utils.ccf import minimise
+import mock
+import numpy as np
+from nengo_spinnaker.utils import ccf
+from nengo_spinnaker.utils.ccf import (minimise, minimise_memoised,
+                                       minimise_vectorised)
 import pytest
 
 
@@ -61,3 +65,75 @@ def test_with_xs():
     off_set = {(0b1000, 0b1110),
                (0b0110, 0b1110)}
     minimised = set(minimise(on_set, off_set))
+
+
+def random_keys_and_masks(rng, n, masks=(0xffffffff, 0xffff0000,
+                                         0xfffffff0, 0xff00ff00)):
+    """Make a random set of keys and masks whose most significant 8 bits are
+    unique.
+    """
+    top_bits = rng.choice(256, size=n, replace=False)
+    keys = (top_bits << 24) | rng.randint(0, 1 << 24, size=n)
+    masks = rng.choice(masks, size=n)
+    return {(int(k & m), int(m)) for k, m in zip(keys, masks)}
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("n_on, n_off", [(1, 0), (40, 0), (1, 1), (20, 50),
+                                         (100, 100), (200, 5), (0, 10)])
+def test_vectorised_matches_minimise(seed, n_on, n_off):
+    """The vectorised minimiser should produce exactly the same entries, in
+    the same order, as the original.
+    """
+    rng = np.random.RandomState(seed)
+    entries = list(random_keys_and_masks(rng, n_on + n_off))
+    on_set, off_set = set(entries[:n_on]), set(entries[n_on:])
+
+    expected = list(minimise(on_set, off_set))
+    assert list(minimise_vectorised(on_set, off_set)) == expected
+
+    # The result covers the on-set but none of the off-set
+    for key, mask in on_set:
+        assert any(key & m == k for k, m in expected)
+    for key, mask in off_set:
+        assert not any(key & m == k and mask & m == m for k, m in expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorised_matches_minimise_used_columns(seed):
+    rng = np.random.RandomState(seed)
+    entries = list(random_keys_and_masks(rng, 30, masks=(0xffffffff, )))
+    on_set, off_set = set(entries[:20]), set(entries[20:])
+    used_columns = {0, 5, 31}
+
+    assert (list(minimise_vectorised(on_set, off_set, used_columns)) ==
+            list(minimise(on_set, off_set, used_columns)))
+
+
+def test_vectorised_inseparable():
+    """An error is raised if no column separates the on- and off-sets."""
+    with pytest.raises(ValueError):
+        list(minimise_vectorised({(0b1, 0b1)}, {(0b0, 0b0)}))
+
+
+def test_minimise_memoised():
+    """Repeated minimisation problems should be minimised only once."""
+    rng = np.random.RandomState(1)
+    entries = list(random_keys_and_masks(rng, 60))
+    problems = [(set(entries[:i]), set(entries[i:])) for i in (10, 20, 30)]
+
+    with mock.patch.object(ccf, "_memo", type(ccf._memo)()), \
+            mock.patch.object(ccf, "MEMO_SIZE", 2), \
+            mock.patch.object(ccf, "minimise_vectorised",
+                              wraps=minimise_vectorised) as minimiser:
+        for on_set, off_set in problems[:2] * 3:
+            assert (minimise_memoised(on_set, off_set) ==
+                    tuple(minimise(on_set, off_set)))
+        assert minimiser.call_count == 2
+
+        # Only the most recently used problems are remembered
+        minimise_memoised(*problems[2])
+        minimise_memoised(*problems[1])
+        assert minimiser.call_count == 3
+        minimise_memoised(*problems[0])
+        assert minimiser.call_count == 4
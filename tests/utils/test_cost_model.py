@@ -0,0 +1,69 @@
+import collections
+import numpy as np
+import pytest
+
+from nengo_spinnaker.utils.cost_model import CostModel, MS_PER_CYCLE
+
+
+@pytest.fixture
+def model():
+    return CostModel(
+        collections.OrderedDict([
+            ("Update", [("n_neurons", "size_in"), ("n_neurons", ), ()]),
+            ("Learn", [("n_neurons", "n_rules")]),
+        ]),
+        {"Update": [9, 61, 174], "Learn": [0]}
+    )
+
+
+def test_cycles(model):
+    assert model.cycles("Update", n_neurons=10, size_in=2) == \
+        9*10*2 + 61*10 + 174
+    assert model.cycles("Learn", n_neurons=10, n_rules=3) == 0.0
+
+
+def test_mismatched_coefficients():
+    with pytest.raises(ValueError) as err:
+        CostModel({"Update": [("n_neurons", ), ()]}, {"Update": [1.0]})
+    assert "Update" in str(err.value)
+
+
+def test_fit(model):
+    """Test that the coefficients are fitted to times and that stages without
+    data are unchanged.
+    """
+    rows = list()
+    for n_neurons in (10, 50, 100):
+        for size_in in (1, 4, 16):
+            cycles = 5*n_neurons*size_in + 40*n_neurons + 100
+            rows.append({"n_neurons": n_neurons, "size_in": size_in,
+                         "Update": cycles * MS_PER_CYCLE})
+
+    # Rows with missing variables are ignored
+    rows.append({"n_neurons": 1000, "Update": 1.0})
+
+    fitted = model.fit(rows)
+    assert np.allclose(fitted.coefficients["Update"], [5, 40, 100])
+    assert fitted.coefficients["Learn"] == model.coefficients["Learn"]
+
+    # The original model is unchanged
+    assert model.coefficients["Update"] == [9, 61, 174]
+
+
+def test_update(model):
+    other = CostModel({"Learn": [("n_neurons", "n_rules"), ("n_rules", )]},
+                      {"Learn": [2, 100]})
+    updated = model.update(other)
+
+    assert list(updated.terms) == ["Update", "Learn"]
+    assert updated.cycles("Update", n_neurons=1, size_in=1) == 9 + 61 + 174
+    assert updated.cycles("Learn", n_neurons=10, n_rules=2) == 240
+
+
+def test_save_load(model, tmpdir):
+    path = str(tmpdir.join("model.json"))
+    model.save(path)
+
+    loaded = CostModel.load(path)
+    assert dict(loaded.terms) == dict(model.terms)
+    assert loaded.coefficients == model.coefficients
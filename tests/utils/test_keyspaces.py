@@ -1,5 +1,6 @@
+import numpy as np
 import pytest
-from rig.bitfield import BitField
+from rig.bitfield import BitField, UnavailableFieldError, UnknownTagError
 from nengo_spinnaker.utils import keyspaces
 
 
@@ -47,3 +48,124 @@ def test_Keyspaces_and_is_nengo_keyspace():
 
     kss.assign_fields()
     other_ks.get_mask()
+
+
+class TestKeyspaceLayout(object):
+    @pytest.fixture
+    def kss(self):
+        """Keyspace container with a keyspace whose fields depend on the value
+        of another field.
+        """
+        kss = keyspaces.KeyspaceContainer()
+        kss["nengo"](connection_id=5, cluster=3, index=40)
+
+        other = kss["other"]
+        other.add_field("kind", length=1, tags="routing")
+        other(kind=0).add_field("x", length=4, tags="routing")
+        other(kind=1).add_field("y", length=6)
+
+        kss.assign_fields()
+        return kss
+
+    @pytest.mark.parametrize("tag, field",
+                             [(None, None), ("routing", None),
+                              ("filter_routing", None), (None, "index"),
+                              (None, "cluster")])
+    def test_matches_bitfield(self, kss, tag, field):
+        """Keys and masks should be those generated by the keyspace."""
+        ks = kss["nengo"](connection_id=2)
+        layout = keyspaces.KeyspaceLayout(ks)
+
+        for cluster, index in [(0, 0), (3, 7), (1, 40)]:
+            expected = ks(cluster=cluster, index=index)
+            assert (layout.get_value(tag, field, cluster=cluster,
+                                     index=index) ==
+                    expected.get_value(tag=tag, field=field))
+            assert (layout.get_mask(tag, field, cluster=cluster,
+                                    index=index) ==
+                    expected.get_mask(tag=tag, field=field))
+
+    def test_arrays(self, kss):
+        """Keys for arrays of values should be broadcast against each
+        other.
+        """
+        ks = kss["nengo"](connection_id=2)
+        layout = keyspaces.KeyspaceLayout(ks)
+
+        clusters = np.array([[0], [1], [3]])
+        indices = np.arange(41)
+        keys = layout.get_value(cluster=clusters, index=indices)
+        masks = layout.get_mask(tag="routing", index=indices)
+
+        assert keys.shape == (3, 41)
+        assert keys.dtype == np.uint32
+        for (i, j), key in np.ndenumerate(keys):
+            assert key == ks(cluster=clusters[i, 0],
+                             index=indices[j]).get_value()
+
+        assert masks.shape == (41, )
+        assert np.all(masks == ks.get_mask(tag="routing"))
+
+    def test_fields_depending_on_values(self, kss):
+        """If a field value changes which fields exist then the keyspace
+        should be called to generate each key.
+        """
+        layout = keyspaces.KeyspaceLayout(kss["other"])
+
+        kinds = np.array([0, 1, 1, 0])
+        keys = layout.get_value(field="kind", kind=kinds)
+        masks = layout.get_mask(tag="routing", kind=kinds)
+        for kind, key, mask in zip(kinds, keys, masks):
+            assert key == kss["other"](kind=kind).get_value(field="kind")
+            assert mask == kss["other"](kind=kind).get_mask(tag="routing")
+        assert masks[0] != masks[1]
+
+        # Once the field is set the layout is fixed
+        layout = keyspaces.KeyspaceLayout(kss["other"](kind=1))
+        assert (list(layout.get_value(y=np.array([2, 5]))) ==
+                [kss["other"](kind=1, y=y).get_value() for y in (2, 5)])
+
+    def test_errors(self, kss):
+        """The same errors as would be raised by the keyspace should be
+        raised.
+        """
+        layout = keyspaces.KeyspaceLayout(kss["nengo"](connection_id=2))
+
+        with pytest.raises(ValueError) as excinfo:
+            layout.get_value(cluster=np.array([1, 1 << 20]), index=0)
+        assert "too large" in str(excinfo.value)
+
+        with pytest.raises(ValueError) as excinfo:
+            layout.get_value(index=-1, cluster=0)
+        assert "positive" in str(excinfo.value)
+
+        with pytest.raises(ValueError) as excinfo:
+            layout.get_value(connection_id=1, cluster=0, index=0)
+        assert "already has value" in str(excinfo.value)
+
+        with pytest.raises(ValueError) as excinfo:
+            layout.get_value(index=np.arange(3))
+        assert "undefined" in str(excinfo.value)
+
+        with pytest.raises(UnknownTagError):
+            layout.get_mask(tag="spam")
+
+        with pytest.raises(UnavailableFieldError):
+            layout.get_mask(field="eggs")
+
+        with pytest.raises(UnavailableFieldError):
+            layout.get_value(eggs=1)
+
+        with pytest.raises(TypeError):
+            layout.get_value(tag="routing", field="index")
+
+    def test_unassigned_fields(self):
+        """Generating keys from keyspaces whose fields are not yet assigned
+        should fail.
+        """
+        kss = keyspaces.KeyspaceContainer()
+        layout = keyspaces.KeyspaceLayout(kss["nengo"](connection_id=2))
+
+        with pytest.raises(ValueError) as excinfo:
+            layout.get_value(tag="routing", cluster=0)
+        assert "fixed size/position" in str(excinfo.value)
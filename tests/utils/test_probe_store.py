@@ -0,0 +1,100 @@
+import numpy as np
+import os
+import pytest
+
+from nengo_spinnaker.utils.probe_store import ProbeStore, MemmapProbeStore
+
+
+@pytest.fixture(params=["memory", "memmap"])
+def store(request, tmpdir):
+    if request.param == "memory":
+        return ProbeStore()
+    else:
+        return MemmapProbeStore(str(tmpdir))
+
+
+def test_append_and_read(store):
+    """Check that chunks appended to the store are read back in order."""
+    chunks = [np.random.uniform(size=(n, 3)) for n in (5, 1, 17, 4)]
+
+    for chunk in chunks:
+        store.append("a", chunk)
+
+    assert "a" in store
+    assert "b" not in store
+    assert len(store) == 1
+    assert list(store) == ["a"]
+    assert np.array_equal(store["a"], np.vstack(chunks))
+
+
+def test_append_preserves_dtype_and_shape(store):
+    """Check that multi-dimensional data of different types may be stored."""
+    store.append("enc", np.ones((2, 4, 2), dtype=np.int32))
+    store.append("enc", np.zeros((3, 4, 2), dtype=np.int32))
+    store.append("spikes", np.eye(3, dtype=np.bool))
+
+    assert store["enc"].shape == (5, 4, 2)
+    assert store["enc"].dtype == np.int32
+    assert np.all(store["enc"][:2] == 1) and np.all(store["enc"][2:] == 0)
+    assert np.array_equal(store["spikes"], np.eye(3, dtype=np.bool))
+
+
+def test_append_empty(store):
+    """Check that appending zero rows is fine."""
+    store.append("a", np.zeros((0, 2)))
+    assert store["a"].shape == (0, 2)
+
+    store.append("a", np.ones((1, 2)))
+    assert np.array_equal(store["a"], np.ones((1, 2)))
+
+
+def test_append_wrong_shape(store):
+    """Check that an error is raised if mismatched chunks are appended."""
+    store.append("a", np.zeros((2, 3)))
+
+    with pytest.raises(ValueError):
+        store.append("a", np.zeros((2, 4)))
+
+
+def test_views_are_not_copies():
+    """Check that the in-memory store doesn't copy its buffer for every
+    append and returns views of it.
+    """
+    store = ProbeStore()
+    store.append("a", np.zeros((4, 2)))
+    store.append("a", np.zeros((2, 2)))
+
+    # Buffer doubled in size, next append fits without a new allocation
+    buf = store._buffers["a"]
+    assert buf.shape == (8, 2)
+    store.append("a", np.ones((2, 2)))
+    assert store._buffers["a"] is buf
+    assert np.shares_memory(store["a"], buf)
+
+
+def test_memmap_store_temporary_directory():
+    """Check that a temporary directory is used and removed on close."""
+    store = MemmapProbeStore()
+    store.append("a", np.ones((10, 2)))
+
+    assert os.path.isdir(store.directory)
+    assert isinstance(store["a"], np.memmap)
+    assert os.path.getsize(store._paths["a"]) == store["a"].nbytes
+
+    store.close()
+    assert not os.path.exists(store.directory)
+
+    # The data remains available after the store is closed
+    assert np.all(store["a"] == 1.0)
+
+
+def test_memmap_store_given_directory_not_removed(tmpdir):
+    """Check that a directory provided by the user is not removed on
+    close.
+    """
+    path = str(tmpdir.join("probes"))
+    store = MemmapProbeStore(path)
+    store.append("a", np.ones((10, 2)))
+    store.close()
+
+    assert os.path.isdir(path)
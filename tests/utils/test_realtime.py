@@ -0,0 +1,207 @@
+import pytest
+
+from nengo_spinnaker.utils.realtime import RealtimeScheduler, SchedulerStats
+
+
+class FakeClock(object):
+    """Clock which advances when slept on, by a small amount each time it is
+    read (as though spinning) and by the duration of each step.
+    """
+    def __init__(self, tick=1e-5, sleep_overshoot=0.0):
+        self.time = 100.0
+        self.tick = tick
+        self.sleep_overshoot = sleep_overshoot
+        self.slept = 0.0
+
+    def clock(self):
+        self.time += self.tick
+        return self.time
+
+    def sleep(self, duration):
+        self.slept += duration
+        self.time += duration + self.sleep_overshoot
+
+
+def make_scheduler(clock, **kwargs):
+    return RealtimeScheduler(0.001, clock=clock.clock, sleep=clock.sleep,
+                             **kwargs)
+
+
+def make_step(clock, durations):
+    """Make a step function whose calls take the given durations and which
+    records the times at which it is called.
+    """
+    durations = list(durations)
+    calls = list()
+
+    def step():
+        calls.append(clock.time)
+        clock.time += durations.pop(0)
+
+    step.calls = calls
+    return step
+
+
+class TestRealtimeScheduler(object):
+    def test_no_drift(self):
+        """Steps which take varying fractions of a timestep and sleeps which
+        overshoot shouldn't cause the schedule to drift.
+        """
+        clock = FakeClock(sleep_overshoot=0.0002)
+        scheduler = make_scheduler(clock, spin_time=0.0005)
+        step = make_step(clock, [0.0002, 0.0009, 0.0005] * 100)
+        start = clock.time
+
+        stats = scheduler.run(step, 300)
+        assert stats is scheduler.stats
+
+        # Every step started within a few clock ticks of its deadline
+        assert stats.n_steps == 300
+        assert stats.n_skipped == 0
+        assert stats.max < 5 * clock.tick
+        assert stats.min >= 0.0
+        for k, t in enumerate(step.calls):
+            assert start + k * 0.001 <= t < start + k * 0.001 + 1e-4
+
+        # Only waits longer than the spin time were slept through (those
+        # after the shortest steps), stopping short of the deadline.
+        assert clock.slept == pytest.approx(100 * (0.0008 - 0.0005),
+                                            abs=300 * clock.tick)
+
+    def test_burst(self):
+        """When a step overruns subsequent steps are run back-to-back until
+        the schedule is caught up.
+        """
+        clock = FakeClock()
+        scheduler = make_scheduler(clock, catch_up="burst")
+        step = make_step(clock, [0.0001, 0.0035] + [0.0001] * 8)
+        start = clock.time
+
+        stats = scheduler.run(step, 10)
+        assert stats.n_steps == 10
+        assert stats.n_skipped == 0
+        assert stats.n_late == 2  # The steps due at 2 and 3 ms
+
+        # Steps 2, 3 and 4 were run as quickly as possible after the long step
+        assert step.calls[2] - step.calls[1] == pytest.approx(0.0035, abs=1e-4)
+        assert step.calls[3] - step.calls[2] < 0.0002
+        assert step.calls[4] - step.calls[3] < 0.0002
+
+        # Then the schedule resumed
+        for k in range(5, 10):
+            assert (step.calls[k] - start) == pytest.approx(k * 0.001,
+                                                            abs=1e-4)
+
+    def test_skip(self):
+        """When a step overruns the steps whose deadlines have passed are
+        dropped.
+        """
+        clock = FakeClock()
+        scheduler = make_scheduler(clock, catch_up="skip")
+        step = make_step(clock, [0.0001, 0.0035] + [0.0001] * 8)
+        start = clock.time
+
+        stats = scheduler.run(step, 10)
+        assert stats.n_skipped == 2  # The steps due at 2 and 3 ms
+        assert stats.n_steps == 8
+        assert stats.n_late == 0
+        assert stats.max < 0.001
+
+        # The step after the long one ran at the next deadline, 4 ms
+        assert step.calls[2] - start == pytest.approx(0.0045, abs=1e-4)
+        for k, t in enumerate(step.calls[3:], start=5):
+            assert t - start == pytest.approx(k * 0.001, abs=1e-4)
+
+    def test_skip_end_of_schedule(self):
+        """Steps skipped at the end of the schedule aren't run."""
+        clock = FakeClock()
+        scheduler = make_scheduler(clock, catch_up="skip")
+        step = make_step(clock, [0.0001, 0.0055])
+
+        stats = scheduler.run(step, 4)
+        assert stats.n_steps == 2
+        assert stats.n_skipped == 2
+
+    def test_should_stop(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        step = make_step(clock, [0.0001] * 10)
+
+        stats = scheduler.run(step, should_stop=lambda: len(step.calls) == 7)
+        assert stats.n_steps == 7
+
+    def test_interrupted(self):
+        """The statistics of an interrupted run remain available."""
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+
+        def step():
+            clock.time += 0.0001
+            if scheduler.stats.n_steps == 3:
+                raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            scheduler.run(step)
+
+        assert scheduler.stats.n_steps == 3
+
+    def test_invalid_catch_up(self):
+        with pytest.raises(ValueError) as excinfo:
+            RealtimeScheduler(0.001, catch_up="hurry")
+        assert "hurry" in str(excinfo.value)
+
+    def test_long_run(self):
+        """Over a long run with sleeps which overshoot the schedule is kept
+        without drift.
+        """
+        clock = FakeClock(tick=1e-4, sleep_overshoot=0.0001)
+        scheduler = make_scheduler(clock)
+        step = make_step(clock, [0.0001] * 2000)
+        start = clock.time
+
+        stats = scheduler.run(step, 2000)
+        assert stats.n_steps == 2000
+        assert stats.n_late == 0
+        assert stats.percentile(50) < 0.001
+        assert step.calls[-1] - start == pytest.approx(1.999, abs=1e-3)
+
+
+class TestSchedulerStats(object):
+    def test_stats(self):
+        stats = SchedulerStats(0.001, [0.0, 0.0005, 0.003, 0.0015], 2)
+        assert stats.n_steps == 4
+        assert stats.n_skipped == 2
+        assert stats.n_late == 2
+        assert stats.mean == pytest.approx(0.00125)
+        assert stats.min == 0.0
+        assert stats.max == 0.003
+
+        # Percentiles are accurate to within the width of a bin
+        assert 0.0005 <= stats.percentile(50) < 0.0005 + 2e-5
+        assert 0.0015 <= stats.percentile(75) < 0.0015 + 2e-5
+        assert stats.percentile(100) == 0.003
+
+    def test_very_late(self):
+        """Steps which are very late share the last bin of the histogram."""
+        stats = SchedulerStats(0.001, [0.0, 0.5, 2.0])
+        assert stats.n_late == 2
+        assert stats._counts[-1] == 2
+        assert stats.max == 2.0
+        assert stats.percentile(100) == 2.0
+
+    def test_empty(self):
+        stats = SchedulerStats(0.001)
+        assert stats.n_steps == 0
+        assert (stats.mean == stats.min == stats.max ==
+                stats.percentile(99) == 0.0)
+
+    def test_add(self):
+        stats = (SchedulerStats(0.001, [0.001, 0.0], 1) +
+                 SchedulerStats(0.001, [0.002], 3))
+        assert stats.n_steps == 3
+        assert stats.n_late == 2
+        assert stats.min == 0.0
+        assert stats.max == 0.002
+        assert stats.mean == pytest.approx(0.001)
+        assert stats.percentile(100) == 0.002
+        assert stats.n_skipped == 4